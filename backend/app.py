@@ -1,12 +1,20 @@
 import os
-from flask import Flask, jsonify, Response, send_from_directory
+import time
+from flask import Flask, g, jsonify, request, Response, send_from_directory, stream_with_context
 
 # Utility function imports
-from utils.gpu import get_gpu_info
-from utils.ram_disk import get_ram_disk_info
-from utils.containers import get_lxc_info
-from utils.cpu import get_cpu_info
-from utils.os_specific_commands import get_live_system_stats # For Live Stats
+from utils.collection import create_sampler, dashboard_mode
+from utils.snapshot_service import RemoteSampler
+from utils.history import HistoryStore
+from utils.storage import storage_from_env
+from utils.fields import parse_field_selector, select_fields
+from utils.export import DEFAULT_CHUNK_ROWS, FORMATS, available_formats, export_history
+from utils.stream import Broadcaster
+from utils.http_cache import EncodedBodyCache, choose_encoding, etag_matches
+from utils.fleet import COMPACTORS, build_agent_snapshot, fleet_views
+from utils.metrics import MetricsRenderer, enabled_collectors_from_env, OPENMETRICS_CONTENT_TYPE, PROMETHEUS_CONTENT_TYPE
+from utils.instrumentation import perf, profiler
+from utils.platform_registry import platform_status
 
 # --- App Configuration ---
 # Determine the absolute path for the frontend directory for robustness
@@ -24,6 +32,127 @@ def index():
     """Serves the main index.html file."""
     return send_from_directory(app.static_folder, 'index.html')
 
+# --- Background Sampling ---
+# Every data source is sampled by its own background thread and the latest result is kept
+# in memory. API routes only read that cache, so the number of nvidia-smi/lxc/top processes
+# spawned does not grow with the number of connected dashboards.
+# Under gunicorn (see gunicorn.conf.py) the collectors run once, in a separate collector process,
+# and every worker subscribes to its snapshots over the unix socket in DASHBOARD_COLLECTOR_SOCKET.
+COLLECTOR_SOCKET = os.environ.get("DASHBOARD_COLLECTOR_SOCKET")
+
+# Metrics are persisted to DASHBOARD_STORAGE_DIR if set (see utils/storage.py), by whichever
+# process runs the collectors; the workers only read from it
+storage = storage_from_env()
+if COLLECTOR_SOCKET:
+    sampler = RemoteSampler(COLLECTOR_SOCKET)
+else:
+    sampler = create_sampler(storage)
+
+# Keeps bounded, downsampled history of the GPU, CPU and RAM/disk metrics. With storage enabled,
+# it starts with the last DASHBOARD_STORAGE_PRELOAD seconds (default 6 hours) read from disk
+history = HistoryStore()
+if storage is not None:
+    preload_started = time.perf_counter()
+    preloaded = storage.load_into(history, float(os.environ.get("DASHBOARD_STORAGE_PRELOAD", 6 * 3600)))
+    print(f"Loaded {preloaded} points of history from {storage.directory} "
+          f"in {time.perf_counter() - preload_started:.2f}s")
+sampler.add_listener(history.record_snapshot)
+
+# Records collection times and error results per source for /api/debug/perf and /metrics
+sampler.add_listener(perf.on_snapshot)
+
+# Pushes snapshot deltas to all /api/stream subscribers
+broadcaster = Broadcaster(sampler)
+sampler.add_listener(broadcaster.on_snapshot)
+
+# Renders the cached snapshots for Prometheus. Exported sources can be restricted with
+# DASHBOARD_METRICS_COLLECTORS, e.g. DASHBOARD_METRICS_COLLECTORS=gpu,ram_disk ("self" adds the
+# dashboard's own latency histograms and counters)
+metrics_renderer = MetricsRenderer(sampler, enabled_collectors_from_env(["gpu", "ram_disk", "cpu", "lxc", "self"]))
+
+# On-demand sampling profiles at /api/debug/profile. Off unless DASHBOARD_PROFILING=1: a profile
+# keeps a thread sampling every stack for up to 30 seconds and exposes the code's call structure
+PROFILING_ENABLED = os.environ.get("DASHBOARD_PROFILING", "0") == "1"
+
+# --- Fleet Mode ---
+# Every node runs this app and serves a compact snapshot at /api/agent/snapshot. A node started with
+# DASHBOARD_MODE=hub additionally polls the agents listed in DASHBOARD_FLEET_AGENTS (host:port,...)
+# through its "fleet" source and serves fleet-wide views at /api/fleet.
+DASHBOARD_MODE = dashboard_mode()
+
+# How long a request waits for the very first sample of a source after startup
+FIRST_SAMPLE_TIMEOUT = 30
+
+@app.before_request
+def start_sampler():
+    # Started lazily on the first request rather than at import time, so that the
+    # reloader parent process of the Flask dev server never spawns collector threads.
+    sampler.start()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    # For streamed responses (/api/stream) this is the time until the stream starts
+    started = g.get("request_started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        perf.observe("route", route, time.perf_counter() - started)
+        if response.status_code >= 500:
+            perf.count("route_errors", route)
+    return response
+
+# Serialized (and compressed) response bodies, cached per snapshot version
+encoded_bodies = EncodedBodyCache()
+
+def snapshot_response(source, mimetype=None, body=None, variant=""):
+    """
+    Builds a response from the cached snapshot of `source`.
+    JSON sources are serialized with the app's JSON provider, plain-text ones are sent as-is.
+    `body`, if given, derives the response content from the snapshot data; `variant` must
+    then identify that derivation (e.g. its query parameters) for the body cache.
+
+    The serialized body is cached per snapshot version and carries a content-hash ETag:
+    a matching If-None-Match gets a 304, and gzip/brotli are negotiated per request.
+    The snapshot's timestamp and age are reported in the X-Snapshot-* and Age headers.
+    """
+    sampler.note_demand(source)
+    snapshot = sampler.get(source, wait=FIRST_SAMPLE_TIMEOUT)
+    if snapshot is None:
+        response = jsonify({"error": f"No data collected yet for {source}", "data": []})
+        response.status_code = 503
+        return response
+
+    def serialize():
+        data = body(snapshot.data) if body else snapshot.data
+        return data.encode() if mimetype else (app.json.dumps(data) + "\n").encode()
+
+    encoded = encoded_bodies.get(source, snapshot.version, variant, serialize)
+    response = encoded_response(encoded, mimetype or "application/json", snapshot.age())
+    response.headers["X-Snapshot-Timestamp"] = f"{snapshot.timestamp:.3f}"
+    return response
+
+def encoded_response(encoded, mimetype, age):
+    """
+    A response for a cached EncodedBody: 304 if If-None-Match matches its ETag, otherwise the
+    body in the best encoding the client accepts. `age` is the age of the (oldest) snapshot used.
+    """
+    if etag_matches(request.headers.get("If-None-Match"), encoded.etag):
+        response = Response(status=304)
+    else:
+        content, coding = encoded.encoded(choose_encoding(request.headers.get("Accept-Encoding")))
+        response = Response(content, mimetype=mimetype)
+        if coding:
+            response.headers["Content-Encoding"] = coding
+    response.headers["ETag"] = encoded.etag
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "no-cache"  # Browsers may cache, but must revalidate with the ETag
+    response.headers["X-Snapshot-Age"] = f"{age:.3f}"
+    response.headers["Age"] = str(int(age))
+    return response
+
 # Flask will automatically handle serving other files (e.g., script.js, style.css)
 # from the static_folder due to the static_url_path='' configuration.
 # For example, a request to /script.js will serve frontend_dir/script.js.
@@ -31,29 +160,290 @@ def index():
 # --- API Endpoints ---
 @app.route('/api/gpu-info')
 def gpu_info_route():
-    return jsonify(get_gpu_info())
+    return snapshot_response("gpu")
 
 @app.route('/api/ram-disk')
 def ram_disk_route():
-    return jsonify(get_ram_disk_info())
+    return snapshot_response("ram_disk")
 
 @app.route('/api/cpu-info')
 def cpu_info_route():
-    return jsonify(get_cpu_info())
+    return snapshot_response("cpu")
 
 @app.route('/api/lxc')
 def lxc_route():
-    return jsonify(get_lxc_info())
+    return snapshot_response("lxc")
+
+@app.route('/api/gpu-processes')
+def gpu_processes_route():
+    """GPU memory per process, per container and per user ("host" for processes outside containers)."""
+    return snapshot_response("gpu_processes")
 
 @app.route('/api/live-stats')
 def live_stats_route():
     """Serves live system statistics as plain text."""
-    stats = get_live_system_stats()
-    return Response(stats, mimetype='text/plain')
+    return snapshot_response("live_stats", mimetype='text/plain', body=lambda stats: stats.get("text", ""), variant="text")
+
+@app.route('/api/disk-io')
+def disk_io_route():
+    """Per-disk read/write bytes per second, IOPS, average latency and utilization (Linux)."""
+    return snapshot_response("disk_io")
+
+@app.route('/api/network')
+def network_route():
+    """Per-interface receive/transmit bytes and packets per second and link utilization (Linux)."""
+    return snapshot_response("network")
+
+@app.route('/api/processes')
+def processes_route():
+    """
+    Serves the process table as JSON.
+    Query parameters: sort=cpu|rss (default cpu), limit=<n> (default and maximum 100).
+    """
+    sort_by = request.args.get('sort', 'cpu')
+    limit = request.args.get('limit', type=int)
+
+    def select(stats):
+        result = {key: value for key, value in stats.items() if key not in ("processes", "top_rss", "text")}
+        processes = stats.get("top_rss" if sort_by == "rss" else "processes", [])
+        result["sort"] = "rss" if sort_by == "rss" else "cpu"
+        result["processes"] = processes[:limit] if limit and limit > 0 else processes
+        return result
+
+    return snapshot_response("live_stats", body=select, variant=f"processes:{sort_by == 'rss'}:{limit}")
+
+@app.route('/api/snapshot')
+def combined_snapshot_route():
+    """
+    Several sources in one response, optionally reduced to the fields a view needs.
+    Query parameters: sources (e.g. gpu,cpu; default: every source named in `fields`, or all)
+    and fields (e.g. gpu.utilization_gpu,gpu.memory_used_mb: the source, then the keys to keep;
+    lists are kept and the keys apply to each element; a bare source name keeps all its data).
+    Returns {"sources": {source: {"timestamp", "version", "data"}}, "missing": [sources without data yet]}.
+    Only the requested sources are marked as watched for the adaptive scheduler, and their first
+    samples (right after startup) are awaited together, within FIRST_SAMPLE_TIMEOUT.
+    """
+    selection = parse_field_selector(request.args.get('fields'))
+    requested = [source for source in request.args.get('sources', '').split(',') if source]
+    sources = list(dict.fromkeys(requested or list(selection) or sampler.sources()))
+    if not sampler.sources():
+        # A worker whose collector process has not announced its sources yet
+        return jsonify({"error": "No data collected yet", "missing": sources}), 503
+    unknown = [source for source in sources if source not in sampler.sources()]
+    if unknown:
+        return jsonify({"error": f"Unknown sources: {', '.join(unknown)}",
+                        "details": f"Available sources: {', '.join(sampler.sources())}"}), 400
+
+    for source in sources:
+        sampler.note_demand(source)
+    # Collectors run in their own threads, so waiting for one also gives the others time
+    deadline = time.monotonic() + FIRST_SAMPLE_TIMEOUT
+    snapshots = {source: sampler.get(source, wait=max(0.0, deadline - time.monotonic())) for source in sources}
+    available = [source for source in sources if snapshots[source] is not None]
+    if not available:
+        return jsonify({"error": "No data collected yet", "missing": sources}), 503
+
+    def serialize():
+        body = {"sources": {}, "missing": [source for source in sources if snapshots[source] is None]}
+        for source in available:
+            snapshot = snapshots[source]
+            body["sources"][source] = {"timestamp": snapshot.timestamp, "version": snapshot.version,
+                                       "data": select_fields(snapshot.data, selection.get(source))}
+        return (app.json.dumps(body) + "\n").encode()
+
+    # The body depends only on the selection and the snapshot versions, so it is cached like single sources
+    variant = f"{','.join(sources)}|{request.args.get('fields', '')}"
+    versions = tuple(snapshots[source].version if snapshots[source] else 0 for source in sources)
+    encoded = encoded_bodies.get("snapshot", versions, variant, serialize)
+    return encoded_response(encoded, "application/json", max(snapshots[source].age() for source in available))
+
+@app.route('/api/status')
+def status_route():
+    """Reports when each source was last sampled, how stale it is and its sampling interval."""
+    return jsonify(sampler.status())
+
+@app.route('/api/health')
+def health_route():
+    """Liveness check: the web process is up and answering."""
+    return jsonify({"status": "ok"})
+
+@app.route('/api/ready')
+def ready_route():
+    """
+    Readiness check: 200 once every source has been sampled at least once (and, under gunicorn,
+    the collector process is connected); 503 with the missing sources until then.
+    """
+    missing = sampler.missing_sources()
+    if missing:
+        return jsonify({"status": "starting", "missing": missing}), 503
+    return jsonify({"status": "ready"})
+
+@app.route('/api/stream')
+def stream_route():
+    """
+    Server-Sent Events stream of live data. A client first receives a "snapshot" event with the
+    full data of every source, then "delta" events holding only the changed values
+    ({"source", "version", "set": {path: value}, "unset": [paths]}).
+    Optional query parameter: sources=gpu,cpu,... to subscribe to a subset of the sources.
+    """
+    sources = [source for source in request.args.get('sources', '').split(',') if source in sampler.sources()]
+    subscription = broadcaster.subscribe(sources or None)
+    response = Response(stream_with_context(broadcaster.events(subscription)), mimetype='text/event-stream')
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # Disable response buffering in nginx
+    return response
+
+@app.route('/api/agent/snapshot')
+def agent_snapshot_route():
+    """Compact snapshot of this node, polled by a hub in fleet mode."""
+    for source in COMPACTORS:
+        if source in sampler.sources():
+            sampler.note_demand(source)
+    return jsonify(build_agent_snapshot(sampler))
+
+@app.route('/api/fleet')
+def fleet_route():
+    """
+    Hub mode only: the latest data of every agent (with its age and poll status) and
+    fleet-wide views (free GPUs, hottest GPUs, memory pressure per node).
+    """
+    if "fleet" not in sampler.sources():
+        return jsonify({"error": "Fleet view is only available in hub mode (DASHBOARD_MODE=hub)."}), 404
+    return snapshot_response("fleet", body=lambda nodes: {"nodes": nodes, "views": fleet_views(nodes)}, variant="fleet")
+
+@app.route('/api/alerts')
+def alerts_route():
+    """The alert rules, the currently firing alerts and the most recent firing/resolved events."""
+    if "alerts" not in sampler.sources():
+        return jsonify({"error": "Alerting is disabled (DASHBOARD_ALERTS=0)."}), 404
+    return snapshot_response("alerts")
+
+@app.route('/metrics')
+def metrics_route():
+    """
+    Prometheus/OpenMetrics exposition of the latest cached snapshots (never triggers collection).
+    OpenMetrics is used if the scraper accepts it, the classic text format otherwise;
+    the body is gzip-compressed when the client accepts gzip.
+    """
+    openmetrics = "application/openmetrics-text" in request.headers.get("Accept", "")
+    gzipped = choose_encoding(request.headers.get("Accept-Encoding"), available=["gzip"]) == "gzip"
+    body = metrics_renderer.render(openmetrics=openmetrics, gzipped=gzipped)
+    response = Response(body, content_type=OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+    if gzipped:
+        response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept, Accept-Encoding"
+    return response
+
+@app.route('/api/debug/perf')
+def debug_perf_route():
+    """
+    The dashboard's own performance data: latency percentiles and error rates per collector and
+    per route, subprocess spawn and timeout counts, cache hit ratios, the sampler status, and
+    the detected platform with the cached probes of the tools its collectors use.
+    """
+    result = perf.snapshot()
+    result["sources"] = sampler.status()
+    if storage is not None:
+        result["storage"] = storage.status()
+    if not COLLECTOR_SOCKET:
+        result["platform"] = platform_status()
+    else:
+        # Subprocess spawns and timeouts happen in the shared collector process
+        try:
+            result["collector_process"] = sampler.collector_perf()
+        except (OSError, ValueError) as e:
+            result["collector_process"] = {"error": "Collector process unreachable", "details": str(e)}
+    return jsonify(result)
+
+@app.route('/api/debug/profile')
+def debug_profile_route():
+    """
+    Samples the stacks of all threads every `interval` seconds (default 0.005, at least 0.001) for
+    `seconds` (default 5, at most 30) and returns the hottest functions and stacks. format=collapsed returns the stacks as text for flame graph tools.
+    Only available with DASHBOARD_PROFILING=1.
+    """
+    if not PROFILING_ENABLED:
+        return jsonify({"error": "Profiling is disabled; enable it with DASHBOARD_PROFILING=1."}), 404
+    result = profiler.profile(request.args.get('seconds', 5.0, type=float),
+                              request.args.get('interval', 0.005, type=float))
+    if "error" in result:
+        return jsonify(result), 409
+    if request.args.get('format') == 'collapsed':
+        text = "".join(f"{stack} {count}\n" for stack, count in result["stacks"].items())
+        return Response(text, mimetype='text/plain')
+    return jsonify(result)
+
+@app.route('/api/history')
+def history_route():
+    """
+    Serves recorded metric history.
+    Query parameters: metric (e.g. gpu.utilization_gpu), device (e.g. a PCI bus id, default: all),
+    start/end (epoch seconds; negative values are relative to now, default: the last hour) and
+    resolution (minimum seconds between points). Without `metric`, lists the available metrics.
+    source=disk reads from the on-disk storage instead of memory, for ranges beyond the
+    in-memory retention.
+    """
+    store = history_source()
+    if store is None:
+        return jsonify({"error": "On-disk storage is disabled.",
+                        "details": "Set DASHBOARD_STORAGE_DIR to persist metrics."}), 404
+    metric = request.args.get('metric')
+    if not metric:
+        return jsonify({"metrics": store.catalog()})
+
+    start, end = history_time_range()
+    resolution = request.args.get('resolution', type=float)
+    return jsonify(store.query(metric, request.args.get('device'), start, end, resolution))
+
+def history_source():
+    """The store selected by the `source` query parameter: memory (default) or disk (None if disabled)."""
+    if request.args.get('source') == 'disk':
+        return storage
+    return history
+
+def history_time_range():
+    """The start/end query parameters in epoch seconds; negative values are relative to now."""
+    now = time.time()
+    start = request.args.get('start', type=float)
+    end = request.args.get('end', type=float)
+    if start is not None and start < 0:
+        start = now + start
+    if end is not None and end < 0:
+        end = now + end
+    return start, end
+
+@app.route('/api/history/export')
+def history_export_route():
+    """
+    Streams recorded history in bulk, in a columnar binary format instead of JSON.
+    Query parameters: format (npy: a tar of .npy chunks, the default; arrow: an Arrow IPC stream,
+    if pyarrow is installed), metric and device (globs, e.g. gpu.* and 00000000:0[1-4]:00.0;
+    default: all), start/end (as for /api/history; default: everything retained), resolution and
+    chunk_rows (points per chunk). The body is generated chunk by chunk while it is sent.
+    source=disk exports from the on-disk storage, at the resolution the points were recorded.
+    Load it with export_history.py, or utils.export.read_npy_export.
+    """
+    store = history_source()
+    if store is None:
+        return jsonify({"error": "On-disk storage is disabled.",
+                        "details": "Set DASHBOARD_STORAGE_DIR to persist metrics."}), 404
+    export_format = request.args.get('format', 'npy')
+    if export_format not in available_formats():
+        return jsonify({"error": f"Unsupported export format: {export_format}",
+                        "details": f"Available formats: {', '.join(available_formats())}"}), 400
+    start, end = history_time_range()
+    chunks = export_history(store, export_format,
+                            metric=request.args.get('metric'), device=request.args.get('device'),
+                            start=start, end=end, resolution=request.args.get('resolution', type=float),
+                            chunk_rows=max(1, request.args.get('chunk_rows', DEFAULT_CHUNK_ROWS, type=int)))
+    filename = f"history-{int(time.time())}.{FORMATS[export_format]['extension']}"
+    return Response(stream_with_context(chunks), mimetype=FORMATS[export_format]["mimetype"],
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
 
 # --- Main Execution ---
 if __name__ == '__main__':
     # Runs the Flask development server.
     # host='0.0.0.0' makes it accessible from other devices on the network.
     # debug=True enables debug mode (auto-reloads on code changes, provides debug info).
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # DASHBOARD_PORT allows running several instances (e.g. agents and a hub) on one machine.
+    app.run(debug=True, host='0.0.0.0', port=int(os.environ.get("DASHBOARD_PORT", 5000)))
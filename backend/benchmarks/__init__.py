@@ -0,0 +1,7 @@
+"""
+Benchmarks for the collectors and the HTTP endpoints. Run from the backend directory:
+
+    python -m benchmarks.bench_collectors --output collectors.json
+    python -m benchmarks.bench_http --output http.json
+    python -m benchmarks.compare before.json after.json
+"""
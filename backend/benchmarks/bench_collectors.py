@@ -0,0 +1,197 @@
+"""
+Micro-benchmarks of the collectors and parsers against the generated fixtures.
+
+    python -m benchmarks.bench_collectors [--output results.json] [--filter gpu] [--min-time 1.0]
+
+Commands (nvidia-smi, lxc) are replaced by fake ones replaying recorded output, so the
+subprocess based collectors are measured including their process spawn cost.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.common import percentile, write_results
+from benchmarks.fixtures import build_fixtures
+from utils import containers, cpu, gpu, os_specific_commands, ram_disk
+from utils.alerts import AlertEngine
+from utils.cgroups import CgroupAccounting, discover_container_cgroups
+from utils.gpu_processes import GpuProcessAttribution
+from utils.processes import ProcessTable
+from utils.throughput import DiskStatsSampler, NetDevSampler
+
+def measure(name, func, setup=None, min_time=0.5, min_runs=5, max_runs=100000):
+    """
+    Calls `func` (with the result of `setup()`, if given, which is not timed) until both
+    `min_runs` calls and `min_time` seconds have passed, and returns per-call timing statistics.
+    """
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < max_runs and (len(timings) < min_runs or time.perf_counter() - started < min_time):
+        argument = setup() if setup else None
+        call_started = time.perf_counter()
+        if setup:
+            func(argument)
+        else:
+            func()
+        timings.append(time.perf_counter() - call_started)
+    timings.sort()
+    return {
+        "name": name,
+        "runs": len(timings),
+        "min_ms": round(timings[0] * 1000, 4),
+        "median_ms": round(percentile(timings, 50) * 1000, 4),
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 4),
+        "p99_ms": round(percentile(timings, 99) * 1000, 4),
+        "max_ms": round(timings[-1] * 1000, 4),
+    }
+
+def benchmark_cases(paths):
+    """Returns (name, func, setup) for every benchmark, given the fixture paths."""
+    with open(paths["nvidia_smi_stream"]) as f:
+        stream_lines = f.read().splitlines()
+    with open(paths["lxc_list"]) as f:
+        lxc_text = f.read()
+    instances = json.loads(lxc_text)
+    stat_paths = [paths["proc_stat"], paths["proc_stat_next"]]
+    linux = platform.system() == "Linux"
+
+    def feed_stream():
+        collector = gpu.GpuStreamCollector()
+        collector.feed(stream_lines)
+        return collector.latest()
+
+    cpu_sampler = cpu.CpuUtilizationSampler(paths["proc_stat"])
+
+    def cpu_sample():
+        # Alternate between two recordings so every sample sees advancing counters
+        cpu_sampler.path = stat_paths[cpu_sampler.path == stat_paths[0]]
+        return cpu_sampler.sample_summary()
+
+    def process_table_warm():
+        table = ProcessTable(paths["proc"])
+        table.scan()
+        return table
+
+    def live_stats(table):
+        os_specific_commands._process_table = table
+        return os_specific_commands.get_process_stats()
+
+    compute_apps_command = [os.path.join(paths["bin"], "nvidia-smi"), "--query-compute-apps"]
+    compute_apps = gpu.query_compute_apps(compute_apps_command)
+
+    def attribution_warm():
+        attribution = GpuProcessAttribution(lambda: compute_apps, proc_root=paths["proc"])
+        attribution.refresh()
+        return attribution
+
+    # 250 rules on every GPU of the fixture, half of them breached, evaluated on a moving clock
+    latest_gpus = {}
+    for line in stream_lines:
+        record = gpu.parse_gpu_csv_line(line)
+        latest_gpus[record["pci_bus_id"]] = record
+    gpu_sample = list(latest_gpus.values())
+    alert_rules = [{"name": f"rule{index}", "metric": ("gpu.temperature_gpu", "gpu.memory_used_percent")[index % 2],
+                    "threshold": 40 + index % 60, "for_seconds": 10} for index in range(250)]
+    alert_clock = [0.0]
+
+    def alerts_evaluate(engine):
+        alert_clock[0] += 1.0
+        return engine.evaluate("gpu", alert_clock[0], gpu_sample)
+
+    def alerts_warm():
+        engine = AlertEngine(alert_rules)
+        alerts_evaluate(engine)
+        return engine
+
+    # Alternate between two recordings so every sample computes rates
+    disk_sampler = DiskStatsSampler(paths["diskstats"])
+    net_sampler = NetDevSampler(paths["net_dev"], sys_class_net=paths["bin"])
+
+    def disk_io_sample():
+        disk_sampler.path = (paths["diskstats"], paths["diskstats_next"])[disk_sampler.path == paths["diskstats"]]
+        return disk_sampler.sample()
+
+    def network_sample():
+        net_sampler.path = (paths["net_dev"], paths["net_dev_next"])[net_sampler.path == paths["net_dev"]]
+        return net_sampler.sample()
+
+    def cgroups_warm():
+        accounting = CgroupAccounting(paths["cgroup"])
+        accounting.sample()
+        return accounting
+
+    cases = [
+        ("gpu.parse_csv_line", lambda: [gpu.parse_gpu_csv_line(line) for line in stream_lines], None),
+        ("gpu.stream_feed_1000_samples", feed_stream, None),
+        ("gpu.get_gpu_info_nvidia_smi", gpu.get_gpu_info, None),
+        ("gpu.query_compute_apps", lambda: gpu.query_compute_apps(compute_apps_command), None),
+        ("gpu_processes.refresh_cold", lambda: GpuProcessAttribution(lambda: compute_apps, proc_root=paths["proc"]).refresh(), None),
+        ("gpu_processes.refresh_warm", lambda attribution: attribution.refresh(), attribution_warm),
+        ("cpu.parse_cpuinfo", lambda: cpu.parse_cpuinfo(paths["cpuinfo"]), None),
+        ("cpu.utilization_sample", cpu_sample, None),
+        ("ram_disk.read_meminfo", lambda: ram_disk.get_linux_ram_info(paths["meminfo"]), None),
+        ("ram_disk.linux_disk_info", lambda: ram_disk.get_linux_disk_info(paths["mounts"]), None),
+        ("throughput.diskstats_sample", disk_io_sample, None),
+        ("throughput.net_dev_sample", network_sample, None),
+        ("alerts.evaluate_250_rules", alerts_evaluate, alerts_warm),
+        ("lxc.parse_list_json", lambda: json.loads(lxc_text), None),
+        ("lxc.container_info", lambda: [containers._container_info(instance, instance.get("state")) for instance in instances], None),
+        ("lxc.get_lxc_info_cli", lambda: containers.get_lxc_info(socket_path=None), None),
+        ("lxc.cgroup_discover", lambda: discover_container_cgroups(paths["cgroup"]), None),
+        ("lxc.cgroup_sample_200_containers", lambda accounting: accounting.sample(), cgroups_warm),
+        ("processes.scan_cold", lambda: ProcessTable(paths["proc"]).scan(), None),
+        ("processes.scan_warm", lambda table: table.scan(), process_table_warm),
+    ]
+    if linux:
+        cases.append(("live_stats.get_process_stats", live_stats, process_table_warm))
+    return cases
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard collectors against generated fixtures.")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this string")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Minimum seconds spent per benchmark")
+    parser.add_argument("--gpus", type=int, default=8)
+    parser.add_argument("--cpus", type=int, default=256)
+    parser.add_argument("--containers", type=int, default=200)
+    parser.add_argument("--processes", type=int, default=10000)
+    parser.add_argument("--keep-fixtures", action="store_true", help="Do not delete the generated fixtures")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="dashboard-bench-")
+    saved_path, saved_socket = os.environ.get("PATH", ""), os.environ.get("LXD_SOCKET")
+    try:
+        print(f"Generating fixtures in {directory}", file=sys.stderr)
+        paths = build_fixtures(directory, gpus=args.gpus, cpus=args.cpus,
+                               containers=args.containers, processes=args.processes)
+        # Fake commands first on PATH; a socket path that does not exist keeps get_lxc_info on the CLI
+        os.environ["PATH"] = paths["bin"] + os.pathsep + saved_path
+        os.environ["LXD_SOCKET"] = os.path.join(directory, "no-lxd.socket")
+
+        results = []
+        for name, func, setup in benchmark_cases(paths):
+            if args.filter not in name:
+                continue
+            result = measure(name, func, setup, min_time=args.min_time)
+            print(f"{name:<36} median {result['median_ms']:>10.3f} ms   p99 {result['p99_ms']:>10.3f} ms", file=sys.stderr)
+            results.append(result)
+        parameters = {"gpus": args.gpus, "cpus": args.cpus, "containers": args.containers, "processes": args.processes}
+        write_results("collectors", results, args.output, parameters)
+    finally:
+        os.environ["PATH"] = saved_path
+        if saved_socket is None:
+            os.environ.pop("LXD_SOCKET", None)
+        else:
+            os.environ["LXD_SOCKET"] = saved_socket
+        if args.keep_fixtures:
+            print(f"Fixtures kept in {directory}", file=sys.stderr)
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
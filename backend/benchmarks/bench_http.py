@@ -0,0 +1,175 @@
+"""
+Load generator for the HTTP endpoints: throughput and latency percentiles per endpoint
+at increasing numbers of concurrent keep-alive clients.
+
+    python -m benchmarks.bench_http [--output results.json] [--concurrency 1,10,100,500] [--duration 5]
+    python -m benchmarks.bench_http --url http://host:5000   # an already running server
+
+Without --url the app is started in a child process on a free local port, with the fake
+nvidia-smi and lxc commands of the fixtures on its PATH. Clients are threads in this process,
+so at high concurrency the numbers include client-side overhead; run the generator on another
+machine with --url to take it out.
+"""
+import argparse
+import http.client
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+from benchmarks.common import percentile, write_results
+from benchmarks.fixtures import build_fixtures
+
+DEFAULT_ENDPOINTS = ["/api/gpu-info", "/api/ram-disk", "/api/cpu-info", "/api/lxc", "/api/live-stats",
+                     "/api/processes", "/metrics"]
+DEFAULT_CONCURRENCY = "1,10,50,100,250,500"
+
+def serve(port):
+    """Runs the app on a threaded HTTP/1.1 server (used as the child process of the benchmark)."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    import app as dashboard
+
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"  # Keep-alive, like a production server
+    make_server("127.0.0.1", port, dashboard.app, threaded=True).serve_forever()
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _get(connection, path, headers):
+    connection.request("GET", path, headers=headers)
+    response = connection.getresponse()
+    response.read()
+    return response.status
+
+def wait_until_ready(base_url, endpoints, timeout=60):
+    """Waits for the server to answer, then for the first sample behind every endpoint."""
+    url = urllib.parse.urlsplit(base_url)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+            _get(connection, "/api/status", {})
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+    for path in endpoints:
+        _get(connection, path, {})  # Blocks until the source has been sampled once
+    connection.close()
+
+def run_load(base_url, path, concurrency, duration, headers=None):
+    """
+    Runs `concurrency` clients, each with its own keep-alive connection, requesting `path`
+    back to back for `duration` seconds. Returns throughput and latency statistics.
+    """
+    url = urllib.parse.urlsplit(base_url)
+    headers = headers or {}
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    barrier = threading.Barrier(concurrency + 1)
+    stop_at = [None]
+
+    def client(index):
+        connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+        own = latencies[index]
+        barrier.wait()
+        while time.monotonic() < stop_at[0]:
+            started = time.perf_counter()
+            try:
+                status = _get(connection, path, headers)
+                if status >= 400:
+                    errors[index] += 1
+            except (OSError, http.client.HTTPException):
+                errors[index] += 1
+                connection.close()  # Reconnects on the next request
+                continue
+            own.append(time.perf_counter() - started)
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    stop_at[0] = time.monotonic() + duration
+    started = time.monotonic()
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    merged = sorted(latency for own in latencies for latency in own)
+    def ms(value):
+        return round(value * 1000, 3) if value is not None else None
+    return {
+        "endpoint": path,
+        "concurrency": concurrency,
+        "duration_seconds": round(elapsed, 3),
+        "requests": len(merged),
+        "errors": sum(errors),
+        "throughput_rps": round(len(merged) / elapsed, 1) if elapsed else None,
+        "p50_ms": ms(percentile(merged, 50)),
+        "p90_ms": ms(percentile(merged, 90)),
+        "p99_ms": ms(percentile(merged, 99)),
+        "max_ms": ms(merged[-1] if merged else None),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the dashboard HTTP endpoints.")
+    parser.add_argument("--url", help="Base URL of a running server (default: start one locally)")
+    parser.add_argument("--endpoints", default=",".join(DEFAULT_ENDPOINTS), help="Comma separated paths")
+    parser.add_argument("--concurrency", default=DEFAULT_CONCURRENCY, help="Comma separated client counts")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per endpoint and concurrency level")
+    parser.add_argument("--gzip", action="store_true", help="Send Accept-Encoding: gzip")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    endpoints = [path.strip() for path in args.endpoints.split(",") if path.strip()]
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    headers = {"Accept-Encoding": "gzip"} if args.gzip else {}
+
+    server = None
+    directory = None
+    base_url = args.url
+    try:
+        if base_url is None:
+            directory = tempfile.mkdtemp(prefix="dashboard-bench-")
+            paths = build_fixtures(directory, processes=0)
+            port = _free_port()
+            env = dict(os.environ, PATH=paths["bin"] + os.pathsep + os.environ.get("PATH", ""),
+                       LXD_SOCKET=os.path.join(directory, "no-lxd.socket"))
+            backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            server = subprocess.Popen([sys.executable, "-m", "benchmarks.bench_http", "--serve", str(port)],
+                                      cwd=backend_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            base_url = f"http://127.0.0.1:{port}"
+        wait_until_ready(base_url, endpoints)
+
+        results = []
+        for path in endpoints:
+            for level in levels:
+                result = run_load(base_url, path, level, args.duration, headers)
+                print(f"{path:<20} c={level:<4} {result['throughput_rps']:>9} req/s   p50 {result['p50_ms']} ms"
+                      f"   p99 {result['p99_ms']} ms   errors {result['errors']}", file=sys.stderr)
+                results.append(result)
+        parameters = {"url": args.url or "local", "duration": args.duration, "gzip": args.gzip}
+        write_results("http", results, args.output, parameters)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+def percentile(sorted_values, q):
+    """The q-th percentile (0-100) of an already sorted list, by nearest rank."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(q / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def git_commit():
+    """The commit being benchmarked, or None outside a git checkout."""
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        return result.stdout.strip() or None
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+def environment_info():
+    return {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def write_results(suite, results, output=None, parameters=None):
+    """Writes {"suite", "environment", "parameters", "results"} as JSON to `output` (a path) or stdout."""
+    document = {"suite": suite, "environment": environment_info(), "parameters": parameters or {}, "results": results}
+    text = json.dumps(document, indent=2) + "\n"
+    if output:
+        with open(output, "w") as f:
+            f.write(text)
+        print(f"Wrote {len(results)} results to {output}", file=sys.stderr)
+    else:
+        sys.stdout.write(text)
+    return document
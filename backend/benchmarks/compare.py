@@ -0,0 +1,63 @@
+"""
+Compares two benchmark result files of the same suite, e.g. from two commits:
+
+    python -m benchmarks.compare before.json after.json [--threshold 1.2]
+
+Exits with status 1 if any benchmark got slower by more than the threshold factor.
+"""
+import argparse
+import json
+import sys
+
+def _key(result):
+    # Collector results are named, HTTP results are identified by endpoint and concurrency
+    return result.get("name") or f"{result['endpoint']} c={result['concurrency']}"
+
+def _metric(result):
+    """The value compared between runs (lower is better) and its label."""
+    if "median_ms" in result:
+        return result["median_ms"], "median_ms"
+    return result["p99_ms"], "p99_ms"
+
+def compare(before, after, threshold):
+    """Returns (rows, regressions) where rows are (key, label, before, after, ratio)."""
+    previous = {_key(result): result for result in before["results"]}
+    rows = []
+    regressions = []
+    for result in after["results"]:
+        key = _key(result)
+        if key not in previous:
+            continue
+        old, label = _metric(previous[key])
+        new, _ = _metric(result)
+        ratio = new / old if old and new is not None else None
+        rows.append((key, label, old, new, ratio))
+        if ratio is not None and ratio > threshold:
+            regressions.append(key)
+    return rows, regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Slowdown factor reported as a regression")
+    args = parser.parse_args(argv)
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    if before.get("suite") != after.get("suite"):
+        print(f"Cannot compare suite {before.get('suite')} with {after.get('suite')}", file=sys.stderr)
+        return 2
+
+    rows, regressions = compare(before, after, args.threshold)
+    print(f"{before['environment'].get('commit')} -> {after['environment'].get('commit')}")
+    for key, label, old, new, ratio in rows:
+        marker = "  REGRESSION" if key in regressions else ""
+        ratio_text = f"{ratio:6.2f}x" if ratio is not None else "     -"
+        print(f"{key:<40} {label:<10} {old:>12} -> {new:>12}  {ratio_text}{marker}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""
+Synthetic but realistically shaped inputs for the collector benchmarks: nvidia-smi CSV output,
+/proc/cpuinfo and /proc/stat of a large machine, /proc/meminfo and mounts, /proc/diskstats and /proc/net/dev, `lxc list --format json`
+output, a fake /proc tree with thousands of processes and a cgroup v2 tree of LXC containers. Everything is generated from a fixed
+seed, so two runs (and two commits) benchmark identical data.
+"""
+import json
+import os
+import random
+import stat
+
+SEED = 1234
+
+def nvidia_smi_csv(gpus=8, samples=1):
+    """`nvidia-smi --query-gpu=GPU_QUERY_FIELDS --format=csv,noheader,nounits` output, `samples` rounds of `gpus` lines."""
+    rng = random.Random(SEED)
+    lines = []
+    for _ in range(samples):
+        for index in range(gpus):
+            used = rng.randint(0, 81920)
+            lines.append(f"NVIDIA H100 80GB HBM3, 00000000:{index + 0x18:02X}:00.0, 550.54.15, "
+                         f"{rng.randint(30, 85)}, {rng.randint(0, 100)}, {rng.randint(0, 100)}, "
+                         f"81559, {81559 - min(used, 81559)}, {min(used, 81559)}")
+    return "\n".join(lines) + "\n"
+
+def compute_apps_csv(processes=64, gpus=8, first_pid=1000):
+    """`nvidia-smi --query-compute-apps=pid,process_name,used_memory,gpu_bus_id` output."""
+    rng = random.Random(SEED)
+    lines = []
+    for i in range(processes):
+        lines.append(f"{first_pid + i}, python3, {rng.randint(256, 40960)}, 00000000:{rng.randrange(gpus) + 0x18:02X}:00.0")
+    return "\n".join(lines) + "\n"
+
+def cpuinfo(sockets=2, cores_per_socket=64, threads_per_core=2):
+    """/proc/cpuinfo of an x86 machine, 256 logical processors with the defaults."""
+    flags = " ".join(["fpu", "vme", "de", "pse", "tsc", "msr", "pae", "mce", "cx8", "apic", "sep", "mtrr",
+                      "pge", "mca", "cmov", "pat", "pse36", "clflush", "mmx", "fxsr", "sse", "sse2", "ht",
+                      "syscall", "nx", "mmxext", "fxsr_opt", "pdpe1gb", "rdtscp", "lm", "avx", "avx2", "avx512f"] * 3)
+    entries = []
+    processor = 0
+    for thread in range(threads_per_core):
+        for socket in range(sockets):
+            for core in range(cores_per_socket):
+                entries.append(
+                    f"processor\t: {processor}\nvendor_id\t: AuthenticAMD\ncpu family\t: 25\nmodel\t\t: 17\n"
+                    f"model name\t: AMD EPYC 9554 64-Core Processor\nstepping\t: 1\nmicrocode\t: 0xa101144\n"
+                    f"cpu MHz\t\t: 3100.000\ncache size\t: 1024 KB\nphysical id\t: {socket}\n"
+                    f"siblings\t: {cores_per_socket * threads_per_core}\ncore id\t\t: {core}\n"
+                    f"cpu cores\t: {cores_per_socket}\napicid\t\t: {processor}\nfpu\t\t: yes\n"
+                    f"flags\t\t: {flags}\nbogomips\t: 6200.00\nclflush size\t: 64\n"
+                    f"address sizes\t: 52 bits physical, 57 bits virtual\npower management: ts ttp tm hwpstate\n")
+                processor += 1
+    return "\n".join(entries) + "\n"
+
+def proc_stat(cpus=256, offset=0):
+    """/proc/stat with `cpus` per-CPU lines; `offset` advances the counters between two samples."""
+    rng = random.Random(SEED + offset)
+    lines = []
+    per_cpu = []
+    for _ in range(cpus):
+        per_cpu.append([rng.randint(1000, 100000) + offset * rng.randint(0, 100) for _ in range(10)])
+    totals = [sum(column) for column in zip(*per_cpu)]
+    lines.append("cpu  " + " ".join(map(str, totals)))
+    for index, values in enumerate(per_cpu):
+        lines.append(f"cpu{index} " + " ".join(map(str, values)))
+    lines += ["intr 123456789 0 0", "ctxt 987654321", "btime 1700000000", "processes 1234567",
+              "procs_running 3", "procs_blocked 0", "softirq 1234 0 0"]
+    return "\n".join(lines) + "\n"
+
+def meminfo():
+    fields = [("MemTotal", 1056561564), ("MemFree", 212345678), ("MemAvailable", 801234567), ("Buffers", 1234567),
+              ("Cached", 512345678), ("SwapCached", 0), ("Active", 312345678), ("Inactive", 212345678),
+              ("SwapTotal", 8388604), ("SwapFree", 8388604), ("Dirty", 1234), ("Shmem", 123456),
+              ("Slab", 12345678), ("PageTables", 123456), ("CommitLimit", 536669384), ("Committed_AS", 123456789)]
+    lines = [f"{name + ':':<16}{value:>10} kB" for name, value in fields]
+    lines += ["HugePages_Total:       0", "HugePages_Free:        0", "Hugepagesize:       2048 kB"]
+    return "\n".join(lines) + "\n"
+
+def mounts(count=60):
+    """A mounts file; only '/' is a real filesystem, the rest are pseudo or unreachable mounts."""
+    lines = ["/dev/root / ext4 rw,relatime 0 0", "proc /proc proc rw,nosuid,nodev,noexec,relatime 0 0",
+             "sysfs /sys sysfs rw,nosuid,nodev,noexec,relatime 0 0"]
+    for i in range(count):
+        lines.append(f"/dev/loop{i} /snap/core/{i} squashfs ro,nodev,relatime 0 0")
+    return "\n".join(lines) + "\n"
+
+def diskstats(disks=24, offset=0):
+    """/proc/diskstats with `disks` NVMe drives and 3 partitions each; `offset` advances the counters."""
+    rng = random.Random(SEED)
+    lines = []
+    for i in range(disks):
+        counters = [rng.randint(10 ** 6, 10 ** 9) + offset * (i + 1) * 1000 for _ in range(11)]
+        lines.append(f" 259 {i * 4} nvme{i}n1 " + " ".join(map(str, counters)) + " 0 0 0 0 0 0")
+        for partition in range(1, 4):
+            lines.append(f" 259 {i * 4 + partition} nvme{i}n1p{partition} " + " ".join(map(str, counters)) + " 0 0 0 0 0 0")
+    return "\n".join(lines) + "\n"
+
+def net_dev(interfaces=8, containers=200, offset=0):
+    """/proc/net/dev with `interfaces` physical NICs, a bridge and one veth per container."""
+    rng = random.Random(SEED)
+    names = ["lo"] + [f"enp{i}s0" for i in range(interfaces)] + ["lxdbr0"] + [f"veth{i:05x}" for i in range(containers)]
+    lines = ["Inter-|   Receive                                                |  Transmit",
+             " face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed"]
+    for index, name in enumerate(names):
+        counters = [rng.randint(10 ** 6, 10 ** 12) + offset * index * 1500 for _ in range(16)]
+        lines.append(f"{name:>6}: " + " ".join(map(str, counters)))
+    return "\n".join(lines) + "\n"
+
+def lxc_list(containers=200, with_state=True):
+    """`lxc list --format json` output for `containers` instances (state included, as recent LXD does)."""
+    rng = random.Random(SEED)
+    instances = []
+    for i in range(containers):
+        running = rng.random() < 0.8
+        name = f"container-{i:03d}"
+        instance = {
+            "name": name,
+            "status": "Running" if running else "Stopped",
+            "type": "container",
+            "config": {"user.owner": f"user{i % 17}", "limits.memory": f"{rng.choice([4, 8, 16, 32])}GiB",
+                       "image.os": "ubuntu", "image.release": "jammy", "volatile.eth0.hwaddr": "00:16:3e:00:00:00"},
+            "expanded_devices": {
+                "root": {"type": "disk", "path": "/", "pool": "default"},
+                "eth0": {"type": "nic", "network": "lxdbr0", "name": "eth0"},
+            },
+        }
+        if i % 4 == 0:
+            instance["expanded_devices"]["gpu0"] = {"type": "gpu", "pci": f"0000:{0x18 + i % 8:02x}:00.0",
+                                                    "vendorid": "10de", "productid": "2330"}
+        if with_state:
+            instance["state"] = {
+                "status": instance["status"],
+                "network": {
+                    "lo": {"addresses": [{"family": "inet", "address": "127.0.0.1", "netmask": "8"}]},
+                    "eth0": {"addresses": [
+                        {"family": "inet", "address": f"10.10.{i // 250}.{i % 250 + 2}", "netmask": "24"},
+                        {"family": "inet6", "address": f"fd42::{i:x}", "netmask": "64"},
+                    ]},
+                } if running else {},
+                "memory": {"usage": rng.randint(10 ** 8, 10 ** 10) if running else 0},
+                "cpu": {"usage": rng.randint(10 ** 9, 10 ** 13) if running else 0},
+                "disk": {"root": {"usage": rng.randint(10 ** 8, 10 ** 10)}},
+            }
+        instances.append(instance)
+    return json.dumps(instances)
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+def proc_tree(root, processes=10000, first_pid=1000, containers=200):
+    """
+    Writes a fake /proc tree with `processes` processes (stat, status, cmdline, statm, cgroup)
+    plus the global stat, meminfo and loadavg files read by ProcessTable.
+    """
+    rng = random.Random(SEED)
+    _write(os.path.join(root, "stat"), proc_stat(cpus=8))
+    _write(os.path.join(root, "meminfo"), meminfo())
+    _write(os.path.join(root, "loadavg"), "12.34 10.56 9.87 5/12345 67890\n")
+    names = ["python3", "bash", "sshd", "postgres", "nginx", "java", "node", "systemd", "kworker/0:1", "Web Content"]
+    for i in range(processes):
+        pid = first_pid + i
+        name = names[i % len(names)]
+        directory = os.path.join(root, str(pid))
+        os.makedirs(directory, exist_ok=True)
+        utime, stime = rng.randint(0, 10 ** 6), rng.randint(0, 10 ** 5)
+        rss_pages = rng.randint(100, 500000)
+        with open(os.path.join(directory, "stat"), "w") as f:
+            f.write(f"{pid} ({name}) {rng.choice('RSSSSSDI')} 1 {pid} {pid} 0 -1 4194560 1000 0 0 0 "
+                    f"{utime} {stime} 0 0 20 0 {rng.randint(1, 64)} 0 {100000 + i} {rss_pages * 8192} {rss_pages} "
+                    "18446744073709551615 1 1 0 0 0 0 0 0 0 0 0 0 17 3 0 0 0 0 0\n")
+        with open(os.path.join(directory, "status"), "w") as f:
+            uid = 1000 + i % 50
+            f.write(f"Name:\t{name}\nUmask:\t0022\nState:\tS (sleeping)\nTgid:\t{pid}\nPid:\t{pid}\nPPid:\t1\n"
+                    f"Uid:\t{uid}\t{uid}\t{uid}\t{uid}\nGid:\t{uid}\t{uid}\t{uid}\t{uid}\n")
+        with open(os.path.join(directory, "cmdline"), "w") as f:
+            f.write(f"/usr/bin/{name}\0--worker\0{i}\0")
+        with open(os.path.join(directory, "statm"), "w") as f:
+            f.write(f"{rss_pages * 3} {rss_pages} {rss_pages // 4} 100 0 {rss_pages} 0\n")
+        with open(os.path.join(directory, "cgroup"), "w") as f:
+            if i % 3 == 0:
+                f.write(f"0::/lxc.payload.container-{i % containers:03d}/system.slice/app.service\n")
+            else:
+                f.write("0::/user.slice/user-1000.slice/session-1.scope\n")
+
+def cgroup_tree(root, containers=200):
+    """
+    Writes a fake cgroup v2 hierarchy with an 'lxc.payload.<name>' (and 'lxc.monitor.<name>')
+    directory per running container of lxc_list(), holding the files read by CgroupAccounting.
+    """
+    rng = random.Random(SEED)
+    _write(os.path.join(root, "cgroup.controllers"), "cpuset cpu io memory hugetlb pids rdma misc\n")
+    for i in range(containers):
+        name = f"container-{i:03d}"
+        os.makedirs(os.path.join(root, f"lxc.monitor.{name}"), exist_ok=True)
+        directory = os.path.join(root, f"lxc.payload.{name}")
+        usage = rng.randint(10 ** 9, 10 ** 13)
+        _write(os.path.join(directory, "memory.current"), f"{rng.randint(10 ** 8, 10 ** 10)}\n")
+        _write(os.path.join(directory, "memory.max"), f"{rng.choice([4, 8, 16, 32]) * 1024 ** 3}\n" if i % 5 else "max\n")
+        _write(os.path.join(directory, "cpu.stat"),
+               f"usage_usec {usage}\nuser_usec {usage * 3 // 4}\nsystem_usec {usage // 4}\n"
+               f"nr_periods 0\nnr_throttled 0\nthrottled_usec 0\n")
+        _write(os.path.join(directory, "io.stat"), "".join(
+            f"{major}:0 rbytes={rng.randint(0, 10 ** 11)} wbytes={rng.randint(0, 10 ** 11)} "
+            f"rios={rng.randint(0, 10 ** 7)} wios={rng.randint(0, 10 ** 7)} dbytes=0 dios=0\n" for major in (8, 259)))
+        _write(os.path.join(directory, "pids.current"), f"{rng.randint(5, 500)}\n")
+
+def _fake_command(path, body):
+    _write(path, "#!/bin/sh\n" + body)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+def build_fixtures(directory, gpus=8, cpus=256, containers=200, processes=10000):
+    """
+    Writes every fixture into `directory` and returns a dictionary of their paths. "bin" holds fake
+    `nvidia-smi` and `lxc` commands replaying the recorded outputs, to put in front of PATH.
+    """
+    paths = {
+        "nvidia_smi_csv": os.path.join(directory, "nvidia-smi.csv"),
+        "nvidia_smi_stream": os.path.join(directory, "nvidia-smi-loop.csv"),
+        "compute_apps_csv": os.path.join(directory, "compute-apps.csv"),
+        "cpuinfo": os.path.join(directory, "cpuinfo"),
+        "proc_stat": os.path.join(directory, "stat"),
+        "proc_stat_next": os.path.join(directory, "stat.next"),
+        "meminfo": os.path.join(directory, "meminfo"),
+        "mounts": os.path.join(directory, "mounts"),
+        "lxc_list": os.path.join(directory, "lxc-list.json"),
+        "diskstats": os.path.join(directory, "diskstats"),
+        "diskstats_next": os.path.join(directory, "diskstats.next"),
+        "net_dev": os.path.join(directory, "net-dev"),
+        "net_dev_next": os.path.join(directory, "net-dev.next"),
+        "proc": os.path.join(directory, "proc"),
+        "cgroup": os.path.join(directory, "cgroup"),
+        "bin": os.path.join(directory, "bin"),
+    }
+    _write(paths["nvidia_smi_csv"], nvidia_smi_csv(gpus))
+    _write(paths["nvidia_smi_stream"], nvidia_smi_csv(gpus, samples=1000))
+    _write(paths["compute_apps_csv"], compute_apps_csv(gpus=gpus))
+    _write(paths["cpuinfo"], cpuinfo(sockets=2, cores_per_socket=cpus // 4, threads_per_core=2))
+    _write(paths["proc_stat"], proc_stat(cpus))
+    _write(paths["proc_stat_next"], proc_stat(cpus, offset=1))
+    _write(paths["meminfo"], meminfo())
+    _write(paths["mounts"], mounts())
+    _write(paths["lxc_list"], lxc_list(containers))
+    _write(paths["diskstats"], diskstats())
+    _write(paths["diskstats_next"], diskstats(offset=1))
+    _write(paths["net_dev"], net_dev(containers=containers))
+    _write(paths["net_dev_next"], net_dev(containers=containers, offset=1))
+    proc_tree(paths["proc"], processes=processes, containers=containers)
+    cgroup_tree(paths["cgroup"], containers=containers)
+    _fake_command(os.path.join(paths["bin"], "nvidia-smi"),
+                  f'case "$*" in\n  *query-compute-apps*) cat "{paths["compute_apps_csv"]}" ;;\n'
+                  f'  *) cat "{paths["nvidia_smi_csv"]}" ;;\nesac\n')
+    _fake_command(os.path.join(paths["bin"], "lxc"), f'cat "{paths["lxc_list"]}"\n')
+    return paths
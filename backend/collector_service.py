@@ -0,0 +1,49 @@
+"""
+The shared collector process for production serving.
+
+Runs every collector once per machine and serves the snapshots to the web server workers over a
+unix socket (DASHBOARD_COLLECTOR_SOCKET), so the number of workers does not multiply the number
+of nvidia-smi/lxc invocations. Started automatically by gunicorn.conf.py, or on its own:
+
+    python collector_service.py --socket /run/dashboard/collector.sock
+"""
+import argparse
+import os
+import signal
+import threading
+
+from utils.collection import create_sampler
+from utils.snapshot_service import SnapshotServer
+from utils.storage import storage_from_env
+
+# Seconds to wait for running collections to finish on shutdown
+SHUTDOWN_TIMEOUT = 10
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the dashboard collectors and serve their snapshots.")
+    parser.add_argument("--socket", default=os.environ.get("DASHBOARD_COLLECTOR_SOCKET"),
+                        help="Unix socket path to serve on (default: $DASHBOARD_COLLECTOR_SOCKET), "
+                             "in a directory that only the dashboard's user can write to")
+    args = parser.parse_args(argv)
+    if not args.socket:
+        parser.error("--socket or DASHBOARD_COLLECTOR_SOCKET is required")
+
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda signum, frame: stop.set())
+
+    sampler = create_sampler(storage_from_env())
+    server = SnapshotServer(sampler, args.socket)
+    server.start()  # First, so that a collector already serving on the socket is found before any collection runs
+    sampler.start()
+    print(f"Collector serving {len(sampler.sources())} sources on {args.socket}")
+    try:
+        while not stop.wait(1.0):
+            pass
+    finally:
+        print("Collector shutting down")
+        server.stop()
+        sampler.stop(timeout=SHUTDOWN_TIMEOUT)
+
+if __name__ == '__main__':
+    main()
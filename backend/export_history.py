@@ -0,0 +1,91 @@
+"""
+Downloads recorded metric history from a running dashboard in a columnar format
+(see /api/history/export), and loads such exports back.
+
+    python export_history.py --url http://gpu01:5000 --metric 'gpu.*' --start -604800 --output gpus.tar
+    python export_history.py --summary gpus.tar
+
+In Python, load_dataframe("gpus.tar") returns a pandas DataFrame with the columns
+metric, device, resolution, timestamp and value (requires numpy and pandas).
+"""
+import argparse
+import shutil
+import sys
+import urllib.parse
+import urllib.request
+
+from utils.export import read_npy_export
+
+def download(url, output, timeout=60, **params):
+    """Streams the export of the dashboard at `url` into the file `output`; returns the bytes written."""
+    query = urllib.parse.urlencode({key: value for key, value in params.items() if value is not None})
+    with urllib.request.urlopen(f"{url.rstrip('/')}/api/history/export?{query}", timeout=timeout) as response, \
+            open(output, "wb") as out:
+        shutil.copyfileobj(response, out, length=1024 * 1024)
+        return out.tell()
+
+def load_dataframe(path):
+    """Loads an export (.tar of .npy chunks, or an Arrow stream) into a pandas DataFrame."""
+    import pandas
+
+    with open(path, "rb") as export:
+        # Arrow IPC streams start with the 0xFFFFFFFF continuation marker
+        is_arrow = export.read(4) == b"\xff\xff\xff\xff"
+        export.seek(0)
+        if is_arrow:
+            import pyarrow.ipc
+
+            return pyarrow.ipc.open_stream(export).read_pandas()
+        import numpy
+
+        frames = []
+        for metric, device, resolution, timestamps, values in read_npy_export(export):
+            frames.append(pandas.DataFrame({
+                "metric": pandas.Categorical([metric] * len(timestamps)),
+                "device": pandas.Categorical([device] * len(timestamps)),
+                "resolution": resolution,
+                "timestamp": numpy.frombuffer(timestamps, dtype=numpy.float64),
+                "value": numpy.frombuffer(values, dtype=numpy.float64),
+            }))
+    if not frames:
+        return pandas.DataFrame(columns=["metric", "device", "resolution", "timestamp", "value"])
+    return pandas.concat(frames, ignore_index=True)
+
+def summarize(path):
+    """Prints the series of a .tar export with their point counts and time ranges."""
+    series = {}
+    with open(path, "rb") as export:
+        for metric, device, resolution, timestamps, _ in read_npy_export(export):
+            entry = series.setdefault((metric, device), [resolution, 0, None, None])
+            entry[1] += len(timestamps)
+            if timestamps:
+                entry[2] = timestamps[0] if entry[2] is None else min(entry[2], timestamps[0])
+                entry[3] = timestamps[-1] if entry[3] is None else max(entry[3], timestamps[-1])
+    for (metric, device), (resolution, points, first, last) in sorted(series.items()):
+        span = f"{first:.0f} - {last:.0f}" if points else "-"
+        print(f"{metric:<28} {str(device):<24} {resolution:>6}s {points:>10} points  {span}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export recorded metric history from a dashboard.")
+    parser.add_argument("--url", default="http://localhost:5000", help="Dashboard base URL")
+    parser.add_argument("--output", help="File to write the export to")
+    parser.add_argument("--format", default="npy", choices=["npy", "arrow"])
+    parser.add_argument("--metric", help="Metric glob, e.g. 'gpu.*' (default: all)")
+    parser.add_argument("--device", help="Device glob (default: all)")
+    parser.add_argument("--start", type=float, help="Epoch seconds, or negative seconds relative to now")
+    parser.add_argument("--end", type=float, help="Epoch seconds, or negative seconds relative to now")
+    parser.add_argument("--resolution", type=float, help="Minimum seconds between points")
+    parser.add_argument("--summary", metavar="EXPORT", help="List the series of a downloaded .tar export instead")
+    args = parser.parse_args(argv)
+
+    if args.summary:
+        summarize(args.summary)
+        return
+    if not args.output:
+        parser.error("--output is required")
+    size = download(args.url, args.output, format=args.format, metric=args.metric, device=args.device,
+                    start=args.start, end=args.end, resolution=args.resolution)
+    print(f"Wrote {size} bytes to {args.output}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Production serving: gunicorn -c gunicorn.conf.py (from the backend directory, or run.sh production).
+
+The master starts one collector process (collector_service.py) and every worker subscribes to its
+snapshots over a unix socket, so adding workers adds request capacity without adding collectors.
+Workers use threads (gthread): Flask is a WSGI app, and threads keep the long-lived /api/stream
+connections from blocking other requests. Settings can be overridden with the usual gunicorn
+command line flags or the DASHBOARD_* variables below.
+"""
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+chdir = backend_dir
+wsgi_app = "app:app"
+
+bind = os.environ.get("DASHBOARD_BIND", f"0.0.0.0:{os.environ.get('DASHBOARD_PORT', 5000)}")
+workers = int(os.environ.get("DASHBOARD_WORKERS", min(4, os.cpu_count() or 1)))
+worker_class = "gthread"
+# Each open /api/stream connection holds a thread for its lifetime
+threads = int(os.environ.get("DASHBOARD_THREADS", 64))
+keepalive = 15
+backlog = 2048
+graceful_timeout = 15
+timeout = 60
+
+# Set for the workers (inherited at fork) unless an external collector is already configured.
+# The socket goes into a directory only this user can enter: $XDG_RUNTIME_DIR, or else a new
+# private (0700) temporary directory, never a predictable path other users could create first
+collector_socket = os.environ.get("DASHBOARD_COLLECTOR_SOCKET")
+_socket_dir = None
+if not collector_socket:
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        collector_socket = os.path.join(os.environ["XDG_RUNTIME_DIR"], "dashboard-collector.sock")
+    else:
+        _socket_dir = tempfile.mkdtemp(prefix="dashboard-")
+        collector_socket = os.path.join(_socket_dir, "collector.sock")
+    os.environ["DASHBOARD_COLLECTOR_SOCKET"] = collector_socket
+# DASHBOARD_EXTERNAL_COLLECTOR=1 when the collector runs as its own service (e.g. a systemd unit)
+start_collector = os.environ.get("DASHBOARD_EXTERNAL_COLLECTOR", "0") != "1"
+
+_collector = None
+
+def on_starting(server):
+    """Master startup: launch the collector process and wait until its socket accepts connections."""
+    global _collector
+    if not start_collector:
+        return
+    from utils.snapshot_service import wait_for_socket
+
+    _collector = subprocess.Popen([sys.executable, os.path.join(backend_dir, "collector_service.py"),
+                                   "--socket", collector_socket], cwd=backend_dir)
+    if not wait_for_socket(collector_socket, timeout=30):
+        server.log.warning("Collector process not accepting connections yet at %s", collector_socket)
+
+def on_exit(server):
+    """Master shutdown, after all workers are gone: stop the collector process."""
+    if _collector is not None and _collector.poll() is None:
+        _collector.send_signal(signal.SIGTERM)
+        try:
+            _collector.wait(timeout=graceful_timeout)
+        except subprocess.TimeoutExpired:
+            _collector.kill()
+    if _socket_dir is not None:
+        try:
+            os.unlink(collector_socket)  # Only left behind if the collector was killed
+        except OSError:
+            pass
+        try:
+            os.rmdir(_socket_dir)
+        except OSError:
+            pass
+
+def post_worker_init(worker):
+    """
+    On SIGTERM, end the open /api/stream responses before gunicorn's graceful shutdown waits
+    for in-flight requests; otherwise every streaming client would hold its worker until
+    graceful_timeout expires.
+    """
+    import app
+
+    handle_exit = worker.handle_exit
+
+    def close_streams_and_exit(signum, frame):
+        app.broadcaster.close()
+        handle_exit(signum, frame)
+
+    signal.signal(signal.SIGTERM, close_streams_and_exit)
+    app.sampler.start()
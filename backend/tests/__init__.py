@@ -0,0 +1,6 @@
+"""
+Unit tests for the collectors and their helpers, run against synthetic inputs (fake /proc
+files, fake commands, fake clocks). Run from the backend directory:
+
+    python -m pytest tests
+"""
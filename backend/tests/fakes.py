@@ -0,0 +1,11 @@
+class FakeClock:
+    """A clock for the `clock=` parameters: time only moves when advance() is called."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
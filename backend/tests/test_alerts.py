@@ -0,0 +1,85 @@
+import pytest
+
+from utils.alerts import AlertEngine, Rule
+
+class ListSink:
+    def __init__(self):
+        self.events = []
+
+    def deliver(self, events):
+        self.events.extend(events)
+
+def gpus(*temperatures):
+    return [{"pci_bus_id": f"GPU{index}", "temperature_gpu": temperature}
+            for index, temperature in enumerate(temperatures)]
+
+def containers(**memory):
+    return [{"name": name, "memory_usage_mb": used, "memory_total_mb": 100} for name, used in memory.items()]
+
+TEMPERATURE_RULE = {"name": "hot", "metric": "gpu.temperature_gpu", "op": ">", "threshold": 85,
+                    "for_seconds": 60, "resolve_threshold": 80}
+
+def states(events):
+    return [(event["rule"], event["device"], event["state"]) for event in events]
+
+def test_fires_only_after_for_seconds():
+    engine = AlertEngine([TEMPERATURE_RULE])
+    assert engine.evaluate("gpu", 0, gpus(90)) == []
+    assert engine.evaluate("gpu", 59, gpus(90)) == []
+    assert states(engine.evaluate("gpu", 60, gpus(90))) == [("hot", "GPU0", "firing")]
+    assert engine.evaluate("gpu", 61, gpus(90)) == []  # Fires once
+    assert [alert["since"] for alert in engine.firing()] == [60]
+
+def test_condition_interrupted_before_for_seconds_does_not_fire():
+    engine = AlertEngine([TEMPERATURE_RULE])
+    engine.evaluate("gpu", 0, gpus(90))
+    engine.evaluate("gpu", 30, gpus(70))
+    assert engine.evaluate("gpu", 70, gpus(90)) == []  # Pending again since 70
+    assert states(engine.evaluate("gpu", 130, gpus(90))) == [("hot", "GPU0", "firing")]
+
+def test_resolves_below_resolve_threshold_only():
+    sink = ListSink()
+    engine = AlertEngine([dict(TEMPERATURE_RULE, for_seconds=0)], sinks=[sink])
+    engine.evaluate("gpu", 0, gpus(90))
+    assert engine.evaluate("gpu", 1, gpus(83)) == []  # Between resolve_threshold and threshold: still firing
+    assert states(engine.evaluate("gpu", 2, gpus(79))) == [("hot", "GPU0", "resolved")]
+    assert engine.firing() == []
+    assert states(sink.events) == [("hot", "GPU0", "firing"), ("hot", "GPU0", "resolved")]
+
+def test_rate_rule():
+    engine = AlertEngine([{"name": "busy", "metric": "lxc.cpu_usage_seconds", "type": "rate", "op": ">", "threshold": 2}])
+    engine.evaluate("lxc", 0, [{"name": "c1", "cpu_usage_seconds": 100}])
+    assert engine.evaluate("lxc", 10, [{"name": "c1", "cpu_usage_seconds": 110}]) == []  # 1 core
+    event, = engine.evaluate("lxc", 20, [{"name": "c1", "cpu_usage_seconds": 140}])  # 3 cores
+    assert event["value"] == pytest.approx(3.0)
+
+def test_device_glob():
+    engine = AlertEngine([dict(TEMPERATURE_RULE, for_seconds=0, device="GPU1")])
+    assert states(engine.evaluate("gpu", 0, gpus(90, 90))) == [("hot", "GPU1", "firing")]
+
+def test_missing_device_resolves_and_is_forgotten():
+    rule = {"name": "full", "metric": "lxc.memory_used_percent", "op": ">", "threshold": 90}
+    engine = AlertEngine([rule])
+    assert states(engine.evaluate("lxc", 0, containers(web=95, db=50))) == [("full", "web", "firing")]
+    # The container "web" was stopped
+    assert states(engine.evaluate("lxc", 10, containers(db=50))) == [("full", "web", "resolved")]
+    assert engine.firing() == []
+    assert set(engine._states) == {(0, "db")}
+
+def test_error_payload_resolves_every_device_of_the_source():
+    engine = AlertEngine([dict(TEMPERATURE_RULE, for_seconds=0),
+                          {"name": "full", "metric": "lxc.memory_used_percent", "op": ">", "threshold": 90}])
+    engine.evaluate("gpu", 0, gpus(90, 90))
+    engine.evaluate("lxc", 0, containers(web=95))
+    assert states(engine.evaluate("gpu", 5, {"error": "nvidia-smi failed"})) == [
+        ("hot", "GPU0", "resolved"), ("hot", "GPU1", "resolved")]
+    assert [alert["device"] for alert in engine.firing()] == ["web"]  # Other sources are untouched
+    assert set(engine._states) == {(1, "web")}
+
+def test_invalid_rules():
+    with pytest.raises(ValueError):
+        Rule({"name": "x", "metric": "nope.metric", "threshold": 1})
+    with pytest.raises(ValueError):
+        Rule({"name": "x", "metric": "gpu.temperature_gpu", "threshold": 1, "op": "=="})
+    with pytest.raises(ValueError):
+        Rule({"name": "x", "metric": "gpu.temperature_gpu"})
@@ -0,0 +1,96 @@
+import os
+import shutil
+
+import pytest
+
+from benchmarks import fixtures
+from tests.fakes import FakeClock
+from utils import cgroups
+from utils.cgroups import CgroupAccounting, discover_container_cgroups, parse_flat_keyed, parse_io_stat
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+def make_container(directory, usage_usec=0, rbytes=0, wbytes=0, memory=1024 ** 2, memory_max="max", pids=3):
+    write(os.path.join(directory, "memory.current"), f"{memory}\n")
+    write(os.path.join(directory, "memory.max"), f"{memory_max}\n")
+    write(os.path.join(directory, "cpu.stat"), f"usage_usec {usage_usec}\nuser_usec {usage_usec}\nsystem_usec 0\n")
+    write(os.path.join(directory, "io.stat"), f"8:0 rbytes={rbytes} wbytes={wbytes} rios=0 wios=0 dbytes=0 dios=0\n")
+    write(os.path.join(directory, "pids.current"), f"{pids}\n")
+
+def test_parsers():
+    assert parse_flat_keyed(b"usage_usec 10\nuser_usec 7\nbroken\n") == {"usage_usec": 10, "user_usec": 7}
+    assert parse_io_stat(b"8:0 rbytes=1 wbytes=2 rios=3 wios=4 dbytes=0\n259:0 rbytes=10 wbytes=20 rios=30 wios=40\n") == {
+        "rbytes": 11, "wbytes": 22, "rios": 33, "wios": 44}
+
+def test_discover_payload_and_legacy_cgroups(tmp_path):
+    fixtures.cgroup_tree(str(tmp_path), containers=3)
+    os.makedirs(tmp_path / "lxc" / "old-style")
+    found = discover_container_cgroups(str(tmp_path))
+    assert sorted(found) == ["container-000", "container-001", "container-002", "old-style"]
+    assert found["container-001"] == str(tmp_path / "lxc.payload.container-001")
+    assert discover_container_cgroups(str(tmp_path / "missing")) == {}
+
+def test_sample_rates(tmp_path):
+    clock = FakeClock()
+    directory = str(tmp_path / "lxc.payload.web")
+    make_container(directory, usage_usec=0, rbytes=0, memory_max=2 * 1024 ** 3)
+    accounting = CgroupAccounting(str(tmp_path), clock)
+    first = accounting.sample(["web"])["web"]
+    assert first["cpu_percent"] is None
+    assert first["memory_max_bytes"] == 2 * 1024 ** 3
+    assert first["pids_current"] == 3
+
+    clock.advance(2)
+    make_container(directory, usage_usec=3_000_000, rbytes=4096, wbytes=8192)
+    stats = accounting.sample(["web"])["web"]
+    assert stats["cpu_percent"] == 150.0  # 1.5 cores
+    assert stats["io_read_bytes_per_second"] == 2048
+    assert stats["io_write_bytes_per_second"] == 4096
+    assert stats["memory_max_bytes"] == 2 * 1024 ** 3  # memory.max is only re-read every LIMIT_REFRESH_SECONDS
+
+    clock.advance(cgroups.LIMIT_REFRESH_SECONDS)
+    assert accounting.sample(["web"])["web"]["memory_max_bytes"] is None  # Now "max"
+
+def test_restarted_container_has_no_rate(tmp_path):
+    clock = FakeClock()
+    directory = str(tmp_path / "lxc.payload.web")
+    make_container(directory, usage_usec=5_000_000)
+    accounting = CgroupAccounting(str(tmp_path), clock)
+    accounting.sample(["web"])
+    clock.advance(1)
+    make_container(directory, usage_usec=1000)  # Counters went backwards
+    assert accounting.sample(["web"])["web"]["cpu_percent"] is None
+
+def test_missing_io_controller(tmp_path):
+    directory = str(tmp_path / "lxc.payload.web")
+    make_container(directory)
+    os.remove(os.path.join(directory, "io.stat"))
+    stats = CgroupAccounting(str(tmp_path), FakeClock()).sample()["web"]
+    assert stats["io_read_bytes"] is None and stats["pids_current"] == 3
+
+def test_rediscovers_when_containers_change(tmp_path):
+    clock = FakeClock()
+    make_container(str(tmp_path / "lxc.payload.a"))
+    accounting = CgroupAccounting(str(tmp_path), clock)
+    assert list(accounting.sample(["a"])) == ["a"]
+
+    make_container(str(tmp_path / "lxc.payload.b"))
+    assert list(accounting.sample(["a"])) == ["a"]  # Same names: no new scan
+    assert sorted(accounting.sample(["a", "b"])) == ["a", "b"]
+
+    # A stopped container's directory disappears: dropped now, rediscovered on the next sample
+    shutil.rmtree(tmp_path / "lxc.payload.a")
+    assert list(accounting.sample(["a", "b"])) == ["b"]
+    assert accounting._stale
+    assert list(accounting.sample(["a", "b"])) == ["b"]
+    assert not accounting._stale
+
+@pytest.mark.parametrize("containers", [1, 25])
+def test_fixture_tree(tmp_path, containers):
+    fixtures.cgroup_tree(str(tmp_path), containers=containers)
+    stats = CgroupAccounting(str(tmp_path), FakeClock()).sample()
+    assert len(stats) == containers
+    assert all(entry["memory_current_bytes"] > 0 for entry in stats.values())
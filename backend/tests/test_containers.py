@@ -0,0 +1,179 @@
+import http.server
+import json
+import os
+import shutil
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+
+import pytest
+
+from benchmarks import fixtures
+from utils import containers, platform_registry
+from utils.containers import LXC_NOT_FOUND, LxdApiError, LxdClient, fetch_states, find_lxd_socket, get_lxc_info
+from utils.platform_registry import Capability
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="LXD listens on a unix socket")
+
+class FakeLxd(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    An LXD REST API on a unix socket. `routes` maps request paths to (status, metadata);
+    `delays` holds seconds to wait before answering a path. Requests are recorded in `requests`.
+    """
+    daemon_threads = True
+
+    def __init__(self, path):
+        self.routes = {}
+        self.delays = {}
+        self.requests = []
+        super().__init__(path, FakeLxdHandler)
+
+    def handle_error(self, request, client_address):
+        pass  # The client gave up on a slow answer
+
+class FakeLxdHandler(http.server.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        time.sleep(self.server.delays.get(self.path, 0))
+        status, metadata = self.server.routes.get(self.path, (404, None))
+        if status == 200:
+            payload = {"type": "sync", "status": "Success", "status_code": 200, "metadata": metadata}
+        else:
+            payload = {"type": "error", "error": "not found", "error_code": status}
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def lxd():
+    # Unix socket paths are limited to ~100 characters, too short for pytest's tmp_path
+    directory = tempfile.mkdtemp(prefix="lxd")
+    server = FakeLxd(os.path.join(directory, "unix.socket"))
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    shutil.rmtree(directory)
+
+@pytest.fixture
+def no_lxc(monkeypatch):
+    """Makes the `lxc` command unavailable, so nothing falls back to the real one."""
+    monkeypatch.setitem(platform_registry._capabilities, "lxc", Capability("lxc", lambda: None))
+
+def test_instances_are_listed_in_one_request(lxd, no_lxc):
+    instances = json.loads(fixtures.lxc_list(containers=5))
+    lxd.routes["/1.0/instances?recursion=2"] = (200, instances)
+    result = get_lxc_info(socket_path=lxd.server_address)
+    assert lxd.requests == ["/1.0/instances?recursion=2"]
+    assert [container["name"] for container in result] == [f"container-{i:03d}" for i in range(5)]
+
+    index = next(i for i, instance in enumerate(instances) if instance["status"] == "Running")
+    container, instance = result[index], instances[index]
+    assert container["status"] == "Running"
+    assert container["user_owner"] == f"user{index}"
+    assert container["ipv4"] == [f"10.10.0.{index + 2}"]  # lo is skipped
+    assert container["ipv6"] == [f"fd42::{index:x}"]
+    assert container["memory_usage_mb"] == round(instance["state"]["memory"]["usage"] / (1024 * 1024), 2)
+    assert container["memory_total_mb"] == containers._parse_size(instance["config"]["limits.memory"]) / (1024 * 1024)
+    assert container["cpu_usage_seconds"] == round(instance["state"]["cpu"]["usage"] / 1e9, 2)
+    assert container["disk_devices"][0]["pool"] == "default"
+    assert result[0]["gpu_devices"][0]["pci_address"] == "0000:18:00.0"
+    assert result[1]["gpu_devices"] == "No GPU devices configured."
+
+def test_old_lxd_falls_back_to_containers(lxd):
+    instances = json.loads(fixtures.lxc_list(containers=2))
+    lxd.routes["/1.0/containers?recursion=2"] = (200, instances)
+    assert LxdClient(lxd.server_address).list_instances() == instances
+    assert lxd.requests == ["/1.0/instances?recursion=2", "/1.0/containers?recursion=2"]
+
+def test_missing_states_are_fetched_within_the_deadline(lxd, no_lxc):
+    instances = [
+        {"name": "fast", "status": "Running", "config": {}},
+        {"name": "slow one", "status": "Running", "config": {}},
+        {"name": "broken", "status": "Running", "config": {}},
+        {"name": "stopped", "status": "Stopped", "config": {}},
+    ]
+    lxd.routes["/1.0/instances?recursion=2"] = (200, instances)
+    lxd.routes["/1.0/instances/fast/state"] = (200, {"memory": {"usage": 512 * 1024 * 1024}})
+    lxd.routes["/1.0/instances/slow%20one/state"] = (200, {"memory": {"usage": 1}})
+    lxd.delays["/1.0/instances/slow%20one/state"] = 5.0
+    lxd.routes["/1.0/instances/broken/state"] = (500, None)
+
+    started = time.monotonic()
+    result = {container["name"]: container for container in get_lxc_info(socket_path=lxd.server_address, deadline=0.3)}
+    assert time.monotonic() - started < 0.9
+    assert result["fast"]["memory_usage_mb"] == 512.0
+    assert "state_pending" not in result["fast"]
+    assert result["slow one"]["state_pending"] is True
+    assert result["slow one"]["memory_usage_mb"] is None
+    assert "state_pending" not in result["broken"]
+    assert "LXD returned 500" in result["broken"]["state_error"]
+    assert "/1.0/instances/stopped/state" not in lxd.requests
+
+    # The abandoned lookup times out on its socket shortly after the deadline
+    assert wait_for(lambda: not any(thread.name.startswith("lxc-state") for thread in threading.enumerate()),
+                    timeout=0.3 + containers.STATE_FETCH_GRACE + 1.0)
+
+def test_fetch_states_passes_the_remaining_time():
+    timeouts = []
+
+    def fetch_state(name, timeout):
+        timeouts.append(timeout)
+        if name == "bad":
+            raise LxdApiError("boom")
+        return {"name": name}
+
+    states, errors = fetch_states(["a", "bad"], fetch_state, deadline=2.0)
+    assert states == {"a": {"name": "a"}}
+    assert errors == {"bad": "boom"}
+    assert all(2.0 < timeout <= 2.0 + containers.STATE_FETCH_GRACE for timeout in timeouts)
+    assert fetch_states([], fetch_state) == ({}, {})
+
+def test_api_errors(lxd):
+    client = LxdClient(lxd.server_address)
+    with pytest.raises(LxdApiError, match="404"):
+        client.instance_state("missing")
+    with pytest.raises(LxdApiError, match="not reachable"):
+        LxdClient(lxd.server_address + ".gone").get("/1.0")
+
+def test_unreachable_socket_falls_back_to_lxc(lxd, no_lxc, monkeypatch):
+    socket_capability = Capability("lxd_socket", lambda: lxd.server_address)
+    monkeypatch.setitem(platform_registry._capabilities, "lxd_socket", socket_capability)
+    assert get_lxc_info(socket_path=lxd.server_address + ".gone") == {"error": LXC_NOT_FOUND, "data": []}
+    assert socket_capability.status()["available"] is False  # Probed again on the next collection
+
+    lxd.routes["/1.0/instances?recursion=2"] = (200, [])
+    assert get_lxc_info() == []
+    assert socket_capability.status()["available"] is True
+
+def test_find_lxd_socket(lxd, monkeypatch):
+    monkeypatch.setenv("LXD_SOCKET", lxd.server_address)
+    assert find_lxd_socket() == lxd.server_address
+    assert platform_registry._lxd_socket_probe() == lxd.server_address
+    monkeypatch.setenv("LXD_SOCKET", lxd.server_address + ".gone")
+    assert find_lxd_socket() is None
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_parse_size():
+    assert containers._parse_size("8GiB") == 8 * 1024 ** 3
+    assert containers._parse_size("512MB") == 512 * 1000 ** 2
+    assert containers._parse_size("1.5 KiB") == 1536
+    assert containers._parse_size("50%") is None
+    assert containers._parse_size(None) is None
@@ -0,0 +1,59 @@
+import pytest
+
+from benchmarks import fixtures
+from utils.cpu import CpuUtilizationSampler, get_cpu_topology, parse_cpuinfo
+
+def test_parse_cpuinfo_topology(tmp_path):
+    path = tmp_path / "cpuinfo"
+    path.write_text(fixtures.cpuinfo(sockets=2, cores_per_socket=4, threads_per_core=2))
+    summary = parse_cpuinfo(str(path))
+    assert summary["sockets"] == 2
+    assert summary["physical_cores"] == 8
+    assert summary["logical_processors"] == 16
+    assert summary["model_name"] == "AMD EPYC 9554 64-Core Processor"
+    assert summary["vendor_id"] == "AuthenticAMD"
+    assert summary["cache_size"] == "1024 KB"
+
+def test_parse_cpuinfo_without_core_ids(tmp_path):
+    # E.g. many ARM systems: no physical id / core id lines
+    path = tmp_path / "cpuinfo"
+    path.write_text("".join(f"processor\t: {i}\nBogoMIPS\t: 50.00\nCPU part\t: 0xd0c\n\n" for i in range(4)))
+    summary = parse_cpuinfo(str(path))
+    assert (summary["sockets"], summary["physical_cores"], summary["logical_processors"]) == (1, 4, 4)
+
+def test_parse_cpuinfo_rejects_unparsable_files(tmp_path):
+    path = tmp_path / "cpuinfo"
+    path.write_text("garbage\n")
+    with pytest.raises(ValueError):
+        parse_cpuinfo(str(path))
+
+def test_get_cpu_topology_is_cached(tmp_path):
+    path = tmp_path / "cpuinfo"
+    path.write_text(fixtures.cpuinfo(sockets=1, cores_per_socket=2, threads_per_core=1))
+    first = get_cpu_topology(str(path))
+    path.write_text("garbage\n")
+    assert get_cpu_topology(str(path)) is first
+
+def proc_stat(*cpus):
+    """A /proc/stat with the aggregate line and one line per (busy, idle) jiffies pair."""
+    lines = [f"cpu  {sum(busy for busy, _ in cpus)} 0 0 {sum(idle for _, idle in cpus)} 0 0 0 0 0 0"]
+    lines += [f"cpu{index} {busy} 0 0 {idle} 0 0 0 0 0 0" for index, (busy, idle) in enumerate(cpus)]
+    return "\n".join(lines + ["intr 1 2 3", "ctxt 4"]) + "\n"
+
+def test_cpu_utilization_sampler(tmp_path):
+    path = tmp_path / "stat"
+    sampler = CpuUtilizationSampler(str(path))
+    path.write_text(proc_stat((100, 100), (0, 200)))
+    assert sampler.sample_summary() == {"utilization_percent": 25.0, "per_core_utilization": [50.0, 0.0]}
+    path.write_text(proc_stat((200, 100), (50, 250)))  # cpu0 fully busy, cpu1 half busy since the last sample
+    assert sampler.sample_summary() == {"utilization_percent": 75.0, "per_core_utilization": [100.0, 50.0]}
+    path.write_text(proc_stat((200, 100), (50, 250)))  # No jiffies elapsed
+    assert sampler.sample_summary()["per_core_utilization"] == [0.0, 0.0]
+
+def test_cpu_utilization_sampler_handles_hotplug(tmp_path):
+    path = tmp_path / "stat"
+    sampler = CpuUtilizationSampler(str(path))
+    path.write_text(proc_stat((100, 100)))
+    sampler.sample()
+    path.write_text(proc_stat((100, 100), (30, 10)))
+    assert sampler.sample_summary()["per_core_utilization"] == [50.0, 75.0]  # Averages since boot again
@@ -0,0 +1,141 @@
+import io
+import json
+import sys
+import tarfile
+from array import array
+
+import pytest
+
+from utils import export
+from utils.export import export_history, export_npy, iter_chunks, npy_bytes, read_npy, read_npy_export
+
+class FakeHistory:
+    """keys()/read() of HistoryStore over fixed series; `evicted` series disappear before they are read."""
+
+    def __init__(self, series, evicted=()):
+        self.series = series
+        self.evicted = set(evicted)
+
+    def keys(self, metric=None, device=None):
+        return sorted(self.series)
+
+    def read(self, metric, device, start=None, end=None, resolution=None):
+        if (metric, device) in self.evicted:
+            raise KeyError((metric, device))
+        timestamps, values = self.series[(metric, device)]
+        return resolution or 1, array("d", timestamps), array("d", values)
+
+SERIES = {
+    ("cpu.utilization", "all"): ([1000.0 + t for t in range(10)], [t / 2 for t in range(10)]),
+    ("gpu.utilization_gpu", "GPU0"): ([1000.0, 1001.0, 1002.0], [50.0, float("nan"), -1.5]),
+    ("ram.used_bytes", "host"): ([], []),
+}
+
+def as_lists(chunks):
+    return [(metric, device, resolution, list(timestamps), list(values))
+            for metric, device, resolution, timestamps, values in chunks]
+
+def test_npy_round_trip():
+    for values in (array("d"), array("d", [1.5, -2.0, 1e300, 0.0])):
+        data = npy_bytes(values)
+        assert data.startswith(b"\x93NUMPY\x01\x00")
+        header_length = int.from_bytes(data[8:10], "little")
+        assert (10 + header_length) % 64 == 0 and data[9 + header_length:10 + header_length] == b"\n"
+        assert read_npy(data) == values
+
+def test_npy_is_readable_by_numpy():
+    numpy = pytest.importorskip("numpy")
+    values = array("d", [1.0, 2.5, -3.0])
+    assert numpy.load(io.BytesIO(npy_bytes(values))).tolist() == [1.0, 2.5, -3.0]
+
+def test_iter_chunks_splits_series():
+    chunks = as_lists(iter_chunks(FakeHistory(SERIES), chunk_rows=4))
+    assert [(metric, len(timestamps)) for metric, _, _, timestamps, _ in chunks] == [
+        ("cpu.utilization", 4), ("cpu.utilization", 4), ("cpu.utilization", 2), ("gpu.utilization_gpu", 3)]
+    assert sum((chunk[3] for chunk in chunks[:3]), []) == SERIES[("cpu.utilization", "all")][0]
+
+def test_iter_chunks_skips_series_evicted_during_the_export():
+    history = FakeHistory(SERIES, evicted=[("cpu.utilization", "all")])
+    assert [chunk[0] for chunk in iter_chunks(history)] == ["gpu.utilization_gpu"]
+
+def test_npy_export_round_trip():
+    body = b"".join(export_history(FakeHistory(SERIES), "npy", chunk_rows=4))
+    assert len(body) % tarfile.BLOCKSIZE == 0
+    chunks = as_lists(read_npy_export(io.BytesIO(body)))
+    assert [chunk[:3] for chunk in chunks] == [("cpu.utilization", "all", 1)] * 3 + [("gpu.utilization_gpu", "GPU0", 1)]
+    assert sum((chunk[4] for chunk in chunks[:3]), []) == SERIES[("cpu.utilization", "all")][1]
+    gpu_values = chunks[3][4]
+    assert gpu_values[0] == 50.0 and gpu_values[1] != gpu_values[1] and gpu_values[2] == -1.5
+
+def test_npy_export_is_a_standard_tar():
+    body = b"".join(export_npy(iter_chunks(FakeHistory(SERIES))))
+    with tarfile.open(fileobj=io.BytesIO(body)) as archive:
+        assert archive.getnames() == ["000000.timestamps.npy", "000000.values.npy",
+                                      "000001.timestamps.npy", "000001.values.npy", "manifest.json"]
+        manifest = json.load(archive.extractfile("manifest.json"))
+        assert manifest["chunks"][1] == {"chunk": "000001", "metric": "gpu.utilization_gpu", "device": "GPU0",
+                                         "resolution": 1, "rows": 3}
+        assert read_npy(archive.extractfile("000001.timestamps.npy").read()) == array("d", [1000.0, 1001.0, 1002.0])
+
+class ChunkedReader(io.RawIOBase):
+    """A non-seekable stream that records how far it has been read."""
+
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), len(self.data) - self.position, 4096)
+        buffer[:size] = self.data[self.position:self.position + size]
+        self.position += size
+        return size
+
+def test_read_npy_export_streams_chunk_by_chunk():
+    series = {("m", f"d{index}"): ([float(t) for t in range(2000)], [1.0] * 2000) for index in range(5)}
+    body = b"".join(export_history(FakeHistory(series), "npy"))
+    stream = ChunkedReader(body)
+    chunks = read_npy_export(stream)
+    metric, device, _, timestamps, _ = next(chunks)
+    assert (metric, device, len(timestamps)) == ("m", "d0", 2000)
+    assert stream.position < len(body) / 2  # The first chunk came before the rest was read
+    assert [chunk[1] for chunk in chunks] == ["d1", "d2", "d3", "d4"]
+
+def test_read_npy_export_of_an_archive_without_chunk_headers(monkeypatch):
+    monkeypatch.setattr(export, "CHUNK_PAX_HEADER", "DASHBOARD.unused")
+    body = b"".join(export_history(FakeHistory(SERIES), "npy"))
+    monkeypatch.undo()
+    chunks = as_lists(read_npy_export(io.BytesIO(body)))
+    assert [chunk[:2] for chunk in chunks] == [("cpu.utilization", "all"), ("gpu.utilization_gpu", "GPU0")]
+    assert chunks[0][3] == SERIES[("cpu.utilization", "all")][0]
+
+def test_empty_npy_export():
+    body = b"".join(export_history(FakeHistory({}), "npy"))
+    assert list(read_npy_export(io.BytesIO(body))) == []
+
+def test_arrow_is_only_offered_with_pyarrow(monkeypatch):
+    monkeypatch.setattr(export, "pyarrow", None)
+    assert export.available_formats() == ["npy"]
+    with pytest.raises(ValueError):
+        export_history(FakeHistory(SERIES), "arrow")
+
+def test_arrow_export_round_trip():
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+
+    body = b"".join(export_history(FakeHistory(SERIES), "arrow", chunk_rows=4))
+    assert body.startswith(b"\xff\xff\xff\xff")  # What export_history.py looks for
+    table = pyarrow.ipc.open_stream(io.BytesIO(body)).read_all()
+    assert table.column_names == ["metric", "device", "resolution", "timestamp", "value"]
+    assert table.num_rows == 13
+    assert table.column("metric").to_pylist() == ["cpu.utilization"] * 10 + ["gpu.utilization_gpu"] * 3
+    assert table.column("device").to_pylist()[-1] == "GPU0"
+    assert table.column("resolution").to_pylist() == [1.0] * 13
+    assert table.column("timestamp").to_pylist()[:10] == SERIES[("cpu.utilization", "all")][0]
+    assert table.column("value").to_pylist()[-1] == -1.5
+
+def test_native_byte_order_is_recorded():
+    header = npy_bytes(array("d", [1.0]))[10:].split(b"\n")[0]
+    assert (b"'<f8'" in header) == (sys.byteorder == "little")
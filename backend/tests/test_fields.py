@@ -0,0 +1,32 @@
+from utils.fields import parse_field_selector, select_fields
+
+def test_parse_field_selector():
+    assert parse_field_selector("gpu.utilization_gpu,gpu.memory_used_mb,ram_disk.ram") == {
+        "gpu": {"utilization_gpu": {}, "memory_used_mb": {}}, "ram_disk": {"ram": {}}}
+
+def test_parse_field_selector_whole_source_wins():
+    assert parse_field_selector("gpu.utilization_gpu,gpu") == {"gpu": {}}
+    assert parse_field_selector("gpu,gpu.utilization_gpu") == {"gpu": {}}
+
+def test_parse_field_selector_prefix_wins():
+    assert parse_field_selector("ram_disk.ram,ram_disk.ram.used_bytes") == {"ram_disk": {"ram": {}}}
+    assert parse_field_selector("ram_disk.ram.used_bytes,ram_disk.ram.total_bytes") == {
+        "ram_disk": {"ram": {"used_bytes": {}, "total_bytes": {}}}}
+
+def test_parse_field_selector_ignores_empty_parts():
+    assert parse_field_selector(" , gpu..name ,") == {"gpu": {"name": {}}}
+    assert parse_field_selector(None) == {}
+
+def test_select_fields_maps_over_lists():
+    data = [{"name": "A", "utilization_gpu": 10, "temperature_gpu": 50},
+            {"name": "B", "utilization_gpu": 20, "temperature_gpu": 60}]
+    assert select_fields(data, {"utilization_gpu": {}}) == [{"utilization_gpu": 10}, {"utilization_gpu": 20}]
+
+def test_select_fields_nested_and_missing():
+    data = {"ram": {"used_bytes": 1, "total_bytes": 2}, "disk": [{"used_bytes": 3}]}
+    assert select_fields(data, {"ram": {"used_bytes": {}}, "swap": {}}) == {"ram": {"used_bytes": 1}}
+    assert select_fields(data, {}) is data
+
+def test_select_fields_keeps_errors():
+    data = {"error": "nvidia-smi not found", "details": "PATH=/usr/bin"}
+    assert select_fields(data, {"utilization_gpu": {}}) == data
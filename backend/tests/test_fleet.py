@@ -0,0 +1,214 @@
+import asyncio
+import gzip
+import http.server
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from utils.fleet import AGENT_SNAPSHOT_PATH, AgentConnection, FleetPoller, agents_from_env, fleet_views
+
+class Agent(http.server.ThreadingHTTPServer):
+    """
+    A local agent serving `snapshot` at /api/agent/snapshot on a free port. `delay` holds the
+    answer back, `gzip`/`chunked` change the encoding and `close` ends every connection after
+    one response. Once `gone` is set, connections are dropped without an answer.
+    `connections` counts the TCP connections accepted.
+    """
+    daemon_threads = True
+
+    def __init__(self, node, **options):
+        self.snapshot = {"node": node, "timestamp": time.time(), "sources": {}}
+        self.delay = options.get("delay", 0)
+        self.gzip = options.get("gzip", False)
+        self.chunked = options.get("chunked", False)
+        self.close = options.get("close", False)
+        self.gone = False
+        self.connections = 0
+        self.requests = 0
+        super().__init__(("127.0.0.1", 0), AgentHandler)
+
+    @property
+    def address(self):
+        return f"127.0.0.1:{self.server_address[1]}"
+
+    def handle_error(self, request, client_address):
+        pass  # The hub hung up on a slow answer
+
+class AgentHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        if server.gone:
+            self.close_connection = True
+            return
+        time.sleep(server.delay)
+        if self.path != AGENT_SNAPSHOT_PATH:
+            body = b"not found"
+            self.send_response(404)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        body = json.dumps(server.snapshot).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if server.gzip:
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        if server.close:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        if server.chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for start in range(0, len(body), 10):
+                chunk = body[start:start + 10]
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def agent_factory():
+    agents = []
+
+    def factory(node, **options):
+        agent = Agent(node, **options)
+        threading.Thread(target=agent.serve_forever, args=(0.05,), daemon=True).start()
+        agents.append(agent)
+        return agent
+
+    yield factory
+    for agent in agents:
+        agent.shutdown()
+        agent.server_close()
+
+@pytest.fixture
+def poller_factory():
+    pollers = []
+
+    def factory(agents, **options):
+        poller = FleetPoller(agents, **options)
+        pollers.append(poller)
+        poller.start()
+        return poller
+
+    yield factory
+    for poller in pollers:
+        poller.stop()
+        poller._thread.join(timeout=5)
+
+def unused_address():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return f"127.0.0.1:{probe.getsockname()[1]}"
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+def by_address(poller):
+    return {node["address"]: node for node in poller.nodes_view()}
+
+def test_slow_and_dead_agents_do_not_hold_back_the_others(agent_factory, poller_factory):
+    fast = agent_factory("fast")
+    slow = agent_factory("slow", delay=2.0)
+    dead = unused_address()
+    poller = poller_factory([fast.address, slow.address, dead], interval=0.1, timeout=0.3)
+
+    assert wait_for(lambda: fast.requests >= 5)
+    assert wait_for(lambda: by_address(poller)[slow.address]["last_error"] is not None)
+    nodes = by_address(poller)
+    assert nodes[fast.address]["status"] == "ok"
+    assert nodes[fast.address]["node"] == "fast"
+    assert nodes[fast.address]["age_seconds"] < 0.3
+    assert nodes[slow.address]["status"] == "down"
+    assert nodes[slow.address]["last_error"] == "timed out after 0.3s"
+    assert wait_for(lambda: by_address(poller)[dead]["last_error"] is not None)
+    assert by_address(poller)[dead]["status"] == "down"
+    assert by_address(poller)[dead]["node"] == dead
+
+def test_connections_are_kept_alive(agent_factory, poller_factory):
+    agent = agent_factory("node-a")
+    poller_factory([agent.address], interval=0.05)
+    assert wait_for(lambda: agent.requests >= 4)
+    assert agent.connections == 1
+
+def test_agent_going_away_leaves_stale_data(agent_factory, poller_factory):
+    agent = agent_factory("node-a")
+    agent.snapshot["sources"] = {"cpu": {"timestamp": 1.0, "version": 1, "data": {"utilization_percent": 12.5}}}
+    poller = poller_factory([agent.address], interval=0.05, timeout=0.5)
+    assert wait_for(lambda: poller.nodes_view()[0]["node"] == "node-a")
+    agent.gone = True
+    assert wait_for(lambda: poller.nodes_view()[0]["status"] == "stale")
+    node = poller.nodes_view()[0]
+    assert node["sources"]["cpu"]["data"] == {"utilization_percent": 12.5}
+    assert node["last_error"]
+
+@pytest.mark.parametrize("options", [{"gzip": True}, {"chunked": True}, {"gzip": True, "chunked": True}, {"close": True}])
+def test_response_encodings(agent_factory, options):
+    agent = agent_factory("node-a", **options)
+    agent.snapshot["sources"] = {"lxc": {"data": {"total": 3, "running": 2}}}
+
+    async def fetch_twice():
+        connection = AgentConnection(agent.address)
+        try:
+            return [await connection.fetch(), await connection.fetch()]
+        finally:
+            await connection.close()
+
+    assert asyncio.run(fetch_twice()) == [agent.snapshot, agent.snapshot]
+    assert agent.connections == (2 if options.get("close") else 1)
+
+def test_http_errors_are_reported(agent_factory):
+    agent = agent_factory("node-a")
+    connection = AgentConnection(f"http://{agent.address}/elsewhere")
+    assert connection.path == "/elsewhere" + AGENT_SNAPSHOT_PATH
+    with pytest.raises(ConnectionError, match="HTTP 404"):
+        asyncio.run(connection.fetch())
+
+def test_agents_from_env(monkeypatch):
+    monkeypatch.setenv("DASHBOARD_FLEET_AGENTS", " node-a:5000, http://node-b:5001/dash ,,")
+    assert agents_from_env() == ["node-a:5000", "http://node-b:5001/dash"]
+    monkeypatch.delenv("DASHBOARD_FLEET_AGENTS")
+    assert agents_from_env() == []
+
+def make_node(name, gpus, ram=None, status="ok"):
+    sources = {"gpu": {"data": gpus}}
+    if ram:
+        sources["ram_disk"] = {"data": ram}
+    return {"node": name, "status": status, "age_seconds": 1.0, "sources": sources}
+
+def test_fleet_views():
+    idle = {"pci_bus_id": "a", "utilization_gpu": 0.0, "memory_used_mb": 1.0, "memory_total_mb": 81559.0, "temperature_gpu": 30.0}
+    busy = {"pci_bus_id": "b", "utilization_gpu": 90.0, "memory_used_mb": 80000.0, "memory_total_mb": 81559.0, "temperature_gpu": 80.0}
+    unknown = {"pci_bus_id": "c", "utilization_gpu": "[N/A]", "memory_used_mb": 1.0, "memory_total_mb": 81559.0, "temperature_gpu": "[N/A]"}
+    nodes = [
+        make_node("node-a", [idle, busy], ram={"total_bytes": 100, "used_bytes": 25, "available_bytes": 75}),
+        make_node("node-b", [unknown], ram={"total_bytes": 100, "used_bytes": 90, "available_bytes": 10}),
+        make_node("node-c", {"error": "nvidia-smi not found"}, status="down"),
+    ]
+    views = fleet_views(nodes)
+    assert [(gpu["node"], gpu["pci_bus_id"]) for gpu in views["free_gpus"]] == [("node-a", "a")]
+    assert [gpu["pci_bus_id"] for gpu in views["hottest_gpus"]] == ["b", "a"]
+    assert [(entry["node"], entry["used_percent"]) for entry in views["memory_pressure"]] == [("node-b", 90.0), ("node-a", 25.0)]
+    assert views["nodes_total"] == 3
+    assert views["nodes_ok"] == 2
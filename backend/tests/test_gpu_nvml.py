@@ -0,0 +1,294 @@
+import ctypes
+
+import pytest
+
+from utils import gpu
+from utils.gpu import NVML_ERROR_GPU_IS_LOST, NVML_ERROR_NOT_SUPPORTED, NvmlBackend, NvmlError, NvmlLibrary
+
+MIB = 1024 * 1024
+
+class FakeNvml:
+    """Stands in for NvmlLibrary: a set of GPUs, keyed by handle, and a count of the calls made."""
+
+    def __init__(self, gpus):
+        self.gpus = gpus
+        self.calls = {}
+        self.unsupported = set()  # (handle, reading) pairs that raise NOT_SUPPORTED
+        self.lost = False
+        self.initialized = False
+
+    def _call(self, name, handle=None):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.lost and handle is not None:
+            raise NvmlError("GPU is lost", NVML_ERROR_GPU_IS_LOST)
+        if (handle, name) in self.unsupported:
+            raise NvmlError("Not Supported", NVML_ERROR_NOT_SUPPORTED)
+        return self.gpus[handle] if handle is not None else None
+
+    def init(self):
+        self._call("init")
+        self.initialized = True
+
+    def shutdown(self):
+        self._call("shutdown")
+        self.initialized = False
+
+    def driver_version(self):
+        self._call("driver_version")
+        return "550.54.15"
+
+    def device_count(self):
+        self._call("device_count")
+        return len(self.gpus)
+
+    def device_handle(self, index):
+        self._call("device_handle")
+        return sorted(self.gpus)[index]
+
+    def device_name(self, handle):
+        return self._call("device_name", handle)["name"]
+
+    def device_pci_bus_id(self, handle):
+        return self._call("device_pci_bus_id", handle)["pci_bus_id"]
+
+    def device_temperature(self, handle):
+        return self._call("device_temperature", handle)["temperature"]
+
+    def device_utilization(self, handle):
+        return self._call("device_utilization", handle)["utilization"]
+
+    def device_memory(self, handle):
+        return self._call("device_memory", handle)["memory"]
+
+    def device_compute_processes(self, handle):
+        return self._call("device_compute_processes", handle)["processes"]
+
+def make_gpu(index, processes=()):
+    return {
+        "name": "NVIDIA H100 80GB HBM3",
+        "pci_bus_id": f"00000000:{0x18 + index:02X}:00.0",
+        "temperature": 40 + index,
+        "utilization": (80 + index, 30),
+        "memory": (81559 * MIB, 1559 * MIB + 123, 80000 * MIB),
+        "processes": list(processes),
+    }
+
+def test_get_gpu_info_converts_readings():
+    nvml = FakeNvml({0: make_gpu(0), 1: make_gpu(1)})
+    gpus = NvmlBackend(nvml=nvml).get_gpu_info()
+    assert nvml.initialized
+    assert gpus[1] == {
+        "name": "NVIDIA H100 80GB HBM3",
+        "pci_bus_id": "00000000:19:00.0",
+        "driver_version": "550.54.15",
+        "temperature_gpu": 41.0,
+        "utilization_gpu": 81.0,
+        "utilization_memory": 30.0,
+        "memory_total_mb": 81559.0,
+        "memory_free_mb": 1559.0,
+        "memory_used_mb": 80000.0,
+    }
+
+def test_devices_are_enumerated_once():
+    nvml = FakeNvml({0: make_gpu(0), 1: make_gpu(1)})
+    backend = NvmlBackend(nvml=nvml)
+    for _ in range(3):
+        backend.get_gpu_info()
+    backend.get_compute_processes()
+    assert nvml.calls["init"] == 1
+    assert nvml.calls["device_count"] == 1
+    assert nvml.calls["device_name"] == 2
+    assert nvml.calls["device_temperature"] == 6
+
+def test_unsupported_readings_are_not_available():
+    nvml = FakeNvml({0: make_gpu(0)})
+    nvml.unsupported = {(0, "device_temperature"), (0, "device_memory")}
+    gpu = NvmlBackend(nvml=nvml).get_gpu_info()[0]
+    assert gpu["temperature_gpu"] == "[N/A]"
+    assert gpu["memory_total_mb"] == gpu["memory_free_mb"] == gpu["memory_used_mb"] == "[N/A]"
+    assert gpu["utilization_gpu"] == 80.0
+
+def test_lost_gpu_is_an_error_and_devices_are_enumerated_again():
+    nvml = FakeNvml({0: make_gpu(0), 1: make_gpu(1)})
+    backend = NvmlBackend(nvml=nvml)
+    backend.get_gpu_info()
+    nvml.lost = True
+    error = backend.get_gpu_info()
+    assert error == {"error": "Failed to query GPUs through NVML", "details": "GPU is lost"}
+
+    # The driver came back with one GPU less
+    nvml.lost = False
+    del nvml.gpus[1]
+    gpus = backend.get_gpu_info()
+    assert [gpu["pci_bus_id"] for gpu in gpus] == ["00000000:18:00.0"]
+    assert nvml.calls["device_count"] == 2
+
+def test_get_compute_processes():
+    nvml = FakeNvml({0: make_gpu(0, [(1234, 2048 * MIB)]), 1: make_gpu(1, [(1235, None)])})
+    processes = NvmlBackend(nvml=nvml).get_compute_processes()
+    assert processes == [
+        {"pid": 1234, "gpu_bus_id": "00000000:18:00.0", "used_memory_mb": 2048.0, "process_name": None},
+        {"pid": 1235, "gpu_bus_id": "00000000:19:00.0", "used_memory_mb": "[N/A]", "process_name": None},
+    ]
+    nvml.lost = True
+    assert NvmlBackend(nvml=nvml).get_compute_processes()["details"] == "GPU is lost"
+
+def test_stop_shuts_nvml_down():
+    nvml = FakeNvml({0: make_gpu(0)})
+    backend = NvmlBackend(nvml=nvml)
+    backend.get_gpu_info()
+    backend.stop()
+    backend.stop()
+    assert nvml.calls["shutdown"] == 1
+    assert not nvml.initialized
+    backend.get_gpu_info()
+    assert nvml.calls["init"] == 2
+
+# --- NvmlLibrary against a fake libnvidia-ml made of ctypes callbacks ---
+
+# Handles above 32 bits, as real device pointers are; they must reach the library unchanged
+HANDLES = [0x7F12_3456_0000, 0x7F12_3456_1000]
+NVML_ERROR_INSUFFICIENT_SIZE = 7
+
+def _function(*argtypes):
+    return ctypes.CFUNCTYPE(ctypes.c_int, *argtypes)
+
+class FakeNvmlLibrary:
+    """
+    The libnvidia-ml functions used by NvmlLibrary, as C callbacks with the prototypes of nvml.h.
+    `process_versions` lists the versions of nvmlDeviceGetComputeRunningProcesses the driver has.
+    """
+
+    def __init__(self, processes=(), process_versions=("_v3", "_v2", "")):
+        self.processes = list(processes)  # (pid, bytes) per device handle index 0
+        self._error_strings = {}  # Code -> static buffer, as the strings of the real library are
+        self.handles_seen = []
+        self.calls = []
+        uint_p = ctypes.POINTER(ctypes.c_uint)
+        handle_p = ctypes.POINTER(ctypes.c_void_p)
+        self._callbacks = {
+            "nvmlInit_v2": _function()(lambda: 0),
+            "nvmlShutdown": _function()(lambda: 0),
+            "nvmlSystemGetDriverVersion": _function(ctypes.c_void_p, ctypes.c_uint)(self._driver_version),
+            "nvmlDeviceGetCount_v2": _function(uint_p)(self._count),
+            "nvmlDeviceGetHandleByIndex_v2": _function(ctypes.c_uint, handle_p)(self._handle),
+            "nvmlDeviceGetName": _function(ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint)(self._name),
+            "nvmlDeviceGetPciInfo_v3": _function(ctypes.c_void_p, ctypes.POINTER(gpu._NvmlPciInfo))(self._pci_info),
+            "nvmlDeviceGetTemperature": _function(ctypes.c_void_p, ctypes.c_int, uint_p)(self._temperature),
+            "nvmlDeviceGetUtilizationRates": _function(ctypes.c_void_p, ctypes.POINTER(gpu._NvmlUtilization))(self._utilization),
+            "nvmlDeviceGetMemoryInfo": _function(ctypes.c_void_p, ctypes.POINTER(gpu._NvmlMemory))(self._memory),
+            "nvmlErrorString": ctypes.CFUNCTYPE(ctypes.c_void_p, ctypes.c_int)(self._error_string),
+        }
+        for version in process_versions:
+            structure = gpu._NvmlProcessInfoV1 if version == "" else gpu._NvmlProcessInfo
+            callback = _function(ctypes.c_void_p, uint_p, ctypes.POINTER(structure))(self._make_processes(version))
+            self._callbacks["nvmlDeviceGetComputeRunningProcesses" + version] = callback
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["_callbacks"][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def _index(self, handle):
+        self.handles_seen.append(handle)
+        return HANDLES.index(handle)
+
+    def _error_string(self, code):
+        if code not in self._error_strings:
+            self._error_strings[code] = ctypes.create_string_buffer(f"error {code}".encode())
+        return ctypes.addressof(self._error_strings[code])
+
+    def _driver_version(self, buffer, size):
+        ctypes.memmove(buffer, b"550.54.15\0", 10)
+        return 0
+
+    def _count(self, count):
+        count[0] = len(HANDLES)
+        return 0
+
+    def _handle(self, index, handle):
+        handle[0] = HANDLES[index]
+        return 0
+
+    def _name(self, handle, buffer, size):
+        name = f"GPU {self._index(handle)}\0".encode()
+        ctypes.memmove(buffer, name, len(name))
+        return 0
+
+    def _pci_info(self, handle, info):
+        info[0].busId = f"00000000:{0x18 + self._index(handle):02X}:00.0".encode()
+        return 0
+
+    def _temperature(self, handle, sensor, temperature):
+        temperature[0] = 40 + self._index(handle)
+        return 0
+
+    def _utilization(self, handle, utilization):
+        utilization[0].gpu, utilization[0].memory = 90, 20
+        return 0
+
+    def _memory(self, handle, memory):
+        memory[0].total, memory[0].free, memory[0].used = 80 * 2 ** 30, 60 * 2 ** 30, 20 * 2 ** 30
+        return 0
+
+    def _make_processes(self, version):
+        def processes(handle, count, infos):
+            self.calls.append(version)
+            found = self.processes if self._index(handle) == 0 else []
+            if count[0] < len(found):
+                count[0] = len(found)
+                return NVML_ERROR_INSUFFICIENT_SIZE
+            for i, (pid, used) in enumerate(found):
+                infos[i].pid, infos[i].usedGpuMemory = pid, used
+            count[0] = len(found)
+            return 0
+        return processes
+
+def test_library_end_to_end_with_64_bit_handles():
+    library = FakeNvmlLibrary(processes=[(1234, 3 * 2 ** 30)])
+    backend = NvmlBackend(nvml=NvmlLibrary(library=library))
+    gpus = backend.get_gpu_info()
+    assert [(g["name"], g["pci_bus_id"], g["temperature_gpu"]) for g in gpus] == [
+        ("GPU 0", "00000000:18:00.0", 40.0), ("GPU 1", "00000000:19:00.0", 41.0)]
+    assert gpus[0]["driver_version"] == "550.54.15"
+    assert gpus[0]["memory_used_mb"] == 20480.0
+    assert backend.get_compute_processes() == [
+        {"pid": 1234, "gpu_bus_id": "00000000:18:00.0", "used_memory_mb": 3072.0, "process_name": None}]
+    assert set(library.handles_seen) == set(HANDLES)
+
+def test_prototypes_are_declared():
+    library = FakeNvmlLibrary()
+    nvml = NvmlLibrary(library=library)
+    nvml.device_handle(1)
+    assert library.nvmlDeviceGetHandleByIndex_v2.argtypes == [ctypes.c_uint, ctypes.POINTER(ctypes.c_void_p)]
+    assert library.nvmlDeviceGetHandleByIndex_v2.restype is ctypes.c_int
+
+@pytest.mark.parametrize("versions, used", [(("_v3", "_v2", ""), "_v3"), (("_v2", ""), "_v2"), (("",), "")])
+def test_compute_processes_fall_back_to_older_drivers(versions, used):
+    library = FakeNvmlLibrary(processes=[(1, 2 ** 20), (2, gpu.NVML_VALUE_NOT_AVAILABLE)], process_versions=versions)
+    nvml = NvmlLibrary(library=library)
+    handle = nvml.device_handle(0)
+    assert nvml.device_compute_processes(handle) == [(1, 2 ** 20), (2, None)]
+    assert nvml.device_compute_processes(handle) == [(1, 2 ** 20), (2, None)]
+    assert library.calls == [used, used]  # The supported version is looked up once
+
+def test_compute_processes_grow_the_buffer():
+    library = FakeNvmlLibrary(processes=[(pid, 2 ** 20) for pid in range(100)])
+    nvml = NvmlLibrary(library=library)
+    assert len(nvml.device_compute_processes(nvml.device_handle(0))) == 100
+    assert library.calls == ["_v3", "_v3"]
+
+def test_compute_processes_without_any_version():
+    nvml = NvmlLibrary(library=FakeNvmlLibrary(process_versions=()))
+    with pytest.raises(NvmlError, match="No version"):
+        nvml.device_compute_processes(nvml.device_handle(0))
+
+def test_error_codes_are_described():
+    library = FakeNvmlLibrary()
+    library._callbacks["nvmlDeviceGetTemperature"] = _function(ctypes.c_void_p, ctypes.c_int, ctypes.POINTER(ctypes.c_uint))(
+        lambda handle, sensor, temperature: NVML_ERROR_NOT_SUPPORTED)
+    nvml = NvmlLibrary(library=library)
+    with pytest.raises(NvmlError, match="nvmlDeviceGetTemperature failed: error 3") as raised:
+        nvml.device_temperature(nvml.device_handle(0))
+    assert raised.value.code == NVML_ERROR_NOT_SUPPORTED
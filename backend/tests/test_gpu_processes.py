@@ -0,0 +1,71 @@
+import os
+
+from benchmarks import fixtures
+from utils.gpu_processes import GpuProcessAttribution, annotate_containers, container_from_cgroup
+from utils.platform_registry import collector
+
+def test_container_from_cgroup():
+    assert container_from_cgroup("0::/lxc.payload.web-01/system.slice/app.service\n") == "web-01"
+    assert container_from_cgroup("12:memory:/lxc/db/init.scope\n") == "db"
+    assert container_from_cgroup("0::/user.slice/user-1000.slice/session-1.scope\n") is None
+
+def make_attribution(tmp_path, processes):
+    fixtures.proc_tree(str(tmp_path), processes=6, first_pid=1000, containers=2)
+    return GpuProcessAttribution(lambda: list(processes), proc_root=str(tmp_path))
+
+def test_refresh_groups_by_container_user_and_gpu(tmp_path):
+    processes = [
+        {"pid": 1000, "process_name": "python3", "used_memory_mb": 100, "gpu_bus_id": "A"},
+        {"pid": 1001, "process_name": "bash", "used_memory_mb": 50, "gpu_bus_id": "B"},
+        {"pid": 1003, "process_name": "postgres", "used_memory_mb": 25, "gpu_bus_id": "A"},
+    ]
+    result = make_attribution(tmp_path, processes).refresh()
+    assert [row["pid"] for row in result["processes"]] == [1000, 1001, 1003]  # By memory, descending
+    assert result["processes"][0]["container"] == "container-000"
+    assert result["processes"][1]["container"] is None
+    by_container = {entry["container"]: entry for entry in result["by_container"]}
+    assert by_container["container-000"]["used_memory_mb"] == 100
+    assert by_container["container-001"]["gpus"] == ["A"]
+    assert by_container["host"]["process_count"] == 1
+    assert {entry["gpu_bus_id"]: entry["used_memory_mb"] for entry in result["by_gpu"]} == {"A": 125, "B": 50}
+
+def test_exited_and_reused_pids_are_forgotten(tmp_path):
+    processes = [{"pid": 1000, "process_name": "python3", "used_memory_mb": 100, "gpu_bus_id": "A"}]
+    attribution = make_attribution(tmp_path, processes)
+    attribution.refresh()
+    assert attribution.container_pids() == {"container-000": [1000]}
+
+    # PID 1000 is reused by a process outside any container: new start time, new cgroup
+    stat_path = os.path.join(str(tmp_path), "1000", "stat")
+    with open(stat_path) as f:
+        fields = f.read().split(" ")
+    fields[21] = str(int(fields[21]) + 1)
+    with open(stat_path, "w") as f:
+        f.write(" ".join(fields))
+    with open(os.path.join(str(tmp_path), "1000", "cgroup"), "w") as f:
+        f.write("0::/user.slice\n")
+    assert attribution.refresh()["processes"][0]["container"] is None
+    assert attribution.container_pids() == {}
+
+    processes.clear()
+    assert attribution.refresh()["processes"] == []
+
+def test_refresh_passes_backend_errors_through(tmp_path):
+    error = {"error": "nvidia-smi not found"}
+    assert GpuProcessAttribution(lambda: error, proc_root=str(tmp_path)).refresh() is error
+
+def test_annotate_containers():
+    containers = [{"name": "container-000"}, {"name": "other"}]
+    attribution = {"processes": [
+        {"pid": 1, "container": "container-000", "gpu_bus_id": "A", "used_memory_mb": 10},
+        {"pid": 2, "container": "container-000", "gpu_bus_id": "A", "used_memory_mb": 5},
+    ]}
+    annotated = annotate_containers(containers, attribution)
+    assert annotated[0]["gpus_used"][0]["used_memory_mb"] == 15
+    assert annotated[1]["gpus_used"] == []
+    assert annotate_containers({"error": "x"}, attribution) == {"error": "x"}
+
+def test_gpu_process_collector_is_not_applicable_on_windows():
+    result = collector("gpu_processes", "Windows")(lambda: [])()
+    assert result["status"] == "not_applicable"
+    assert result["processes"] == []
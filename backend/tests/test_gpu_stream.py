@@ -0,0 +1,121 @@
+import sys
+import textwrap
+
+import pytest
+
+from benchmarks import fixtures
+from utils.gpu import NVIDIA_SMI_NOT_FOUND, GpuStreamCollector, parse_gpu_csv_line, query_compute_apps
+
+def fake_nvidia_smi(tmp_path, body):
+    """A command standing in for nvidia-smi: a Python script running `body`."""
+    script = tmp_path / "nvidia-smi.py"
+    script.write_text("import sys, time\n" + textwrap.dedent(body))
+    return [sys.executable, str(script)]
+
+@pytest.fixture
+def collector_factory():
+    collectors = []
+
+    def factory(command, **options):
+        collector = GpuStreamCollector(loop_ms=100, command=command, restart_delay=0.05, **options)
+        collectors.append(collector)
+        return collector
+
+    yield factory
+    for collector in collectors:
+        collector.stop()
+
+def test_parse_gpu_csv_line():
+    gpu = parse_gpu_csv_line("NVIDIA H100, 00000000:18:00.0, 550.54.15, 45, 87, 30, 81559, 1559, 80000")
+    assert gpu["pci_bus_id"] == "00000000:18:00.0"
+    assert gpu["utilization_gpu"] == 87.0
+    assert gpu["memory_used_mb"] == 80000.0
+    assert parse_gpu_csv_line("GPU, 00000000:01:00.0, 550, [N/A], 5, 1, 100, 50, 50")["temperature_gpu"] == "[N/A]"
+    assert parse_gpu_csv_line("GPU, 00000000:01:00.0, 550") is None
+    assert parse_gpu_csv_line("") is None
+
+def test_stream_keeps_the_latest_record_per_gpu(tmp_path, collector_factory):
+    samples = fixtures.nvidia_smi_csv(gpus=2, samples=3)
+    command = fake_nvidia_smi(tmp_path, f"""
+        sys.stdout.write({samples!r})
+        sys.stdout.flush()
+        time.sleep(30)
+    """)
+    collector = collector_factory(command)
+    collector.start()
+    gpus = collector.get_gpu_info(wait=10)
+    assert [gpu["pci_bus_id"] for gpu in gpus] == ["00000000:18:00.0", "00000000:19:00.0"]
+    last_round = [parse_gpu_csv_line(line) for line in samples.splitlines()[-2:]]
+    assert gpus == last_round
+
+def test_stream_reports_exits_and_restarts(tmp_path, collector_factory):
+    command = fake_nvidia_smi(tmp_path, """
+        sys.stderr.write("NVIDIA-SMI has failed because it couldn't communicate with the NVIDIA driver")
+        sys.exit(9)
+    """)
+    collector = collector_factory(command)
+    collector.start()
+    error = collector.get_gpu_info(wait=10)
+    assert error["error"] == "Failed to execute nvidia-smi"
+    assert "couldn't communicate" in error["details"]
+    collector._stop_event.wait(0.3)
+    assert collector.restarts >= 2
+
+def test_stream_is_not_blocked_by_a_chatty_stderr(tmp_path, collector_factory):
+    # Far more than a pipe buffer, written before any CSV output
+    samples = fixtures.nvidia_smi_csv(gpus=1)
+    command = fake_nvidia_smi(tmp_path, f"""
+        for _ in range(16384):
+            sys.stderr.write("x" * 63 + "\\n")
+        sys.stderr.flush()
+        sys.stdout.write({samples!r})
+        sys.stdout.flush()
+        time.sleep(30)
+    """)
+    collector = collector_factory(command)
+    collector.start()
+    gpus = collector.get_gpu_info(wait=10)
+    assert isinstance(gpus, list) and len(gpus) == 1
+
+def test_stopping_is_not_counted_as_a_restart(tmp_path, collector_factory):
+    samples = fixtures.nvidia_smi_csv(gpus=1)
+    command = fake_nvidia_smi(tmp_path, f"""
+        sys.stdout.write({samples!r})
+        sys.stdout.flush()
+        time.sleep(30)
+    """)
+    collector = collector_factory(command)
+    collector.start()
+    assert isinstance(collector.get_gpu_info(wait=10), list)
+    collector.stop()
+    collector._thread.join(timeout=5)
+    assert not collector._thread.is_alive()
+    assert collector.restarts == 0
+
+def test_stream_does_not_start_an_unavailable_command(tmp_path, collector_factory):
+    marker = tmp_path / "started"
+    command = fake_nvidia_smi(tmp_path, f"open({str(marker)!r}, 'w').close()\n")
+    collector = collector_factory(command, available=lambda: False)
+    collector.start()
+    assert collector.get_gpu_info(wait=10) == {"error": NVIDIA_SMI_NOT_FOUND}
+    assert not marker.exists()
+
+def test_gpus_not_reported_recently_are_dropped():
+    collector = GpuStreamCollector(command=["unused"])
+    collector.feed(fixtures.nvidia_smi_csv(gpus=2).splitlines())
+    assert len(collector.get_gpu_info(wait=0)) == 2
+    collector.stale_after = -1  # Everything seen so far is too old
+    assert collector.get_gpu_info(wait=0) == {"error": "No data received from nvidia-smi yet."}
+
+def test_query_compute_apps(tmp_path):
+    output = fixtures.compute_apps_csv(processes=3, gpus=2)
+    command = fake_nvidia_smi(tmp_path, f"sys.stdout.write({output!r})\n")
+    processes = query_compute_apps(command)
+    assert [process["pid"] for process in processes] == [1000, 1001, 1002]
+    assert all(process["process_name"] == "python3" for process in processes)
+    assert isinstance(processes[0]["used_memory_mb"], float)
+
+def test_query_compute_apps_errors(tmp_path):
+    failing = fake_nvidia_smi(tmp_path, "sys.stderr.write('boom')\nsys.exit(1)\n")
+    assert query_compute_apps(failing)["details"] == "boom"
+    assert query_compute_apps([str(tmp_path / "missing-nvidia-smi")]) == {"error": NVIDIA_SMI_NOT_FOUND}
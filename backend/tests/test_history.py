@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from utils import history
+from utils.history import HistoryStore, RingBuffer, Tier, extract_cpu_metrics, extract_ram_disk_metrics
+
+def test_ring_buffer_grows_then_wraps():
+    buffer = RingBuffer(200)
+    assert len(buffer.timestamps) == history.INITIAL_BUFFER_SLOTS
+    for t in range(150):
+        buffer.append(t, t * 2)
+    assert len(buffer.timestamps) == 200  # 64 -> 128 -> 200
+    assert buffer.range(10, 12) == (buffer.timestamps[10:13], buffer.values[10:13])
+    for t in range(150, 250):
+        buffer.append(t, t * 2)
+    assert buffer.count == 200 and len(buffer.timestamps) == 200
+    assert buffer.oldest() == 50
+    timestamps, values = buffer.range(195, 205)
+    assert timestamps.tolist() == list(range(195, 206))
+    assert values.tolist() == [t * 2 for t in range(195, 206)]
+
+def test_tier_averages_buckets_and_shows_the_partial_one():
+    tier = Tier(10, 100)
+    for t, value in [(0, 1), (5, 3), (10, 10), (12, 20)]:
+        tier.add(t, value)
+    timestamps, values = tier.range(0, 100)
+    assert timestamps.tolist() == [0, 10]
+    assert values.tolist() == [2, 15]
+
+def test_query_picks_the_tier_covering_the_start():
+    store = HistoryStore(tiers=[(1, 60), (10, 600)])
+    now = int(time.time())
+    for t in range(now - 300, now):
+        store.record("gpu.utilization_gpu", "GPU0", t, 50)
+    assert store.query("gpu.utilization_gpu", start=now - 30, end=now)["resolution"] == 1
+    assert store.query("gpu.utilization_gpu", start=now - 300, end=now)["resolution"] == 10
+    assert store.query("gpu.utilization_gpu", start=now - 30, end=now, resolution=5)["resolution"] == 10
+
+def test_idle_series_are_evicted_after_the_coarsest_retention():
+    store = HistoryStore(tiers=[(1, 60), (10, 3600)])
+    store.record("disk.used_bytes", "/mnt/usb", 0, 1)
+    for t in range(0, 3600 + 2 * history.EVICTION_INTERVAL, 60):
+        store.record("disk.used_bytes", "/", t, 1)
+    assert store.catalog() == {"disk.used_bytes": ["/"]}
+
+def test_extract_cpu_metrics():
+    data = {"utilization_percent": 12.5, "per_core_utilization": [10, 15]}
+    assert list(extract_cpu_metrics(data)) == [
+        ("cpu.utilization", "all", 12.5), ("cpu.utilization", "cpu0", 10), ("cpu.utilization", "cpu1", 15)]
+    assert list(extract_cpu_metrics({"error": "x"})) == []
+
+@pytest.mark.parametrize("disk, recorded", [
+    ({"mounted_on": "/", "fstype": "ext4"}, True),
+    ({"mounted_on": "/data", "fstype": "zfs"}, True),
+    ({"mounted_on": "C:\\\\"}, True),  # Windows entries carry no fstype
+    ({"mounted_on": "/var/lib/docker/overlay2/abc/merged", "fstype": "overlay"}, False),
+    ({"mounted_on": "/dev/shm", "fstype": "tmpfs"}, False),
+    ({"mounted_on": "/snap/core/123", "fstype": "squashfs"}, False),
+    ({"mounted_on": "/var/snap/lxd/common/lxd/storage-pools/default/containers/c1", "fstype": "btrfs"}, False),
+    ({"mounted_on": "/run/user/1000", "fstype": "ext4"}, False),
+])
+def test_extract_ram_disk_metrics_skips_pseudo_and_container_mounts(disk, recorded):
+    data = {"ram": {"used_bytes": 1, "available_bytes": 2}, "disk": [dict(disk, used_bytes=100)]}
+    disks = [metric for metric in extract_ram_disk_metrics(data) if metric[0] == "disk.used_bytes"]
+    assert disks == ([("disk.used_bytes", disk["mounted_on"], 100)] if recorded else [])
@@ -0,0 +1,128 @@
+import gzip
+
+import pytest
+
+from utils import http_cache
+from utils.http_cache import EncodedBody, EncodedBodyCache, choose_encoding, etag_matches, parse_accept_encoding
+
+BODY = b'{"value": 1}' * 100  # Above MIN_COMPRESS_SIZE
+
+@pytest.mark.parametrize("header, expected", [
+    (None, {}),
+    ("", {}),
+    ("gzip", {"gzip": 1.0}),
+    ("gzip, deflate, br", {"gzip": 1.0, "deflate": 1.0, "br": 1.0}),
+    ("GZIP;q=0.5, br;q=0", {"gzip": 0.5, "br": 0.0}),
+    ("gzip; Q = 0.3", {"gzip": 0.3}),
+    ("gzip;level=1;q=0", {"gzip": 0.0}),
+    ("gzip;q=high", {"gzip": 0.0}),
+    (" , *;q=0.1,", {"*": 0.1}),
+])
+def test_parse_accept_encoding(header, expected):
+    assert parse_accept_encoding(header) == expected
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("deflate, gzip;q=0.1", "gzip"),
+    ("*", "gzip"),
+    ("*;q=0", None),
+    ("gzip;q=0, *", None),  # An explicit refusal beats the wildcard
+])
+def test_choose_encoding_without_brotli(monkeypatch, header, expected):
+    monkeypatch.setattr(http_cache, "brotli", None)
+    assert choose_encoding(header) == expected
+
+def test_choose_encoding_prefers_brotli_when_installed(monkeypatch):
+    monkeypatch.setattr(http_cache, "brotli", object())
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("gzip, br;q=0") == "gzip"
+    assert choose_encoding("*") == "br"
+    assert choose_encoding("gzip, br", available=["gzip"]) == "gzip"
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    (None, False),
+    ("", False),
+    ('"abc"', True),
+    ('W/"abc"', True),   # Weak comparison: a weak validator matches the strong ETag
+    ('"abd"', False),
+    ('"x", "abc"', True),
+    ('"x",W/"abc" ', True),
+    ('"x", "y"', False),
+    ("*", True),
+    (" * ", True),
+    ('W/"ab"', False),
+])
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, '"abc"') is expected
+
+def test_encoded_body_compresses_once_and_skips_small_bodies():
+    encoded = EncodedBody(1, BODY)
+    body, coding = encoded.encoded("gzip")
+    assert coding == "gzip" and gzip.decompress(body) == BODY
+    assert encoded.encoded("gzip")[0] is body
+    assert encoded.encoded(None) == (BODY, None)
+    assert EncodedBody(1, b"{}").encoded("gzip") == (b"{}", None)
+    assert EncodedBody(2, BODY).etag == encoded.etag  # A content hash, independent of the version
+    assert EncodedBody(1, BODY + b" ").etag != encoded.etag
+
+def test_body_cache_serializes_once_per_version():
+    cache = EncodedBodyCache()
+    calls = []
+
+    def serialize():
+        calls.append(1)
+        return BODY
+
+    first = cache.get("gpu", 1, "", serialize)
+    assert cache.get("gpu", 1, "", serialize) is first
+    assert len(calls) == 1
+    assert cache.get("gpu", 2, "", serialize) is not first
+    assert cache.get("gpu", 2, "fields=a", serialize) is not first
+    assert len(calls) == 3
+
+def test_body_cache_keeps_the_newer_version():
+    cache = EncodedBodyCache()
+    newer = cache.get("gpu", 5, "", lambda: b"new")
+    assert cache.get("gpu", 4, "", lambda: b"old").identity == b"old"  # Served, but not cached
+    assert cache.get("gpu", 5, "", lambda: b"other") is newer
+
+def test_body_cache_evicts_the_oldest_variants(monkeypatch):
+    monkeypatch.setattr(http_cache, "MAX_CACHED_BODIES", 3)
+    cache = EncodedBodyCache()
+    for variant in "abcd":
+        cache.get("gpu", 1, variant, lambda: BODY)
+    assert [key[1] for key in cache._entries] == ["b", "c", "d"]
+
+@pytest.fixture
+def app_module():
+    import app  # Imported here so the other tests don't configure the app's sampler and stores
+    return app
+
+def test_matching_if_none_match_gets_a_304(app_module, monkeypatch):
+    monkeypatch.setattr(http_cache, "brotli", None)
+    encoded = EncodedBody(1, BODY)
+    with app_module.app.test_request_context(headers={"If-None-Match": f'"other", W/{encoded.etag}',
+                                                      "Accept-Encoding": "gzip"}):
+        response = app_module.encoded_response(encoded, "application/json", 2.5)
+    assert response.status_code == 304
+    assert response.get_data() == b""
+    assert response.headers["ETag"] == encoded.etag
+    assert response.headers["Age"] == "2"
+    assert "Content-Encoding" not in response.headers
+
+def test_stale_etag_gets_the_body_in_the_accepted_encoding(app_module, monkeypatch):
+    monkeypatch.setattr(http_cache, "brotli", None)
+    encoded = EncodedBody(1, BODY)
+    with app_module.app.test_request_context(headers={"If-None-Match": '"stale"', "Accept-Encoding": "gzip"}):
+        response = app_module.encoded_response(encoded, "application/json", 0)
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(response.get_data()) == BODY
+
+    with app_module.app.test_request_context(headers={"Accept-Encoding": "gzip;q=0"}):
+        response = app_module.encoded_response(encoded, "application/json", 0)
+    assert "Content-Encoding" not in response.headers and response.get_data() == BODY
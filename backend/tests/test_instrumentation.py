@@ -0,0 +1,73 @@
+import pytest
+
+from utils.instrumentation import PROFILE_MAX_INTERVAL, PROFILE_MIN_INTERVAL, Histogram, Instrumentation, SamplingProfiler
+from utils.sampler import Snapshot
+
+@pytest.mark.parametrize("interval, expected", [(-1, PROFILE_MIN_INTERVAL), (0, PROFILE_MIN_INTERVAL),
+                                                (float("nan"), PROFILE_MIN_INTERVAL), (60, PROFILE_MAX_INTERVAL),
+                                                (0.01, 0.01)])
+def test_profile_interval_is_clamped(interval, expected):
+    result = SamplingProfiler().profile(0.1, interval)
+    assert result["interval_seconds"] == expected
+    assert result["samples"] >= 1
+
+def test_only_one_profile_runs_at_a_time():
+    profiler = SamplingProfiler()
+    profiler._running.acquire()
+    assert "error" in profiler.profile(0.1)
+
+def test_histogram_quantile_interpolates_inside_the_bucket():
+    histogram = Histogram(bounds=(1.0, 2.0, 4.0))
+    assert histogram.quantile(0.5) is None
+    for value in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(value)
+    # Ranks 0-1 fall in (0, 1], 1-3 in (1, 2], 3-4 in (2, 4]
+    assert histogram.quantile(0.25) == 1.0
+    assert histogram.quantile(0.5) == 1.5
+    assert histogram.quantile(0.875) == 3.0
+    assert histogram.quantile(1.0) == 3.0  # Capped at the largest value seen, not the bucket bound
+
+def test_histogram_quantile_in_the_overflow_bucket_uses_the_max():
+    histogram = Histogram(bounds=(1.0,))
+    for value in (10.0, 20.0):
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == pytest.approx(10.5)
+    assert histogram.quantile(0.99) <= 20.0
+
+def test_histogram_cumulative_counts():
+    histogram = Histogram(bounds=(1.0, 2.0))
+    for value in (1.0, 0.2, 5.0):  # A value on a bound belongs to that bucket (le)
+        histogram.observe(value)
+    buckets, total = histogram.cumulative_counts()
+    assert buckets == [(1.0, 2), (2.0, 2), (float("inf"), 3)]
+    assert total == pytest.approx(6.2)
+    assert histogram.to_dict()["count"] == 3 and histogram.to_dict()["max_ms"] == 5000
+
+def test_snapshot_aggregates_collectors_routes_and_caches():
+    perf = Instrumentation()
+    perf.on_snapshot(Snapshot("gpu", [{"name": "A"}], 0, 0.002, 1))
+    perf.on_snapshot(Snapshot("gpu", {"error": "nvidia-smi failed"}, 0, 0.004, 2))
+    perf.on_snapshot(Snapshot("cpu", {"errors_encountered": ["top"]}, 0, 0.1, 1))
+    perf.observe("route", "/api/gpu-info", 0.01)
+    perf.count("route_errors", "/api/gpu-info")
+    perf.spawned("nvidia-smi")
+    perf.spawned("nvidia-smi")
+    perf.timed_out("lxc")
+    perf.cache_access("http_body", hits=3, misses=1)
+    perf.cache_access("metrics_block", misses=2)
+
+    result = perf.snapshot()
+    assert result["collectors"]["gpu"]["count"] == 2
+    assert result["collectors"]["gpu"]["errors"] == 1
+    assert result["collectors"]["gpu"]["error_rate"] == 0.5
+    assert result["collectors"]["cpu"]["error_rate"] == 1.0
+    assert list(result["collectors"]) == ["cpu", "gpu"]
+    assert result["routes"]["/api/gpu-info"]["errors"] == 1
+    assert result["subprocess_spawns"] == {"nvidia-smi": 2}
+    assert result["timeouts"] == {"lxc": 1}
+    assert result["caches"] == {"http_body": {"hits": 3, "misses": 1, "hit_ratio": 0.75},
+                                "metrics_block": {"hits": 0, "misses": 2, "hit_ratio": 0.0}}
+
+def test_empty_snapshot():
+    result = Instrumentation().snapshot()
+    assert result["collectors"] == {} and result["routes"] == {} and result["caches"] == {}
@@ -0,0 +1,110 @@
+import gzip
+
+from utils import metrics
+from utils.http_cache import choose_encoding
+from utils.instrumentation import Instrumentation
+from utils.metrics import MetricsRenderer
+from utils.sampler import Snapshot
+
+class FakeSampler:
+    def __init__(self, data):
+        self.snapshots = {source: Snapshot(source, value, 1700000000.1234, 0.01, 1) for source, value in data.items()}
+
+    def sources(self):
+        return list(self.snapshots)
+
+    def get(self, source):
+        return self.snapshots.get(source)
+
+    def update(self, source, data):
+        self.snapshots[source] = Snapshot(source, data, 1700000001.0, 0.01, self.snapshots[source].version + 1)
+
+GPUS = [{"pci_bus_id": "00000000:01:00.0", "name": "Tesla \"T4\"", "utilization_gpu": 40,
+         "memory_used_mb": 2, "memory_total_mb": 16, "temperature_gpu": "N/A"}]
+CONTAINERS = [{"name": "web", "status": "Running", "memory_usage_mb": 1.5, "cpu_usage_seconds": 12.5, "pids": 7},
+              {"name": "db", "status": "Stopped"}]
+
+def render(sampler, enabled=None, **kwargs):
+    return MetricsRenderer(sampler, enabled).render(**kwargs).decode()
+
+def test_openmetrics_exposition():
+    text = render(FakeSampler({"gpu": GPUS, "lxc": CONTAINERS}))
+    lines = text.splitlines()
+    labels = '{bus_id="00000000:01:00.0",name="Tesla \\"T4\\""}'
+    assert f"dashboard_gpu_utilization_percent{labels} 40" in lines
+    assert f"dashboard_gpu_memory_used_bytes{labels} {2 * 1024 * 1024}" in lines
+    assert not any(line.startswith("dashboard_gpu_temperature_celsius") for line in lines)  # Not a number
+    assert "# TYPE dashboard_gpu_temperature_celsius gauge" not in lines  # Families without samples are left out
+    assert 'dashboard_lxc_container_running{container="web"} 1' in lines
+    assert 'dashboard_lxc_container_running{container="db"} 0' in lines
+    assert 'dashboard_lxc_container_memory_usage_bytes{container="web"} 1572864' in lines
+    # Counter families are named without _total in OpenMetrics, their samples with it
+    assert "# TYPE dashboard_lxc_container_cpu_seconds counter" in lines
+    assert 'dashboard_lxc_container_cpu_seconds_total{container="web"} 12.5' in lines
+    assert 'dashboard_snapshot_timestamp_seconds{source="gpu"} 1700000000.123' in lines
+    assert lines[-1] == "# EOF" and text.endswith("\n")
+
+def test_every_sample_follows_its_help_and_type():
+    text = render(FakeSampler({"gpu": GPUS, "lxc": CONTAINERS, "cpu": {"utilization_percent": 5,
+                                                                       "per_core_utilization": [4, 6]}}))
+    family = None
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            family = line.split()[2]
+        elif line.startswith("# TYPE "):
+            assert line.split()[2] == family
+        elif line != "# EOF":
+            assert line.split("{")[0].split(" ")[0] in (family, family + "_total")
+
+def test_prometheus_format_names_counters_with_total_and_has_no_eof():
+    lines = render(FakeSampler({"lxc": CONTAINERS}), openmetrics=False).splitlines()
+    assert "# TYPE dashboard_lxc_container_cpu_seconds_total counter" in lines
+    assert "# EOF" not in lines
+
+def test_only_enabled_sources_are_rendered():
+    text = render(FakeSampler({"gpu": GPUS, "cpu": {"utilization_percent": 5}}), enabled=["cpu", "unknown"])
+    assert 'dashboard_cpu_utilization_percent{cpu="all"} 5' in text
+    assert "gpu" not in text
+
+def test_body_is_cached_until_a_snapshot_changes():
+    sampler = FakeSampler({"cpu": {"utilization_percent": 5}})
+    renderer = MetricsRenderer(sampler, ["cpu"])
+    first = renderer.render()
+    assert renderer.render() is first
+    compressed = renderer.render(gzipped=True)
+    assert gzip.decompress(compressed) == first
+    assert renderer.render(gzipped=True) is compressed
+    sampler.update("cpu", {"utilization_percent": 7})
+    assert b'{cpu="all"} 7' in renderer.render()
+
+def test_self_metrics_export_histograms_and_counters(monkeypatch):
+    perf = Instrumentation()
+    monkeypatch.setattr(metrics, "perf", perf)
+    perf.observe("collector", "gpu", 0.003)
+    perf.observe("collector", "gpu", 100)
+    perf.count("collector_errors", "gpu")
+    lines = render(FakeSampler({}), enabled=["self"]).splitlines()
+    assert "# TYPE dashboard_collector_duration_seconds histogram" in lines
+    buckets = [line for line in lines if line.startswith("dashboard_collector_duration_seconds_bucket")]
+    assert buckets[-1] == 'dashboard_collector_duration_seconds_bucket{collector="gpu",le="+Inf"} 2'
+    counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    assert counts == sorted(counts)
+    assert 'dashboard_collector_duration_seconds_count{collector="gpu"} 2' in lines
+    assert 'dashboard_collector_errors_total{collector="gpu"} 1' in lines
+    assert lines[-1] == "# EOF"
+
+def test_label_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(metrics, "MAX_CACHED_LABELS", 10)
+    sampler = FakeSampler({"lxc": []})
+    renderer = MetricsRenderer(sampler, ["lxc"])
+    for index in range(50):
+        sampler.update("lxc", [{"name": f"container-{index}", "status": "Running"}])
+        assert f'{{container="container-{index}"}} 1'.encode() in renderer.render()
+    assert len(renderer._labels) <= 10
+
+def test_gzip_is_not_used_when_refused():
+    assert choose_encoding("gzip", available=["gzip"]) == "gzip"
+    assert choose_encoding("gzip;q=0", available=["gzip"]) is None
+    assert choose_encoding("br, *;q=0", available=["gzip"]) is None
+    assert choose_encoding("*", available=["gzip"]) == "gzip"
+    assert choose_encoding(None, available=["gzip"]) is None
@@ -0,0 +1,160 @@
+import os
+
+import pytest
+
+from benchmarks import fixtures
+from tests.fakes import FakeClock
+from utils import processes
+from utils.processes import ROW_CPU, ROW_CPU_TIME, ROW_PID, ROW_RSS, ROW_STATE, ROW_THREADS, ProcessTable, render_process_text
+
+def write_process(root, pid, name="worker", utime=0, stime=0, start=1000, rss_pages=100, state="S", threads=1,
+                  uid=0, cmdline=None):
+    """Writes /proc/<pid> of a synthetic proc tree; fields like the kernel's, see proc(5)."""
+    directory = os.path.join(root, str(pid))
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "stat"), "w") as f:
+        f.write(f"{pid} ({name}) {state} 1 {pid} {pid} 0 -1 4194560 1000 0 0 0 {utime} {stime} 0 0 20 0 "
+                f"{threads} 0 {start} {rss_pages * 8192} {rss_pages} 18446744073709551615 1 1 0 0 0 0\n")
+    with open(os.path.join(directory, "status"), "w") as f:
+        f.write(f"Name:\t{name}\nState:\t{state}\nUid:\t{uid}\t{uid}\t{uid}\t{uid}\n")
+    with open(os.path.join(directory, "cmdline"), "w") as f:
+        f.write(cmdline if cmdline is not None else f"/usr/bin/{name}\0--flag\0")
+    with open(os.path.join(directory, "statm"), "w") as f:
+        f.write(f"{rss_pages * 3} {rss_pages} {rss_pages // 4} 1 0 {rss_pages} 0\n")
+
+@pytest.fixture
+def proc(tmp_path):
+    root = str(tmp_path)
+    with open(os.path.join(root, "stat"), "w") as f:
+        f.write("cpu  1 2 3 4\nbtime 1700000000\n")
+    with open(os.path.join(root, "meminfo"), "w") as f:
+        f.write("MemTotal:       1000000 kB\n")
+    with open(os.path.join(root, "loadavg"), "w") as f:
+        f.write("1.50 1.00 0.50 2/100 1234\n")
+    return root
+
+def test_scan_reads_every_process(tmp_path):
+    fixtures.proc_tree(str(tmp_path), processes=25, first_pid=500, containers=3)
+    table = ProcessTable(str(tmp_path))
+    rows, elapsed = table.scan()
+    assert elapsed is None
+    assert sorted(row[ROW_PID] for row in rows) == list(range(500, 525))
+    assert all(row[ROW_CPU] == 0.0 for row in rows)  # No previous scan to compare with
+    assert table.summary(rows)["total"] == 25
+
+def test_fields_and_names_with_parentheses(proc):
+    write_process(proc, 42, name="Web Content (x)", utime=300, stime=100, rss_pages=250, state="R", threads=7,
+                  cmdline="/usr/lib/firefox\0-contentproc\0")
+    table = ProcessTable(proc)
+    (row,), _ = table.scan()
+    assert row[ROW_STATE] == "R"
+    assert row[ROW_THREADS] == 7
+    assert row[ROW_RSS] == 250 * table.page_size
+    assert row[ROW_CPU_TIME] == 400
+
+    process = table.describe(row, mem_total=table.read_mem_total())
+    assert process["name"] == "Web Content (x)"
+    assert process["command"] == "/usr/lib/firefox -contentproc"
+    assert process["user"] == "root"
+    assert process["virtual_bytes"] == 750 * table.page_size
+    assert process["memory_percent"] == round(250 * table.page_size / 1024000000 * 100, 1)
+    assert process["start_time"] == 1700000000 + 1000 / table.clock_ticks
+    assert process["cpu_time_seconds"] == round(400 / table.clock_ticks, 2)
+
+def test_cpu_percent_from_the_delta_between_scans(proc):
+    clock = FakeClock()
+    table = ProcessTable(proc, clock=clock)
+    ticks = table.clock_ticks
+    write_process(proc, 10, utime=1000)
+    write_process(proc, 11, utime=1000)
+    table.scan()
+
+    clock.advance(2.0)
+    write_process(proc, 10, utime=1000 + 2 * ticks)  # One processor busy for the whole interval
+    write_process(proc, 11, utime=1000 + ticks // 2, stime=ticks // 2)
+    rows, elapsed = table.scan()
+    cpu = {row[ROW_PID]: row[ROW_CPU] for row in rows}
+    assert elapsed == 2.0
+    assert cpu[10] == pytest.approx(100.0)
+    assert cpu[11] == pytest.approx(50.0)
+
+def test_reused_pid_is_looked_up_again(proc, monkeypatch):
+    clock = FakeClock()
+    table = ProcessTable(proc, clock=clock)
+    write_process(proc, 10, name="old", utime=5000, start=1000)
+    table.scan()
+    clock.advance(1.0)
+    table.scan()
+
+    loads = []
+    original = table._load_static
+    monkeypatch.setattr(table, "_load_static", lambda *args: loads.append(args[0]) or original(*args))
+    clock.advance(1.0)
+    table.scan()
+    assert loads == []  # Static fields are cached while the process lives
+
+    write_process(proc, 10, name="new", utime=10, start=9000)
+    clock.advance(1.0)
+    (row,), _ = table.scan()
+    assert loads == [10]
+    assert row[ROW_CPU] == 0.0  # No delta against the previous process' ticks
+    assert table.describe(row)["command"] == "/usr/bin/new --flag"
+
+def test_processes_exiting_during_the_scan(proc):
+    write_process(proc, 10)
+    write_process(proc, 11)
+    os.makedirs(os.path.join(proc, "12"))  # Listed, but gone before its stat was read
+    table = ProcessTable(proc)
+    rows, _ = table.scan()
+    assert sorted(row[ROW_PID] for row in rows) == [10, 11]
+
+    # Exits between the scan and describe(): statm is missing
+    row = next(row for row in rows if row[ROW_PID] == 11)
+    os.remove(os.path.join(proc, "11", "statm"))
+    assert table.describe(row)["virtual_bytes"] is None
+
+    # Exits between stat and status/cmdline: the static fields fall back
+    write_process(proc, 13, name="short")
+    os.remove(os.path.join(proc, "13", "status"))
+    os.remove(os.path.join(proc, "13", "cmdline"))
+    rows, _ = table.scan()
+    process = table.describe(next(row for row in rows if row[ROW_PID] == 13))
+    assert process["user"] == "?"
+    assert process["command"] == "[short]"
+
+    # Processes that are gone are forgotten
+    for name in os.listdir(os.path.join(proc, "10")):
+        os.remove(os.path.join(proc, "10", name))
+    os.rmdir(os.path.join(proc, "10"))
+    table.scan()
+    assert 10 not in table._static
+
+@pytest.mark.parametrize("sort_by, index", [("cpu", ROW_CPU), ("rss", ROW_RSS)])
+def test_top_matches_a_full_sort(sort_by, index):
+    rows = [(pid, float(pid * 7 % 13), pid * 31 % 17 * 4096, "S", 1, 0) for pid in range(200)]
+    top = ProcessTable.top(rows, 10, sort_by=sort_by)
+    assert [row[index] for row in top] == sorted((row[index] for row in rows), reverse=True)[:10]
+    assert ProcessTable.top(rows, 500, sort_by=sort_by) == sorted(rows, key=lambda row: row[index], reverse=True)
+
+def test_summary_and_text(proc):
+    write_process(proc, 1, state="R")
+    write_process(proc, 2, state="S")
+    write_process(proc, 3, state="D")
+    write_process(proc, 4, state="Z")
+    write_process(proc, 5, state="I")
+    table = ProcessTable(proc)
+    rows, _ = table.scan()
+    tasks = table.summary(rows)
+    assert tasks == {"running": 1, "sleeping": 2, "idle": 1, "stopped": 0, "zombie": 1, "total": 5}
+    assert table.read_loadavg() == [1.5, 1.0, 0.5]
+
+    stats = {"tasks": tasks, "load_average": table.read_loadavg(),
+             "processes": [table.describe(row, table.read_mem_total()) for row in ProcessTable.top(rows, 2)]}
+    text = render_process_text(stats)
+    assert text.startswith("load average: 1.50, 1.00, 0.50\nTasks: 5 total, 1 running, 2 sleeping")
+    assert "/usr/bin/worker --flag" in text
+
+def test_format_bytes():
+    assert processes._format_bytes(512) == "512B"
+    assert processes._format_bytes(1536) == "1.5K"
+    assert processes._format_bytes(5 * 1024 ** 4) == "5.0T"
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+
+import pytest
+
+from benchmarks import fixtures
+from utils import ram_disk
+
+def test_read_meminfo_converts_kb_to_bytes(tmp_path):
+    path = tmp_path / "meminfo"
+    path.write_text(fixtures.meminfo())
+    meminfo = ram_disk.read_meminfo(str(path))
+    assert meminfo["MemTotal"] == 1056561564 * 1024
+    assert meminfo["HugePages_Total"] == 0  # Unitless values are kept as-is
+
+def test_get_linux_ram_info(tmp_path):
+    path = tmp_path / "meminfo"
+    path.write_text(fixtures.meminfo())
+    ram = ram_disk.get_linux_ram_info(str(path))
+    assert ram["used_bytes"] == (1056561564 - 801234567) * 1024
+    assert ram["swap_used_bytes"] == 0
+    assert ram["total_mb"] == 1056561564 * 1024 // ram_disk.BYTES_PER_MB
+
+def test_read_mounts(tmp_path):
+    path = tmp_path / "mounts"
+    path.write_text(fixtures.mounts(count=2))
+    assert ram_disk.read_mounts(str(path)) == [
+        ("/dev/root", "/", "ext4"), ("proc", "/proc", "proc"), ("sysfs", "/sys", "sysfs"),
+        ("/dev/loop0", "/snap/core/0", "squashfs"), ("/dev/loop1", "/snap/core/1", "squashfs"),
+    ]
+
+def test_read_mounts_unescapes_octal_sequences(tmp_path):
+    path = tmp_path / "mounts"
+    path.write_text("/dev/sdb1 /media/my\\040disk ext4 rw 0 0\n/dev/sdc1 /mnt/tab\\011and\\134slash xfs rw 0 0\n")
+    assert ram_disk.read_mounts(str(path)) == [
+        ("/dev/sdb1", "/media/my disk", "ext4"), ("/dev/sdc1", "/mnt/tab\tand\\slash", "xfs"),
+    ]
+
+def test_get_linux_disk_info_skips_pseudo_and_unreachable_mounts(tmp_path):
+    path = tmp_path / "mounts"
+    path.write_text(fixtures.mounts(count=3))
+    disks = ram_disk.get_linux_disk_info(str(path))
+    assert [disk["mounted_on"] for disk in disks] == ["/"]  # proc/sysfs have no blocks, the loop mounts do not exist
+    assert disks[0]["total_bytes"] >= disks[0]["used_bytes"]
+
+class FakeStatvfs:
+    """statvfs of a few mount points; the ones in `hanging` block until release() like a stale NFS mount."""
+
+    def __init__(self, hanging=()):
+        self.hanging = set(hanging)
+        self.calls = []
+        self._released = threading.Event()
+
+    def __call__(self, path):
+        self.calls.append(path)
+        if path in self.hanging:
+            self._released.wait()
+        return os.statvfs_result((4096, 4096, 1000, 400, 300, 100, 50, 50, 0, 255))
+
+    def release(self):
+        self._released.set()
+
+@pytest.fixture
+def network_mounts(tmp_path):
+    path = tmp_path / "mounts"
+    path.write_text("/dev/sda1 / ext4 rw 0 0\n"
+                    "server:/export /mnt/nfs nfs4 rw 0 0\n"
+                    "//server/share /mnt/smb cifs rw 0 0\n")
+    yield str(path)
+    ram_disk._blocked_statvfs.clear()
+
+def test_stale_network_mount_does_not_hang_disk_info(network_mounts):
+    statvfs = FakeStatvfs(hanging={"/mnt/nfs"})
+    try:
+        started = time.monotonic()
+        disks = ram_disk.get_linux_disk_info(network_mounts, statvfs=statvfs, timeout=0.2)
+        assert time.monotonic() - started < 1.0
+        assert [disk["mounted_on"] for disk in disks] == ["/", "/mnt/smb"]
+        assert disks[0]["total_bytes"] == 1000 * 4096
+
+        # The blocked mount is not queried again while its first call hangs
+        disks = ram_disk.get_linux_disk_info(network_mounts, statvfs=statvfs, timeout=0.2)
+        assert [disk["mounted_on"] for disk in disks] == ["/", "/mnt/smb"]
+        assert statvfs.calls.count("/mnt/nfs") == 1
+    finally:
+        statvfs.release()
+
+    assert wait_for(lambda: ram_disk._blocked_statvfs["/mnt/nfs"].done.is_set())
+    disks = ram_disk.get_linux_disk_info(network_mounts, statvfs=statvfs, timeout=0.2)
+    assert [disk["mounted_on"] for disk in disks] == ["/", "/mnt/nfs", "/mnt/smb"]
+
+def test_network_fstypes():
+    assert ram_disk.is_network_fstype("nfs4")
+    assert ram_disk.is_network_fstype("fuse.sshfs")
+    assert ram_disk.is_network_fstype("smb3")
+    assert not ram_disk.is_network_fstype("ext4")
+    assert not ram_disk.is_network_fstype("fuse.lxcfs")
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
@@ -0,0 +1,91 @@
+import pytest
+
+from tests.fakes import FakeClock
+from utils import scheduler
+from utils.scheduler import AdaptiveScheduler
+
+def gpus(utilization):
+    return [{"pci_bus_id": "GPU0", "utilization_gpu": utilization}]
+
+def make_scheduler(**options):
+    clock = FakeClock()
+    adaptive = AdaptiveScheduler(heartbeat=15, cpu_budget=0.1, demand_window=30, clock=clock, **options)
+    adaptive.track("gpu", 2.0)
+    return adaptive, clock
+
+def collect(adaptive, clock, data, duration=0.001):
+    """One collection: observe it, then advance the clock by the interval the scheduler picks."""
+    adaptive.observe("gpu", data, duration)
+    interval = adaptive.next_interval("gpu")
+    clock.advance(interval)
+    return interval
+
+def test_unwatched_flat_source_backs_off_to_the_heartbeat():
+    adaptive, clock = make_scheduler()
+    intervals = [collect(adaptive, clock, gpus(5)) for _ in range(10)]
+    assert intervals[0] == pytest.approx(2.0 * scheduler.BACKOFF_FACTOR)
+    assert intervals == sorted(intervals)
+    assert intervals[-1] == 15
+    assert adaptive.status()["gpu"]["reason"] == "heartbeat"
+
+def test_demand_restores_the_base_interval():
+    adaptive, clock = make_scheduler()
+    for _ in range(10):
+        collect(adaptive, clock, gpus(5))
+    assert adaptive.note_demand("gpu") is True   # Was not watched: the collector should be woken up
+    assert adaptive.note_demand("gpu") is False  # Already watched
+    assert collect(adaptive, clock, gpus(5)) == 2.0
+    assert adaptive.status()["gpu"]["watched"] is True
+    # Demand expires after the window
+    clock.advance(30)
+    assert collect(adaptive, clock, gpus(5)) > 2.0
+
+def test_watched_and_changing_source_is_sampled_faster():
+    adaptive, clock = make_scheduler()
+    adaptive.note_demand("gpu")
+    collect(adaptive, clock, gpus(10))
+    assert collect(adaptive, clock, gpus(90)) == 1.0
+    assert adaptive.status()["gpu"]["reason"] == "watched, changing"
+
+def test_change_keeps_an_unwatched_source_at_its_base_interval_for_the_hold_time():
+    adaptive, clock = make_scheduler()
+    collect(adaptive, clock, gpus(10))
+    assert collect(adaptive, clock, gpus(90)) == 2.0
+    assert adaptive.status()["gpu"]["reason"] == "changing"
+    clock.advance(scheduler.CHANGE_HOLD)
+    assert collect(adaptive, clock, gpus(90)) > 2.0
+
+def test_small_changes_near_zero_are_not_a_change():
+    adaptive, clock = make_scheduler()
+    collect(adaptive, clock, gpus(1))
+    assert collect(adaptive, clock, gpus(2)) > 2.0  # 1% -> 2% is measured against CHANGE_FLOOR
+    assert collect(adaptive, clock, gpus(10)) == 2.0
+
+def test_cpu_budget_limits_slow_collectors():
+    adaptive, clock = make_scheduler()
+    adaptive.note_demand("gpu")
+    assert collect(adaptive, clock, gpus(5), duration=1.0) == pytest.approx(10.0)  # 1 s runtime / 0.1 budget
+    status = adaptive.status()["gpu"]
+    assert status["reason"] == "cpu budget"
+    assert status["cpu_share"] == pytest.approx(0.1)
+
+def test_untracked_sources_are_ignored():
+    adaptive, _ = make_scheduler()
+    assert adaptive.note_demand("lxc") is False
+    adaptive.observe("lxc", [], 0.1)
+    assert adaptive.tracks("gpu") and not adaptive.tracks("lxc")
+
+def test_custom_signals():
+    adaptive = AdaptiveScheduler(clock=FakeClock())
+    adaptive.track("custom", 1.0, signals=lambda data: [("value", "x", data)])
+    adaptive.observe("custom", 10, 0.0)
+    adaptive.observe("custom", 100, 0.0)
+    assert adaptive.next_interval("custom") == 1.0
+    assert adaptive.status()["custom"]["changing"] is True
+
+def test_scheduler_from_env(monkeypatch):
+    monkeypatch.setenv("DASHBOARD_ADAPTIVE", "0")
+    assert scheduler.scheduler_from_env() is None
+    monkeypatch.setenv("DASHBOARD_ADAPTIVE", "1")
+    monkeypatch.setenv("DASHBOARD_HEARTBEAT", "30")
+    assert scheduler.scheduler_from_env().heartbeat == 30
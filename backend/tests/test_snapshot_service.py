@@ -0,0 +1,174 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from utils import snapshot_service
+from utils.sampler import Sampler
+from utils.snapshot_service import RemoteSampler, SnapshotServer, request_collector
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+@pytest.fixture
+def local():
+    """A Sampler that is never started: snapshots are published by the tests."""
+    sampler = Sampler()
+    sampler.register("cpu", lambda: {}, 10.0)
+    sampler.register("gpu", lambda: [], 2.0)
+    sampler.demanded = []
+    sampler.note_demand = sampler.demanded.append
+    return sampler
+
+@pytest.fixture
+def server(local, tmp_path):
+    server = SnapshotServer(local, str(tmp_path / "collector.sock"))
+    server.start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def remote(server):
+    remote = RemoteSampler(server.socket_path)
+    yield remote
+    remote.stop()
+
+def test_remote_sampler_mirrors_the_collector(local, server, remote):
+    local._publish("cpu", {"usage": 1}, 0.01)
+    remote.start(wait=5.0)
+    assert sorted(remote.sources()) == ["cpu", "gpu"]
+    assert remote.status()["gpu"]["interval_seconds"] == 2.0
+    assert remote.get("cpu").data == {"usage": 1}
+    assert remote.get("gpu") is None
+    assert remote.missing_sources() == ["gpu"]
+
+    received = []
+    remote.add_listener(received.append)
+    local._publish("gpu", [{"name": "A"}], 0.01)
+    local._publish("cpu", {"usage": 2}, 0.01)
+    wait_for(lambda: len(received) == 2)
+    assert [snapshot.source for snapshot in received] == ["gpu", "cpu"]
+    assert remote.get("cpu").data == {"usage": 2} and remote.get("cpu").version == 2
+    assert remote.ready()
+
+def test_get_waits_for_the_first_sample(local, server, remote):
+    remote.start(wait=5.0)
+    threading.Timer(0.1, local._publish, args=("gpu", [], 0.01)).start()
+    assert remote.get("gpu", wait=5.0).data == []
+
+def test_sources_are_pending_until_the_hello(tmp_path):
+    remote = RemoteSampler(str(tmp_path / "missing.sock"))
+    assert remote.get("gpu") is None
+    assert remote.get("gpu", wait=0.05) is None
+    remote._apply({"type": "hello", "instance": "a", "sources": {"gpu": 2.0}})
+    assert remote.get("gpu") is None
+    with pytest.raises(KeyError):
+        remote.get("unknown")
+
+def test_waiting_get_returns_when_the_hello_arrives(tmp_path):
+    remote = RemoteSampler(str(tmp_path / "missing.sock"))
+    threading.Timer(0.1, remote._apply, args=({"type": "hello", "instance": "a", "sources": {"gpu": 2.0}},)).start()
+    started = time.monotonic()
+    with pytest.raises(KeyError):
+        remote.get("unknown", wait=5.0)
+    assert time.monotonic() - started < 2.0
+
+def test_versions_keep_increasing_across_a_collector_restart(local, tmp_path):
+    path = str(tmp_path / "collector.sock")
+    first = SnapshotServer(local, path)
+    first.start()
+    remote = RemoteSampler(path)
+    try:
+        local._publish("cpu", {"usage": 1}, 0.01)
+        remote.start(wait=5.0)
+        wait_for(lambda: remote.get("cpu") is not None)
+        first.stop()
+        second = SnapshotServer(local, path)
+        second.start()
+        try:
+            wait_for(lambda: remote.get("cpu").version == 2)
+            assert remote._instance == second.instance
+        finally:
+            second.stop()
+    finally:
+        remote.stop()
+
+def test_demand_is_forwarded_in_the_background(local, server, remote):
+    remote.start(wait=5.0)
+    remote.note_demand("cpu")
+    remote.note_demand("cpu")  # Within DEMAND_FORWARD_INTERVAL, not forwarded again
+    remote.note_demand("gpu")
+    wait_for(lambda: sorted(local.demanded) == ["cpu", "gpu"])
+    time.sleep(0.1)
+    assert sorted(local.demanded) == ["cpu", "gpu"]
+
+def test_note_demand_does_not_wait_for_a_stuck_collector(tmp_path, monkeypatch):
+    path = str(tmp_path / "stuck.sock")
+    stuck = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stuck.bind(path)
+    stuck.listen(8)  # Never accepts: requests connect, then wait for a reply until they time out
+    requests = []
+    monkeypatch.setattr(snapshot_service, "request_collector",
+                        lambda *args, **kwargs: requests.append(kwargs["sources"]) or request_collector(*args, **kwargs))
+    remote = RemoteSampler(path)
+    remote._apply({"type": "hello", "instance": "a", "sources": {"gpu": 2.0, "cpu": 10.0}})
+    threading.Thread(target=remote._forward_demand, daemon=True).start()
+    try:
+        started = time.monotonic()
+        remote.note_demand("gpu")
+        remote.note_demand("cpu")
+        assert time.monotonic() - started < 0.1
+        wait_for(lambda: sorted(sum(requests, [])) == ["cpu", "gpu"])
+    finally:
+        remote.stop()
+        stuck.close()
+
+def test_unknown_demand_and_ops(local, server):
+    assert request_collector(server.socket_path, "demand", sources=["cpu", "nope"]) == {"ok": True}
+    assert local.demanded == ["cpu"]
+    assert "error" in request_collector(server.socket_path, "bogus")
+    perf = request_collector(server.socket_path, "perf")
+    assert sorted(perf["sources"]) == ["cpu", "gpu"] and "platform" in perf
+
+def test_start_replaces_only_a_stale_socket(local, tmp_path):
+    path = str(tmp_path / "collector.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()  # The file stays, nobody listens
+    server = SnapshotServer(local, path)
+    server.start()
+    try:
+        assert request_collector(path, "demand", sources=[]) == {"ok": True}
+        with pytest.raises(OSError, match="already serving"):
+            SnapshotServer(local, path).start()
+        assert request_collector(path, "demand", sources=[]) == {"ok": True}
+    finally:
+        server.stop()
+
+def test_start_does_not_remove_other_files(local, tmp_path):
+    path = tmp_path / "collector.sock"
+    path.write_text("not a socket")
+    with pytest.raises(OSError, match="not a socket"):
+        SnapshotServer(local, str(path)).start()
+    assert path.read_text() == "not a socket"
+
+def test_slow_subscriber_is_disconnected(local, server, monkeypatch):
+    monkeypatch.setattr(snapshot_service, "CLIENT_QUEUE_SIZE", 2)
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(server.socket_path)
+    connection.sendall(b'{"op":"subscribe"}\n')
+    try:
+        wait_for(lambda: server._clients)
+        # Blocks the client's writer on a full socket buffer, since nothing is read
+        payload = "x" * 65536
+        for usage in range(200):
+            local._publish("cpu", {"usage": usage, "padding": payload}, 0.01)
+            if not server._clients:
+                break
+        assert not server._clients
+    finally:
+        connection.close()
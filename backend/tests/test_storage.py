@@ -0,0 +1,183 @@
+import json
+import os
+import time
+from array import array
+
+import pytest
+
+from utils.sampler import Snapshot
+from utils.storage import RECORD_SIZE, ROLLUP_SECONDS, SegmentStore, downsample, storage_from_env
+
+class RecordingHistory:
+    """Stands in for HistoryStore in load_into: remembers every recorded point."""
+
+    def __init__(self):
+        self.points = []
+
+    def record(self, metric, device, timestamp, value):
+        self.points.append((metric, device, timestamp, value))
+
+def minute(now=None):
+    """Start of the current rollup bucket, far enough back that a whole test fits before now."""
+    now = now if now is not None else time.time()
+    return (now // ROLLUP_SECONDS - 30) * ROLLUP_SECONDS
+
+def segment_file(store, segment_start, series_id=0, suffix=""):
+    return os.path.join(store.directory, f"{segment_start:012d}", f"{series_id}{suffix}.f8")
+
+def test_records_are_pairs_of_native_doubles(tmp_path):
+    store = SegmentStore(str(tmp_path), segment_seconds=3600)
+    store.append("gpu.utilization_gpu", "GPU0", 7200.5, 42.0)
+    store.append("gpu.utilization_gpu", "GPU0", 7201.5, 43.0)
+    assert store.flush() == 2
+    with open(segment_file(store, 7200), "rb") as records:
+        data = records.read()
+    assert len(data) == 2 * RECORD_SIZE
+    assert array("d", data).tolist() == [7200.5, 42.0, 7201.5, 43.0]
+    with open(tmp_path / "series.json") as series:
+        assert json.load(series) == {"series": {"0": ["gpu.utilization_gpu", "GPU0"]}}
+
+def test_segments_rotate_and_reads_span_them(tmp_path):
+    store = SegmentStore(str(tmp_path), segment_seconds=100)
+    for t in range(50, 250, 10):
+        store.append("cpu.utilization", "all", float(t), float(t))
+    store.flush()
+    assert store.segments() == [0, 100, 200]
+    resolution, timestamps, values = store.read("cpu.utilization", "all")
+    assert resolution == 0 and timestamps.tolist() == [float(t) for t in range(50, 250, 10)]
+    _, timestamps, _ = store.read("cpu.utilization", "all", start=90, end=210)
+    assert timestamps.tolist() == [float(t) for t in range(90, 211, 10)]
+    with pytest.raises(KeyError):
+        store.read("cpu.utilization", "other")
+
+def test_torn_tail_record_is_ignored_then_dropped(tmp_path):
+    store = SegmentStore(str(tmp_path), segment_seconds=3600)
+    store.append("m", "d", 10.0, 1.0)
+    store.flush()
+    with open(segment_file(store, 0), "ab") as records:
+        records.write(array("d", [11.0]).tobytes())  # Half a record, as after a crash mid-write
+    assert store.read("m", "d")[1].tolist() == [10.0]
+
+    restarted = SegmentStore(str(tmp_path), segment_seconds=3600)
+    restarted.append("m", "d", 12.0, 3.0)
+    restarted.flush()
+    assert os.path.getsize(segment_file(store, 0)) == 2 * RECORD_SIZE
+    assert restarted.read("m", "d")[2].tolist() == [1.0, 3.0]
+
+def test_retention_deletes_expired_segments(tmp_path):
+    store = SegmentStore(str(tmp_path), segment_seconds=100, retention_seconds=250)
+    for t in range(0, 500, 50):
+        store.append("m", "d", float(t), 1.0)
+    store.flush()
+    assert store.enforce_retention(now=480) == [0, 100]  # Ended before 480 - 250
+    assert store.segments() == [200, 300, 400]
+    assert store.read("m", "d")[1][0] == 200.0
+
+def test_retention_by_size_keeps_the_current_segment(tmp_path):
+    store = SegmentStore(str(tmp_path), segment_seconds=100, max_bytes=3 * RECORD_SIZE)
+    for t in range(0, 500, 50):
+        store.append("m", "d", float(t), 1.0)
+    store.flush()
+    # Each segment holds 2 raw records (32 bytes) and, from the second on, a rollup
+    assert store.enforce_retention(now=450) == [0, 100, 200, 300]
+    assert store.enforce_retention(now=450) == []
+    assert store.segments() == [400]
+
+def test_rollups_average_complete_buckets(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    start = minute()
+    for offset in range(0, ROLLUP_SECONDS, 10):
+        store.append("m", "d", start + offset, float(offset))
+    store.append("m", "d", start + ROLLUP_SECONDS, 100.0)  # Completes the first bucket
+    store.flush()
+    resolution, timestamps, values = store.read("m", "d", resolution=ROLLUP_SECONDS)
+    assert resolution == ROLLUP_SECONDS
+    assert timestamps.tolist() == [start] and values.tolist() == [25.0]
+    # Coarser resolutions are computed from the rollups
+    assert store.read("m", "d", resolution=2 * ROLLUP_SECONDS)[2].tolist() == [25.0]
+    assert store.read("m", "d", resolution=20)[2].tolist() == [5.0, 25.0, 45.0, 100.0]
+
+def test_restart_in_the_middle_of_a_bucket_does_not_duplicate_it(tmp_path):
+    start = minute()
+    first = SegmentStore(str(tmp_path))
+    for offset in range(0, 30, 10):
+        first.append("m", "d", start + offset, 1.0)
+    first.stop()  # Writes the partial rollup of the bucket
+    assert first.read("m", "d", resolution=ROLLUP_SECONDS)[2].tolist() == [1.0]
+
+    second = SegmentStore(str(tmp_path))
+    for offset in range(30, ROLLUP_SECONDS, 10):
+        second.append("m", "d", start + offset, 4.0)
+    second.append("m", "d", start + ROLLUP_SECONDS, 7.0)
+    second.stop()
+    _, timestamps, values = second.read("m", "d", resolution=ROLLUP_SECONDS)
+    assert timestamps.tolist() == [start, start + ROLLUP_SECONDS]
+    assert values.tolist() == [2.5, 7.0]  # The whole first bucket, across both processes
+
+    history = RecordingHistory()
+    second.load_into(history, seconds=3600, raw_seconds=0)
+    assert [point[2:] for point in history.points] == [(start, 2.5), (start + ROLLUP_SECONDS, 7.0)]
+
+def test_restart_in_a_later_bucket_keeps_the_partial_rollup(tmp_path):
+    start = minute()
+    first = SegmentStore(str(tmp_path))
+    first.append("m", "d", start, 2.0)
+    first.stop()
+    second = SegmentStore(str(tmp_path))
+    second.append("m", "d", start + 2 * ROLLUP_SECONDS, 5.0)
+    second.stop()
+    _, timestamps, values = second.read("m", "d", resolution=ROLLUP_SECONDS)
+    assert timestamps.tolist() == [start, start + 2 * ROLLUP_SECONDS] and values.tolist() == [2.0, 5.0]
+
+def test_load_into_uses_rollups_then_raw_points_without_overlap(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    now = time.time()
+    start = minute(now) - 60 * ROLLUP_SECONDS
+    t = start
+    while t < now - 1:
+        store.append("cpu.utilization", "all", t, 1.0)
+        t += 5
+    store.stop()
+
+    history = RecordingHistory()
+    loaded = store.load_into(history, seconds=3600, raw_seconds=600)
+    timestamps = [point[2] for point in history.points]
+    assert loaded == len(timestamps)
+    assert timestamps == sorted(set(timestamps))  # In order, nothing twice
+    # The raw points start at a bucket boundary, right after the last rollup
+    raw_start = next(timestamp for timestamp in timestamps if timestamp % ROLLUP_SECONDS) - 5
+    assert raw_start % ROLLUP_SECONDS == 0 and now - 600 - ROLLUP_SECONDS <= raw_start <= now - 600
+    rollups = [timestamp for timestamp in timestamps if timestamp < raw_start]
+    assert rollups == [raw_start - ROLLUP_SECONDS * count for count in range(len(rollups), 0, -1)]
+    assert len(rollups) >= 49
+    assert timestamps[len(rollups):] == [raw_start + 5 * index for index in range(len(timestamps) - len(rollups))]
+    assert timestamps[-1] == t - 5
+
+def test_another_process_sees_new_series(tmp_path):
+    writer = SegmentStore(str(tmp_path))
+    reader = SegmentStore(str(tmp_path))
+    writer.record_snapshot(Snapshot("cpu", {"utilization_percent": 12.5}, 100.0, 0.01, 1))
+    writer.flush()
+    assert ("cpu.utilization", "all") in reader.keys()
+    assert reader.read("cpu.utilization", "all")[2].tolist() == [12.5]
+    assert reader.catalog()["cpu.utilization"] == ["all"]
+
+def test_status_reports_buffered_points(tmp_path):
+    store = SegmentStore(str(tmp_path), segment_seconds=100)
+    store.append("m", "d", 10.0, 1.0)
+    assert store.status()["buffered_values"] == 1
+    store.flush()
+    status = store.status()
+    assert status["buffered_values"] == 0 and status["segments"] == 1 and status["bytes"] == RECORD_SIZE
+
+def test_downsample_stamps_buckets_with_their_start():
+    timestamps, values = downsample(array("d", [0, 5, 10, 25]), array("d", [1, 3, 10, 20]), 10)
+    assert timestamps.tolist() == [0, 10, 20] and values.tolist() == [2, 10, 20]
+
+def test_storage_is_disabled_without_a_directory(monkeypatch, tmp_path):
+    monkeypatch.delenv("DASHBOARD_STORAGE_DIR", raising=False)
+    assert storage_from_env() is None
+    monkeypatch.setenv("DASHBOARD_STORAGE_DIR", str(tmp_path))
+    monkeypatch.setenv("DASHBOARD_STORAGE_MAX_MB", "0.5")
+    store = storage_from_env()
+    assert store.directory == str(tmp_path) and store.max_bytes == 512 * 1024
@@ -0,0 +1,151 @@
+import json
+
+from utils import stream
+from utils.sampler import Snapshot
+from utils.stream import Broadcaster, compute_delta, flatten
+
+class FakeSampler:
+    """Just enough of Sampler for the Broadcaster: the latest snapshot per source."""
+
+    def __init__(self):
+        self.latest = {}
+        self.demanded = []
+
+    def sources(self):
+        return list(self.latest)
+
+    def get(self, name):
+        return self.latest.get(name)
+
+    def note_demand(self, name):
+        self.demanded.append(name)
+
+    def publish(self, broadcaster, source, data):
+        previous = self.latest.get(source)
+        snapshot = Snapshot(source, data, 1000.0, 0.01, previous.version + 1 if previous else 1)
+        self.latest[source] = snapshot
+        broadcaster.on_snapshot(snapshot)
+        return snapshot
+
+def apply_delta(flat, delta):
+    """What the browser does with a delta event."""
+    result = {path: value for path, value in flat.items() if path not in delta["unset"]}
+    result.update(delta["set"])
+    return result
+
+def parse_event(text):
+    lines = text.strip().split("\n")
+    assert lines[0].startswith("event: ") and lines[1].startswith("data: ")
+    return lines[0][len("event: "):], json.loads(lines[1][len("data: "):])
+
+def test_flatten_records_list_lengths_and_keeps_empty_containers():
+    data = {"gpus": [{"name": "A", "util": 10}], "mounts": [], "extra": {}, "count": 1}
+    assert flatten(data) == {
+        "gpus.#": 1,
+        "gpus.0.name": "A",
+        "gpus.0.util": 10,
+        "mounts": [],
+        "extra": {},
+        "count": 1,
+    }
+    assert flatten([1, 2]) == {"#": 2, "0": 1, "1": 2}
+    assert flatten(5) == {"": 5}
+
+def test_delta_sets_changed_values_and_unsets_removed_keys():
+    old = flatten({"a": 1, "b": {"c": 2, "d": 3}})
+    new = flatten({"a": 1, "b": {"c": 4}, "e": 5})
+    delta = compute_delta(old, new)
+    assert delta == {"set": {"b.c": 4, "e": 5}, "unset": ["b.d"]}
+    assert apply_delta(old, delta) == new
+
+def test_delta_truncates_a_shrinking_list():
+    old = flatten({"gpus": [{"util": 1}, {"util": 2}, {"util": 3}]})
+    new = flatten({"gpus": [{"util": 1}]})
+    delta = compute_delta(old, new)
+    assert delta["set"] == {"gpus.#": 1}
+    assert sorted(delta["unset"]) == ["gpus.1.util", "gpus.2.util"]
+    assert apply_delta(old, delta) == new
+
+def test_delta_handles_a_list_emptying_and_refilling():
+    full = flatten({"mounts": [{"path": "/"}]})
+    empty = flatten({"mounts": []})
+    delta = compute_delta(full, empty)
+    assert delta["set"] == {"mounts": []}
+    assert sorted(delta["unset"]) == ["mounts.#", "mounts.0.path"]
+    assert apply_delta(full, delta) == empty
+    assert apply_delta(empty, compute_delta(empty, full)) == full
+
+def test_unchanged_snapshot_produces_no_delta():
+    flat = flatten({"a": [1, 2], "b": {"c": None}})
+    assert compute_delta(flat, dict(flat)) == {"set": {}, "unset": []}
+
+def test_subscriber_gets_a_snapshot_then_deltas():
+    sampler = FakeSampler()
+    broadcaster = Broadcaster(sampler)
+    sampler.publish(broadcaster, "cpu", {"usage": [10, 20]})
+    subscription = broadcaster.subscribe()
+    events = broadcaster.events(subscription)
+    assert next(events) == "retry: 3000\n\n"
+    name, payload = parse_event(next(events))
+    assert name == "snapshot" and payload["data"] == {"usage": [10, 20]}
+
+    sampler.publish(broadcaster, "cpu", {"usage": [15]})
+    sampler.publish(broadcaster, "cpu", {"usage": [15]})  # Unchanged, no event
+    sampler.publish(broadcaster, "cpu", {"usage": [15, 30]})
+    name, first = parse_event(next(events))
+    assert name == "delta" and first["version"] == 2
+    assert first["set"] == {"usage.#": 1, "usage.0": 15} and first["unset"] == ["usage.1"]
+    name, second = parse_event(next(events))
+    assert second["version"] == 4 and second["set"] == {"usage.#": 2, "usage.1": 30}
+    assert subscription.queue.empty()
+    events.close()
+    assert broadcaster.subscriber_count() == 0
+
+def test_subscriber_only_receives_its_sources():
+    sampler = FakeSampler()
+    broadcaster = Broadcaster(sampler)
+    sampler.publish(broadcaster, "cpu", {"usage": 1})
+    sampler.publish(broadcaster, "gpu", {"util": 1})
+    subscription = broadcaster.subscribe(["gpu"])
+    events = broadcaster.events(subscription)
+    next(events)
+    assert [parse_event(next(events))[1]["source"]] == ["gpu"]
+    sampler.publish(broadcaster, "cpu", {"usage": 2})
+    sampler.publish(broadcaster, "gpu", {"util": 2})
+    assert subscription.queue.qsize() == 1
+    assert parse_event(next(events))[1]["source"] == "gpu"
+    events.close()
+
+def test_overflowing_subscriber_is_resynchronized_with_full_snapshots():
+    sampler = FakeSampler()
+    broadcaster = Broadcaster(sampler)
+    sampler.publish(broadcaster, "cpu", {"usage": 0})
+    subscription = broadcaster.subscribe()
+    events = broadcaster.events(subscription)
+    next(events)
+    next(events)  # Initial snapshot
+
+    for usage in range(1, stream.SUBSCRIBER_QUEUE_SIZE + 10):
+        sampler.publish(broadcaster, "cpu", {"usage": usage})
+    assert subscription.needs_resync
+
+    name, payload = parse_event(next(events))
+    assert name == "snapshot"
+    assert payload["data"] == {"usage": stream.SUBSCRIBER_QUEUE_SIZE + 9}
+    assert not subscription.needs_resync and subscription.queue.empty()
+
+    # Back to deltas against the snapshot it was resynchronized with
+    sampler.publish(broadcaster, "cpu", {"usage": -1})
+    name, payload = parse_event(next(events))
+    assert name == "delta" and payload["set"] == {"usage": -1}
+    events.close()
+
+def test_close_ends_open_streams():
+    sampler = FakeSampler()
+    broadcaster = Broadcaster(sampler)
+    subscription = broadcaster.subscribe()
+    events = broadcaster.events(subscription)
+    next(events)
+    broadcaster.close()
+    assert list(events) == []
+    assert broadcaster.subscriber_count() == 0
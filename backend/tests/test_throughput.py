@@ -0,0 +1,113 @@
+from array import array
+
+import pytest
+
+from benchmarks import fixtures
+from tests.fakes import FakeClock
+from utils.throughput import CounterRates, DiskStatsSampler, NetDevSampler
+
+def test_counter_rates_swaps_buffers():
+    clock = FakeClock()
+    rates = CounterRates(2, clock)
+    elapsed, previous, current = rates.sample([("a", array("Q", [1, 2])), ("b", array("Q", [3, 4]))])
+    assert elapsed is None
+    assert current.tolist() == [1, 2, 3, 4]
+    clock.advance(2)
+    elapsed, previous, current = rates.sample([("a", array("Q", [11, 12])), ("b", array("Q", [13, 14]))])
+    assert elapsed == 2
+    assert previous.tolist() == [1, 2, 3, 4]
+    assert current.tolist() == [11, 12, 13, 14]
+    assert rates.names == ["a", "b"]
+
+def test_counter_rates_restarts_when_the_devices_change():
+    clock = FakeClock()
+    rates = CounterRates(1, clock)
+    rates.sample([("a", array("Q", [1]))])
+    clock.advance(1)
+    elapsed, _, current = rates.sample([("a", array("Q", [2])), ("b", array("Q", [5]))])
+    assert elapsed is None  # No rates across a change of the device set
+    assert rates.names == ["a", "b"] and current.tolist() == [2, 5]
+
+def diskstats_line(name, reads, sectors_read, read_ms, writes, sectors_written, write_ms, io_ms):
+    return f"   8 0 {name} {reads} 0 {sectors_read} {read_ms} {writes} 0 {sectors_written} {write_ms} 0 {io_ms} 0 0 0 0 0\n"
+
+def test_disk_stats_sampler(tmp_path):
+    path = tmp_path / "diskstats"
+    clock = FakeClock()
+    sampler = DiskStatsSampler(str(path), clock)
+    path.write_text(diskstats_line("sda", 100, 1000, 50, 10, 2000, 40, 100) +
+                    diskstats_line("sda1", 100, 1000, 50, 10, 2000, 40, 100) +
+                    diskstats_line("loop0", 1, 1, 1, 1, 1, 1, 1))
+    first = sampler.sample()
+    assert [device["name"] for device in first["devices"]] == ["sda"]  # No partitions, loop or ram devices
+    assert first["devices"][0]["read_bytes_per_second"] is None
+    assert first["devices"][0]["read_bytes_total"] == 1000 * 512
+
+    clock.advance(2)
+    path.write_text(diskstats_line("sda", 300, 5000, 250, 10, 2000, 40, 1100))
+    device = sampler.sample()["devices"][0]
+    assert device["read_bytes_per_second"] == 4000 * 512 / 2
+    assert device["write_bytes_per_second"] == 0
+    assert device["read_iops"] == 100
+    assert device["read_latency_ms"] == 1.0     # 200 ms over 200 reads
+    assert device["write_latency_ms"] is None   # No writes completed
+    assert device["utilization_percent"] == 50.0
+
+def test_disk_stats_sampler_fixture(tmp_path):
+    path = tmp_path / "diskstats"
+    clock = FakeClock()
+    sampler = DiskStatsSampler(str(path), clock)
+    path.write_text(fixtures.diskstats(disks=4))
+    sampler.sample()
+    clock.advance(1)
+    path.write_text(fixtures.diskstats(disks=4, offset=1))
+    devices = sampler.sample()["devices"]
+    assert [device["name"] for device in devices] == [f"nvme{i}n1" for i in range(4)]
+    assert devices[1]["read_iops"] == 2000
+
+def net_dev(lines):
+    header = "Inter-|   Receive |  Transmit\n face |bytes packets errs drop fifo frame compressed multicast|bytes packets\n"
+    return header + "".join(f"{name}: " + " ".join(map(str, counters)) + "\n" for name, counters in lines)
+
+def test_net_dev_sampler(tmp_path):
+    path = tmp_path / "net_dev"
+    sys_class_net = tmp_path / "class"
+    (sys_class_net / "eth0").mkdir(parents=True)
+    (sys_class_net / "eth0" / "speed").write_text("1000\n")
+    (sys_class_net / "veth1").mkdir()
+    (sys_class_net / "veth1" / "speed").write_text("-1\n")
+    clock = FakeClock()
+    sampler = NetDevSampler(str(path), str(sys_class_net), clock)
+    counters = lambda rx, tx: [rx, 10, 1, 2, 0, 0, 0, 0, tx, 20, 3, 4, 0, 0, 0, 0]
+    path.write_text(net_dev([("lo", counters(5, 5)), ("eth0", counters(0, 0)), ("veth1", counters(0, 0))]))
+    first = sampler.sample()
+    assert [interface["name"] for interface in first["interfaces"]] == ["eth0", "veth1"]
+    assert first["interfaces"][0]["rx_bytes_per_second"] is None
+
+    clock.advance(4)
+    path.write_text(net_dev([("lo", counters(5, 5)), ("eth0", counters(50_000_000, 10_000_000)), ("veth1", counters(4, 0))]))
+    eth0, veth1 = sampler.sample()["interfaces"]
+    assert eth0["rx_bytes_per_second"] == 12_500_000
+    assert eth0["tx_bytes_per_second"] == 2_500_000
+    assert eth0["link_speed_bytes_per_second"] == 125_000_000
+    assert eth0["utilization_percent"] == 10.0
+    assert eth0["rx_errors"] == 1 and eth0["tx_dropped"] == 4
+    assert veth1["link_speed_bytes_per_second"] is None and veth1["utilization_percent"] is None
+
+def test_net_dev_sampler_counter_reset(tmp_path):
+    path = tmp_path / "net_dev"
+    clock = FakeClock()
+    sampler = NetDevSampler(str(path), str(tmp_path), clock)
+    counters = lambda rx: [rx] + [0] * 15
+    path.write_text(net_dev([("eth0", counters(1000))]))
+    sampler.sample()
+    clock.advance(1)
+    path.write_text(net_dev([("eth0", counters(10))]))  # Driver reload: counters went backwards
+    assert sampler.sample()["interfaces"][0]["rx_bytes_per_second"] is None
+
+@pytest.mark.parametrize("include_loopback", [True, False])
+def test_net_dev_sampler_loopback(tmp_path, include_loopback):
+    path = tmp_path / "net_dev"
+    path.write_text(net_dev([("lo", [0] * 16)]))
+    sampler = NetDevSampler(str(path), str(tmp_path), FakeClock(), include_loopback=include_loopback)
+    assert len(sampler.sample()["interfaces"]) == (1 if include_loopback else 0)
@@ -0,0 +1,378 @@
+import fnmatch
+import json
+import operator
+import os
+import queue
+import threading
+import time
+import urllib.request
+from collections import deque
+
+from utils.history import EXTRACTORS
+from utils.instrumentation import perf
+
+# Firing/resolved events kept for /api/alerts
+RECENT_EVENTS = 100
+# Webhook deliveries waiting to be sent before the oldest are dropped
+WEBHOOK_QUEUE_SIZE = 1000
+
+OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+# Used when DASHBOARD_ALERT_RULES does not point at a rules file
+DEFAULT_RULES = [
+    {"name": "gpu_temperature_high", "metric": "gpu.temperature_gpu", "op": ">", "threshold": 85,
+     "for_seconds": 60, "severity": "critical"},
+    {"name": "gpu_memory_full", "metric": "gpu.memory_used_percent", "op": ">", "threshold": 95,
+     "resolve_threshold": 90, "severity": "warning"},
+    {"name": "container_memory_near_limit", "metric": "lxc.memory_used_percent", "op": ">", "threshold": 90,
+     "for_seconds": 30, "resolve_threshold": 85, "severity": "warning"},
+]
+
+def _numeric(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _percent(used, total):
+    return used / total * 100 if _numeric(used) and _numeric(total) and total > 0 else None
+
+def extract_gpu_alert_metrics(data):
+    """The history metrics of a GPU snapshot, plus gpu.memory_used_percent."""
+    yield from EXTRACTORS["gpu"](data)
+    if isinstance(data, list):
+        for gpu in data:
+            percent = _percent(gpu.get("memory_used_mb"), gpu.get("memory_total_mb"))
+            if percent is not None:
+                yield "gpu.memory_used_percent", gpu.get("pci_bus_id"), percent
+
+def extract_lxc_alert_metrics(data):
+    """Per-container memory (MB and % of the limit), CPU time and, from cgroups, CPU %, I/O rates and PIDs of an LXC snapshot."""
+    if not isinstance(data, list):
+        return
+    for container in data:
+        name = container.get("name")
+        for field in ("memory_usage_mb", "cpu_usage_seconds", "cpu_percent",
+                      "io_read_bytes_per_second", "io_write_bytes_per_second", "pids"):
+            if _numeric(container.get(field)):
+                yield f"lxc.{field}", name, container[field]
+        percent = _percent(container.get("memory_usage_mb"), container.get("memory_total_mb"))
+        if percent is not None:
+            yield "lxc.memory_used_percent", name, percent
+
+def extract_ram_disk_alert_metrics(data):
+    """The history metrics of a RAM/disk snapshot, plus ram.used_percent."""
+    yield from EXTRACTORS["ram_disk"](data)
+    if isinstance(data, dict):
+        ram = data.get("ram") or {}
+        percent = _percent(ram.get("used_bytes"), ram.get("total_bytes"))
+        if percent is not None:
+            yield "ram.used_percent", "system", percent
+
+# Snapshot sources rules can refer to, and how their metrics are extracted
+ALERT_EXTRACTORS = {
+    "gpu": extract_gpu_alert_metrics,
+    "lxc": extract_lxc_alert_metrics,
+    "cpu": EXTRACTORS["cpu"],
+    "ram_disk": extract_ram_disk_alert_metrics,
+    "disk_io": EXTRACTORS["disk_io"],
+    "network": EXTRACTORS["network"],
+}
+
+# Metric name prefix -> snapshot source
+METRIC_SOURCES = {"gpu": "gpu", "lxc": "lxc", "cpu": "cpu", "ram": "ram_disk", "disk": "ram_disk",
+                  "diskio": "disk_io", "net": "network"}
+
+class Rule:
+    """
+    One declarative alert rule, built from a dictionary such as
+    {"name": "gpu_temperature_high", "metric": "gpu.temperature_gpu", "op": ">", "threshold": 85, "for_seconds": 60}
+
+      type               "threshold" (default) compares the metric's value; "rate" compares its
+                         change per second between consecutive samples (e.g. lxc.cpu_usage_seconds)
+      for_seconds        how long the condition must hold before the alert fires (default 0)
+      resolve_threshold  a firing alert resolves only once this is no longer crossed (hysteresis;
+                         defaults to threshold)
+      device             optional glob restricting the devices, e.g. "00000000:0[1-4]:00.0"
+      severity           free text passed along with the events (default "warning")
+    """
+
+    def __init__(self, spec):
+        try:
+            self.name = spec["name"]
+            self.metric = spec["metric"]
+            self.threshold = float(spec["threshold"])
+        except KeyError as e:
+            raise ValueError(f"Alert rule {spec.get('name', spec)} is missing {e}")
+        self.type = spec.get("type", "threshold")
+        if self.type not in ("threshold", "rate"):
+            raise ValueError(f"Alert rule {self.name}: unknown type {self.type!r}")
+        self.op = spec.get("op", ">")
+        if self.op not in OPERATORS:
+            raise ValueError(f"Alert rule {self.name}: unknown op {self.op!r}, expected one of {', '.join(OPERATORS)}")
+        self.source = METRIC_SOURCES.get(self.metric.split(".")[0])
+        if self.source is None:
+            raise ValueError(f"Alert rule {self.name}: unknown metric {self.metric!r}")
+        self.for_seconds = float(spec.get("for_seconds", 0))
+        self.resolve_threshold = float(spec.get("resolve_threshold", self.threshold))
+        self.device = spec.get("device")
+        self.severity = spec.get("severity", "warning")
+        self._compare = OPERATORS[self.op]
+        self.spec = dict(spec)
+
+    def matches_device(self, device):
+        return self.device is None or fnmatch.fnmatchcase(str(device), self.device)
+
+    def breached(self, value, firing):
+        """Whether `value` violates the rule; a firing alert is held until resolve_threshold is cleared."""
+        return self._compare(value, self.resolve_threshold if firing else self.threshold)
+
+class _AlertState:
+    """Everything kept per (rule, device): constant size, no sample history."""
+    __slots__ = ("pending_since", "firing_since", "value", "previous_timestamp", "previous_value")
+
+    def __init__(self):
+        self.pending_since = None   # Sample time the condition started to hold
+        self.firing_since = None
+        self.value = None           # Last evaluated value (the rate, for rate rules)
+        self.previous_timestamp = None
+        self.previous_value = None
+
+class AlertEngine:
+    """
+    Evaluates alert rules incrementally on every new snapshot (registered as a Sampler
+    listener). Each (rule, device) pair keeps a constant-size state, so a sample costs one
+    comparison per pair no matter how long a condition has held. Pairs a sample of their
+    source no longer reports are resolved (if firing) and dropped. Durations are measured
+    with the snapshots' own timestamps, which makes the engine deterministic for synthetic
+    sample streams fed to evaluate().
+
+    Firing and resolved events are handed to every sink (see LogSink and WebhookSink);
+    status() summarizes the rules, the firing alerts and the most recent events.
+    """
+
+    def __init__(self, rules, sinks=None):
+        self.rules = [rule if isinstance(rule, Rule) else Rule(rule) for rule in rules]
+        self.sinks = list(sinks or [])
+        self._rules_by_source = {}
+        for index, rule in enumerate(self.rules):
+            self._rules_by_source.setdefault(rule.source, {}).setdefault(rule.metric, []).append((index, rule))
+        self._states = {}   # (rule index, device) -> _AlertState
+        self._keys_by_source = {source: set() for source in self._rules_by_source}  # Keys of _states per source
+        self._recent = deque(maxlen=RECENT_EVENTS)
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def start(self):
+        """Starts the sinks that deliver in the background (Sampler service interface)."""
+        for sink in self.sinks:
+            if hasattr(sink, "start"):
+                sink.start()
+
+    def stop(self):
+        for sink in self.sinks:
+            if hasattr(sink, "stop"):
+                sink.stop()
+
+    def _event(self, rule, device, state_name, state, timestamp):
+        return {
+            "rule": rule.name,
+            "metric": rule.metric,
+            "device": device,
+            "state": state_name,
+            "severity": rule.severity,
+            "value": state.value,
+            "threshold": rule.threshold if state_name == "firing" else rule.resolve_threshold,
+            "since": state.firing_since,
+            "timestamp": timestamp,
+        }
+
+    def _evaluate_pair(self, index, rule, device, timestamp, value, events, seen):
+        key = (index, device)
+        seen.add(key)
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = _AlertState()
+            self._keys_by_source[rule.source].add(key)
+        if rule.type == "rate":
+            previous_timestamp, previous_value = state.previous_timestamp, state.previous_value
+            state.previous_timestamp, state.previous_value = timestamp, value
+            if previous_timestamp is None or timestamp <= previous_timestamp:
+                return
+            value = (value - previous_value) / (timestamp - previous_timestamp)
+        state.value = value
+
+        if rule.breached(value, state.firing_since is not None):
+            if state.pending_since is None:
+                state.pending_since = timestamp
+            if state.firing_since is None and timestamp - state.pending_since >= rule.for_seconds:
+                state.firing_since = timestamp
+                events.append(self._event(rule, device, "firing", state, timestamp))
+        else:
+            state.pending_since = None
+            if state.firing_since is not None:
+                events.append(self._event(rule, device, "resolved", state, timestamp))
+                state.firing_since = None
+
+    def _drop_missing(self, source, timestamp, seen, events):
+        """
+        Forgets the pairs of `source` that the sample did not report (a stopped container, a GPU
+        that fell off the bus, an error payload), resolving those that were firing, so neither
+        firing() nor the states keep devices that are gone.
+        """
+        keys = self._keys_by_source[source]
+        if len(seen) == len(keys):
+            return  # `seen` is a subset of `keys`: every known pair was reported
+        for key in sorted(keys - seen, key=lambda key: (key[0], str(key[1]))):
+            keys.discard(key)
+            state = self._states.pop(key)
+            if state.firing_since is not None:
+                events.append(self._event(self.rules[key[0]], key[1], "resolved", state, timestamp))
+
+    def evaluate(self, source, timestamp, data):
+        """Evaluates the rules of `source` against one sample; returns (and delivers) the resulting events."""
+        rules_by_metric = self._rules_by_source.get(source)
+        extractor = ALERT_EXTRACTORS.get(source)
+        if not rules_by_metric or extractor is None:
+            return []
+        events = []
+        seen = set()
+        with self._lock:
+            for metric, device, value in extractor(data):
+                for index, rule in rules_by_metric.get(metric, ()):
+                    if rule.matches_device(device):
+                        self._evaluate_pair(index, rule, device, timestamp, value, events, seen)
+            self._drop_missing(source, timestamp, seen, events)
+            self._recent.extend(events)
+        for event in events:
+            perf.count("alert_events", event["state"])
+        self._deliver(events)
+        return events
+
+    def on_snapshot(self, snapshot):
+        """Sampler listener."""
+        if snapshot.source in self._rules_by_source:
+            started = time.perf_counter()
+            self.evaluate(snapshot.source, snapshot.timestamp, snapshot.data)
+            perf.observe("alerts", snapshot.source, time.perf_counter() - started)
+
+    def _deliver(self, events):
+        if not events:
+            return
+        for sink in self.sinks:
+            try:
+                sink.deliver(events)
+            except Exception as e:
+                print(f"Alert sink {sink} failed: {e}")
+
+    def firing(self):
+        """The currently firing alerts, most recent first."""
+        with self._lock:
+            active = [self._event(self.rules[index], device, "firing", state, state.firing_since)
+                      for (index, device), state in self._states.items() if state.firing_since is not None]
+        return sorted(active, key=lambda alert: alert["since"], reverse=True)
+
+    def status(self):
+        """Rules, firing alerts and recent events; published as the "alerts" source."""
+        with self._lock:
+            recent = list(self._recent)
+        return {"rules": [rule.spec for rule in self.rules], "firing": self.firing(), "recent_events": recent[::-1]}
+
+class LogSink:
+    """Writes every event as one JSON line to `path`, or prints it when no path is given."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def deliver(self, events):
+        lines = [json.dumps(event, separators=(",", ":")) for event in events]
+        if self.path is None:
+            for event, line in zip(events, lines):
+                print(f"Alert {event['state']}: {line}")
+            return
+        with self._lock, open(self.path, "a") as log:
+            log.write("\n".join(lines) + "\n")
+
+class WebhookSink:
+    """
+    POSTs events as JSON ({"events": [...]}) to `url`. Delivery happens on a background
+    thread so a slow or unreachable endpoint never holds up sampling; events that queue up
+    in the meantime are sent together, and the oldest are dropped beyond WEBHOOK_QUEUE_SIZE.
+    Started and stopped as a Sampler service.
+    """
+
+    def __init__(self, url, timeout=5.0):
+        self.url = url
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=WEBHOOK_QUEUE_SIZE)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def deliver(self, events):
+        for event in events:
+            while True:
+                try:
+                    self._queue.put_nowait(event)
+                    break
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        perf.count("alert_webhook_dropped", self.url)
+                    except queue.Empty:
+                        pass
+
+    def _post(self, events):
+        body = json.dumps({"events": events}).encode()
+        request = urllib.request.Request(self.url, data=body, method="POST",
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                events = [self._queue.get(timeout=1.0)]
+            except queue.Empty:
+                continue
+            while True:
+                try:
+                    events.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._post(events)
+            except Exception as e:
+                perf.count("alert_webhook_failures", self.url)
+                print(f"Alert webhook {self.url} failed, {len(events)} events not delivered: {e}")
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="alert-webhook", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+def load_rules(path):
+    """Reads a JSON list of rule dictionaries."""
+    with open(path) as rules_file:
+        rules = json.load(rules_file)
+    if not isinstance(rules, list):
+        raise ValueError(f"{path} must contain a JSON list of alert rules")
+    return rules
+
+def create_alert_engine():
+    """
+    The AlertEngine configured from the environment:
+      DASHBOARD_ALERT_RULES    JSON file with the rules (default: DEFAULT_RULES)
+      DASHBOARD_ALERT_WEBHOOK  URL events are POSTed to
+      DASHBOARD_ALERT_LOG      file events are appended to as JSON lines (default: printed)
+    """
+    path = os.environ.get("DASHBOARD_ALERT_RULES")
+    engine = AlertEngine(load_rules(path) if path else DEFAULT_RULES)
+    engine.add_sink(LogSink(os.environ.get("DASHBOARD_ALERT_LOG")))
+    if os.environ.get("DASHBOARD_ALERT_WEBHOOK"):
+        engine.add_sink(WebhookSink(os.environ["DASHBOARD_ALERT_WEBHOOK"]))
+    return engine
@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+
+from utils.instrumentation import perf
+
+# Mount point of the cgroup v2 (unified) hierarchy
+CGROUP_ROOT = os.environ.get("DASHBOARD_CGROUP_ROOT", "/sys/fs/cgroup")
+
+# Memory limits rarely change; memory.max is re-read after this many seconds
+LIMIT_REFRESH_SECONDS = 60.0
+
+# Directory names of container cgroups directly below the root: LXD/LXC 4+ put a container's
+# processes in 'lxc.payload.<name>' (its monitor in 'lxc.monitor.<name>'), older LXC in 'lxc/<name>'
+_PAYLOAD_PREFIX = "lxc.payload."
+_LEGACY_PARENT = "lxc"
+
+def parse_flat_keyed(data):
+    """Parses a flat keyed cgroup file such as cpu.stat ('usage_usec 123' per line) into {key: int}."""
+    values = {}
+    for line in data.splitlines():
+        key, _, value = line.partition(b" ")
+        try:
+            values[key.decode()] = int(value)
+        except ValueError:
+            continue
+    return values
+
+def parse_io_stat(data):
+    """Sums the rbytes, wbytes, rios and wios of every device line of an io.stat file."""
+    totals = {"rbytes": 0, "wbytes": 0, "rios": 0, "wios": 0}
+    for line in data.splitlines():
+        # '8:0 rbytes=1459200 wbytes=314773504 rios=192 wios=353 dbytes=0 dios=0'
+        for field in line.split()[1:]:
+            key, _, value = field.partition(b"=")
+            key = key.decode()
+            if key in totals:
+                totals[key] += int(value)
+    return totals
+
+def _parse_limit(data):
+    """The value of a limit file such as memory.max: an int, or None for 'max' (unlimited)."""
+    data = data.strip()
+    return None if data == b"max" else int(data)
+
+def discover_container_cgroups(root=CGROUP_ROOT):
+    """{container name: cgroup directory} for the LXC containers found directly below `root`."""
+    cgroups = {}
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return cgroups
+    for entry in entries:
+        if entry.name.startswith(_PAYLOAD_PREFIX) and entry.is_dir():
+            cgroups[entry.name[len(_PAYLOAD_PREFIX):]] = entry.path
+        elif entry.name == _LEGACY_PARENT and entry.is_dir():
+            try:
+                for container in os.scandir(entry.path):
+                    if container.is_dir():
+                        cgroups.setdefault(container.name, container.path)
+            except OSError:
+                continue
+    return cgroups
+
+class _ContainerCgroup:
+    """One container's cgroup directory, its cached memory limit, and the counters of the previous sample."""
+    __slots__ = ("path", "memory_max", "limit_read_at", "previous")
+
+    def __init__(self, path):
+        self.path = path
+        self.memory_max = None
+        self.limit_read_at = None
+        self.previous = None  # (clock, usage_usec, rbytes, wbytes, rios, wios)
+
+class CgroupAccounting:
+    """
+    Resource usage of LXC containers read straight from their cgroup v2 files: memory.current,
+    memory.max, cpu.stat, io.stat and pids.current. No subprocess is started.
+
+    The container -> cgroup directory map is discovered with one scan of `root`, and scanned
+    again only when the set of container names passed to sample() changes or a directory
+    disappears. A sample then reads four files per container (memory.max only every
+    LIMIT_REFRESH_SECONDS). CPU and I/O rates are computed from the difference to the
+    previous sample.
+
+    `root` can point at a synthetic cgroup tree for testing, `clock` at a fake clock.
+    """
+
+    def __init__(self, root=CGROUP_ROOT, clock=time.monotonic):
+        self.root = root
+        self._clock = clock
+        self._cgroups = {}      # name -> _ContainerCgroup
+        self._names = None      # Container names the map was discovered for
+        self._stale = True      # Set until the first discovery and when a directory disappeared
+        self._lock = threading.Lock()
+
+    def _read(self, cgroup, name):
+        with open(os.path.join(cgroup.path, name), "rb") as f:
+            return f.read()
+
+    def _discover(self, names):
+        found = discover_container_cgroups(self.root)
+        previous = self._cgroups
+        # Keep the state (previous counters, limit) of containers whose directory did not change
+        self._cgroups = {name: previous[name] if name in previous and previous[name].path == path else _ContainerCgroup(path)
+                         for name, path in found.items()}
+        self._names = names
+        self._stale = False
+        perf.count("cgroup_discoveries", "lxc")
+
+    def _sample_one(self, cgroup, now):
+        memory_current = int(self._read(cgroup, "memory.current"))
+        if cgroup.limit_read_at is None or now - cgroup.limit_read_at >= LIMIT_REFRESH_SECONDS:
+            try:
+                cgroup.memory_max = _parse_limit(self._read(cgroup, "memory.max"))
+            except (OSError, ValueError):
+                cgroup.memory_max = None
+            cgroup.limit_read_at = now
+        cpu = parse_flat_keyed(self._read(cgroup, "cpu.stat"))
+        try:
+            io = parse_io_stat(self._read(cgroup, "io.stat"))
+        except OSError:
+            io = None  # The io controller is not enabled for this cgroup
+        pids = int(self._read(cgroup, "pids.current"))
+
+        usage_usec = cpu.get("usage_usec", 0)
+        stats = {
+            "memory_current_bytes": memory_current,
+            "memory_max_bytes": cgroup.memory_max,
+            "cpu_usage_seconds": usage_usec / 1e6,
+            "cpu_user_seconds": cpu.get("user_usec", 0) / 1e6,
+            "cpu_system_seconds": cpu.get("system_usec", 0) / 1e6,
+            "cpu_throttled_seconds": cpu.get("throttled_usec", 0) / 1e6,
+            "cpu_percent": None,  # Of one core, averaged since the previous sample
+            "io_read_bytes": io["rbytes"] if io else None,
+            "io_write_bytes": io["wbytes"] if io else None,
+            "io_read_bytes_per_second": None,
+            "io_write_bytes_per_second": None,
+            "io_read_ops_per_second": None,
+            "io_write_ops_per_second": None,
+            "pids_current": pids,
+        }
+        counters = (now, usage_usec) + ((io["rbytes"], io["wbytes"], io["rios"], io["wios"]) if io else (None,) * 4)
+        previous, cgroup.previous = cgroup.previous, counters
+        elapsed = now - previous[0] if previous else 0
+        if elapsed > 0:
+            # A counter going backwards means the cgroup was recreated (container restarted)
+            if usage_usec >= previous[1]:
+                stats["cpu_percent"] = round((usage_usec - previous[1]) / elapsed / 1e4, 2)
+            if io and previous[2] is not None and io["rbytes"] >= previous[2] and io["wbytes"] >= previous[3]:
+                stats["io_read_bytes_per_second"] = round((io["rbytes"] - previous[2]) / elapsed, 1)
+                stats["io_write_bytes_per_second"] = round((io["wbytes"] - previous[3]) / elapsed, 1)
+                stats["io_read_ops_per_second"] = round((io["rios"] - previous[4]) / elapsed, 2)
+                stats["io_write_ops_per_second"] = round((io["wios"] - previous[5]) / elapsed, 2)
+        return stats
+
+    def sample(self, names=None):
+        """
+        {container name: stats} for the containers with a cgroup. `names` (e.g. the running
+        containers reported by LXD) triggers a new discovery whenever it differs from the
+        previous call's; without it, the map is only refreshed when a directory disappears.
+        """
+        names = frozenset(names) if names is not None else None
+        results = {}
+        with self._lock:
+            if self._stale or (names is not None and names != self._names):
+                self._discover(names)
+            now = self._clock()
+            for name, cgroup in self._cgroups.items():
+                try:
+                    results[name] = self._sample_one(cgroup, now)
+                except FileNotFoundError:
+                    self._stale = True  # Container stopped since the discovery
+                except (OSError, ValueError) as e:
+                    print(f"Error reading the cgroup of LXC container {name}: {e}")
+        return results
+
+def cgroup2_root():
+    """Probe for the cgroup v2 hierarchy: CGROUP_ROOT if it is a unified (v2) mount, else None."""
+    return CGROUP_ROOT if os.path.exists(os.path.join(CGROUP_ROOT, "cgroup.controllers")) else None
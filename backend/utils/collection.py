@@ -0,0 +1,98 @@
+import os
+
+from utils.alerts import create_alert_engine
+from utils.gpu import create_gpu_backend
+from utils.platform_registry import CURRENT_OS, capability, collector, platform_status
+from utils.sampler import Sampler, interval_from_env
+from utils.scheduler import scheduler_from_env
+
+def dashboard_mode():
+    """'standalone' (default) or 'hub', from DASHBOARD_MODE."""
+    return os.environ.get("DASHBOARD_MODE", "standalone").lower()
+
+def create_sampler(storage=None):
+    """
+    Builds the Sampler with every data source of the dashboard registered, in the process that
+    does the actual collection: the Flask app itself, or the shared collector process that
+    production workers read from (see collector_service.py).
+
+    The CPU, RAM/disk, process, LXC and GPU process collectors are resolved for the running system by
+    utils/platform_registry.py, which only imports the implementations of that system.
+    Intervals (seconds) can be overridden with DASHBOARD_INTERVAL_<SOURCE>, e.g. DASHBOARD_INTERVAL_GPU=1
+    These are the base intervals of the adaptive scheduler (utils/scheduler.py): sources are
+    sampled faster while watched and changing, and back off to a heartbeat when idle.
+    With a `storage` (utils/storage.py), every sample of the history metrics is also persisted to disk.
+    """
+    sampler = Sampler(scheduler_from_env())
+    detected = platform_status()
+    missing = [name for name, state in detected["capabilities"].items() if not state["available"]]
+    print(f"Platform {detected['system']}, unavailable: {', '.join(missing) or 'none'}")
+
+    # GPU data comes from NVML in-process when available, otherwise from one long-running
+    # `nvidia-smi --loop-ms` process. Select explicitly with DASHBOARD_GPU_BACKEND=nvml|nvidia-smi
+    gpu_interval = interval_from_env("gpu", 2.0)
+    gpu_backend = create_gpu_backend(loop_ms=gpu_interval * 1000)
+    sampler.add_service(gpu_backend)
+    sampler.register("gpu", gpu_backend.get_gpu_info, gpu_interval, adaptive=True)
+    sampler.register("ram_disk", collector("ram_disk"), interval_from_env("ram_disk", 5.0), adaptive=True)
+    sampler.register("cpu", collector("cpu"), interval_from_env("cpu", 10.0), adaptive=True)
+    get_lxc_info = collector("lxc")
+    # On cgroup v2 hosts, container memory, CPU, I/O and process counts come from the cgroup files
+    cgroups = None
+    if CURRENT_OS == "Linux":
+        from utils.cgroups import CgroupAccounting
+        from utils.containers import apply_cgroup_stats
+        from utils.gpu_processes import annotate_containers
+
+        cgroups = CgroupAccounting()
+
+    def collect_lxc():
+        """
+        Container info with "gpus_used" filled from the latest GPU process attribution, and the
+        cgroup accounting of the running containers.
+        """
+        containers = get_lxc_info()
+        if cgroups is None:
+            return containers  # Not applicable on this system
+        attribution = sampler.get("gpu_processes")
+        containers = annotate_containers(containers, attribution.data if attribution else None)
+        if isinstance(containers, list) and capability("cgroup2").available():
+            running = [container.get("name") for container in containers
+                       if (container.get("status") or "").lower() == "running"]
+            containers = apply_cgroup_stats(containers, cgroups.sample(running))
+        return containers
+
+    sampler.register("lxc", collect_lxc, interval_from_env("lxc", 10.0), adaptive=True)
+    sampler.register("live_stats", collector("live_stats"), interval_from_env("live_stats", 5.0), adaptive=True)
+    # Disk and network rates are averages over the time between two samples
+    sampler.register("disk_io", collector("disk_io"), interval_from_env("disk_io", 2.0), adaptive=True)
+    sampler.register("network", collector("network"), interval_from_env("network", 2.0), adaptive=True)
+
+    # GPU memory per process, container and user, from the GPU backend's compute process list (Linux only)
+    get_gpu_processes = collector("gpu_processes")(gpu_backend.get_compute_processes)
+    sampler.register("gpu_processes", get_gpu_processes, interval_from_env("gpu_processes", 5.0), adaptive=True)
+
+    # Alert rules are evaluated on every new sample of the sources they refer to; the "alerts"
+    # source publishes the rules, the firing alerts and the recent events. Disable with DASHBOARD_ALERTS=0
+    if os.environ.get("DASHBOARD_ALERTS", "1") != "0":
+        alert_engine = create_alert_engine()
+        sampler.add_listener(alert_engine.on_snapshot)
+        sampler.add_service(alert_engine)
+        sampler.register("alerts", alert_engine.status, 1.0)
+
+    # Written from this process only: the web server workers read the same directory
+    if storage is not None:
+        sampler.add_listener(storage.record_snapshot)
+        sampler.add_service(storage)
+
+    # A hub polls the agents listed in DASHBOARD_FLEET_AGENTS (host:port,...); the "fleet" source
+    # publishes the per-node view of the poller every second
+    if dashboard_mode() == "hub":
+        from utils.fleet import FleetPoller, agents_from_env
+
+        fleet_poller = FleetPoller(agents_from_env(),
+                                   interval=interval_from_env("fleet", 5.0),
+                                   timeout=float(os.environ.get("DASHBOARD_FLEET_TIMEOUT", 3.0)))
+        sampler.add_service(fleet_poller)
+        sampler.register("fleet", fleet_poller.nodes_view, 1.0)
+    return sampler
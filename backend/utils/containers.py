@@ -1,108 +1,291 @@
-import subprocess
+import http.client
 import json
+import os
 import re
-import platform # Added for OS detection
+import socket
+import subprocess
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from utils.instrumentation import perf
+from utils.platform_registry import capability
+
+# Locations of the LXD API socket (snap, distribution package). LXD_SOCKET overrides them.
+LXD_SOCKET_PATHS = ["/var/snap/lxd/common/lxd/unix.socket", "/var/lib/lxd/unix.socket"]
+
+# Per-container lookups (only needed when the bulk listing lacks an instance's state)
+# run on a bounded pool and must finish within this many seconds overall. Each lookup
+# times out STATE_FETCH_GRACE seconds after the deadline, so abandoned workers end soon after.
+STATE_FETCH_WORKERS = 8
+STATE_FETCH_DEADLINE = 8
+STATE_FETCH_GRACE = 1.0
+
+LXC_NOT_FOUND = "'lxc' command not found. Make sure LXC is installed and in PATH (Linux only)."
+
+class LxdApiError(Exception):
+    """Raised when the LXD REST API returns an error or cannot be reached."""
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection speaking to a unix domain socket instead of a TCP port."""
+
+    def __init__(self, socket_path, timeout=10):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+class LxdClient:
+    """Minimal client for the LXD REST API over its unix socket."""
+
+    def __init__(self, socket_path, timeout=10):
+        self.socket_path = socket_path
+        self.timeout = timeout
 
-def get_lxc_info():
+    def get(self, path, timeout=None):
+        """
+        GETs `path` and returns the response's metadata, raising LxdApiError on failure.
+        `timeout` (default: the client's) bounds every socket operation of the request.
+        """
+        connection = UnixHTTPConnection(self.socket_path, timeout=timeout or self.timeout)
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            body = response.read()
+        except OSError as e:
+            raise LxdApiError(f"LXD socket {self.socket_path} not reachable: {e}")
+        finally:
+            connection.close()
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError as e:
+            raise LxdApiError(f"Invalid JSON from LXD for {path}: {e}")
+        if response.status != 200 or payload.get("type") == "error":
+            raise LxdApiError(f"LXD returned {response.status} for {path}: {payload.get('error', '')}")
+        return payload.get("metadata")
+
+    def list_instances(self):
+        """All instances with their state, in one request (recursion=2)."""
+        try:
+            return self.get("/1.0/instances?recursion=2")
+        except LxdApiError:
+            # LXD before 3.19 only knows about /1.0/containers
+            return self.get("/1.0/containers?recursion=2")
+
+    def instance_state(self, name, timeout=None):
+        return self.get(f"/1.0/instances/{urllib.parse.quote(name, safe='')}/state", timeout)
+
+def find_lxd_socket():
+    """Returns the path of the first LXD socket that exists, or None."""
+    candidates = [os.environ["LXD_SOCKET"]] if os.environ.get("LXD_SOCKET") else LXD_SOCKET_PATHS
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    return None
+
+def _list_instances_cli():
+    """All instances with their state from a single `lxc list --format json` call."""
+    # Get a list of all containers in JSON format; the output includes each instance's state
+    list_command = ["lxc", "list", "--format", "json"]
+    perf.spawned("lxc list")
+    process = subprocess.Popen(list_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    stdout, stderr = process.communicate(timeout=20)
+    if process.returncode != 0:
+        raise LxdApiError(stderr.strip())
+    return json.loads(stdout)
+
+def _instance_state_cli(name, timeout=STATE_FETCH_DEADLINE):
+    perf.spawned("lxc query")
+    process = subprocess.Popen(["lxc", "query", f"/1.0/instances/{urllib.parse.quote(name, safe='')}/state"],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        raise LxdApiError(f"'lxc query' timed out after {timeout:.1f}s")
+    if process.returncode != 0:
+        raise LxdApiError(stderr.strip())
+    return json.loads(stdout)
+
+def fetch_states(names, fetch_state, workers=STATE_FETCH_WORKERS, deadline=STATE_FETCH_DEADLINE):
+    """
+    Fetches the state of several instances in parallel on a bounded pool.
+    `fetch_state(name, timeout)` must give up after `timeout` seconds; it is passed the time
+    left until the deadline plus STATE_FETCH_GRACE, so no worker outlives the deadline by much.
+    Returns ({name: state}, {name: error message}) for the lookups that completed within
+    `deadline` seconds; the others are abandoned so the caller can return partial results on time.
     """
-    Fetches LXC container information using the 'lxc' command-line tool.
-    Attempts to get container name, status, IP addresses, and basic resource usage.
-    This function is only applicable to Linux systems with LXC installed.
+    if not names:
+        return {}, {}
+    states = {}
+    errors = {}
+    end = time.monotonic() + deadline
+
+    def fetch(name):
+        return fetch_state(name, max(end - time.monotonic(), 0.0) + STATE_FETCH_GRACE)
+
+    executor = ThreadPoolExecutor(max_workers=min(workers, len(names)), thread_name_prefix="lxc-state")
+    try:
+        futures = {executor.submit(fetch, name): name for name in names}
+        done, not_done = wait(futures, timeout=deadline)
+        for future in done:
+            name = futures[future]
+            try:
+                states[name] = future.result()
+            except Exception as e:
+                print(f"Error getting state for LXC container {name}: {e}")
+                errors[name] = str(e) or type(e).__name__
+        for future in not_done:
+            perf.timed_out("lxc instance state")
+            print(f"Timeout getting state for LXC container {futures[future]}")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return states, errors
+
+_MEMORY_UNITS = {"": 1, "B": 1, "KB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3, "TB": 1000 ** 4,
+                 "KIB": 1024, "MIB": 1024 ** 2, "GIB": 1024 ** 3, "TIB": 1024 ** 4}
+
+def _parse_size(value):
+    """Parses LXD size strings such as '8GiB' or '512MB' into bytes. Returns None for percentages or junk."""
+    match = re.fullmatch(r"\s*([\d.]+)\s*([A-Za-z]*)\s*", value or "")
+    if not match or match.group(2).upper() not in _MEMORY_UNITS:
+        return None
+    return int(float(match.group(1)) * _MEMORY_UNITS[match.group(2).upper()])
+
+def _container_info(instance, state):
+    """Turns an LXD instance (plus its state, if known) into the dictionary returned by get_lxc_info."""
+    config = instance.get("config") or {}
+    devices = instance.get("expanded_devices") or instance.get("devices") or {}
+    info = {
+        "name": instance.get("name"),
+        "status": instance.get("status"),
+        "type": instance.get("type"),
+        "user_owner": config.get("user.owner", "N/A"),
+        "ip_addresses": [],
+        "ipv4": [],
+        "ipv6": [],
+        "memory_usage_mb": None,
+        "memory_total_mb": None,
+        "cpu_usage_seconds": None,
+        "disk_devices": [],
+        "gpu_devices": [],
+        "gpus_used": "N/A (Requires advanced GPU process correlation)"
+    }
+
+    limit_bytes = _parse_size(config.get("limits.memory"))
+    if limit_bytes:
+        info["memory_total_mb"] = round(limit_bytes / (1024 * 1024), 2)
+
+    if state:
+        # Extract IP addresses (ipv4 and ipv6), skipping the loopback interface
+        for iface, iface_data in (state.get("network") or {}).items():
+            if iface == "lo":
+                continue
+            for addr_info in iface_data.get("addresses", []):
+                if addr_info.get("family") == "inet":
+                    info["ipv4"].append(addr_info.get("address"))
+                    info["ip_addresses"].append(f"{addr_info.get('address')}/{addr_info.get('netmask')} (ipv4)")
+                elif addr_info.get("family") == "inet6":
+                    info["ipv6"].append(addr_info.get("address"))
+                    info["ip_addresses"].append(f"{addr_info.get('address')}/{addr_info.get('netmask')} (ipv6)")
+
+        memory = state.get("memory") or {}
+        if memory.get("usage") is not None:
+            info["memory_usage_mb"] = round(memory["usage"] / (1024 * 1024), 2)
+        if info["memory_total_mb"] is None and memory.get("total"):
+            info["memory_total_mb"] = round(memory["total"] / (1024 * 1024), 2)
+
+        cpu = state.get("cpu") or {}
+        if cpu.get("usage") is not None:
+            info["cpu_usage_seconds"] = round(cpu["usage"] / 1e9, 2)  # Reported in nanoseconds
+
+    disk_state = (state or {}).get("disk") or {}
+    for device_name, device_info in devices.items():
+        device_type = device_info.get("type")
+        if device_type == "disk":
+            usage = disk_state.get(device_name) or {}
+            info["disk_devices"].append({
+                "name": device_name,
+                "path": device_info.get("path", "N/A"),
+                "pool": device_info.get("pool", "N/A"),
+                "used": usage.get("usage"),   # Bytes, only reported by some storage drivers
+                "total": usage.get("total")  # May not always be available
+            })
+        elif device_type in ("gpu", "mdev"):  # mdev for mediated devices
+            info["gpu_devices"].append({
+                "name": device_name,
+                "vendor": device_info.get("vendorid"),
+                "product": device_info.get("productid"),
+                "pci_address": device_info.get("pci")
+            })
+    if not info["disk_devices"]:
+        info["disk_devices"] = "No disk devices found or usage not reported."
+    if not info["gpu_devices"]:
+        info["gpu_devices"] = "No GPU devices configured."
+    return info
+
+def get_lxc_info(socket_path=None, deadline=STATE_FETCH_DEADLINE):
+    """
+    Fetches LXC container information: name, status, IP addresses, owner, devices and
+    basic resource usage. This function is only applicable to Linux systems with LXD installed.
+
+    All instances and their state are fetched in one request, through the LXD REST API on its
+    unix socket (`socket_path`, or the first of LXD_SOCKET_PATHS that accepts connections) or
+    else with a single `lxc list --format json`. Whether the socket and the `lxc` command exist
+    is probed once and cached (see utils/platform_registry.py), so a host without LXD does
+    not pay for a failed connection and Popen on every collection. Instances whose state is missing from the listing are
+    looked up in parallel within `deadline` seconds; the ones that do not answer in time
+    are returned with "state_pending": True instead of delaying the whole result, and the
+    ones whose lookup failed with the error in "state_error".
+
+    Only used on Linux; other systems get platform_registry.lxc_not_applicable() instead.
 
     Returns:
-        list: A list of dictionaries, where each dictionary represents an LXC container (on Linux).
-              Returns an error dictionary if 'lxc' command fails or parsing issues occur.
-              Returns a specific message if run on a non-Linux OS.
+        list: A list of dictionaries, where each dictionary represents an LXC container.
+              Returns an error dictionary if listing fails.
     """
-    current_os = platform.system()
-    if current_os != "Linux":
-        message = f"LXC container monitoring is specific to Linux. Current OS: {current_os}"
-        print(message)
-        return {"status": "not_applicable", "message": message, "data": []}
+    socket_path = socket_path or capability("lxd_socket").value()
+    instances = None
+    fetch_state = _instance_state_cli
+    if socket_path:
+        client = LxdClient(socket_path)
+        try:
+            instances = client.list_instances()
+            fetch_state = client.instance_state
+        except LxdApiError as e:
+            capability("lxd_socket").invalidate()
+            print(f"LXD REST API unavailable, falling back to the lxc command: {e}")
 
-    try:
-        # Get a list of all containers in JSON format
-        list_command = ["lxc", "list", "--format", "json"]
-        process = subprocess.Popen(list_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        stdout, stderr = process.communicate(timeout=20)
-
-        if process.returncode != 0:
-            error_message = f"Error executing 'lxc list': {stderr.strip()}"
-            print(error_message)
-            return {"error": "Failed to list LXC containers", "details": stderr.strip(), "data": []}
-
-        containers_data = json.loads(stdout)
-        detailed_containers_info = []
-
-        for container in containers_data:
-            name = container.get("name")
-            info = {
-                "name": name,
-                "status": container.get("status"),
-                "type": container.get("type"),
-                "ip_addresses": [],
-                "memory_usage_mb": None,
-                "memory_total_mb": None, # If available from limits
-                "disk_usage": None, # This is highly dependent on storage backend
-                "user_associated": "N/A (Requires custom logic)",
-                "gpus_used": "N/A (Requires advanced GPU process correlation)"
-            }
-
-            # Extract IP addresses (ipv4 and ipv6)
-            if container.get("state") and container["state"].get("network"):
-                for iface, iface_data in container["state"]["network"].items():
-                    for addr_info in iface_data.get("addresses", []):
-                        if addr_info.get("family") == "inet":
-                            info["ip_addresses"].append(f"{addr_info.get('address')}/{addr_info.get('netmask')} (ipv4)")
-                        elif addr_info.get("family") == "inet6":
-                            info["ip_addresses"].append(f"{addr_info.get('address')}/{addr_info.get('netmask')} (ipv6)")
-            
-            # Attempt to get memory usage if the container is running
-            if name and container.get("status", "").lower() == "running":
-                try:
-                    mem_command = ["lxc", "info", name]
-                    mem_process = subprocess.Popen(mem_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-                    mem_stdout, mem_stderr = mem_process.communicate(timeout=10)
-
-                    if mem_process.returncode == 0:
-                        # Example parsing, this might need adjustment based on 'lxc info' output format
-                        current_mem_match = re.search(r"Memory usage:\n\s*Current:\s*([\d\.]+)(KiB|MiB|GiB)", mem_stdout, re.MULTILINE)
-                        if current_mem_match:
-                            val, unit = float(current_mem_match.group(1)), current_mem_match.group(2)
-                            if unit == "GiB": val *= 1024
-                            if unit == "KiB": val /= 1024
-                            info["memory_usage_mb"] = round(val, 2)
-                        
-                        mem_limit_match = re.search(r"Memory limits:\n\s*Hard:\s*([\d\.]+)(KiB|MiB|GiB)", mem_stdout, re.MULTILINE)
-                        if mem_limit_match:
-                            val, unit = float(mem_limit_match.group(1)), mem_limit_match.group(2)
-                            if unit == "GiB": val *= 1024
-                            if unit == "KiB": val /= 1024
-                            info["memory_total_mb"] = round(val, 2)
-                except subprocess.TimeoutExpired:
-                    print(f"Timeout getting info for LXC container {name}")
-                except Exception as e_info:
-                    print(f"Error getting detailed info for LXC container {name}: {e_info}")
-            
-            # Note on Disk Usage:
-            # Disk usage is complex as it depends on the storage backend (dir, LVM, ZFS, btrfs).
-            # For ZFS/btrfs, 'lxc storage info <pool_name>' might be useful, or direct ZFS/btrfs commands.
-            # For dir backend, it's harder to isolate per-container usage without quotas.
-            # 'lxc config get <container_name> security.disk_quota' or similar might exist.
-
-            detailed_containers_info.append(info)
-
-        return detailed_containers_info # On Linux, this will be the list of dicts
+    if instances is None and not capability("lxc").available():
+        return {"error": LXC_NOT_FOUND, "data": []}
 
+    try:
+        if instances is None:
+            instances = _list_instances_cli()
     except FileNotFoundError:
-        error_message = "'lxc' command not found. Make sure LXC is installed and in PATH (Linux only)."
+        error_message = LXC_NOT_FOUND
+        capability("lxc").invalidate()
         print(error_message)
         return {"error": error_message, "data": []}
+    except LxdApiError as e:
+        error_message = f"Error executing 'lxc list': {e}"
+        print(error_message)
+        return {"error": "Failed to list LXC containers", "details": str(e), "data": []}
     except json.JSONDecodeError as e:
         error_message = f"Failed to parse JSON from 'lxc list': {e}"
         print(error_message)
-        return {"error": error_message, "details": stdout, "data": []} # Include stdout for debugging
+        return {"error": error_message, "data": []}
     except subprocess.TimeoutExpired:
+        perf.timed_out("lxc list")
         error_message = "'lxc list' command timed out."
         print(error_message)
         return {"error": error_message, "data": []}
@@ -111,84 +294,45 @@ def get_lxc_info():
         print(error_message)
         return {"error": "An unexpected error occurred", "details": str(e), "data": []}
 
-    # Enhanced information retrieval for each container
-    enhanced_info = []
-    for container in detailed_containers_info:
-        container_name = container.get("name")
-        container_status = container.get("status")
+    # Only running instances without state in the listing need a separate lookup
+    missing = [instance.get("name") for instance in instances
+               if instance.get("state") is None and (instance.get("status") or "").lower() == "running"]
+    fetched, failed = fetch_states(missing, fetch_state, deadline=deadline)
 
-        # For running containers, get detailed info
-        if container_status and container_status.lower() == "running":
-            try:
-                process_info = subprocess.Popen(["lxc", "info", container_name, "--format", "json"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-                stdout_info, stderr_info = process_info.communicate(timeout=10)
-
-                if process_info.returncode == 0:
-                    info_data = json.loads(stdout_info)
-                    container_details = {
-                        "name": container_name,
-                        "status": info_data.get("status"),
-                        "ipv4": [addr["address"] for addr in info_data.get("network", {}).get("eth0", {}).get("addresses", []) if addr["family"] == "inet"],
-                        "ipv6": [addr["address"] for addr in info_data.get("network", {}).get("eth0", {}).get("addresses", []) if addr["family"] == "inet6"],
-                        "memory_usage_mb": "N/A",
-                        "user_owner": info_data.get("config", {}).get("user.owner", "N/A"),
-                        "disk_devices": [],
-                        "gpu_devices": []
-                    }
-
-                    # Memory usage
-                    memory_usage_bytes = info_data.get("memory", {}).get("usage")
-                    if memory_usage_bytes is not None:
-                        container_details["memory_usage_mb"] = round(memory_usage_bytes / (1024*1024), 2)
-                    else:
-                        container_details["memory_usage_mb"] = "N/A"
-
-                    # Disk usage
-                    disk_devices = []
-                    for device_name, device_info in info_data.get("devices", {}).items():
-                        if device_info.get("type") == "disk":
-                            usage = device_info.get("usage", {})
-                            disk_devices.append({
-                                "name": device_name,
-                                "path": device_info.get("path", "N/A"),
-                                "pool": device_info.get("pool", "N/A"),
-                                "total": usage.get("total", "N/A"), # May not always be available
-                                "used": usage.get("used", "N/A")   # May not always be available
-                            })
-                    container_details["disk_devices"] = disk_devices if disk_devices else "No disk devices found or usage not reported."
-                    
-                    # GPU passthrough info (basic check if any GPU devices are listed)
-                    gpu_devices = []
-                    for device_name, device_info in info_data.get("devices", {}).items():
-                        if device_info.get("type") == "gpu" or device_info.get("type") == "mdev": # mdev for mediated devices
-                            gpu_devices.append({
-                                "name": device_name,
-                                "vendor": device_info.get("vendor"),
-                                "product": device_info.get("product"),
-                                "pci_address": device_info.get("pci") # Example, actual key might vary
-                            })
-                    container_details["gpu_devices"] = gpu_devices if gpu_devices else "No GPU devices configured."
-
-                    enhanced_info.append(container_details)
-                else:
-                    enhanced_info.append({"error": f"Failed to get info for {container_name}: {stderr_info.strip()}"})
-            except Exception as e:
-                enhanced_info.append({"error": f"Exception while getting info for {container_name}: {str(e)}"})
-        else:
-            # For non-running containers, we can still return basic info
-            basic_info = {
-                "name": container.get("name"),
-                "status": container.get("status"),
-                "type": container.get("type"),
-                "ip_addresses": container.get("ip_addresses"),
-                "memory_usage_mb": container.get("memory_usage_mb"),
-                "user_associated": container.get("user_associated"),
-                "gpus_used": container.get("gpus_used"),
-                "disk_usage": container.get("disk_usage")
-            }
-            enhanced_info.append(basic_info)
-
-    return enhanced_info
+    containers = []
+    for instance in instances:
+        name = instance.get("name")
+        state = instance.get("state") or fetched.get(name)
+        info = _container_info(instance, state)
+        if name in failed:
+            info["state_error"] = failed[name]
+        elif name in missing and name not in fetched:
+            info["state_pending"] = True
+        containers.append(info)
+    return containers
+
+def apply_cgroup_stats(containers, stats):
+    """
+    Fills the containers returned by get_lxc_info with their cgroup accounting (see
+    utils/cgroups.py): memory and CPU time are taken from the cgroup files, and the CPU, I/O
+    and process counts are added. The full stats are kept under "cgroup".
+    """
+    if not isinstance(containers, list):
+        return containers
+    for container in containers:
+        usage = stats.get(container.get("name"))
+        if usage is None:
+            continue
+        container["memory_usage_mb"] = round(usage["memory_current_bytes"] / (1024 * 1024), 2)
+        if usage["memory_max_bytes"] is not None:
+            container["memory_total_mb"] = round(usage["memory_max_bytes"] / (1024 * 1024), 2)
+        container["cpu_usage_seconds"] = round(usage["cpu_usage_seconds"], 2)
+        container["cpu_percent"] = usage["cpu_percent"]
+        container["io_read_bytes_per_second"] = usage["io_read_bytes_per_second"]
+        container["io_write_bytes_per_second"] = usage["io_write_bytes_per_second"]
+        container["pids"] = usage["pids_current"]
+        container["cgroup"] = usage
+    return containers
 
 if __name__ == '__main__':
     # For testing the function directly
@@ -1,85 +1,135 @@
-import subprocess
-import re
-import platform
-
-def get_cpu_info():
-    """
-    Fetches CPU information using WMIC on Windows or /proc/cpuinfo on Linux.
-    """
-    cpu_info_list = []
-    current_os = platform.system()
-
-    if current_os == "Windows":
-        try:
-            command = ["wmic", "cpu", "get", "Name,Manufacturer,MaxClockSpeed,NumberOfCores,NumberOfLogicalProcessors,Description,Caption,SocketDesignation", "/FORMAT:CSV"]
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, shell=False)
-            stdout, stderr = process.communicate(timeout=15)
-
-            if process.returncode != 0:
-                return {"error": "Failed to execute wmic cpu", "details": stderr.strip()}
-
-            lines = stdout.strip().splitlines()
-            if len(lines) > 1:
-                header = [h.strip() for h in lines[0].split(",")]
-                for line in lines[1:]:
-                    if not line.strip():
-                        continue
-                    values = [v.strip() for v in line.split(",")]
-                    # The first column from WMIC CSV is often "Node"
-                    if len(values) == len(header) +1: # Node,Name,Manufacturer...
-                         values_to_zip = values[1:] # Skip node
-                    elif len(values) == len(header):
-                         values_to_zip = values
-                    else:
-                        continue # malformed line
-
-                    info = dict(zip(header, values_to_zip))
-                    # Basic parsing for numerical values if they exist
-                    for key in ['MaxClockSpeed', 'NumberOfCores', 'NumberOfLogicalProcessors']:
-                        if key in info and info[key].isdigit():
-                            info[key] = int(info[key])
-                    cpu_info_list.append(info)
-            return cpu_info_list if cpu_info_list else {"error": "No CPU data parsed from wmic"}
-
-        except FileNotFoundError:
-            return {"error": "wmic command not found (should be available on Windows)."}
-        except subprocess.TimeoutExpired:
-            return {"error": "wmic cpu command timed out."}
-        except Exception as e:
-            return {"error": f"An unexpected error occurred while fetching CPU info on Windows: {e}"}
-
-    elif current_os == "Linux":
-        try:
-            cpuinfo = {}
-            with open("/proc/cpuinfo", "r") as f:
-                for line in f:
-                    if ":" in line:
-                        key, value = line.split(":", 1)
-                        key = key.strip()
-                        value = value.strip()
-                        if key == "processor": # Start of a new processor
-                            if cpuinfo: # if cpuinfo is not empty, add it to list
-                                cpu_info_list.append(cpuinfo)
-                            cpuinfo = {'processor_id': value}
-                        elif key in ["model name", "vendor_id", "cpu family", "model", "stepping", "cpu MHz", "cache size", "siblings", "core id", "cpu cores"]:
-                            cpuinfo[key.replace(" ", "_")] = value
-            if cpuinfo: # Add the last processor info
-                cpu_info_list.append(cpuinfo)
-            
-            # Consolidate into one entry per physical CPU if possible, or simplify
-            # For now, returning list of logical processors as parsed
-            if not cpu_info_list:
-                 return {"error": "Could not parse /proc/cpuinfo"}
-            return cpu_info_list
-
-        except FileNotFoundError:
-            return {"error": "/proc/cpuinfo not found (should be available on Linux)."}
-        except Exception as e:
-            return {"error": f"An unexpected error occurred while fetching CPU info on Linux: {e}"}
-    else:
-        return {"error": f"CPU info not implemented for OS: {current_os}"}
-
-if __name__ == '__main__':
-    import json
-    info = get_cpu_info()
-    print(json.dumps(info, indent=4))
+import threading
+from array import array
+
+from utils.instrumentation import perf
+
+# Fields copied from the first processor entry of /proc/cpuinfo into the topology summary
+_CPUINFO_SUMMARY_FIELDS = ["model name", "vendor_id", "cpu family", "model", "stepping", "cache size"]
+
+def parse_cpuinfo(path="/proc/cpuinfo"):
+    """
+    Summarizes /proc/cpuinfo into one dictionary describing the CPU topology:
+    model, vendor, cache size and the number of sockets, physical cores and logical processors.
+    Per-processor entries are folded into counters while reading, so no per-thread dicts are built.
+    """
+    summary = {}
+    logical_processors = 0
+    sockets = set()
+    cores = set()
+    physical_id = None
+    with open(path, "r") as f:
+        for line in f:
+            key, sep, value = line.partition(":")
+            if not sep:
+                continue
+            key = key.strip()
+            if key == "processor":  # Start of a new processor
+                logical_processors += 1
+                physical_id = None
+            elif key == "physical id":
+                physical_id = value.strip()
+                sockets.add(physical_id)
+            elif key == "core id":
+                cores.add((physical_id, value.strip()))
+            elif logical_processors == 1 and key in _CPUINFO_SUMMARY_FIELDS:
+                summary[key.replace(" ", "_")] = value.strip()
+
+    if not logical_processors:
+        raise ValueError(f"Could not parse {path}")
+    summary["sockets"] = len(sockets) or 1
+    # Some architectures (e.g. many ARM systems) do not report core ids
+    summary["physical_cores"] = len(cores) or logical_processors
+    summary["logical_processors"] = logical_processors
+    summary["source"] = "/proc/cpuinfo + /proc/stat (Linux)"
+    return summary
+
+_topology_cache = {}
+_topology_lock = threading.Lock()
+
+def get_cpu_topology(path="/proc/cpuinfo"):
+    """Cached parse_cpuinfo(): the topology does not change while the system is running."""
+    with _topology_lock:
+        if path not in _topology_cache:
+            perf.cache_access("cpu_topology", misses=1)
+            _topology_cache[path] = parse_cpuinfo(path)
+        else:
+            perf.cache_access("cpu_topology", hits=1)
+        return _topology_cache[path]
+
+class CpuUtilizationSampler:
+    """
+    Computes CPU utilization from the jiffy counters in /proc/stat.
+    The counters of the previous sample are kept in flat arrays (slot 0 is the aggregate
+    "cpu" line, slot i+1 is "cpu<i>") and utilization is the busy share of the jiffies
+    elapsed between two samples. The first sample reports the average since boot.
+    """
+
+    def __init__(self, path="/proc/stat"):
+        self.path = path
+        self._prev_busy = array("Q")
+        self._prev_total = array("Q")
+        self._lock = threading.Lock()
+
+    def _read_counters(self):
+        busy = array("Q")
+        total = array("Q")
+        with open(self.path, "r") as f:
+            for line in f:
+                if not line.startswith("cpu"):
+                    break  # The cpu lines always come first
+                # user nice system idle iowait irq softirq steal guest guest_nice
+                fields = line.split()
+                values = [int(v) for v in fields[1:9]]
+                line_total = sum(values)
+                idle = values[3] + (values[4] if len(values) > 4 else 0)  # idle + iowait
+                busy.append(line_total - idle)
+                total.append(line_total)
+        return busy, total
+
+    def sample(self):
+        """
+        Returns an array('d') of utilization percentages: index 0 is the whole CPU,
+        index i+1 is logical processor i.
+        """
+        busy, total = self._read_counters()
+        with self._lock:
+            if len(self._prev_total) != len(total):  # First sample or CPUs were hot-plugged
+                self._prev_busy = array("Q", bytes(8 * len(busy)))
+                self._prev_total = array("Q", bytes(8 * len(total)))
+            prev_busy, prev_total = self._prev_busy, self._prev_total
+            utilization = array("d", bytes(8 * len(total)))
+            for i in range(len(total)):
+                delta_total = total[i] - prev_total[i]
+                if delta_total > 0:
+                    utilization[i] = 100.0 * (busy[i] - prev_busy[i]) / delta_total
+            self._prev_busy, self._prev_total = busy, total
+        return utilization
+
+    def sample_summary(self):
+        """Takes a sample and returns it as JSON-friendly fields."""
+        utilization = self.sample()
+        return {
+            "utilization_percent": round(utilization[0], 1) if utilization else None,
+            "per_core_utilization": [round(value, 1) for value in utilization[1:]],
+        }
+
+_utilization_sampler = CpuUtilizationSampler()
+
+def get_cpu_info():
+    """
+    Fetches CPU information on Linux: the cached /proc/cpuinfo topology plus per-core
+    utilization from /proc/stat. Windows uses utils/windows.py (see utils/platform_registry.py).
+    """
+    try:
+        info = dict(get_cpu_topology())
+        info.update(_utilization_sampler.sample_summary())
+        return info
+    except FileNotFoundError as e:
+        return {"error": f"{e.filename} not found (should be available on Linux)."}
+    except Exception as e:
+        return {"error": f"An unexpected error occurred while fetching CPU info on Linux: {e}"}
+
+if __name__ == '__main__':
+    import json
+    info = get_cpu_info()
+    print(json.dumps(info, indent=4))
@@ -0,0 +1,164 @@
+import io
+import json
+import sys
+import tarfile
+import time
+from array import array
+
+try:
+    import pyarrow  # Optional: enables the Arrow IPC stream format
+except ImportError:
+    pyarrow = None
+
+# Points per chunk: one .npy member pair or one Arrow record batch
+DEFAULT_CHUNK_ROWS = 65536
+
+FORMATS = {
+    "npy": {"mimetype": "application/x-tar", "extension": "tar"},
+    "arrow": {"mimetype": "application/vnd.apache.arrow.stream", "extension": "arrows"},
+}
+
+_NPY_DESCR = "<f8" if sys.byteorder == "little" else ">f8"
+# PAX header on every values member with that chunk's manifest entry, so readers need not wait for the manifest
+CHUNK_PAX_HEADER = "DASHBOARD.chunk"
+
+def available_formats():
+    return [name for name in FORMATS if name != "arrow" or pyarrow is not None]
+
+def npy_bytes(values):
+    """A float64 array('d') as the contents of a NumPy .npy file (format version 1.0), without numpy."""
+    header = f"{{'descr': '{_NPY_DESCR}', 'fortran_order': False, 'shape': ({len(values)},), }}"
+    # Magic (6) + version (2) + header length (2) + header, padded with spaces to a multiple of 64 and ending in \n
+    padding = 64 - (10 + len(header) + 1) % 64
+    header = (header + " " * (padding % 64) + "\n").encode("latin1")
+    return b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, "little") + header + values.tobytes()
+
+def read_npy(data):
+    """The float64 values of an .npy file written by npy_bytes, as array('d')."""
+    header_length = int.from_bytes(data[8:10], "little")
+    header = data[10:10 + header_length].decode("latin1")
+    values = array("d")
+    values.frombytes(data[10 + header_length:])
+    if ("'<f8'" in header) != (sys.byteorder == "little"):
+        values.byteswap()
+    return values
+
+def _tar_member(name, data, mtime, pax_headers=None):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(mtime)
+    info.mode = 0o644
+    if pax_headers:
+        info.pax_headers = pax_headers
+    padding = -len(data) % tarfile.BLOCKSIZE
+    return info.tobuf(tarfile.PAX_FORMAT) + data + b"\0" * padding
+
+def iter_chunks(history, metric=None, device=None, start=None, end=None, resolution=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Yields (metric, device, resolution, timestamps, values) for every series matching the
+    `metric`/`device` globs, split into chunks of at most `chunk_rows` points. Series are read
+    one at a time, so memory use is bounded by the largest series, not the whole export.
+    A series evicted while the export runs is left out.
+    """
+    for series_metric, series_device in history.keys(metric, device):
+        try:
+            series_resolution, timestamps, values = history.read(series_metric, series_device, start, end, resolution)
+        except KeyError:
+            continue
+        for offset in range(0, len(timestamps), chunk_rows):
+            yield (series_metric, series_device, series_resolution,
+                   timestamps[offset:offset + chunk_rows], values[offset:offset + chunk_rows])
+
+def export_npy(chunks):
+    """
+    Streams chunks as a tar archive: every chunk is a pair of .npy members,
+    NNNNNN.timestamps.npy (epoch seconds) and NNNNNN.values.npy, and a final
+    manifest.json lists the metric, device and resolution of each chunk. The same
+    entry is also in the DASHBOARD.chunk PAX header of each values member.
+    """
+    now = time.time()
+    manifest = []
+    for index, (metric, device, resolution, timestamps, values) in enumerate(chunks):
+        entry = {"chunk": f"{index:06d}", "metric": metric, "device": device,
+                 "resolution": resolution, "rows": len(timestamps)}
+        manifest.append(entry)
+        yield (_tar_member(f"{index:06d}.timestamps.npy", npy_bytes(timestamps), now)
+               + _tar_member(f"{index:06d}.values.npy", npy_bytes(values), now,
+                             {CHUNK_PAX_HEADER: json.dumps(entry, separators=(",", ":"))}))
+    yield _tar_member("manifest.json", json.dumps({"chunks": manifest}, indent=1).encode(), now)
+    yield b"\0" * (2 * tarfile.BLOCKSIZE)  # End of archive
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object collecting what the Arrow writer produces until drained."""
+
+    def __init__(self):
+        self._parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+def export_arrow(chunks):
+    """Streams chunks as an Arrow IPC stream with the columns metric, device, resolution, timestamp and value."""
+    schema = pyarrow.schema([("metric", pyarrow.string()), ("device", pyarrow.string()),
+                             ("resolution", pyarrow.float64()), ("timestamp", pyarrow.float64()),
+                             ("value", pyarrow.float64())])
+    sink = _DrainableSink()
+    writer = pyarrow.ipc.new_stream(pyarrow.PythonFile(sink, mode="w"), schema)
+    for metric, device, resolution, timestamps, values in chunks:
+        rows = len(timestamps)
+        repeat = pyarrow.Array.from_buffers(pyarrow.int32(), rows, [None, pyarrow.py_buffer(bytes(4 * rows))])
+        batch = pyarrow.record_batch([
+            pyarrow.array([metric], pyarrow.string()).take(repeat),
+            pyarrow.array([str(device)], pyarrow.string()).take(repeat),
+            pyarrow.Array.from_buffers(pyarrow.float64(), rows, [None, pyarrow.py_buffer(array("d", [resolution]) * rows)]),
+            pyarrow.Array.from_buffers(pyarrow.float64(), rows, [None, pyarrow.py_buffer(timestamps)]),
+            pyarrow.Array.from_buffers(pyarrow.float64(), rows, [None, pyarrow.py_buffer(values)]),
+        ], schema=schema)
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+def export_history(history, format="npy", **filters):
+    """Generator of the encoded export of `history` in `format` ("npy" or "arrow"), see iter_chunks for the filters."""
+    if format not in available_formats():
+        raise ValueError(f"Unsupported export format {format!r}, available: {', '.join(available_formats())}")
+    chunks = iter_chunks(history, **filters)
+    return export_arrow(chunks) if format == "arrow" else export_npy(chunks)
+
+def read_npy_export(fileobj):
+    """
+    Reads an export_npy() archive from a file object, which may be a non-seekable stream.
+    Yields (metric, device, resolution, timestamps, values) with array('d') columns, one chunk
+    as soon as its values member is read, so only one chunk is held in memory at a time.
+    Chunks without the DASHBOARD.chunk header (older exports) are held until the manifest.
+    """
+    timestamps = {}  # chunk -> timestamps waiting for their values
+    pending = {}     # chunk -> (timestamps, values) waiting for the manifest
+    with tarfile.open(fileobj=fileobj, mode="r|") as archive:
+        for member in archive:
+            chunk, _, kind = member.name.partition(".")
+            data = archive.extractfile(member).read() if member.isfile() else b""
+            if member.name == "manifest.json":
+                for entry in json.loads(data)["chunks"]:
+                    if entry["chunk"] in pending:
+                        yield (entry["metric"], entry["device"], entry["resolution"], *pending.pop(entry["chunk"]))
+            elif kind == "timestamps.npy":
+                timestamps[chunk] = read_npy(data)
+            elif kind == "values.npy":
+                columns = (timestamps.pop(chunk), read_npy(data))
+                header = member.pax_headers.get(CHUNK_PAX_HEADER)
+                if header is None:
+                    pending[chunk] = columns
+                    continue
+                entry = json.loads(header)
+                yield (entry["metric"], entry["device"], entry["resolution"], *columns)
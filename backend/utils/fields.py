@@ -0,0 +1,46 @@
+def parse_field_selector(spec):
+    """
+    Parses a field selector such as "gpu.utilization_gpu,gpu.memory_used_mb,ram_disk.ram"
+    into {source: selection tree}, e.g. {"gpu": {"utilization_gpu": {}, "memory_used_mb": {}},
+    "ram_disk": {"ram": {}}}. The first part of every path is the source; an empty tree
+    (a bare source name) selects all of its data.
+    """
+    selection = {}
+    for path in (spec or "").split(","):
+        parts = [part for part in path.strip().split(".") if part]
+        if not parts:
+            continue
+        source, keys = parts[0], parts[1:]
+        if source in selection and not selection[source]:
+            continue  # The whole source is already selected
+        if not keys:
+            selection[source] = {}
+            continue
+        node = selection.setdefault(source, {})
+        for key in keys[:-1]:
+            child = node.get(key)
+            if child is not None and not child:
+                break  # A prefix of this path is already selected as a whole
+            node = node.setdefault(key, {})
+        else:
+            node[keys[-1]] = {}
+    return selection
+
+def select_fields(data, tree):
+    """
+    The parts of `data` selected by `tree` (see parse_field_selector). Lists are kept and the
+    selection applies to each element, so "gpu.utilization_gpu" gives one {"utilization_gpu"}
+    dictionary per GPU. "error" and "details" entries are always kept, so a collector error
+    still reaches the client.
+    """
+    if not tree:
+        return data
+    if isinstance(data, list):
+        return [select_fields(item, tree) for item in data]
+    if not isinstance(data, dict):
+        return data
+    selected = {key: select_fields(data[key], subtree) for key, subtree in tree.items() if key in data}
+    for key in ("error", "details"):
+        if key in data:
+            selected[key] = data[key]
+    return selected
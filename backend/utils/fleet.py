@@ -0,0 +1,289 @@
+import asyncio
+import gzip
+import json
+import os
+import socket
+import threading
+import time
+import urllib.parse
+
+from utils.instrumentation import perf
+
+# A GPU counts as free below these utilization / memory usage levels
+FREE_GPU_MAX_UTILIZATION = 5.0
+FREE_GPU_MAX_MEMORY_PERCENT = 5.0
+HOTTEST_GPUS_LIMIT = 10
+
+AGENT_SNAPSHOT_PATH = "/api/agent/snapshot"
+
+def node_name():
+    """Name this node reports to a hub: DASHBOARD_NODE_NAME or the hostname."""
+    return os.environ.get("DASHBOARD_NODE_NAME") or socket.gethostname()
+
+def agents_from_env():
+    """Agent addresses polled in hub mode, from DASHBOARD_FLEET_AGENTS (comma separated host:port or URLs)."""
+    raw = os.environ.get("DASHBOARD_FLEET_AGENTS", "")
+    return [agent.strip() for agent in raw.split(",") if agent.strip()]
+
+# --- Agent side ---
+
+def _compact_gpus(data):
+    if not isinstance(data, list):
+        return data  # Error dictionary
+    keys = ("name", "pci_bus_id", "temperature_gpu", "utilization_gpu", "memory_used_mb", "memory_total_mb")
+    return [{key: gpu.get(key) for key in keys} for gpu in data]
+
+def _compact_ram(data):
+    ram = (data or {}).get("ram") or {}
+    if "error" in ram:
+        return {"error": ram["error"]}
+    return {key: ram.get(key) for key in ("total_bytes", "used_bytes", "available_bytes", "total_mb", "used_mb", "available_mb")}
+
+def _compact_cpu(data):
+    if not isinstance(data, dict) or "error" in data:
+        return data
+    return {key: data.get(key) for key in ("model_name", "logical_processors", "utilization_percent")}
+
+def _compact_lxc(data):
+    if not isinstance(data, list):
+        return {"error": (data or {}).get("error") or (data or {}).get("message")}
+    running = sum(1 for container in data if (container.get("status") or "").lower() == "running")
+    return {"total": len(data), "running": running}
+
+# Per source: how its snapshot is reduced for the hub
+COMPACTORS = {
+    "gpu": _compact_gpus,
+    "ram_disk": _compact_ram,
+    "cpu": _compact_cpu,
+    "lxc": _compact_lxc,
+}
+
+def build_agent_snapshot(sampler):
+    """The compact view of this node served to hubs: only what the fleet views need."""
+    sources = {}
+    for source, compact in COMPACTORS.items():
+        if source not in sampler.sources():
+            continue
+        snapshot = sampler.get(source)
+        if snapshot is not None:
+            sources[source] = {"timestamp": snapshot.timestamp, "version": snapshot.version, "data": compact(snapshot.data)}
+    return {"node": node_name(), "timestamp": time.time(), "sources": sources}
+
+# --- Hub side ---
+
+class AgentConnection:
+    """
+    A persistent HTTP/1.1 keep-alive connection to one agent, on asyncio streams.
+    The connection is reused across polls and re-established after errors or when
+    the agent closes it.
+    """
+
+    def __init__(self, address):
+        if "://" not in address:
+            address = "http://" + address
+        url = urllib.parse.urlsplit(address)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.path = (url.path.rstrip("/") or "") + AGENT_SNAPSHOT_PATH
+        self.url = f"http://{self.host}:{self.port}"
+        self._reader = None
+        self._writer = None
+
+    async def close(self):
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def _request(self):
+        request = (f"GET {self.path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                   "Accept: application/json\r\nAccept-Encoding: gzip\r\nConnection: keep-alive\r\n\r\n")
+        self._writer.write(request.encode())
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by agent")
+        version, status, _ = (status_line.decode("latin-1").split(" ", 2) + [""])[:3]
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = bytearray()
+            while True:
+                size = int((await self._reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self._reader.readline()
+                    break
+                body += await self._reader.readexactly(size)
+                await self._reader.readline()
+            body = bytes(body)
+        elif "content-length" in headers:
+            body = await self._reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await self._reader.read()
+            headers["connection"] = "close"
+
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        if not keep_alive:
+            await self.close()
+        if headers.get("content-encoding") == "gzip":
+            body = gzip.decompress(body)
+        if status != "200":
+            raise ConnectionError(f"agent returned HTTP {status}")
+        return json.loads(body)
+
+    async def fetch(self):
+        """GETs the agent snapshot, reconnecting once if a reused connection went stale."""
+        reused = self._writer is not None
+        try:
+            if not reused:
+                self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            return await self._request()
+        except (ConnectionError, asyncio.IncompleteReadError, OSError):
+            await self.close()
+            if not reused:
+                raise
+        # The agent may have closed the idle keep-alive connection; retry on a fresh one
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            return await self._request()
+        except BaseException:
+            await self.close()
+            raise
+
+class NodeState:
+    """Latest result of polling one agent."""
+
+    def __init__(self, address):
+        self.address = address
+        self.node = None           # Name reported by the agent
+        self.data = None           # Last successful agent snapshot
+        self.last_success = None   # time.time() of the last successful poll
+        self.last_error = None
+        self.poll_seconds = None
+
+    def to_dict(self, now):
+        age = now - self.last_success if self.last_success else None
+        return {
+            "address": self.address,
+            "node": self.node or self.address,
+            "status": "ok" if self.last_error is None else ("stale" if self.data else "down"),
+            "age_seconds": round(age, 3) if age is not None else None,
+            "poll_seconds": round(self.poll_seconds, 4) if self.poll_seconds is not None else None,
+            "last_error": self.last_error,
+            "sources": self.data.get("sources", {}) if self.data else {},
+        }
+
+class FleetPoller:
+    """
+    Polls all agents concurrently from one asyncio event loop in a background thread.
+    Every agent has its own polling task and keep-alive connection, and each poll is bounded
+    by `timeout`, so a slow or dead node only ages its own entry and never delays the others.
+    """
+
+    def __init__(self, agents, interval=5.0, timeout=3.0):
+        self.interval = interval
+        self.timeout = timeout
+        self.nodes = [NodeState(address) for address in agents]
+        self._lock = threading.Lock()
+        self._thread = None
+        self._loop = None
+        self._stop = None
+
+    async def _poll_node(self, state):
+        connection = AgentConnection(state.address)
+        try:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                try:
+                    data = await asyncio.wait_for(connection.fetch(), timeout=self.timeout)
+                    with self._lock:
+                        state.data = data
+                        state.node = data.get("node")
+                        state.last_success = time.time()
+                        state.last_error = None
+                        state.poll_seconds = time.monotonic() - started
+                except asyncio.TimeoutError:
+                    perf.timed_out("fleet poll")
+                    await connection.close()
+                    with self._lock:
+                        state.last_error = f"timed out after {self.timeout}s"
+                except Exception as e:
+                    await connection.close()
+                    with self._lock:
+                        state.last_error = str(e) or type(e).__name__
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=max(0.0, self.interval - (time.monotonic() - started)))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await connection.close()
+
+    async def _main(self):
+        self._stop = asyncio.Event()
+        await asyncio.gather(*(self._poll_node(state) for state in self.nodes))
+
+    def start(self):
+        """Starts the poller thread. Safe to call more than once."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_until_complete, args=(self._main(),),
+                                        name="fleet-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._loop and self._stop:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    def nodes_view(self):
+        now = time.time()
+        with self._lock:
+            return [state.to_dict(now) for state in self.nodes]
+
+def fleet_views(nodes):
+    """Fleet-wide views derived from the per-node entries: free GPUs, hottest GPUs, memory pressure."""
+    free_gpus = []
+    all_gpus = []
+    memory_pressure = []
+    for node in nodes:
+        sources = node["sources"]
+        gpus = (sources.get("gpu") or {}).get("data")
+        if isinstance(gpus, list):
+            for gpu in gpus:
+                entry = dict(gpu, node=node["node"], age_seconds=node["age_seconds"])
+                all_gpus.append(entry)
+                utilization = gpu.get("utilization_gpu")
+                used, total = gpu.get("memory_used_mb"), gpu.get("memory_total_mb")
+                if (isinstance(utilization, (int, float)) and isinstance(used, (int, float)) and isinstance(total, (int, float))
+                        and total > 0 and utilization <= FREE_GPU_MAX_UTILIZATION
+                        and used / total * 100 <= FREE_GPU_MAX_MEMORY_PERCENT):
+                    free_gpus.append(entry)
+        ram = (sources.get("ram_disk") or {}).get("data") or {}
+        if ram.get("total_bytes"):
+            memory_pressure.append({
+                "node": node["node"],
+                "used_percent": round(ram["used_bytes"] / ram["total_bytes"] * 100, 1),
+                "available_bytes": ram.get("available_bytes"),
+                "age_seconds": node["age_seconds"],
+            })
+
+    hottest = sorted((gpu for gpu in all_gpus if isinstance(gpu.get("temperature_gpu"), (int, float))),
+                     key=lambda gpu: gpu["temperature_gpu"], reverse=True)[:HOTTEST_GPUS_LIMIT]
+    memory_pressure.sort(key=lambda entry: entry["used_percent"], reverse=True)
+    return {
+        "free_gpus": free_gpus,
+        "hottest_gpus": hottest,
+        "memory_pressure": memory_pressure,
+        "nodes_total": len(nodes),
+        "nodes_ok": sum(1 for node in nodes if node["status"] == "ok"),
+    }
@@ -1,6 +1,51 @@
 import subprocess
 import csv
+import ctypes
+import ctypes.util
 import io
+import os
+import threading
+import time
+from collections import deque
+
+from utils.instrumentation import perf
+from utils.platform_registry import CURRENT_OS, capability
+
+# Fields requested from nvidia-smi, in the order they appear in each CSV row.
+# For more fields, see `nvidia-smi --help-query-gpu`
+GPU_QUERY_FIELDS = "name,pci.bus_id,driver_version,temperature.gpu,utilization.gpu,utilization.memory,memory.total,memory.free,memory.used"
+
+NVIDIA_SMI_NOT_FOUND = "nvidia-smi command not found. Make sure NVIDIA drivers are installed and nvidia-smi is in your system's PATH."
+
+def _to_number(value):
+    """Converts a numeric nvidia-smi field to float, leaving values like '[N/A]' as strings."""
+    value = value.strip()
+    return float(value) if value.replace('.', '', 1).isdigit() else value
+
+def parse_gpu_csv_row(row):
+    """
+    Converts one parsed CSV row of `nvidia-smi --query-gpu=GPU_QUERY_FIELDS` output
+    into a GPU dictionary. Returns None for empty or truncated rows.
+    """
+    if not row or len(row) < 9:  # Skip empty rows or rows with insufficient data
+        return None
+    return {
+        "name": row[0].strip(),
+        "pci_bus_id": row[1].strip(),
+        "driver_version": row[2].strip(),
+        "temperature_gpu": _to_number(row[3]),
+        "utilization_gpu": _to_number(row[4]), # %
+        "utilization_memory": _to_number(row[5]), # %
+        "memory_total_mb": _to_number(row[6]), # MiB
+        "memory_free_mb": _to_number(row[7]), # MiB
+        "memory_used_mb": _to_number(row[8]), # MiB
+    }
+
+def parse_gpu_csv_line(line):
+    """Parses a single line of nvidia-smi CSV output, see parse_gpu_csv_row."""
+    for row in csv.reader([line]):
+        return parse_gpu_csv_row(row)
+    return None
 
 def get_gpu_info():
     """
@@ -13,11 +58,12 @@ def get_gpu_info():
         # Adjust fields as needed. For more fields, see `nvidia-smi --help-query-gpu`
         command = [
             "nvidia-smi",
-            "--query-gpu=name,pci.bus_id,driver_version,temperature.gpu,utilization.gpu,utilization.memory,memory.total,memory.free,memory.used",
+            f"--query-gpu={GPU_QUERY_FIELDS}",
             "--format=csv,noheader,nounits"
         ]
         # Note: On Windows, nvidia-smi is typically in C:\Program Files\NVIDIA Corporation\NVSMI\
         # Ensure this path is in your system's PATH environment variable.
+        perf.spawned("nvidia-smi")
         process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, shell=False)
         stdout, stderr = process.communicate(timeout=15) # Added timeout
 
@@ -30,30 +76,21 @@ def get_gpu_info():
         # Use io.StringIO to treat the string output as a file for the csv reader
         csv_reader = csv.reader(io.StringIO(stdout))
         for row in csv_reader:
-            if not row or len(row) < 9:  # Skip empty rows or rows with insufficient data
-                continue
             try:
-                gpu_info_list.append({
-                    "name": row[0].strip(),
-                    "pci_bus_id": row[1].strip(),
-                    "driver_version": row[2].strip(),
-                    "temperature_gpu": float(row[3].strip()) if row[3].strip().replace('.', '', 1).isdigit() else row[3].strip(),
-                    "utilization_gpu": float(row[4].strip()) if row[4].strip().replace('.', '', 1).isdigit() else row[4].strip(), # %
-                    "utilization_memory": float(row[5].strip()) if row[5].strip().replace('.', '', 1).isdigit() else row[5].strip(), # %
-                    "memory_total_mb": float(row[6].strip()) if row[6].strip().replace('.', '', 1).isdigit() else row[6].strip(), # MiB
-                    "memory_free_mb": float(row[7].strip()) if row[7].strip().replace('.', '', 1).isdigit() else row[7].strip(), # MiB
-                    "memory_used_mb": float(row[8].strip()) if row[8].strip().replace('.', '', 1).isdigit() else row[8].strip(), # MiB
-                })
+                gpu = parse_gpu_csv_row(row)
+                if gpu:
+                    gpu_info_list.append(gpu)
             except ValueError as e:
                 print(f"ValueError parsing row {row}: {e}")
                 # Optionally skip this GPU or add placeholder data
                 continue
         return gpu_info_list
     except FileNotFoundError:
-        error_message = "nvidia-smi command not found. Make sure NVIDIA drivers are installed and nvidia-smi is in your system's PATH."
+        error_message = NVIDIA_SMI_NOT_FOUND
         print(error_message)
         return {"error": error_message}
     except subprocess.TimeoutExpired:
+        perf.timed_out("nvidia-smi")
         error_message = "nvidia-smi command timed out."
         print(error_message)
         return {"error": error_message}
@@ -62,6 +99,573 @@ def get_gpu_info():
         print(error_message)
         return {"error": "An unexpected error occurred", "details": str(e)}
 
+class GpuStreamCollector:
+    """
+    Keeps a single `nvidia-smi --loop-ms` process running and parses its CSV output
+    line by line as it arrives, instead of starting nvidia-smi for every sample.
+    The latest record of every GPU is kept keyed by its PCI bus id. If nvidia-smi
+    exits or cannot be started, it is restarted with an increasing back-off.
+
+    `command` can point at any executable producing the same CSV stream, which lets the
+    parser be exercised with a fake nvidia-smi script on machines without a GPU.
+    Lines can also be pushed directly with feed_line()/feed().
+
+    `available` is an optional check (e.g. a cached Capability) made before every start of
+    nvidia-smi; while it fails, no process is started and the back-off keeps growing.
+    """
+
+    MAX_RESTART_DELAY = 60
+    STDERR_TAIL_LINES = 20  # Lines of nvidia-smi's stderr kept for the error details
+
+    def __init__(self, loop_ms=1000, command=None, restart_delay=2.0, available=None):
+        self.loop_ms = int(loop_ms)
+        self.command = command or [
+            "nvidia-smi",
+            f"--query-gpu={GPU_QUERY_FIELDS}",
+            "--format=csv,noheader,nounits",
+            f"--loop-ms={self.loop_ms}",
+        ]
+        self.restart_delay = restart_delay
+        self.available = available
+        # GPUs not reported for this long are considered gone (e.g. fell off the bus)
+        self.stale_after = max(3 * self.loop_ms / 1000.0, 5.0)
+        self.restarts = 0
+        self._records = {}  # pci_bus_id -> (monotonic time seen, GPU dictionary)
+        self._error = None
+        self._lock = threading.Lock()
+        self._first_result = threading.Event()
+        self._stop_event = threading.Event()
+        self._process = None
+        self._thread = None
+
+    def feed_line(self, line):
+        """Parses one line of nvidia-smi CSV output and updates the record of that GPU."""
+        try:
+            gpu = parse_gpu_csv_line(line)
+        except ValueError as e:
+            print(f"ValueError parsing nvidia-smi line {line!r}: {e}")
+            return None
+        if gpu is None:
+            return None
+        with self._lock:
+            self._records[gpu["pci_bus_id"]] = (time.monotonic(), gpu)
+            self._error = None
+        self._first_result.set()
+        return gpu
+
+    def feed(self, lines):
+        """Consumes an iterable of lines, e.g. a file of recorded nvidia-smi output."""
+        for line in lines:
+            if self._stop_event.is_set():
+                break
+            self.feed_line(line)
+
+    def latest(self):
+        """Returns {pci_bus_id: GPU dictionary} for all GPUs reported recently."""
+        now = time.monotonic()
+        with self._lock:
+            return {bus_id: gpu for bus_id, (seen, gpu) in self._records.items() if now - seen <= self.stale_after}
+
+    def get_gpu_info(self, wait=5.0):
+        """
+        Same result shape as get_gpu_info(): a list of GPU dictionaries ordered by bus id,
+        or an error dictionary if nvidia-smi is not producing data.
+        Waits up to `wait` seconds for the first record right after startup.
+        """
+        if wait and not self._first_result.is_set():
+            self._first_result.wait(wait)
+        records = self.latest()
+        if records:
+            return [records[bus_id] for bus_id in sorted(records)]
+        with self._lock:
+            error = self._error
+        return error or {"error": "No data received from nvidia-smi yet."}
+
+    @staticmethod
+    def _drain(stream, tail):
+        """Reads `stream` to the end, keeping its last lines in `tail`, so the child never blocks on a full pipe."""
+        try:
+            for line in stream:
+                tail.append(line)
+        except (OSError, ValueError):
+            pass  # Closed while stopping
+
+    def _set_error(self, error):
+        with self._lock:
+            self._error = error
+        self._first_result.set()
+
+    def _run(self):
+        delay = self.restart_delay
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                if self.available is not None and not self.available():
+                    raise FileNotFoundError(self.command[0])
+                perf.spawned("nvidia-smi --loop-ms")
+                self._process = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                                 text=True, bufsize=1, shell=False)
+                stderr_tail = deque(maxlen=self.STDERR_TAIL_LINES)
+                drain = threading.Thread(target=self._drain, args=(self._process.stderr, stderr_tail),
+                                         name="gpu-stream-stderr", daemon=True)
+                drain.start()
+                self.feed(self._process.stdout)
+                self._process.stdout.close()
+                returncode = self._process.wait()
+                drain.join(timeout=1.0)
+                stderr = "".join(stderr_tail).strip()
+                if not self._stop_event.is_set():
+                    error_message = f"nvidia-smi exited (code {returncode}), restarting"
+                    print(error_message)
+                    self._set_error({"error": "Failed to execute nvidia-smi", "details": stderr or error_message})
+            except FileNotFoundError:
+                error_message = NVIDIA_SMI_NOT_FOUND
+                print(error_message)
+                self._set_error({"error": error_message})
+            except Exception as e:
+                print(f"An unexpected error occurred in the nvidia-smi stream: {e}")
+                self._set_error({"error": "An unexpected error occurred", "details": str(e)})
+            finally:
+                if self._process and self._process.poll() is None:
+                    self._process.kill()
+                    self._process.wait()
+
+            if self._stop_event.is_set():
+                break  # Stopped on purpose, not a restart
+            # Reset the back-off if the process ran fine for a while, otherwise grow it
+            if time.monotonic() - started > 60:
+                delay = self.restart_delay
+            self.restarts += 1
+            self._stop_event.wait(delay)
+            delay = min(delay * 2, self.MAX_RESTART_DELAY)
+
+    def start(self):
+        """Starts the nvidia-smi reader thread. Safe to call more than once."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="gpu-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        process = self._process
+        if process and process.poll() is None:
+            process.terminate()
+
+class NvmlError(Exception):
+    """Raised when NVML cannot be loaded or an NVML call returns an error code."""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+# NVML return codes and constants used below (see nvml.h)
+NVML_SUCCESS = 0
+NVML_ERROR_NOT_SUPPORTED = 3
+NVML_ERROR_INSUFFICIENT_SIZE = 7
+NVML_ERROR_FUNCTION_NOT_FOUND = 13
+NVML_ERROR_GPU_IS_LOST = 15
+NVML_TEMPERATURE_GPU = 0
+NVML_VALUE_NOT_AVAILABLE = 2 ** 64 - 1
+
+class _NvmlPciInfo(ctypes.Structure):
+    _fields_ = [
+        ("busIdLegacy", ctypes.c_char * 16),
+        ("domain", ctypes.c_uint),
+        ("bus", ctypes.c_uint),
+        ("device", ctypes.c_uint),
+        ("pciDeviceId", ctypes.c_uint),
+        ("pciSubSystemId", ctypes.c_uint),
+        ("busId", ctypes.c_char * 32),
+    ]
+
+class _NvmlUtilization(ctypes.Structure):
+    _fields_ = [("gpu", ctypes.c_uint), ("memory", ctypes.c_uint)]
+
+class _NvmlMemory(ctypes.Structure):
+    _fields_ = [("total", ctypes.c_ulonglong), ("free", ctypes.c_ulonglong), ("used", ctypes.c_ulonglong)]
+
+class _NvmlProcessInfo(ctypes.Structure):
+    _fields_ = [
+        ("pid", ctypes.c_uint),
+        ("usedGpuMemory", ctypes.c_ulonglong),
+        ("gpuInstanceId", ctypes.c_uint),
+        ("computeInstanceId", ctypes.c_uint),
+    ]
+
+class _NvmlProcessInfoV1(ctypes.Structure):
+    """Process info of the unversioned nvmlDeviceGetComputeRunningProcesses (drivers before 470)."""
+    _fields_ = [("pid", ctypes.c_uint), ("usedGpuMemory", ctypes.c_ulonglong)]
+
+# Argument types of the NVML functions used below; all of them return an nvmlReturn_t (int).
+# Device handles are opaque pointers and must not go through the default int conversion.
+_NVML_HANDLE = ctypes.c_void_p
+_NVML_PROTOTYPES = {
+    "nvmlInit_v2": [],
+    "nvmlShutdown": [],
+    "nvmlSystemGetDriverVersion": [ctypes.c_char_p, ctypes.c_uint],
+    "nvmlDeviceGetCount_v2": [ctypes.POINTER(ctypes.c_uint)],
+    "nvmlDeviceGetHandleByIndex_v2": [ctypes.c_uint, ctypes.POINTER(_NVML_HANDLE)],
+    "nvmlDeviceGetName": [_NVML_HANDLE, ctypes.c_char_p, ctypes.c_uint],
+    "nvmlDeviceGetPciInfo_v3": [_NVML_HANDLE, ctypes.POINTER(_NvmlPciInfo)],
+    "nvmlDeviceGetTemperature": [_NVML_HANDLE, ctypes.c_int, ctypes.POINTER(ctypes.c_uint)],
+    "nvmlDeviceGetUtilizationRates": [_NVML_HANDLE, ctypes.POINTER(_NvmlUtilization)],
+    "nvmlDeviceGetMemoryInfo": [_NVML_HANDLE, ctypes.POINTER(_NvmlMemory)],
+    "nvmlDeviceGetComputeRunningProcesses_v3": [_NVML_HANDLE, ctypes.POINTER(ctypes.c_uint), ctypes.POINTER(_NvmlProcessInfo)],
+    "nvmlDeviceGetComputeRunningProcesses_v2": [_NVML_HANDLE, ctypes.POINTER(ctypes.c_uint), ctypes.POINTER(_NvmlProcessInfo)],
+    "nvmlDeviceGetComputeRunningProcesses": [_NVML_HANDLE, ctypes.POINTER(ctypes.c_uint), ctypes.POINTER(_NvmlProcessInfoV1)],
+}
+
+# Compute process listings from newest to oldest, with the structure each one fills
+_NVML_COMPUTE_PROCESS_FUNCTIONS = [
+    ("nvmlDeviceGetComputeRunningProcesses_v3", _NvmlProcessInfo),
+    ("nvmlDeviceGetComputeRunningProcesses_v2", _NvmlProcessInfo),
+    ("nvmlDeviceGetComputeRunningProcesses", _NvmlProcessInfoV1),
+]
+
+class NvmlLibrary:
+    """
+    Thin ctypes wrapper around the parts of libnvidia-ml used by NvmlBackend.
+    The shared library is loaded once, when the wrapper is created.
+
+    NvmlBackend only relies on the methods below, so any object providing them
+    (e.g. a fake NVML shim in tests) can be passed to it instead. `library` takes an
+    already loaded library object instead of loading libnvidia-ml.
+    """
+
+    def __init__(self, path=None, library=None):
+        self._lib = library if library is not None else self._load(path)
+        self._functions = {}  # Name -> function with its prototype declared
+        self._compute_processes = None  # (function name, structure) supported by this driver
+
+    @staticmethod
+    def _load(path):
+        if path:
+            candidates = [path]
+        elif CURRENT_OS == "Windows":
+            candidates = ["nvml.dll", os.path.join(os.environ.get("ProgramFiles", "C:\\Program Files"),
+                                                   "NVIDIA Corporation", "NVSMI", "nvml.dll")]
+        else:
+            candidates = ["libnvidia-ml.so.1", "libnvidia-ml.so", ctypes.util.find_library("nvidia-ml")]
+        for candidate in candidates:
+            if not candidate:
+                continue
+            try:
+                return ctypes.CDLL(candidate)
+            except OSError:
+                continue
+        raise NvmlError("NVML library (libnvidia-ml) could not be loaded.")
+
+    def _function(self, function_name):
+        function = self._functions.get(function_name)
+        if function is None:
+            try:
+                function = getattr(self._lib, function_name)
+            except AttributeError:
+                raise NvmlError(f"NVML function {function_name} not available in this driver version.",
+                                NVML_ERROR_FUNCTION_NOT_FOUND)
+            if function_name == "nvmlErrorString":
+                function.argtypes = [ctypes.c_int]
+                function.restype = ctypes.c_char_p
+            else:
+                function.argtypes = _NVML_PROTOTYPES[function_name]
+                function.restype = ctypes.c_int
+            self._functions[function_name] = function
+        return function
+
+    def _call(self, function_name, *args):
+        code = self._function(function_name)(*args)
+        if code != NVML_SUCCESS:
+            message = self._function("nvmlErrorString")(code)
+            raise NvmlError(f"{function_name} failed: {message.decode(errors='replace')}", code)
+
+    def init(self):
+        self._call("nvmlInit_v2")
+
+    def shutdown(self):
+        self._call("nvmlShutdown")
+
+    def driver_version(self):
+        buffer = ctypes.create_string_buffer(80)
+        self._call("nvmlSystemGetDriverVersion", buffer, ctypes.c_uint(80))
+        return buffer.value.decode()
+
+    def device_count(self):
+        count = ctypes.c_uint()
+        self._call("nvmlDeviceGetCount_v2", ctypes.byref(count))
+        return count.value
+
+    def device_handle(self, index):
+        handle = ctypes.c_void_p()
+        self._call("nvmlDeviceGetHandleByIndex_v2", ctypes.c_uint(index), ctypes.byref(handle))
+        return handle
+
+    def device_name(self, handle):
+        buffer = ctypes.create_string_buffer(96)
+        self._call("nvmlDeviceGetName", handle, buffer, ctypes.c_uint(96))
+        return buffer.value.decode()
+
+    def device_pci_bus_id(self, handle):
+        pci_info = _NvmlPciInfo()
+        self._call("nvmlDeviceGetPciInfo_v3", handle, ctypes.byref(pci_info))
+        return pci_info.busId.decode()
+
+    def device_temperature(self, handle):
+        temperature = ctypes.c_uint()
+        self._call("nvmlDeviceGetTemperature", handle, NVML_TEMPERATURE_GPU, ctypes.byref(temperature))
+        return temperature.value
+
+    def device_utilization(self, handle):
+        """Returns (gpu %, memory %)."""
+        utilization = _NvmlUtilization()
+        self._call("nvmlDeviceGetUtilizationRates", handle, ctypes.byref(utilization))
+        return utilization.gpu, utilization.memory
+
+    def device_memory(self, handle):
+        """Returns (total, free, used) in bytes."""
+        memory = _NvmlMemory()
+        self._call("nvmlDeviceGetMemoryInfo", handle, ctypes.byref(memory))
+        return memory.total, memory.free, memory.used
+
+    def device_compute_processes(self, handle):
+        """
+        Returns [(pid, used GPU memory in bytes or None)] for the compute processes on a device.
+        Uses the newest version of nvmlDeviceGetComputeRunningProcesses the driver provides.
+        """
+        if self._compute_processes is not None:
+            return self._compute_processes_with(handle, *self._compute_processes)
+        for function_name, structure in _NVML_COMPUTE_PROCESS_FUNCTIONS:
+            try:
+                processes = self._compute_processes_with(handle, function_name, structure)
+            except NvmlError as e:
+                if e.code == NVML_ERROR_FUNCTION_NOT_FOUND:
+                    continue  # Older driver, try the previous version
+                raise
+            self._compute_processes = (function_name, structure)
+            return processes
+        raise NvmlError("No version of nvmlDeviceGetComputeRunningProcesses is available in this driver.",
+                        NVML_ERROR_FUNCTION_NOT_FOUND)
+
+    def _compute_processes_with(self, handle, function_name, structure):
+        capacity = 64
+        while True:
+            count = ctypes.c_uint(capacity)
+            infos = (structure * capacity)()
+            try:
+                self._call(function_name, handle, ctypes.byref(count), infos)
+                break
+            except NvmlError as e:
+                if e.code != NVML_ERROR_INSUFFICIENT_SIZE:
+                    raise
+                capacity = max(count.value, capacity * 2)  # More processes than slots, retry with more
+        return [(info.pid, None if info.usedGpuMemory == NVML_VALUE_NOT_AVAILABLE else info.usedGpuMemory)
+                for info in infos[:count.value]]
+
+class GpuBackend:
+    """
+    Interface shared by all GPU data sources. get_gpu_info() returns the same shape as
+    the module-level get_gpu_info(): a list of GPU dictionaries or an error dictionary.
+    """
+    name = "base"
+
+    def start(self):
+        """Prepares the backend for sampling. Safe to call more than once."""
+
+    def stop(self):
+        """Releases resources held by the backend."""
+
+    def get_gpu_info(self):
+        raise NotImplementedError
+
+    def get_compute_processes(self):
+        """
+        Processes currently using a GPU: a list of {"pid", "gpu_bus_id", "used_memory_mb",
+        "process_name"} dictionaries (process_name may be None), or an error dictionary.
+        """
+        raise NotImplementedError
+
+class NvidiaSmiBackend(GpuBackend):
+    """GPU data from a persistent nvidia-smi process, see GpuStreamCollector."""
+    name = "nvidia-smi"
+
+    def __init__(self, loop_ms=1000, command=None, available=None):
+        self.available = available
+        self.stream = GpuStreamCollector(loop_ms=loop_ms, command=command, available=available)
+
+    def start(self):
+        self.stream.start()
+
+    def stop(self):
+        self.stream.stop()
+
+    def get_gpu_info(self):
+        return self.stream.get_gpu_info()
+
+    def get_compute_processes(self):
+        if self.available is not None and not self.available():
+            return {"error": NVIDIA_SMI_NOT_FOUND}
+        return query_compute_apps()
+
+class NvmlBackend(GpuBackend):
+    """
+    In-process GPU data through NVML. Device handles and static properties (name,
+    PCI bus id, driver version) are looked up once and reused, so a sample is just
+    a handful of library calls per GPU.
+    """
+    name = "nvml"
+    BYTES_PER_MB = 1024 * 1024
+
+    def __init__(self, nvml=None):
+        self.nvml = nvml if nvml is not None else NvmlLibrary()
+        self._initialized = False
+        self._devices = None  # List of (handle, static GPU fields)
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if not self._initialized:
+                self.nvml.init()
+                self._initialized = True
+
+    def stop(self):
+        with self._lock:
+            if self._initialized:
+                self._initialized = False
+                self._devices = None
+                try:
+                    self.nvml.shutdown()
+                except NvmlError as e:
+                    print(f"NVML shutdown failed: {e}")
+
+    def _enumerate_devices(self):
+        driver_version = self.nvml.driver_version()
+        devices = []
+        for index in range(self.nvml.device_count()):
+            handle = self.nvml.device_handle(index)
+            devices.append((handle, {
+                "name": self.nvml.device_name(handle),
+                "pci_bus_id": self.nvml.device_pci_bus_id(handle),
+                "driver_version": driver_version,
+            }))
+        return devices
+
+    def _read_or_na(self, function, handle):
+        # Mirrors nvidia-smi, which reports unsupported readings as '[N/A]'
+        try:
+            return function(handle)
+        except NvmlError as e:
+            if e.code == NVML_ERROR_GPU_IS_LOST:
+                raise
+            return None
+
+    def get_gpu_info(self):
+        try:
+            self.start()
+            with self._lock:
+                if self._devices is None:
+                    self._devices = self._enumerate_devices()
+                devices = self._devices
+
+            gpu_info_list = []
+            for handle, static_fields in devices:
+                gpu = dict(static_fields)
+                temperature = self._read_or_na(self.nvml.device_temperature, handle)
+                utilization = self._read_or_na(self.nvml.device_utilization, handle)
+                memory = self._read_or_na(self.nvml.device_memory, handle)
+                gpu["temperature_gpu"] = float(temperature) if temperature is not None else "[N/A]"
+                gpu["utilization_gpu"] = float(utilization[0]) if utilization else "[N/A]"  # %
+                gpu["utilization_memory"] = float(utilization[1]) if utilization else "[N/A]"  # %
+                if memory:
+                    total, free, used = memory
+                    gpu["memory_total_mb"] = float(total // self.BYTES_PER_MB)  # MiB
+                    gpu["memory_free_mb"] = float(free // self.BYTES_PER_MB)  # MiB
+                    gpu["memory_used_mb"] = float(used // self.BYTES_PER_MB)  # MiB
+                else:
+                    gpu["memory_total_mb"] = gpu["memory_free_mb"] = gpu["memory_used_mb"] = "[N/A]"
+                gpu_info_list.append(gpu)
+            return gpu_info_list
+        except NvmlError as e:
+            # Handles may be invalid now (GPU lost, driver reloaded), enumerate again next time
+            with self._lock:
+                self._devices = None
+            print(f"NVML error in get_gpu_info: {e}")
+            return {"error": "Failed to query GPUs through NVML", "details": str(e)}
+
+    def get_compute_processes(self):
+        try:
+            self.start()
+            with self._lock:
+                if self._devices is None:
+                    self._devices = self._enumerate_devices()
+                devices = self._devices
+            processes = []
+            for handle, static_fields in devices:
+                for pid, used_bytes in self.nvml.device_compute_processes(handle):
+                    processes.append({
+                        "pid": pid,
+                        "gpu_bus_id": static_fields["pci_bus_id"],
+                        "used_memory_mb": float(used_bytes // self.BYTES_PER_MB) if used_bytes is not None else "[N/A]",
+                        "process_name": None,
+                    })
+            return processes
+        except NvmlError as e:
+            with self._lock:
+                self._devices = None
+            print(f"NVML error in get_compute_processes: {e}")
+            return {"error": "Failed to query GPU processes through NVML", "details": str(e)}
+
+def query_compute_apps(command=None):
+    """
+    Lists the processes using a GPU with `nvidia-smi --query-compute-apps`.
+    Returns dictionaries shaped like GpuBackend.get_compute_processes(), or an error dictionary.
+    """
+    command = command or ["nvidia-smi", "--query-compute-apps=pid,process_name,used_memory,gpu_bus_id",
+                          "--format=csv,noheader,nounits"]
+    try:
+        perf.spawned("nvidia-smi --query-compute-apps")
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, shell=False)
+        stdout, stderr = process.communicate(timeout=15)
+        if process.returncode != 0:
+            return {"error": "Failed to execute nvidia-smi --query-compute-apps", "details": stderr.strip()}
+        processes = []
+        for row in csv.reader(io.StringIO(stdout)):
+            if len(row) < 4 or not row[0].strip().isdigit():
+                continue
+            processes.append({
+                "pid": int(row[0].strip()),
+                "process_name": row[1].strip(),
+                "used_memory_mb": _to_number(row[2]), # MiB
+                "gpu_bus_id": row[3].strip(),
+            })
+        return processes
+    except FileNotFoundError:
+        return {"error": NVIDIA_SMI_NOT_FOUND}
+    except subprocess.TimeoutExpired:
+        perf.timed_out("nvidia-smi --query-compute-apps")
+        return {"error": "nvidia-smi --query-compute-apps timed out."}
+    except Exception as e:
+        return {"error": "An unexpected error occurred", "details": str(e)}
+
+def create_gpu_backend(loop_ms=1000, preferred=None):
+    """
+    Picks the GPU backend to use. NVML is preferred; if it cannot be loaded or
+    initialized the nvidia-smi stream is used instead. `preferred` (or the
+    DASHBOARD_GPU_BACKEND environment variable) may force "nvml" or "nvidia-smi".
+    """
+    preferred = (preferred or os.environ.get("DASHBOARD_GPU_BACKEND", "auto")).lower()
+    if preferred in ("auto", "nvml"):
+        try:
+            backend = NvmlBackend()
+            backend.start()
+            print("Using NVML GPU backend")
+            return backend
+        except NvmlError as e:
+            print(f"NVML unavailable ({e}), falling back to nvidia-smi")
+    # Without nvidia-smi on PATH the backend reports an error instead of trying to start it,
+    # until the cached probe finds it
+    return NvidiaSmiBackend(loop_ms=loop_ms, available=capability("nvidia-smi").available)
+
 if __name__ == '__main__':
     # For testing the function directly
     info = get_gpu_info()
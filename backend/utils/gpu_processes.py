@@ -0,0 +1,238 @@
+import os
+import re
+import threading
+import time
+
+from utils.instrumentation import perf
+
+try:
+    import pwd
+except ImportError:  # Windows; GPU processes are only attributed on POSIX systems
+    pwd = None
+
+# Container names in /proc/<pid>/cgroup paths: LXD/LXC 4+ put the payload of a container
+# in 'lxc.payload.<name>' (cgroup v2, or v1 hierarchies), older LXC in '/lxc/<name>/'.
+_LXC_PAYLOAD_RE = re.compile(r"/lxc\.payload\.([^/]+)")
+_LXC_LEGACY_RE = re.compile(r"/lxc/([^/]+)")
+
+def container_from_cgroup(text):
+    """
+    Returns the LXC container name found in the contents of a /proc/<pid>/cgroup file,
+    or None if the process runs on the host (or in a cgroup this does not recognise).
+    """
+    for line in text.splitlines():
+        path = line.split(":", 2)[-1]
+        match = _LXC_PAYLOAD_RE.search(path) or _LXC_LEGACY_RE.search(path)
+        if match:
+            return match.group(1)
+    return None
+
+class _ProcessIdentity:
+    """Who a GPU process belongs to; fixed for the lifetime of the process, so read once per PID."""
+    __slots__ = ("start_ticks", "name", "uid", "user", "container")
+
+    def __init__(self, start_ticks, name, uid, user, container):
+        self.start_ticks = start_ticks
+        self.name = name
+        self.uid = uid
+        self.user = user
+        self.container = container
+
+def _add_usage(groups, key, gpu_bus_id, used_mb, extra=None):
+    entry = groups.get(key)
+    if entry is None:
+        entry = groups[key] = dict(extra or {}, process_count=0, used_memory_mb=0.0, gpus=set())
+    entry["process_count"] += 1
+    if isinstance(used_mb, (int, float)):
+        entry["used_memory_mb"] += used_mb
+    if gpu_bus_id:
+        entry["gpus"].add(gpu_bus_id)
+
+def _finish_groups(groups, key_name):
+    result = []
+    for key, entry in groups.items():
+        entry = dict(entry, gpus=sorted(entry["gpus"]))
+        entry[key_name] = key
+        result.append(entry)
+    result.sort(key=lambda entry: entry["used_memory_mb"], reverse=True)
+    return result
+
+class GpuProcessAttribution:
+    """
+    Correlates the processes using a GPU with their owner and their LXC container.
+
+    `list_processes()` returns the GPU compute processes as produced by
+    GpuBackend.get_compute_processes() (a list of {"pid", "gpu_bus_id", "used_memory_mb",
+    "process_name"}, or an error dictionary). Each PID is resolved once through
+    /proc/<pid>/stat, status and cgroup and cached; the cache entry is dropped when the
+    process exits and re-read when its start time changes (PID reuse), so a refresh only
+    touches /proc for processes that started using a GPU since the previous one.
+    The container -> PIDs index is updated from the same additions and removals.
+
+    `proc_root` can point at a synthetic /proc tree for testing.
+    """
+
+    def __init__(self, list_processes, proc_root="/proc"):
+        self.list_processes = list_processes
+        self.proc_root = proc_root
+        self._identities = {}   # pid -> _ProcessIdentity
+        self._containers = {}   # container name -> set of pids
+        self._user_names = {}   # uid -> user name
+        self._lock = threading.Lock()
+
+    # --- /proc lookups ---
+
+    def _read(self, *parts):
+        with open(os.path.join(self.proc_root, *parts), "rb") as f:
+            return f.read()
+
+    def _start_ticks(self, pid):
+        """Process start time in clock ticks since boot (field 22 of /proc/<pid>/stat), or None if gone."""
+        try:
+            stat = self._read(str(pid), "stat")
+        except OSError:
+            return None
+        # The command name may contain spaces and parentheses, the fields start after the last ')'
+        fields = stat[stat.rfind(b")") + 2:].split()
+        return int(fields[19]) if len(fields) > 19 else None
+
+    def _user_name(self, uid):
+        name = self._user_names.get(uid)
+        if name is None:
+            try:
+                name = pwd.getpwuid(uid).pw_name if pwd is not None else str(uid)
+            except KeyError:
+                name = str(uid)  # E.g. the shifted UIDs of unprivileged containers
+            self._user_names[uid] = name
+        return name
+
+    def _load_identity(self, pid, start_ticks):
+        name = None
+        uid = None
+        try:
+            for line in self._read(str(pid), "status").splitlines():
+                if line.startswith(b"Name:"):
+                    name = line.split(b":", 1)[1].strip().decode(errors="replace")
+                elif line.startswith(b"Uid:"):
+                    uid = int(line.split()[1])  # Real UID
+                    break
+        except OSError:
+            pass
+        try:
+            container = container_from_cgroup(self._read(str(pid), "cgroup").decode(errors="replace"))
+        except OSError:
+            container = None
+        user = self._user_name(uid) if uid is not None else None
+        return _ProcessIdentity(start_ticks, name, uid, user, container)
+
+    # --- Incremental index maintenance ---
+
+    def _forget(self, pid):
+        identity = self._identities.pop(pid, None)
+        if identity is not None and identity.container is not None:
+            pids = self._containers.get(identity.container)
+            if pids is not None:
+                pids.discard(pid)
+                if not pids:
+                    del self._containers[identity.container]
+
+    def _identify(self, pid):
+        start_ticks = self._start_ticks(pid)
+        identity = self._identities.get(pid)
+        if identity is not None and identity.start_ticks == start_ticks:
+            perf.cache_access("gpu_process_identity", hits=1)
+            return identity
+        perf.cache_access("gpu_process_identity", misses=1)
+        if identity is not None:
+            self._forget(pid)  # The PID was reused by another process
+        identity = self._load_identity(pid, start_ticks)
+        self._identities[pid] = identity
+        if identity.container is not None:
+            self._containers.setdefault(identity.container, set()).add(pid)
+        return identity
+
+    def container_pids(self):
+        """The container -> GPU-using PIDs index as of the last refresh."""
+        with self._lock:
+            return {name: sorted(pids) for name, pids in self._containers.items()}
+
+    # --- Public API ---
+
+    def refresh(self):
+        """
+        Collects the GPU processes and returns
+        {"timestamp", "processes", "by_container", "by_user", "by_gpu"}, or an error dictionary.
+        GPU memory is reported in MiB; "host" stands for processes outside any container.
+        """
+        processes = self.list_processes()
+        if not isinstance(processes, list):
+            return processes  # Error dictionary from the GPU backend
+
+        rows = []
+        by_container = {}
+        by_user = {}
+        by_gpu = {}
+        with self._lock:
+            seen = set()
+            for process in processes:
+                pid = process.get("pid")
+                if not isinstance(pid, int):
+                    continue
+                seen.add(pid)
+                identity = self._identify(pid)
+                used_mb = process.get("used_memory_mb")
+                gpu_bus_id = process.get("gpu_bus_id")
+                container = identity.container
+                rows.append({
+                    "pid": pid,
+                    "name": identity.name or process.get("process_name"),
+                    "user": identity.user,
+                    "uid": identity.uid,
+                    "container": container,
+                    "gpu_bus_id": gpu_bus_id,
+                    "used_memory_mb": used_mb,
+                })
+                _add_usage(by_container, container or "host", gpu_bus_id, used_mb)
+                _add_usage(by_user, identity.user or "unknown", gpu_bus_id, used_mb)
+                _add_usage(by_gpu, gpu_bus_id, None, used_mb)
+            for pid in [pid for pid in self._identities if pid not in seen]:
+                self._forget(pid)
+
+        rows.sort(key=lambda row: row["used_memory_mb"] if isinstance(row["used_memory_mb"], (int, float)) else -1, reverse=True)
+        gpus = _finish_groups(by_gpu, "gpu_bus_id")
+        for gpu in gpus:
+            del gpu["gpus"]
+        return {
+            "timestamp": time.time(),
+            "processes": rows,
+            "by_container": _finish_groups(by_container, "container"),
+            "by_user": _finish_groups(by_user, "user"),
+            "by_gpu": gpus,
+        }
+
+def create_gpu_process_collector(list_processes):
+    """The gpu_processes collector on Linux: refreshes a GpuProcessAttribution of `list_processes`."""
+    return GpuProcessAttribution(list_processes).refresh
+
+def annotate_containers(containers, attribution):
+    """
+    Fills the "gpus_used" field of get_lxc_info() results from a GpuProcessAttribution.refresh()
+    result: per container, the GPUs its processes use with their process count and memory.
+    Returns `containers` unchanged if either side is an error.
+    """
+    if not isinstance(containers, list) or not isinstance(attribution, dict) or "processes" not in attribution:
+        return containers
+    usage = {}
+    for process in attribution["processes"]:
+        if process["container"] is None:
+            continue
+        gpus = usage.setdefault(process["container"], {})
+        gpu = gpus.setdefault(process["gpu_bus_id"], {"gpu_bus_id": process["gpu_bus_id"], "pids": [], "used_memory_mb": 0.0})
+        gpu["pids"].append(process["pid"])
+        if isinstance(process["used_memory_mb"], (int, float)):
+            gpu["used_memory_mb"] += process["used_memory_mb"]
+    annotated = []
+    for container in containers:
+        gpus = usage.get(container.get("name"), {})
+        annotated.append(dict(container, gpus_used=sorted(gpus.values(), key=lambda gpu: gpu["gpu_bus_id"] or "")))
+    return annotated
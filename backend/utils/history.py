@@ -0,0 +1,315 @@
+import fnmatch
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+# (resolution seconds, retention seconds) of each rollup tier, finest first:
+# 1 s for 10 minutes, 10 s for 6 hours, 1 minute for 7 days.
+DEFAULT_TIERS = [(1, 10 * 60), (10, 6 * 3600), (60, 7 * 24 * 3600)]
+
+# Slots a ring buffer starts with; it doubles as it fills, up to its capacity
+INITIAL_BUFFER_SLOTS = 64
+
+# Seconds (of sample time) between two scans for series whose device is gone
+EVICTION_INTERVAL = 600
+
+# Filesystems and mount points whose usage is not recorded: pseudo and in-memory filesystems,
+# container root filesystems (overlay, LXD/Docker storage) and snaps, which come and go with
+# the containers and would each leave a series behind
+SKIPPED_FSTYPES = {"overlay", "aufs", "tmpfs", "devtmpfs", "ramfs", "squashfs", "nsfs", "fuse.lxcfs"}
+SKIPPED_MOUNT_PREFIXES = ("/run/", "/snap/", "/var/snap/", "/var/lib/docker/", "/var/lib/containers/",
+                          "/var/lib/lxd/", "/var/lib/incus/")
+
+class RingBuffer:
+    """
+    Buffer of at most `capacity` (timestamp, value) pairs backed by two arrays of doubles,
+    which start at INITIAL_BUFFER_SLOTS and double as they fill, so a short-lived series does
+    not hold a week of slots. Once full, each append overwrites the oldest entry. Timestamps
+    must be appended in increasing order, which keeps each of the (at most two) contiguous
+    runs of the buffer sorted so range lookups are binary searches plus array slices.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        slots = min(capacity, INITIAL_BUFFER_SLOTS)
+        self.timestamps = array("d", bytes(8 * slots))
+        self.values = array("d", bytes(8 * slots))
+        self.head = 0   # Next slot to write
+        self.count = 0
+
+    def append(self, timestamp, value):
+        if self.head == len(self.timestamps) and self.head < self.capacity:
+            # Not wrapped yet, so the data is the prefix [0, head): grow in place
+            grow = min(self.capacity, 2 * self.head) - self.head
+            self.timestamps.extend(array("d", bytes(8 * grow)))
+            self.values.extend(array("d", bytes(8 * grow)))
+        self.timestamps[self.head] = timestamp
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def _runs(self):
+        """(start, end) index ranges of the stored data, oldest run first."""
+        if self.count < self.capacity:
+            return [(0, self.count)]
+        return [(self.head, self.capacity), (0, self.head)]
+
+    def range(self, start, end):
+        """Returns (timestamps, values) arrays for start <= timestamp <= end, oldest first."""
+        timestamps = array("d")
+        values = array("d")
+        for lo, hi in self._runs():
+            if lo == hi or self.timestamps[hi - 1] < start or self.timestamps[lo] > end:
+                continue
+            first = bisect_left(self.timestamps, start, lo, hi)
+            last = bisect_right(self.timestamps, end, lo, hi)
+            timestamps.extend(self.timestamps[first:last])
+            values.extend(self.values[first:last])
+        return timestamps, values
+
+    def oldest(self):
+        if not self.count:
+            return None
+        return self.timestamps[self._runs()[0][0]]
+
+class Tier:
+    """
+    One retention tier: samples are averaged into buckets of `resolution` seconds and each
+    completed bucket is stored in a ring buffer holding `retention` seconds of history.
+    The bucket currently being filled is kept as a running sum and count.
+    """
+
+    def __init__(self, resolution, retention):
+        self.resolution = resolution
+        self.retention = retention
+        self.buffer = RingBuffer(max(1, int(retention // resolution)))
+        self._bucket = None
+        self._sum = 0.0
+        self._count = 0
+
+    def add(self, timestamp, value):
+        bucket = math.floor(timestamp / self.resolution)
+        if bucket != self._bucket:
+            self.flush()
+            self._bucket = bucket
+        self._sum += value
+        self._count += 1
+
+    def flush(self):
+        if self._count and (self.buffer.count == 0 or
+                            self._bucket * self.resolution > self.buffer.timestamps[self.buffer.head - 1]):
+            self.buffer.append(self._bucket * self.resolution, self._sum / self._count)
+        self._sum = 0.0
+        self._count = 0
+
+    def range(self, start, end):
+        timestamps, values = self.buffer.range(start, end)
+        # Include the partially filled current bucket so the newest data is visible right away
+        if self._count:
+            bucket_start = self._bucket * self.resolution
+            if start <= bucket_start <= end:
+                timestamps.append(bucket_start)
+                values.append(self._sum / self._count)
+        return timestamps, values
+
+class MetricSeries:
+    """All rollup tiers of one metric for one device."""
+
+    def __init__(self, tiers):
+        self.tiers = [Tier(resolution, retention) for resolution, retention in tiers]
+        self.last_timestamp = None
+
+    def add(self, timestamp, value):
+        self.last_timestamp = timestamp
+        for tier in self.tiers:
+            tier.add(timestamp, value)
+
+    def select_tier(self, start, resolution=None, now=None):
+        """
+        Picks the finest tier that is at least as coarse as `resolution` and still
+        retains data back to `start`; falls back to the coarsest tier.
+        """
+        now = now if now is not None else time.time()
+        for tier in self.tiers:
+            if resolution and tier.resolution < resolution:
+                continue
+            if now - start <= tier.retention:
+                return tier
+        return self.tiers[-1]
+
+def _numeric(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def extract_gpu_metrics(data):
+    """Yields (metric, device, value) from a GPU snapshot (list of GPU dictionaries)."""
+    if not isinstance(data, list):
+        return
+    for gpu in data:
+        device = gpu.get("pci_bus_id")
+        for field in ("utilization_gpu", "utilization_memory", "memory_used_mb", "temperature_gpu"):
+            value = gpu.get(field)
+            if _numeric(value):
+                yield f"gpu.{field}", device, value
+
+def extract_cpu_metrics(data):
+    """Yields (metric, device, value) from a CPU snapshot (total and per-core utilization)."""
+    if not isinstance(data, dict):
+        return
+    if _numeric(data.get("utilization_percent")):
+        yield "cpu.utilization", "all", data["utilization_percent"]
+    for index, value in enumerate(data.get("per_core_utilization") or []):
+        yield "cpu.utilization", f"cpu{index}", value
+
+def extract_ram_disk_metrics(data):
+    """Yields (metric, device, value) from a RAM/disk snapshot."""
+    if not isinstance(data, dict):
+        return
+    ram = data.get("ram") or {}
+    for field in ("used_bytes", "available_bytes"):
+        if _numeric(ram.get(field)):
+            yield f"ram.{field}", "system", ram[field]
+    disks = data.get("disk")
+    if isinstance(disks, list):
+        for disk in disks:
+            if not _numeric(disk.get("used_bytes")) or not is_recorded_mount(disk):
+                continue
+            yield "disk.used_bytes", disk.get("mounted_on") or disk.get("filesystem"), disk["used_bytes"]
+
+def is_recorded_mount(disk):
+    """Whether the usage of a disk entry is worth a series: not a pseudo, overlay or container storage mount."""
+    if disk.get("fstype") in SKIPPED_FSTYPES:
+        return False
+    mount_point = disk.get("mounted_on") or ""
+    return not mount_point.startswith(SKIPPED_MOUNT_PREFIXES)
+
+def extract_disk_io_metrics(data):
+    """Yields (metric, device, value) from a disk I/O snapshot: throughput, IOPS and utilization per disk."""
+    if not isinstance(data, dict):
+        return
+    for disk in data.get("devices") or []:
+        for field in ("read_bytes_per_second", "write_bytes_per_second", "read_iops", "write_iops", "utilization_percent"):
+            if _numeric(disk.get(field)):
+                yield f"diskio.{field}", disk.get("name"), disk[field]
+
+def extract_network_metrics(data):
+    """
+    Yields (metric, device, value) from a network snapshot: receive/transmit rates per interface.
+    Container veth interfaces are left out; their traffic shows on the bridge.
+    """
+    if not isinstance(data, dict):
+        return
+    for interface in data.get("interfaces") or []:
+        name = interface.get("name") or ""
+        if name.startswith("veth"):
+            continue
+        for field in ("rx_bytes_per_second", "tx_bytes_per_second", "utilization_percent"):
+            if _numeric(interface.get(field)):
+                yield f"net.{field}", name, interface[field]
+
+# Snapshot sources recorded by HistoryStore.record_snapshot and how to extract their metrics
+EXTRACTORS = {
+    "gpu": extract_gpu_metrics,
+    "cpu": extract_cpu_metrics,
+    "ram_disk": extract_ram_disk_metrics,
+    "disk_io": extract_disk_io_metrics,
+    "network": extract_network_metrics,
+}
+
+class HistoryStore:
+    """
+    In-memory time-series store keyed by (metric, device), e.g. ("gpu.utilization_gpu", "00000000:01:00.0").
+    Memory is bounded: every series holds at most the ring buffers of its tiers, and a series
+    without points for longer than the coarsest retention (a removed disk, a deleted container)
+    is dropped, so devices that come and go do not accumulate.
+    """
+
+    def __init__(self, tiers=None):
+        self.tier_spec = tiers or DEFAULT_TIERS
+        self.retention = max(retention for _, retention in self.tier_spec)
+        self._series = {}
+        self._newest = None         # Newest timestamp recorded, the clock of the eviction
+        self._evicted_at = None
+        self._lock = threading.Lock()
+
+    def record(self, metric, device, timestamp, value):
+        with self._lock:
+            series = self._series.get((metric, device))
+            if series is None:
+                series = self._series[(metric, device)] = MetricSeries(self.tier_spec)
+            series.add(timestamp, float(value))
+            if self._newest is None or timestamp > self._newest:
+                self._newest = timestamp
+                if self._evicted_at is None:
+                    self._evicted_at = timestamp
+                elif timestamp - self._evicted_at >= EVICTION_INTERVAL:
+                    self._evict(timestamp)
+
+    def _evict(self, now):
+        """Drops the series whose newest point is older than the coarsest retention."""
+        self._evicted_at = now
+        for key in [key for key, series in self._series.items() if now - series.last_timestamp > self.retention]:
+            del self._series[key]
+
+    def record_snapshot(self, snapshot):
+        """Sampler listener: records the metrics of a new snapshot, if its source is tracked."""
+        extractor = EXTRACTORS.get(snapshot.source)
+        if extractor is None:
+            return
+        for metric, device, value in extractor(snapshot.data):
+            self.record(metric, device, snapshot.timestamp, value)
+
+    def catalog(self):
+        """{metric: [devices]} for everything recorded so far."""
+        catalog = {}
+        with self._lock:
+            keys = list(self._series)
+        for metric, device in sorted(keys):
+            catalog.setdefault(metric, []).append(device)
+        return catalog
+
+    def keys(self, metric=None, device=None):
+        """Sorted (metric, device) pairs of the recorded series matching the `metric`/`device` globs (None matches all)."""
+        with self._lock:
+            keys = list(self._series)
+        return sorted(key for key in keys
+                      if (metric is None or fnmatch.fnmatchcase(key[0], metric))
+                      and (device is None or fnmatch.fnmatchcase(str(key[1]), device)))
+
+    def read(self, metric, device, start=None, end=None, resolution=None):
+        """
+        (resolution, timestamps, values) of one series between `start` and `end`, from the tier
+        query() would use. Without `start`, everything the coarsest tier retains is returned.
+        """
+        now = time.time()
+        end = end if end is not None else now
+        with self._lock:
+            series = self._series[(metric, device)]
+            if start is None:
+                start = end - series.tiers[-1].retention
+            tier = series.select_tier(start, resolution, now)
+            timestamps, values = tier.range(start, end)
+        return tier.resolution, timestamps, values
+
+    def query(self, metric, device=None, start=None, end=None, resolution=None):
+        """
+        Returns the history of `metric` between `start` and `end` (epoch seconds; default: the
+        last hour up to now) for one device, or for all devices of the metric if `device` is None.
+        The resolution used is the finest stored one that is at least `resolution` seconds and
+        still covers `start`.
+        """
+        now = time.time()
+        end = end if end is not None else now
+        start = start if start is not None else end - 3600
+        result = {"metric": metric, "start": start, "end": end, "resolution": None, "series": {}}
+        with self._lock:
+            for (series_metric, series_device), series in self._series.items():
+                if series_metric != metric or (device is not None and series_device != device):
+                    continue
+                tier = series.select_tier(start, resolution, now)
+                timestamps, values = tier.range(start, end)
+                result["resolution"] = tier.resolution
+                result["series"][series_device] = {"timestamps": timestamps.tolist(), "values": values.tolist()}
+        return result
@@ -0,0 +1,121 @@
+import gzip
+import hashlib
+import threading
+
+from utils.instrumentation import perf
+
+try:
+    import brotli  # Optional: enables the 'br' content encoding
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 512
+# Cached (source, variant) bodies; variants come from query parameters, so the oldest are evicted
+MAX_CACHED_BODIES = 256
+
+def parse_accept_encoding(header):
+    """Returns {coding: q} from an Accept-Encoding header value."""
+    codings = {}
+    for part in (header or "").split(","):
+        coding, *params = part.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value.strip())
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+def choose_encoding(header, available=None):
+    """
+    Picks the first of `available` codings that an Accept-Encoding header accepts, or None.
+    By default 'br' (if brotli is installed) is preferred over 'gzip'.
+    """
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get("*", 0.0)
+    if available is None:
+        available = (["br"] if brotli else []) + ["gzip"]
+    for coding in available:
+        if codings.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header value matches `etag` (weak comparison, as for GET)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag.strip('"')
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.strip('"') == bare:
+            return True
+    return False
+
+class EncodedBody:
+    """
+    The serialized bytes of one response body with their ETag (a content hash).
+    Compressed variants are produced lazily, once, the first time a client asks for them.
+    """
+
+    def __init__(self, version, body):
+        self.version = version
+        self.identity = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, coding):
+        """Returns (bytes, coding actually used) for 'br', 'gzip' or None."""
+        if coding is None or len(self.identity) < MIN_COMPRESS_SIZE:
+            return self.identity, None
+        with self._lock:
+            body = self._encoded.get(coding)
+            if body is None:
+                if coding == "br":
+                    body = brotli.compress(self.identity, quality=5)
+                else:
+                    body = gzip.compress(self.identity, compresslevel=6)
+                self._encoded[coding] = body
+        return body, coding
+
+class EncodedBodyCache:
+    """
+    Caches EncodedBody objects per (source, variant), where variant distinguishes the different
+    bodies derived from one snapshot (e.g. query parameters). Only the entry for the latest
+    snapshot version is kept, so N clients polling the same snapshot cost one serialization
+    and at most one compression per encoding.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, source, version, variant, serialize):
+        key = (source, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry.version == version:
+            perf.cache_access("http_body", hits=1)
+            return entry
+        perf.cache_access("http_body", misses=1)
+        entry = EncodedBody(version, serialize())
+        with self._lock:
+            current = self._entries.get(key)
+            # Another request may have cached a newer version meanwhile; keep the newest
+            if current is None or current.version <= version:
+                self._entries.pop(key, None)  # Re-inserted last, so the dict stays in least recently stored order
+                self._entries[key] = entry
+                while len(self._entries) > MAX_CACHED_BODIES:
+                    del self._entries[next(iter(self._entries))]
+        return entry
@@ -0,0 +1,242 @@
+import collections
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds (seconds) of the latency histogram buckets, the last bucket is +Inf
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Bounds for on-demand profiles
+PROFILE_MAX_SECONDS = 30
+PROFILE_DEFAULT_INTERVAL = 0.005
+# A shorter interval would keep a core busy sampling for the whole profile
+PROFILE_MIN_INTERVAL = 0.001
+PROFILE_MAX_INTERVAL = 1.0
+PROFILE_TOP_STACKS = 50
+
+class Histogram:
+    """
+    A fixed-bucket latency histogram. Observing a value is a bisect over the bucket bounds
+    plus a few additions, so it can stay enabled on every request and collection.
+    """
+    __slots__ = ("bounds", "counts", "sum", "count", "max", "_lock")
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+            if value > self.max:
+                self.max = value
+
+    def quantile(self, q):
+        """Estimates the q-quantile (0-1) by linear interpolation inside the bucket holding it."""
+        with self._lock:
+            counts, total, maximum = list(self.counts), self.count, self.max
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else maximum
+                return min(lower + (upper - lower) * (rank - cumulative) / count, maximum)
+            cumulative += count
+        return maximum
+
+    def cumulative_counts(self):
+        """[(upper bound, cumulative count)] including (inf, total), plus the sum: the Prometheus representation."""
+        with self._lock:
+            counts, total_sum = list(self.counts), self.sum
+        result = []
+        cumulative = 0
+        for bound, count in zip(list(self.bounds) + [float("inf")], counts):
+            cumulative += count
+            result.append((bound, cumulative))
+        return result, total_sum
+
+    def to_dict(self):
+        def ms(value):
+            return round(value * 1000, 3) if value is not None else None
+        return {
+            "count": self.count,
+            "mean_ms": ms(self.sum / self.count) if self.count else None,
+            "p50_ms": ms(self.quantile(0.5)),
+            "p90_ms": ms(self.quantile(0.9)),
+            "p99_ms": ms(self.quantile(0.99)),
+            "max_ms": ms(self.max) if self.count else None,
+        }
+
+def _is_error(data):
+    """True for the error results collectors return instead of raising."""
+    if isinstance(data, dict):
+        return "error" in data or bool(data.get("errors_encountered"))
+    return False
+
+class Instrumentation:
+    """
+    The dashboard's own performance counters: latency histograms per collector and per route,
+    subprocess spawn counts, timeouts, collector errors and cache hits/misses.
+    Histograms are keyed by (kind, label) and counters by (name, label); both are created on
+    first use, so call sites only name what they measure.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._histograms = {}  # (kind, label) -> Histogram
+        self._counters = collections.Counter()  # (name, label) -> count
+        self._lock = threading.Lock()
+
+    def observe(self, kind, label, seconds):
+        histogram = self._histograms.get((kind, label))
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault((kind, label), Histogram())
+        histogram.observe(seconds)
+
+    def count(self, name, label, amount=1):
+        with self._lock:
+            self._counters[(name, label)] += amount
+
+    def cache_access(self, cache, hits=0, misses=0):
+        """Records cache hits and misses; callers with a hot loop pass the totals of one pass."""
+        with self._lock:
+            if hits:
+                self._counters[("cache_hits", cache)] += hits
+            if misses:
+                self._counters[("cache_misses", cache)] += misses
+
+    def spawned(self, command):
+        """Counts one subprocess started for `command` (e.g. 'nvidia-smi')."""
+        self.count("subprocess_spawns", command)
+
+    def timed_out(self, operation):
+        self.count("timeouts", operation)
+
+    def on_snapshot(self, snapshot):
+        """Sampler listener: collection time and error results per source."""
+        self.observe("collector", snapshot.source, snapshot.duration)
+        self.count("collector_runs", snapshot.source)
+        if _is_error(snapshot.data):
+            self.count("collector_errors", snapshot.source)
+
+    def histograms(self, kind):
+        with self._lock:
+            return {label: histogram for (k, label), histogram in self._histograms.items() if k == kind}
+
+    def counters(self, name):
+        with self._lock:
+            return {label: value for (n, label), value in self._counters.items() if n == name}
+
+    def snapshot(self):
+        """Everything recorded so far, for /api/debug/perf."""
+        runs = self.counters("collector_runs")
+        errors = self.counters("collector_errors")
+        collectors = {}
+        for source, histogram in sorted(self.histograms("collector").items()):
+            entry = histogram.to_dict()
+            entry["errors"] = errors.get(source, 0)
+            entry["error_rate"] = round(errors.get(source, 0) / runs[source], 4) if runs.get(source) else None
+            collectors[source] = entry
+
+        route_errors = self.counters("route_errors")
+        routes = {}
+        for route, histogram in sorted(self.histograms("route").items()):
+            entry = histogram.to_dict()
+            entry["errors"] = route_errors.get(route, 0)
+            routes[route] = entry
+
+        hits = self.counters("cache_hits")
+        misses = self.counters("cache_misses")
+        caches = {}
+        for cache in sorted(set(hits) | set(misses)):
+            total = hits.get(cache, 0) + misses.get(cache, 0)
+            caches[cache] = {"hits": hits.get(cache, 0), "misses": misses.get(cache, 0),
+                             "hit_ratio": round(hits.get(cache, 0) / total, 4) if total else None}
+
+        return {
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "collectors": collectors,
+            "routes": routes,
+            "subprocess_spawns": dict(sorted(self.counters("subprocess_spawns").items())),
+            "timeouts": dict(sorted(self.counters("timeouts").items())),
+            "caches": caches,
+        }
+
+# The process-wide instance every module records into
+perf = Instrumentation()
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    """
+    A statistical profiler for a running server: a thread samples the stacks of all other
+    threads (sys._current_frames) at a fixed interval for a bounded time. Nothing is traced
+    between samples, so the overhead is limited to the profiling window. Only one profile
+    runs at a time.
+    """
+
+    def __init__(self):
+        self._running = threading.Lock()
+
+    def profile(self, seconds, interval=PROFILE_DEFAULT_INTERVAL):
+        """
+        Samples every `interval` seconds (between PROFILE_MIN_INTERVAL and PROFILE_MAX_INTERVAL)
+        for `seconds` (capped at PROFILE_MAX_SECONDS) and returns the most frequent
+        stacks in collapsed form ("outer;inner;leaf" -> samples, as used by flame graph tools)
+        and per-function sample counts, or an error dictionary if a profile is already running.
+        """
+        if not self._running.acquire(blocking=False):
+            return {"error": "A profile is already running"}
+        try:
+            seconds = max(0.1, min(float(seconds), PROFILE_MAX_SECONDS))
+            interval = max(PROFILE_MIN_INTERVAL, min(float(interval), PROFILE_MAX_INTERVAL))
+            own_thread = threading.get_ident()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = collections.Counter()
+            self_counts = collections.Counter()
+            total_counts = collections.Counter()
+            samples = 0
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_name(frame))
+                        frame = frame.f_back
+                    if not stack:
+                        continue
+                    self_counts[stack[0]] += 1
+                    for name in set(stack):
+                        total_counts[name] += 1
+                    stack.append(names.get(thread_id, str(thread_id)))
+                    stacks[";".join(reversed(stack))] += 1
+                samples += 1
+                time.sleep(interval)
+            return {
+                "duration_seconds": seconds,
+                "interval_seconds": interval,
+                "samples": samples,
+                "top_self": self_counts.most_common(PROFILE_TOP_STACKS),
+                "top_total": total_counts.most_common(PROFILE_TOP_STACKS),
+                "stacks": dict(stacks.most_common(PROFILE_TOP_STACKS)),
+            }
+        finally:
+            self._running.release()
+
+profiler = SamplingProfiler()
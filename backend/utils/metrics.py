@@ -0,0 +1,266 @@
+import gzip
+import os
+import threading
+import time
+
+from utils.instrumentation import perf
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+METRIC_PREFIX = "dashboard_"
+BYTES_PER_MB = 1024 * 1024
+
+# Pseudo source exporting the dashboard's own instrumentation, re-rendered at most once per interval
+SELF_SOURCE = "self"
+SELF_METRICS_INTERVAL = 1.0
+# Preformatted label sets kept for reuse; containers and mounts come and go, so the oldest are evicted
+MAX_CACHED_LABELS = 4096
+
+def enabled_collectors_from_env(default):
+    """
+    Sources exported on /metrics, from DASHBOARD_METRICS_COLLECTORS (comma separated,
+    e.g. "gpu,cpu"). Falls back to `default` if the variable is unset.
+    """
+    raw = os.environ.get("DASHBOARD_METRICS_COLLECTORS")
+    if raw is None:
+        return list(default)
+    return [name.strip() for name in raw.split(",") if name.strip()]
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+class _Family:
+    """Collects the samples of one metric family while a source block is rendered."""
+    __slots__ = ("name", "kind", "help", "samples")
+
+    def __init__(self, name, kind, help_text):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.samples = []
+
+class MetricsRenderer:
+    """
+    Renders the cached snapshots in the OpenMetrics (or classic Prometheus) text format.
+
+    Nothing is collected here: each source's block is rendered from its latest snapshot and
+    cached until the snapshot version changes, and label sets are formatted once and reused
+    across scrapes. The full body and its gzip encoding are cached per combination of
+    snapshot versions, so repeated scrapes between two samples cost a dictionary lookup.
+    """
+
+    def __init__(self, sampler, enabled=None):
+        self.sampler = sampler
+        self.enabled = [name for name in (enabled or sampler.sources()) if name in self.RENDERERS or name == SELF_SOURCE]
+        self._labels = {}   # (label names, label values) -> preformatted '{a="x",b="y"}'
+        self._blocks = {}   # (source, openmetrics) -> (snapshot version, rendered text)
+        self._body = None   # (cache key, body bytes, gzip bytes or None)
+        self._lock = threading.Lock()
+
+    # --- Helpers ---
+
+    def _label_string(self, names, values):
+        key = (names, values)
+        labels = self._labels.get(key)
+        if labels is None:
+            labels = "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)) + "}"
+            self._labels[key] = labels
+            while len(self._labels) > MAX_CACHED_LABELS:
+                del self._labels[next(iter(self._labels))]
+        return labels
+
+    @staticmethod
+    def _format_families(families, openmetrics):
+        lines = []
+        for family in families:
+            if not family.samples:
+                continue
+            name = METRIC_PREFIX + family.name
+            sample_name = name + "_total" if family.kind == "counter" else name
+            # OpenMetrics names counter families without the _total suffix, Prometheus 0.0.4 with it
+            type_name = name if openmetrics else sample_name
+            lines.append(f"# HELP {type_name} {family.help}")
+            lines.append(f"# TYPE {type_name} {family.kind}")
+            for labels, value in family.samples:
+                lines.append(f"{sample_name}{labels} {value}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    # --- Per-source renderers, each returning a list of _Family ---
+
+    def _render_gpu(self, data):
+        fields = [
+            ("utilization_gpu", "gpu_utilization_percent", "GPU utilization in percent.", 1),
+            ("utilization_memory", "gpu_memory_utilization_percent", "GPU memory controller utilization in percent.", 1),
+            ("memory_used_mb", "gpu_memory_used_bytes", "GPU memory in use.", BYTES_PER_MB),
+            ("memory_total_mb", "gpu_memory_total_bytes", "Total GPU memory.", BYTES_PER_MB),
+            ("temperature_gpu", "gpu_temperature_celsius", "GPU core temperature.", 1),
+        ]
+        families = [_Family(name, "gauge", help_text) for _, name, help_text, _ in fields]
+        if not isinstance(data, list):
+            return families
+        for gpu in data:
+            labels = self._label_string(("bus_id", "name"), (gpu.get("pci_bus_id"), gpu.get("name")))
+            for family, (field, _, _, scale) in zip(families, fields):
+                value = gpu.get(field)
+                if _number(value):
+                    family.samples.append((labels, value * scale))
+        return families
+
+    def _render_ram_disk(self, data):
+        memory = [_Family("memory_total_bytes", "gauge", "Total physical memory."),
+                  _Family("memory_used_bytes", "gauge", "Physical memory in use."),
+                  _Family("memory_available_bytes", "gauge", "Physical memory available for new allocations.")]
+        filesystem = [_Family("filesystem_size_bytes", "gauge", "Filesystem size."),
+                      _Family("filesystem_used_bytes", "gauge", "Filesystem space in use."),
+                      _Family("filesystem_avail_bytes", "gauge", "Filesystem space available to non-root users.")]
+        if not isinstance(data, dict):
+            return memory + filesystem
+        ram = data.get("ram") or {}
+        for family, field in zip(memory, ("total_bytes", "used_bytes", "available_bytes")):
+            if _number(ram.get(field)):
+                family.samples.append(("", ram[field]))
+        disks = data.get("disk")
+        if isinstance(disks, list):
+            for disk in disks:
+                labels = self._label_string(("device", "mountpoint", "fstype"),
+                                            (disk.get("filesystem"), disk.get("mounted_on", ""), disk.get("fstype", "")))
+                for family, field in zip(filesystem, ("total_bytes", "used_bytes", "available_bytes")):
+                    if _number(disk.get(field)):
+                        family.samples.append((labels, disk[field]))
+        return memory + filesystem
+
+    def _render_cpu(self, data):
+        utilization = _Family("cpu_utilization_percent", "gauge", "CPU utilization in percent, per logical processor and overall (cpu=\"all\").")
+        cores = _Family("cpu_logical_processors", "gauge", "Number of logical processors.")
+        if not isinstance(data, dict):
+            return [utilization, cores]
+        if _number(data.get("utilization_percent")):
+            utilization.samples.append((self._label_string(("cpu",), ("all",)), data["utilization_percent"]))
+        for index, value in enumerate(data.get("per_core_utilization") or []):
+            utilization.samples.append((self._label_string(("cpu",), (index,)), value))
+        if _number(data.get("logical_processors")):
+            cores.samples.append(("", data["logical_processors"]))
+        return [utilization, cores]
+
+    def _render_lxc(self, data):
+        running = _Family("lxc_container_running", "gauge", "1 if the container is running, 0 otherwise.")
+        memory = _Family("lxc_container_memory_usage_bytes", "gauge", "Memory used by the container.")
+        limit = _Family("lxc_container_memory_limit_bytes", "gauge", "Memory limit of the container.")
+        cpu = _Family("lxc_container_cpu_seconds", "counter", "CPU time consumed by the container.")
+        read = _Family("lxc_container_io_read_bytes", "counter", "Bytes read by the container (cgroup v2 io.stat).")
+        written = _Family("lxc_container_io_write_bytes", "counter", "Bytes written by the container (cgroup v2 io.stat).")
+        pids = _Family("lxc_container_pids", "gauge", "Number of processes in the container.")
+        families = [running, memory, limit, cpu, read, written, pids]
+        if not isinstance(data, list):
+            return families
+        for container in data:
+            if not container.get("name"):
+                continue
+            labels = self._label_string(("container",), (container["name"],))
+            running.samples.append((labels, 1 if (container.get("status") or "").lower() == "running" else 0))
+            if _number(container.get("memory_usage_mb")):
+                memory.samples.append((labels, round(container["memory_usage_mb"] * BYTES_PER_MB)))
+            if _number(container.get("memory_total_mb")):
+                limit.samples.append((labels, round(container["memory_total_mb"] * BYTES_PER_MB)))
+            if _number(container.get("cpu_usage_seconds")):
+                cpu.samples.append((labels, container["cpu_usage_seconds"]))
+            cgroup = container.get("cgroup") or {}
+            if _number(cgroup.get("io_read_bytes")):
+                read.samples.append((labels, cgroup["io_read_bytes"]))
+            if _number(cgroup.get("io_write_bytes")):
+                written.samples.append((labels, cgroup["io_write_bytes"]))
+            if _number(container.get("pids")):
+                pids.samples.append((labels, container["pids"]))
+        return families
+
+    def _render_self(self, openmetrics):
+        """The instrumentation recorded in utils.instrumentation.perf: latency histograms and counters."""
+        lines = []
+        for kind, name, label, help_text in (
+                ("collector", "collector_duration_seconds", "collector", "Time taken by one collection."),
+                ("route", "http_request_duration_seconds", "route", "Time taken to handle one HTTP request.")):
+            histograms = perf.histograms(kind)
+            if not histograms:
+                continue
+            name = METRIC_PREFIX + name
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for value, histogram in sorted(histograms.items()):
+                buckets, total = histogram.cumulative_counts()
+                for bound, count in buckets:
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{self._label_string((label, 'le'), (value, le))} {count}")
+                labels = self._label_string((label,), (value,))
+                lines.append(f"{name}_count{labels} {buckets[-1][1]}")
+                lines.append(f"{name}_sum{labels} {total}")
+        text = "\n".join(lines) + "\n" if lines else ""
+
+        families = []
+        for counter, name, label, help_text in (
+                ("collector_runs", "collector_runs", "collector", "Collections run per source."),
+                ("collector_errors", "collector_errors", "collector", "Collections that returned an error."),
+                ("route_errors", "http_request_errors", "route", "HTTP requests answered with a 5xx status."),
+                ("subprocess_spawns", "subprocess_spawns", "command", "External commands started by the collectors."),
+                ("timeouts", "timeouts", "operation", "Commands, lookups and polls that timed out.")):
+            family = _Family(name, "counter", help_text)
+            for value, count in sorted(perf.counters(counter).items()):
+                family.samples.append((self._label_string((label,), (value,)), count))
+            families.append(family)
+        cache = _Family("cache_requests", "counter", "Cache lookups by cache and result (hit or miss).")
+        for result in ("hit", "miss"):
+            for value, count in sorted(perf.counters("cache_" + result + "s").items()):
+                cache.samples.append((self._label_string(("cache", "result"), (value, result)), count))
+        families.append(cache)
+        return text + self._format_families(families, openmetrics)
+
+    RENDERERS = {
+        "gpu": _render_gpu,
+        "ram_disk": _render_ram_disk,
+        "cpu": _render_cpu,
+        "lxc": _render_lxc,
+    }
+
+    # --- Public API ---
+
+    def _block(self, source, snapshot, openmetrics):
+        cached = self._blocks.get((source, openmetrics))
+        if cached and cached[0] == snapshot.version:
+            perf.cache_access("metrics_block", hits=1)
+            return cached[1]
+        perf.cache_access("metrics_block", misses=1)
+        families = self.RENDERERS[source](self, snapshot.data)
+        text = self._format_families(families, openmetrics)
+        self._blocks[(source, openmetrics)] = (snapshot.version, text)
+        return text
+
+    def render(self, openmetrics=True, gzipped=False):
+        """Returns the exposition body as bytes, gzip-compressed if `gzipped`."""
+        snapshots = [(source, self.sampler.get(source)) for source in self.enabled if source in self.RENDERERS]
+        snapshots = [(source, snapshot) for source, snapshot in snapshots if snapshot is not None]
+        include_self = SELF_SOURCE in self.enabled
+        key = (openmetrics, tuple((source, snapshot.version) for source, snapshot in snapshots),
+               int(time.monotonic() // SELF_METRICS_INTERVAL) if include_self else None)
+        with self._lock:
+            if self._body is not None and self._body[0] == key:
+                perf.cache_access("metrics_body", hits=1)
+            else:
+                perf.cache_access("metrics_body", misses=1)
+                blocks = [self._block(source, snapshot, openmetrics) for source, snapshot in snapshots]
+                if include_self:
+                    blocks.append(self._render_self(openmetrics))
+                timestamps = _Family("snapshot_timestamp_seconds", "gauge", "Unix time at which each source was last sampled.")
+                for source, snapshot in snapshots:
+                    timestamps.samples.append((self._label_string(("source",), (source,)), round(snapshot.timestamp, 3)))
+                blocks.append(self._format_families([timestamps], openmetrics))
+                if openmetrics:
+                    blocks.append("# EOF\n")
+                self._body = [key, "".join(blocks).encode(), None]
+            if not gzipped:
+                return self._body[1]
+            if self._body[2] is None:
+                self._body[2] = gzip.compress(self._body[1], compresslevel=6)
+            return self._body[2]
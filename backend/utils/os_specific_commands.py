@@ -1,38 +1,46 @@
-import platform
-import subprocess
-
-def get_live_system_stats():
-    system = platform.system()
-    try:
-        if system == "Linux":
-            # top -b -n 1: batch mode, 1 iteration
-            process = subprocess.run(["top", "-b", "-n", "1"], capture_output=True, text=True, check=True, timeout=15)
-            return process.stdout
-        elif system == "Windows":
-            # Get-Process, sort by WorkingSet (WS), take top 30, format as table
-            # CPU is total CPU seconds, WS is in bytes
-            cmd = [
-                "powershell", "-Command",
-                "Get-Process | Sort-Object WS -Descending | Select-Object -First 30 -Property ProcessName, Id, WS, CPU, Path | Format-Table -AutoSize"
-            ]
-            process = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=15)
-            return process.stdout
-        elif system == "Darwin": # macOS
-            # top -l 1: 1 sample. -o cpu: sort by cpu. -n 30: show 30 processes.
-            process = subprocess.run(["top", "-l", "1", "-o", "cpu", "-n", "30"], capture_output=True, text=True, check=True, timeout=15)
-            return process.stdout
-        else:
-            return f"Unsupported OS: {system}"
-    except subprocess.CalledProcessError as e:
-        return f"Command failed: {e}\nOutput: {e.stderr}"
-    except subprocess.TimeoutExpired:
-        return "Command timed out after 15 seconds."
-    except FileNotFoundError:
-        return "Command not found. Ensure it is in your PATH."
-    except Exception as e:
-        return f"An unexpected error occurred: {e}"
-
-if __name__ == '__main__':
-    # For direct testing
-    stats = get_live_system_stats()
-    print(stats)
+import time
+
+from utils.processes import ProcessTable, render_process_text
+
+# Number of processes included in each top-N list
+PROCESS_LIMIT = 100
+
+_process_table = None
+
+def get_process_stats(limit=PROCESS_LIMIT):
+    """
+    Structured process statistics on Linux, read directly from /proc:
+    "processes" holds the top `limit` processes by CPU%, "top_rss" the top `limit` by
+    resident memory, and "text" a top-like rendering of the CPU list. Other systems
+    only fill "text", from their process listing command (see utils/platform_registry.py).
+    """
+    global _process_table
+    try:
+        if _process_table is None:
+            _process_table = ProcessTable()
+        rows, _ = _process_table.scan()
+        mem_total = _process_table.read_mem_total()
+        stats = {
+            "timestamp": time.time(),
+            "tasks": _process_table.summary(rows),
+            "load_average": _process_table.read_loadavg(),
+            "mem_total_bytes": mem_total,
+            "processes": [_process_table.describe(row, mem_total) for row in ProcessTable.top(rows, limit, "cpu")],
+            "top_rss": [_process_table.describe(row, mem_total) for row in ProcessTable.top(rows, limit, "rss")],
+            "source": "/proc (Linux)",
+        }
+        stats["text"] = render_process_text(stats)
+        return stats
+    except Exception as e:
+        return {"error": f"An unexpected error occurred while reading /proc: {e}", "processes": [], "top_rss": [], "text": f"An unexpected error occurred: {e}"}
+
+def get_live_system_stats():
+    """Live process statistics as plain text (top-like), from the collector of the running system."""
+    from utils.platform_registry import collector
+
+    return collector("live_stats")()["text"]
+
+if __name__ == '__main__':
+    # For direct testing
+    stats = get_live_system_stats()
+    print(stats)
@@ -0,0 +1,195 @@
+import importlib
+import os
+import platform
+import shutil
+import socket
+import threading
+import time
+
+from utils.instrumentation import perf
+
+# Detected once; collectors are resolved for this system only
+CURRENT_OS = platform.system()
+
+# Seconds a probe result is trusted before it is checked again, so tools installed (or removed)
+# while the dashboard runs are picked up. Override with DASHBOARD_CAPABILITY_REPROBE
+REPROBE_INTERVAL = float(os.environ.get("DASHBOARD_CAPABILITY_REPROBE", 60.0))
+
+class Capability:
+    """
+    A cached probe for something a collector depends on: a command on PATH, a reachable socket, ...
+
+    `probe` returns a truthy value (e.g. the resolved path) when the capability is available and
+    a falsy one otherwise. The result is kept for `reprobe_interval` seconds, so a missing tool
+    costs a cached lookup per collection instead of a failed Popen and its exception.
+    """
+
+    def __init__(self, name, probe, reprobe_interval=None, clock=time.monotonic):
+        self.name = name
+        self.reprobe_interval = REPROBE_INTERVAL if reprobe_interval is None else reprobe_interval
+        self._probe = probe
+        self._clock = clock
+        self._value = None
+        self._checked = None  # Clock time of the last probe, None before the first one
+        self._lock = threading.Lock()
+
+    def value(self):
+        """The probe's result (e.g. the path of the command), or None if unavailable."""
+        now = self._clock()
+        with self._lock:
+            if self._checked is not None and now - self._checked < self.reprobe_interval:
+                return self._value
+            previous, first = self._value, self._checked is None
+        try:
+            value = self._probe() or None
+        except Exception as e:
+            print(f"Probe for {self.name} failed: {e}")
+            value = None
+        perf.count("capability_probes", self.name)
+        if not first and bool(value) != bool(previous):
+            print(f"{self.name} is {'now available' if value else 'no longer available'}")
+        with self._lock:
+            self._value, self._checked = value, now
+        return value
+
+    def available(self):
+        return self.value() is not None
+
+    def invalidate(self):
+        """Forces a new probe on the next check, e.g. after the tool failed unexpectedly."""
+        with self._lock:
+            self._checked = None
+
+    def status(self):
+        with self._lock:
+            value, checked = self._value, self._checked
+        return {
+            "available": value is not None,
+            "value": str(value) if value is not None else None,
+            "age_seconds": round(self._clock() - checked, 3) if checked is not None else None,
+        }
+
+def command_probe(command):
+    """Probe for a command on PATH; returns its resolved path."""
+    return lambda: shutil.which(command)
+
+def _lxd_socket_probe():
+    """Path of the first LXD socket that exists and accepts connections."""
+    from utils.containers import find_lxd_socket
+
+    path = find_lxd_socket()
+    if path is None:
+        return None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(1.0)
+        try:
+            connection.connect(path)
+        except OSError:
+            return None
+    return path
+
+_capabilities = {}
+_capabilities_lock = threading.Lock()
+
+# name -> probe for every capability known to the dashboard
+_PROBES = {
+    "nvidia-smi": command_probe("nvidia-smi"),
+    "lxc": command_probe("lxc"),
+    "lxd_socket": _lxd_socket_probe,
+    "cgroup2": lambda: importlib.import_module("utils.cgroups").cgroup2_root(),
+    "wmic": command_probe("wmic"),
+    "systeminfo": command_probe("systeminfo"),
+    "powershell": command_probe("powershell"),
+    "free": command_probe("free"),
+    "df": command_probe("df"),
+    "top": command_probe("top"),
+}
+
+# The capabilities each system's collectors may use (listed by platform_status())
+_OS_CAPABILITIES = {
+    "Linux": ["nvidia-smi", "lxc", "lxd_socket", "cgroup2"],
+    "Windows": ["nvidia-smi", "wmic", "systeminfo", "powershell"],
+}
+_OTHER_OS_CAPABILITIES = ["nvidia-smi", "free", "df", "top"]
+
+def capability(name):
+    """The shared, cached Capability called `name` (see _PROBES)."""
+    with _capabilities_lock:
+        if name not in _capabilities:
+            _capabilities[name] = Capability(name, _PROBES[name])
+        return _capabilities[name]
+
+# source -> {system: "module:function"}; "*" is used for any system not listed.
+# Modules are only imported when the collector of the running system is resolved.
+COLLECTORS = {
+    "cpu": {
+        "Linux": "utils.cpu:get_cpu_info",
+        "Windows": "utils.windows:get_cpu_info",
+        "*": "utils.posix_commands:get_cpu_info",
+    },
+    "ram_disk": {
+        "Linux": "utils.ram_disk:get_ram_disk_info",
+        "Windows": "utils.windows:get_ram_disk_info",
+        "*": "utils.posix_commands:get_ram_disk_info",
+    },
+    "live_stats": {
+        "Linux": "utils.os_specific_commands:get_process_stats",
+        "Windows": "utils.windows:get_process_stats",
+        "*": "utils.posix_commands:get_process_stats",
+    },
+    "lxc": {
+        "Linux": "utils.containers:get_lxc_info",
+        "*": "utils.platform_registry:lxc_not_applicable",
+    },
+    "disk_io": {
+        "Linux": "utils.throughput:get_disk_io",
+        "*": "utils.platform_registry:disk_io_not_applicable",
+    },
+    "network": {
+        "Linux": "utils.throughput:get_network_io",
+        "*": "utils.platform_registry:network_not_applicable",
+    },
+    # Built from the GPU backend's compute process list: create(list_processes) returns the collector
+    "gpu_processes": {
+        "Linux": "utils.gpu_processes:create_gpu_process_collector",
+        "*": "utils.platform_registry:create_gpu_processes_not_applicable",
+    },
+}
+
+def lxc_not_applicable():
+    message = f"LXC container monitoring is specific to Linux. Current OS: {CURRENT_OS}"
+    return {"status": "not_applicable", "message": message, "data": []}
+
+def disk_io_not_applicable():
+    message = f"Disk I/O rates are read from /proc/diskstats, which is specific to Linux. Current OS: {CURRENT_OS}"
+    return {"status": "not_applicable", "message": message, "devices": []}
+
+def network_not_applicable():
+    message = f"Network rates are read from /proc/net/dev, which is specific to Linux. Current OS: {CURRENT_OS}"
+    return {"status": "not_applicable", "message": message, "interfaces": []}
+
+def gpu_processes_not_applicable():
+    message = f"GPU process attribution reads /proc, which is specific to Linux. Current OS: {CURRENT_OS}"
+    return {"status": "not_applicable", "message": message, "processes": []}
+
+def create_gpu_processes_not_applicable(list_processes):
+    return gpu_processes_not_applicable
+
+def collector(source, system=None):
+    """Imports and returns the collector function of `source` for `system` (default: this one)."""
+    implementations = COLLECTORS[source]
+    system = system or CURRENT_OS
+    target = implementations.get(system, implementations.get("*"))
+    if target is None:
+        raise KeyError(f"No {source} collector for {system}")
+    module_name, function_name = target.split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+def platform_status():
+    """The detected system and the state of the capabilities its collectors use, probing as needed."""
+    names = _OS_CAPABILITIES.get(CURRENT_OS, _OTHER_OS_CAPABILITIES)
+    capabilities = {}
+    for name in names:
+        capability(name).value()
+        capabilities[name] = capability(name).status()
+    return {"system": CURRENT_OS, "capabilities": capabilities}
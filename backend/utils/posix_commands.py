@@ -0,0 +1,108 @@
+"""
+Command based collectors for systems other than Linux and Windows (macOS in practice):
+`free -m`, `df -kP` and `top`. Only imported there, through utils/platform_registry.py.
+"""
+import subprocess
+
+from utils.instrumentation import perf
+from utils.platform_registry import CURRENT_OS, capability
+from utils.ram_disk import BYTES_PER_GB, combine_ram_disk
+
+def get_cpu_info():
+    return {"error": f"CPU info not implemented for OS: {CURRENT_OS}"}
+
+def _get_ram_info_free():
+    """RAM usage from `free -m` (Unix systems without /proc/meminfo)."""
+    if not capability("free").available():
+        return {"error": "'free -m' command not found. RAM info unavailable."}
+    try:
+        perf.spawned("free")
+        ram_process = subprocess.Popen(["free", "-m"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        ram_stdout, ram_stderr = ram_process.communicate(timeout=10)
+        if ram_process.returncode != 0:
+            return {"error": f"'free -m' failed (code {ram_process.returncode}): {ram_stderr.strip()}"}
+        lines = ram_stdout.strip().splitlines()
+        if len(lines) < 2:
+            return {"error": "Could not parse 'free -m' output."}
+        # Mem: total used free shared buff/cache available
+        parts = lines[1].split() # Second line contains actual memory data
+        return {
+            "total_mb": int(parts[1]),
+            "used_mb": int(parts[2]),
+            "free_mb": int(parts[3]),
+            "available_mb": int(parts[6]), # 'available' is usually more relevant than 'free'
+            "source": "free -m (Linux/macOS)"
+        }
+    except FileNotFoundError:
+        return {"error": "'free -m' command not found. RAM info unavailable."}
+    except subprocess.TimeoutExpired:
+        perf.timed_out("free")
+        return {"error": "'free -m' command timed out."}
+    except Exception as e:
+        return {"error": f"Error processing 'free -m': {str(e)}"}
+
+def _get_disk_info_df():
+    """Disk usage from `df -kP` (Unix systems without /proc)."""
+    if not capability("df").available():
+        return {"error": "'df -kP' command not found. Disk info unavailable."}
+    try:
+        # -k gives exact 1024-byte blocks rather than rounded human readable sizes
+        perf.spawned("df")
+        disk_process = subprocess.Popen(["df", "-kP"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        disk_stdout, disk_stderr = disk_process.communicate(timeout=10)
+        if disk_process.returncode != 0:
+            return {"error": f"'df -kP' failed (code {disk_process.returncode}): {disk_stderr.strip()}"}
+        disk_info = []
+        for line in disk_stdout.strip().split('\n')[1:]: # Skip header line
+            # Filesystem 1024-blocks Used Available Capacity Mounted on
+            parts = line.split(None, 5)
+            if len(parts) >= 6 and parts[1].isdigit():
+                total, used, available = int(parts[1]) * 1024, int(parts[2]) * 1024, int(parts[3]) * 1024
+                disk_info.append({
+                    "filesystem": parts[0],
+                    "mounted_on": parts[5],
+                    "total_bytes": total,
+                    "used_bytes": used,
+                    "available_bytes": available,
+                    "total_gb": round(total / BYTES_PER_GB, 2),
+                    "used_gb": round(used / BYTES_PER_GB, 2),
+                    "free_gb": round(available / BYTES_PER_GB, 2),
+                    "use_percent": float(parts[4].rstrip("%")) if parts[4].rstrip("%").isdigit() else parts[4],
+                    "source": "df -kP (macOS)"
+                })
+        return disk_info if disk_info else {"error": "Could not parse 'df -kP' output."}
+    except FileNotFoundError:
+        return {"error": "'df -kP' command not found. Disk info unavailable."}
+    except subprocess.TimeoutExpired:
+        perf.timed_out("df")
+        return {"error": "'df -kP' command timed out."}
+    except Exception as e:
+        return {"error": f"Error processing 'df -kP': {str(e)}"}
+
+def get_ram_disk_info():
+    """RAM usage from `free -m` and disk usage from `df -kP`."""
+    return combine_ram_disk(_get_ram_info_free(), _get_disk_info_df())
+
+def _process_listing():
+    if CURRENT_OS != "Darwin":
+        return f"Unsupported OS: {CURRENT_OS}"
+    if not capability("top").available():
+        return "top not found. Ensure it is in your PATH."
+    try:
+        # top -l 1: 1 sample. -o cpu: sort by cpu. -n 30: show 30 processes.
+        perf.spawned("top")
+        process = subprocess.run(["top", "-l", "1", "-o", "cpu", "-n", "30"], capture_output=True, text=True, check=True, timeout=15)
+        return process.stdout
+    except subprocess.CalledProcessError as e:
+        return f"Command failed: {e}\nOutput: {e.stderr}"
+    except subprocess.TimeoutExpired:
+        perf.timed_out(f"process listing ({CURRENT_OS})")
+        return "Command timed out after 15 seconds."
+    except FileNotFoundError:
+        return "Command not found. Ensure it is in your PATH."
+    except Exception as e:
+        return f"An unexpected error occurred: {e}"
+
+def get_process_stats():
+    """Process statistics as text only ("processes" and "top_rss" stay empty), from `top`."""
+    return {"processes": [], "top_rss": [], "text": _process_listing(), "source": f"command ({CURRENT_OS})"}
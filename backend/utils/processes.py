@@ -0,0 +1,235 @@
+import heapq
+import os
+import threading
+import time
+from operator import itemgetter
+
+from utils.instrumentation import perf
+
+try:
+    import pwd
+except ImportError:  # Windows, where the process table is not read from /proc
+    pwd = None
+
+# Indexes into the tuple rows produced by ProcessTable.scan()
+ROW_PID, ROW_CPU, ROW_RSS, ROW_STATE, ROW_THREADS, ROW_CPU_TIME = range(6)
+
+_STATE_NAMES = {"R": "running", "S": "sleeping", "D": "sleeping", "I": "idle", "T": "stopped", "t": "stopped", "Z": "zombie"}
+
+class _ProcessStatic:
+    """Fields of a process that do not change during its lifetime, read once per PID."""
+    __slots__ = ("start_ticks", "name", "cmdline", "uid", "user")
+
+    def __init__(self, start_ticks, name, cmdline, uid, user):
+        self.start_ticks = start_ticks
+        self.name = name
+        self.cmdline = cmdline
+        self.uid = uid
+        self.user = user
+
+class ProcessTable:
+    """
+    A `top`-like process table read directly from /proc.
+
+    Each scan reads only /proc/<pid>/stat for every process. Static fields (command line,
+    owner, start time) come from /proc/<pid>/cmdline and status once per process and are
+    cached; a PID whose start time changes has been reused and is looked up again.
+    CPU% is computed from the utime+stime delta between two consecutive scans, with 100%
+    meaning one fully busy logical processor (like top). Top-N selection uses a heap, and
+    /proc/<pid>/statm is only read for the processes that end up being reported.
+
+    `proc_root` can point at a synthetic /proc tree for testing, and `clock` replaces
+    time.monotonic for the time between scans.
+    """
+
+    def __init__(self, proc_root="/proc", clock=time.monotonic):
+        self.proc_root = proc_root
+        self.clock = clock
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self._static = {}      # pid -> _ProcessStatic
+        self._prev_cpu = {}    # pid -> (start ticks, utime+stime ticks) from the previous scan
+        self._prev_scan_time = None
+        self._user_names = {}  # uid -> user name
+        self._boot_time = None
+        self._lock = threading.Lock()
+
+    # --- Helpers reading single files ---
+
+    def _read(self, *parts):
+        with open(os.path.join(self.proc_root, *parts), "rb") as f:
+            return f.read()
+
+    def _get_boot_time(self):
+        if self._boot_time is None:
+            self._boot_time = 0
+            for line in self._read("stat").splitlines():
+                if line.startswith(b"btime "):
+                    self._boot_time = int(line.split()[1])
+                    break
+        return self._boot_time
+
+    def _user_name(self, uid):
+        name = self._user_names.get(uid)
+        if name is None:
+            try:
+                name = pwd.getpwuid(uid).pw_name if pwd is not None else str(uid)
+            except KeyError:
+                name = str(uid)
+            self._user_names[uid] = name
+        return name
+
+    def _load_static(self, pid, name, start_ticks):
+        try:
+            cmdline = self._read(str(pid), "cmdline").replace(b"\0", b" ").strip().decode(errors="replace")
+        except OSError:
+            cmdline = ""
+        uid = -1
+        try:
+            for line in self._read(str(pid), "status").splitlines():
+                if line.startswith(b"Uid:"):
+                    uid = int(line.split()[1])  # Real uid
+                    break
+        except OSError:
+            pass
+        return _ProcessStatic(start_ticks, name, cmdline or f"[{name}]", uid, self._user_name(uid) if uid >= 0 else "?")
+
+    # --- Scanning ---
+
+    def scan(self):
+        """
+        Reads every process once and returns (rows, elapsed seconds since the previous scan).
+        Each row is a tuple indexed by the ROW_* constants.
+        """
+        with self._lock:
+            now = self.clock()
+            elapsed = now - self._prev_scan_time if self._prev_scan_time is not None else None
+            ticks_per_percent = elapsed * self.clock_ticks / 100.0 if elapsed else None
+
+            rows = []
+            loaded = 0
+            current_cpu = {}
+            static = self._static
+            prev_cpu = self._prev_cpu
+            page_size = self.page_size
+            with os.scandir(self.proc_root) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if not name.isdigit():
+                        continue
+                    pid = int(name)
+                    try:
+                        with open(os.path.join(self.proc_root, name, "stat"), "rb") as f:
+                            stat = f.read()
+                    except OSError:
+                        continue  # Process exited while scanning
+                    # The command name is in parentheses and may itself contain spaces or ')'
+                    close = stat.rfind(b")")
+                    fields = stat[close + 2:].split()
+                    if len(fields) < 22:
+                        continue
+                    # Fields after the name: state ppid ... utime(11) stime(12) ... num_threads(17) ... starttime(19) vsize(20) rss(21)
+                    cpu_ticks = int(fields[11]) + int(fields[12])
+                    start_ticks = int(fields[19])
+
+                    info = static.get(pid)
+                    if info is None or info.start_ticks != start_ticks:
+                        comm = stat[stat.find(b"(") + 1:close].decode(errors="replace")
+                        static[pid] = self._load_static(pid, comm, start_ticks)
+                        loaded += 1
+
+                    cpu_percent = 0.0
+                    previous = prev_cpu.get(pid)
+                    if ticks_per_percent and previous and previous[0] == start_ticks:
+                        cpu_percent = (cpu_ticks - previous[1]) / ticks_per_percent
+                    current_cpu[pid] = (start_ticks, cpu_ticks)
+                    rows.append((pid, cpu_percent, int(fields[21]) * page_size, fields[0].decode(),
+                                 int(fields[17]), cpu_ticks))
+
+            # Forget processes that have exited
+            for pid in static.keys() - current_cpu.keys():
+                del static[pid]
+            self._prev_cpu = current_cpu
+            self._prev_scan_time = now
+            perf.cache_access("process_static", hits=len(rows) - loaded, misses=loaded)
+            return rows, elapsed
+
+    @staticmethod
+    def top(rows, n, sort_by="cpu"):
+        """Selects the n largest rows by CPU% or RSS with a heap instead of sorting everything."""
+        key = itemgetter(ROW_RSS if sort_by == "rss" else ROW_CPU)
+        return heapq.nlargest(n, rows, key=key)
+
+    def describe(self, row, mem_total=None):
+        """Turns a row into a JSON-friendly dictionary, adding cached static fields and statm data."""
+        pid = row[ROW_PID]
+        info = self._static.get(pid)
+        process = {
+            "pid": pid,
+            "user": info.user if info else "?",
+            "name": info.name if info else "?",
+            "command": info.cmdline if info else "?",
+            "state": row[ROW_STATE],
+            "threads": row[ROW_THREADS],
+            "cpu_percent": round(row[ROW_CPU], 1),
+            "rss_bytes": row[ROW_RSS],
+            "memory_percent": round(row[ROW_RSS] / mem_total * 100, 1) if mem_total else None,
+            "cpu_time_seconds": round(row[ROW_CPU_TIME] / self.clock_ticks, 2),
+            "start_time": self._get_boot_time() + info.start_ticks / self.clock_ticks if info else None,
+        }
+        try:
+            # size resident shared text lib data dt (in pages)
+            statm = self._read(str(pid), "statm").split()
+            process["virtual_bytes"] = int(statm[0]) * self.page_size
+            process["shared_bytes"] = int(statm[2]) * self.page_size
+        except (OSError, IndexError, ValueError):
+            process["virtual_bytes"] = process["shared_bytes"] = None
+        return process
+
+    def summary(self, rows):
+        """Process counts per state, like the 'Tasks:' line of top."""
+        states = {"running": 0, "sleeping": 0, "idle": 0, "stopped": 0, "zombie": 0}
+        for row in rows:
+            state = _STATE_NAMES.get(row[ROW_STATE])
+            if state:
+                states[state] += 1
+        states["total"] = len(rows)
+        return states
+
+    def read_mem_total(self):
+        try:
+            for line in self._read("meminfo").splitlines():
+                if line.startswith(b"MemTotal:"):
+                    return int(line.split()[1]) * 1024
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def read_loadavg(self):
+        try:
+            return [float(v) for v in self._read("loadavg").split()[:3]]
+        except (OSError, ValueError):
+            return None
+
+def _format_bytes(value):
+    for unit in ("B", "K", "M", "G"):
+        if value < 1024:
+            return f"{value:.0f}{unit}" if unit == "B" else f"{value:.1f}{unit}"
+        value /= 1024
+    return f"{value:.1f}T"
+
+def render_process_text(stats):
+    """Renders the structured process stats as a compact top-like text table."""
+    tasks = stats["tasks"]
+    lines = []
+    if stats.get("load_average"):
+        lines.append("load average: " + ", ".join(f"{v:.2f}" for v in stats["load_average"]))
+    lines.append(f"Tasks: {tasks['total']} total, {tasks['running']} running, {tasks['sleeping']} sleeping, "
+                 f"{tasks['stopped']} stopped, {tasks['zombie']} zombie")
+    lines.append("")
+    lines.append(f"{'PID':>8} {'USER':<10} S {'THR':>4} {'RES':>8} {'%CPU':>6} {'%MEM':>5} {'TIME':>10}  COMMAND")
+    for p in stats["processes"]:
+        memory_percent = p["memory_percent"] if p["memory_percent"] is not None else 0.0
+        lines.append(f"{p['pid']:>8} {p['user'][:10]:<10} {p['state']} {p['threads']:>4} {_format_bytes(p['rss_bytes']):>8} "
+                     f"{p['cpu_percent']:>6.1f} {memory_percent:>5.1f} {p['cpu_time_seconds']:>10.2f}  {p['command'][:120]}")
+    return "\n".join(lines) + "\n"
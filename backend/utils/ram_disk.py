@@ -1,193 +1,218 @@
-import subprocess
+import os
 import re
-import csv # Added for wmic parsing
-import io  # Added for wmic parsing
+import threading
+import time
 
-def get_ram_disk_info():
+from utils.instrumentation import perf
+
+BYTES_PER_MB = 1024 ** 2
+BYTES_PER_GB = 1024 ** 3
+
+# statvfs on a network filesystem whose server is gone blocks (NFS hard mounts forever) instead
+# of failing, so these are queried in threads and given at most STATVFS_TIMEOUT seconds overall
+NETWORK_FSTYPES = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "ncpfs", "afs", "9p", "ceph", "glusterfs", "lustre",
+                   "gpfs", "fuse.sshfs", "fuse.glusterfs", "fuse.cephfs", "fuse.s3fs", "fuse.rclone", "fuse.gcsfuse"}
+STATVFS_TIMEOUT = 2.0
+
+# --- Linux: native /proc and statvfs readers (no subprocesses) ---
+
+def read_meminfo(path="/proc/meminfo"):
     """
-    Fetches RAM and Disk usage information.
-    For RAM, it tries to use `systeminfo` on Windows or `free -m` on Linux.
-    For Disk, it tries to use `wmic logicaldisk` on Windows or `df -hP` on Linux.
-    Returns a dictionary with RAM and disk stats, or an error message.
+    Parses /proc/meminfo into a dictionary of byte counts, e.g. {"MemTotal": 16663830528, ...}.
+    Values reported in kB are converted to bytes; unitless values (HugePages_*) are kept as-is.
     """
-    ram_info = {}
-    disk_info = []
-    error_messages = []
+    meminfo = {}
+    with open(path, "r") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            parts = rest.split()
+            if not parts:
+                continue
+            value = int(parts[0])
+            if len(parts) > 1 and parts[1] == "kB":
+                value *= 1024
+            meminfo[key] = value
+    return meminfo
 
-    # --- RAM Information --- 
-    try:
-        # Try Windows-specific command first
-        ram_process = subprocess.Popen(["systeminfo"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, shell=False)
-        ram_stdout, ram_stderr = ram_process.communicate(timeout=20)
-
-        if ram_process.returncode == 0:
-            total_mem_match = re.search(r"Total Physical Memory:\s*([\d,]+(?:\.\d+)?)\s*MB", ram_stdout, re.IGNORECASE)
-            avail_mem_match = re.search(r"Available Physical Memory:\s*([\d,]+(?:\.\d+)?)\s*MB", ram_stdout, re.IGNORECASE)
-            
-            if total_mem_match and avail_mem_match:
-                total_mem_mb = int(float(total_mem_match.group(1).replace(",", "")))
-                avail_mem_mb = int(float(avail_mem_match.group(1).replace(",", "")))
-                ram_info = {
-                    "total_mb": total_mem_mb,
-                    "available_mb": avail_mem_mb,
-                    "used_mb": total_mem_mb - avail_mem_mb,
-                    "source": "systeminfo (Windows)"
-                }
-            else:
-                # This case might mean systeminfo ran but couldn't parse, try Linux next
-                raise Exception("Could not parse RAM info from systeminfo output.")
-        else:
-            # systeminfo failed (e.g. non-Windows or other error)
-            raise Exception(f"systeminfo command failed with code {ram_process.returncode}: {ram_stderr.strip()}")
+def get_linux_ram_info(meminfo_path="/proc/meminfo"):
+    """RAM and swap usage in exact bytes from /proc/meminfo (MB values kept for compatibility)."""
+    meminfo = read_meminfo(meminfo_path)
+    total = meminfo["MemTotal"]
+    free = meminfo.get("MemFree", 0)
+    # MemAvailable exists since Linux 3.14; estimate it like older `free` did otherwise
+    available = meminfo.get("MemAvailable", free + meminfo.get("Buffers", 0) + meminfo.get("Cached", 0))
+    used = total - available
+    swap_total = meminfo.get("SwapTotal", 0)
+    swap_free = meminfo.get("SwapFree", 0)
+    return {
+        "total_bytes": total,
+        "used_bytes": used,
+        "free_bytes": free,
+        "available_bytes": available,
+        "buffers_bytes": meminfo.get("Buffers", 0),
+        "cached_bytes": meminfo.get("Cached", 0),
+        "swap_total_bytes": swap_total,
+        "swap_used_bytes": swap_total - swap_free,
+        "total_mb": total // BYTES_PER_MB,
+        "used_mb": used // BYTES_PER_MB,
+        "free_mb": free // BYTES_PER_MB,
+        "available_mb": available // BYTES_PER_MB,
+        "use_percent": round(used / total * 100, 1) if total else 0.0,
+        "source": "/proc/meminfo (Linux)"
+    }
 
-    except Exception as e_win_ram: # Catching any exception from the Windows block
-        # print(f"Windows RAM info failed: {e_win_ram}. Trying Linux fallback.")
-        error_messages.append(f"Windows RAM command error: {str(e_win_ram)}")
+def _unescape_mount_field(field):
+    # /proc/self/mounts escapes spaces, tabs, newlines and backslashes as octal (e.g. \040)
+    if "\\" not in field:
+        return field
+    return re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), field)
+
+def read_mounts(path="/proc/self/mounts"):
+    """Returns a list of (device, mount point, filesystem type) tuples from a mounts file."""
+    mounts = []
+    with open(path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3:
+                mounts.append((_unescape_mount_field(parts[0]), _unescape_mount_field(parts[1]), parts[2]))
+    return mounts
+
+def is_network_fstype(fstype):
+    return fstype in NETWORK_FSTYPES or fstype.startswith("nfs")
+
+class _StatvfsCall:
+    """os.statvfs of one path in a daemon thread, which may never return."""
+
+    def __init__(self, path, statvfs):
+        self.stats = None
+        self.done = threading.Event()
+        threading.Thread(target=self._run, args=(path, statvfs), name="statvfs", daemon=True).start()
+
+    def _run(self, path, statvfs):
         try:
-            # Linux/macOS command for RAM
-            ram_process_linux = subprocess.Popen(["free", "-m"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            ram_stdout_linux, ram_stderr_linux = ram_process_linux.communicate(timeout=10)
-            if ram_process_linux.returncode == 0:
-                lines = ram_stdout_linux.strip().splitlines()
-                if len(lines) > 1:
-                    # Mem: total used free shared buff/cache available
-                    parts = lines[1].split() # Second line contains actual memory data
-                    ram_info = {
-                        "total_mb": int(parts[1]),
-                        "used_mb": int(parts[2]),
-                        "free_mb": int(parts[3]),
-                        "available_mb": int(parts[6]), # 'available' is usually more relevant than 'free'
-                        "source": "free -m (Linux/macOS)"
-                    }
-                else:
-                    ram_info = {"error": "Could not parse 'free -m' output."}
-                    error_messages.append(ram_info["error"])
-            else:
-                ram_info = {"error": f"'free -m' failed (code {ram_process_linux.returncode}): {ram_stderr_linux.strip()}"}
-                error_messages.append(ram_info["error"])
-        except FileNotFoundError:
-            ram_info = {"error": "'free -m' command not found. RAM info unavailable."}
-            error_messages.append(ram_info["error"])
-        except subprocess.TimeoutExpired:
-            ram_info = {"error": "'free -m' command timed out."}
-            error_messages.append(ram_info["error"])
-        except Exception as e_nix_ram:
-            ram_info = {"error": f"Error processing 'free -m': {str(e_nix_ram)}"}
-            error_messages.append(ram_info["error"])
-
-    # --- Disk Information --- 
-    try:
-        # Try Windows-specific command first
-        disk_command = ["wmic", "logicaldisk", "get", "DeviceID,FreeSpace,Size", "/FORMAT:CSV"]
-        disk_process = subprocess.Popen(disk_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, shell=False)
-        disk_stdout, disk_stderr = disk_process.communicate(timeout=15)
-
-        if disk_process.returncode == 0 and disk_stdout.strip():
-            # Skip the first line which is usually "Node,DeviceID,FreeSpace,Size"
-            # And any other blank lines before the actual data
-            lines = disk_stdout.strip().splitlines()
-            actual_data_started = False
-            temp_disk_info = []
-            for line in lines:
-                if not line.strip(): continue # Skip blank lines
-                if line.lower().startswith("node,"):
-                    actual_data_started = True
-                    continue
-                if not actual_data_started and line.strip(): # Handle cases where Node might be on its own line
-                    if line.strip().lower() == "node": # Check if it is the header from wmic output
-                         actual_data_started = True
-                         continue
-                
-                # If we are past the header (or if no explicit header was found but we have data lines)
-                # A typical data line: DESKTOP-XYZ,C:,123456789,987654321
-                parts = line.strip().split(",")
-                if len(parts) == 4 and parts[1].endswith(":") and parts[2].isdigit() and parts[3].isdigit():
-                    device_id = parts[1]
-                    free_space_bytes = int(parts[2])
-                    total_size_bytes = int(parts[3])
-                    if total_size_bytes > 0:
-                        temp_disk_info.append({
-                            "filesystem": device_id,
-                            "total_gb": round(total_size_bytes / (1024**3), 2),
-                            "free_gb": round(free_space_bytes / (1024**3), 2),
-                            "used_gb": round((total_size_bytes - free_space_bytes) / (1024**3), 2),
-                            "use_percent": round(((total_size_bytes - free_space_bytes) / total_size_bytes) * 100, 1),
-                            "source": "wmic (Windows)"
-                        })
-            if temp_disk_info:
-                disk_info = temp_disk_info
-            elif not error_messages or "RAM" in error_messages[-1]: # only raise if no disk info found and no prior specific disk error
-                 raise Exception("WMIC executed but no disk data parsed.")
+            self.stats = statvfs(path)
+        except OSError:
+            pass
+        finally:
+            self.done.set()
+
+# Mount point -> _StatvfsCall that did not return in time; the mount is not queried again until it does
+_blocked_statvfs = {}
+_blocked_statvfs_lock = threading.Lock()
+
+def statvfs_with_timeout(mount_points, statvfs=os.statvfs, timeout=STATVFS_TIMEOUT):
+    """
+    statvfs of several (network) mount points in parallel, within `timeout` seconds overall.
+    Returns {mount point: stats or None}; mounts that did not answer in time or failed map to None.
+    """
+    results = {}
+    calls = {}
+    with _blocked_statvfs_lock:
+        for mount_point in mount_points:
+            blocked = _blocked_statvfs.get(mount_point)
+            if blocked is not None and not blocked.done.is_set():
+                results[mount_point] = None  # Still hanging since an earlier sample
+                continue
+            _blocked_statvfs.pop(mount_point, None)
+            calls[mount_point] = _StatvfsCall(mount_point, statvfs)
+    deadline = time.monotonic() + timeout
+    for mount_point, call in calls.items():
+        if call.done.wait(max(0.0, deadline - time.monotonic())):
+            results[mount_point] = call.stats
+            continue
+        perf.timed_out("statvfs")
+        print(f"statvfs of {mount_point} did not return within {timeout}s, skipping it until it does")
+        with _blocked_statvfs_lock:
+            _blocked_statvfs[mount_point] = call
+        results[mount_point] = None
+    return results
+
+def get_linux_disk_info(mounts_path="/proc/self/mounts", statvfs=os.statvfs, timeout=STATVFS_TIMEOUT):
+    """
+    Capacity of every mounted filesystem in exact bytes, using statvfs per mount point.
+    Like `df`, pseudo filesystems with no blocks (proc, sysfs, cgroup, ...) are skipped and
+    a device mounted several times (bind mounts) is only reported once. Network filesystems
+    that do not answer within `timeout` seconds (e.g. a stale NFS mount) are left out.
+    """
+    mounts = read_mounts(mounts_path)
+    network_stats = statvfs_with_timeout([mount_point for _, mount_point, fstype in mounts if is_network_fstype(fstype)],
+                                         statvfs, timeout)
+    disks = []
+    seen_devices = set()
+    for device, mount_point, fstype in mounts:
+        if mount_point in network_stats:
+            stats = network_stats[mount_point]
+            if stats is None:
+                continue  # Not answering in time, or not accessible
         else:
-            raise Exception(f"wmic command failed with code {disk_process.returncode}: {disk_stderr.strip()}")
+            try:
+                stats = statvfs(mount_point)
+            except OSError:
+                continue  # Not accessible to us (permissions, removed meanwhile, ...)
+        if stats.f_blocks == 0:
+            continue
+        device_key = (device, stats.f_fsid) if device.startswith("/") else (device, mount_point)
+        if device_key in seen_devices:
+            continue
+        seen_devices.add(device_key)
+
+        total = stats.f_blocks * stats.f_frsize
+        free = stats.f_bfree * stats.f_frsize
+        available = stats.f_bavail * stats.f_frsize
+        used = total - free
+        # Same definition as df: share of the space usable by non-root users that is taken
+        usable = used + available
+        disks.append({
+            "filesystem": device,
+            "mounted_on": mount_point,
+            "fstype": fstype,
+            "total_bytes": total,
+            "used_bytes": used,
+            "available_bytes": available,
+            "total_gb": round(total / BYTES_PER_GB, 2),
+            "used_gb": round(used / BYTES_PER_GB, 2),
+            "free_gb": round(available / BYTES_PER_GB, 2),
+            "use_percent": round(used / usable * 100, 1) if usable else 0.0,
+            "source": "statvfs (Linux)"
+        })
+    return disks
+
+def _get_ram_info_linux():
+    try:
+        return get_linux_ram_info()
+    except (OSError, KeyError, ValueError) as e:
+        return {"error": f"Could not read /proc/meminfo: {e}"}
+
+def _get_disk_info_linux():
+    try:
+        disks = get_linux_disk_info()
+        return disks if disks else {"error": "No mounted filesystems found in /proc/self/mounts."}
+    except OSError as e:
+        return {"error": f"Could not read /proc/self/mounts: {e}"}
+
+def get_ram_disk_info():
+    """
+    Fetches RAM and Disk usage information on Linux, reading /proc/meminfo and
+    /proc/self/mounts + statvfs directly (no subprocesses). The Windows and other
+    implementations live in utils/windows.py and utils/posix_commands.py, see
+    utils/platform_registry.py.
+    Sizes are reported as exact byte counts (*_bytes), with rounded MB/GB values alongside.
+    Returns a dictionary with RAM and disk stats, or an error message.
+    """
+    return combine_ram_disk(_get_ram_info_linux(), _get_disk_info_linux())
+
+def combine_ram_disk(ram_info, disk_info):
+    """The get_ram_disk_info() result for the RAM and disk results of any platform."""
+    result = {"ram": ram_info, "disk": disk_info}
 
-    except Exception as e_win_disk:
-        # print(f"Windows disk info failed: {e_win_disk}. Trying Linux fallback.")
-        error_messages.append(f"Windows disk command error: {str(e_win_disk)}")
-        try:
-            # Linux/macOS command for disk
-            disk_process_linux = subprocess.Popen(["df", "-hP"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            disk_stdout_linux, disk_stderr_linux = disk_process_linux.communicate(timeout=10)
-            if disk_process_linux.returncode == 0:
-                lines = disk_stdout_linux.strip().split('\n')
-                temp_disk_info_linux = []
-                if len(lines) > 1:
-                    for line in lines[1:]: # Skip header line
-                        parts = line.split()
-                        if len(parts) >= 6:
-                             # Filesystem Size Used Avail Use% Mounted on
-                            total_str = parts[1]
-                            used_str = parts[2]
-                            avail_str = parts[3]
-                            use_percent_str = parts[4]
-                            temp_disk_info_linux.append({
-                                "filesystem": parts[0],
-                                "total_str": total_str,
-                                "used_str": used_str,
-                                "available_str": avail_str,
-                                "use_percent_str": use_percent_str,
-                                "mounted_on": parts[5],
-                                "source": "df -hP (Linux/macOS)"
-                            })
-                if temp_disk_info_linux:
-                    disk_info = temp_disk_info_linux
-                else:
-                    disk_info = {"error": "Could not parse 'df -hP' output."}
-                    error_messages.append(str(disk_info["error"]))
-            else:
-                disk_info = {"error": f"'df -hP' failed (code {disk_process_linux.returncode}): {disk_stderr_linux.strip()}"}
-                error_messages.append(str(disk_info["error"]))
-        except FileNotFoundError:
-            disk_info = {"error": "'df -hP' command not found. Disk info unavailable."}
-            error_messages.append(str(disk_info["error"]))
-        except subprocess.TimeoutExpired:
-            disk_info = {"error": "'df -hP' command timed out."}
-            error_messages.append(str(disk_info["error"]))
-        except Exception as e_nix_disk:
-            disk_info = {"error": f"Error processing 'df -hP': {str(e_nix_disk)}"}
-            error_messages.append(str(disk_info["error"]))
-
-    result = {
-        "ram": ram_info if ram_info else {"error": "RAM information could not be determined."},
-        "disk": disk_info if (isinstance(disk_info, list) and disk_info) else disk_info if isinstance(disk_info, dict) and "error" in disk_info else {"error": "Disk information could not be determined."}
-    }
-    
     # Consolidate errors if specific data sections failed but others might have succeeded
     final_errors = []
-    if isinstance(result["ram"], dict) and "error" in result["ram"]:
-        final_errors.append(f"RAM Error: {result['ram']['error']}")
-    if isinstance(result["disk"], dict) and "error" in result["disk"]:
-        final_errors.append(f"Disk Error: {result['disk']['error']}")
-    elif isinstance(result["disk"], list) and not result["disk"]:
-         final_errors.append("Disk Error: No disk information was populated.")
-
+    if "error" in ram_info:
+        final_errors.append(f"RAM Error: {ram_info['error']}")
+    if isinstance(disk_info, dict) and "error" in disk_info:
+        final_errors.append(f"Disk Error: {disk_info['error']}")
     if final_errors:
         result["errors_encountered"] = final_errors
-        # If all main sections failed, it implies a broader issue
-        if len(final_errors) == 2 or ( (not result["ram"] or "error" in result["ram"]) and (not result["disk"] or "error" in result["disk"]) ) :
-             # If both failed, it's likely the initial error messages list is more relevant
-             if error_messages and len(error_messages) > 1:
-                 result["errors_encountered"] = error_messages # Show more detailed subprocess errors
 
     return result
 
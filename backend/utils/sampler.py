@@ -0,0 +1,252 @@
+import os
+import threading
+import time
+
+
+def interval_from_env(name, default):
+    """
+    Reads the sampling interval (in seconds) for a collector from the environment.
+    The variable name is DASHBOARD_INTERVAL_<NAME>, e.g. DASHBOARD_INTERVAL_GPU=1.5.
+    Falls back to `default` if the variable is unset or not a positive number.
+    """
+    raw = os.environ.get(f"DASHBOARD_INTERVAL_{name.upper()}")
+    if raw is None:
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        print(f"Ignoring invalid interval '{raw}' for collector {name}, using {default}s")
+        return default
+    return value if value > 0 else default
+
+
+class Snapshot:
+    """
+    The latest result of one collector, together with when it was taken.
+    Snapshots are immutable once published; a new sample replaces the whole object.
+    """
+    __slots__ = ("source", "data", "timestamp", "duration", "version")
+
+    def __init__(self, source, data, timestamp, duration, version):
+        self.source = source
+        self.data = data
+        self.timestamp = timestamp  # Wall-clock time (time.time()) when the sample finished
+        self.duration = duration    # Seconds the collector took to produce the sample
+        self.version = version      # Increments by one for every new sample of this source
+
+    def age(self):
+        """Seconds elapsed since this snapshot was taken."""
+        return max(0.0, time.time() - self.timestamp)
+
+    def meta(self):
+        return {
+            "source": self.source,
+            "timestamp": self.timestamp,
+            "age_seconds": round(self.age(), 3),
+            "collection_seconds": round(self.duration, 6),
+            "version": self.version,
+        }
+
+
+class Collector:
+    """
+    Runs one collection function in a daemon thread and hands every result to the owning
+    Sampler. The wait after each collection is the fixed `interval`, or for adaptive
+    sources whatever the Sampler's scheduler chooses.
+    """
+
+    def __init__(self, name, func, interval, sampler):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self._sampler = sampler
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+
+    def collect_once(self):
+        """Runs the collection function once and publishes the result."""
+        started = time.monotonic()
+        try:
+            data = self.func()
+        except Exception as e:
+            # Collectors normally report their own errors, this is a last line of defence
+            # so one broken source never kills its sampling thread.
+            print(f"Collector {self.name} raised an unexpected error: {e}")
+            data = {"error": f"Collector {self.name} failed", "details": str(e)}
+        self._sampler._publish(self.name, data, time.monotonic() - started)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake_event.clear()
+            self.collect_once()
+            finished = time.monotonic()
+            # Woken up by wake(), the interval is chosen again, counted from the same collection
+            while not self._stop_event.is_set():
+                remaining = self._sampler.next_interval(self.name) - (time.monotonic() - finished)
+                if remaining <= 0:
+                    break
+                self._wake_event.wait(remaining)
+                self._wake_event.clear()
+
+    def wake(self):
+        """Makes a waiting collector re-check its interval, e.g. after it became shorter."""
+        self._wake_event.set()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"collector-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def join(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+
+class Sampler:
+    """
+    Owns all collectors and the in-memory cache holding the latest Snapshot per source.
+    Request handlers only ever read from the cache, so the cost of collection is
+    independent of how many clients are polling.
+
+    With a `scheduler` (utils/scheduler.py), sources registered as adaptive are sampled
+    faster while someone watches them (note_demand()) or their values change, and slower
+    otherwise.
+    """
+
+    def __init__(self, scheduler=None):
+        self.scheduler = scheduler
+        self._collectors = {}
+        self._snapshots = {}
+        self._listeners = []
+        self._services = []
+        self._condition = threading.Condition()
+        self._started = False
+
+    def register(self, name, func, interval, adaptive=False):
+        """
+        Registers a collection function under `name`, sampled every `interval` seconds.
+        `adaptive` lets the scheduler (if any) vary the interval around `interval`.
+        """
+        collector = Collector(name, func, interval, self)
+        if adaptive and self.scheduler is not None:
+            self.scheduler.track(name, interval)
+        self._collectors[name] = collector
+        if self._started:
+            collector.start()
+        return collector
+
+    def add_listener(self, callback):
+        """Calls `callback(snapshot)` from the collector thread whenever a new snapshot is published."""
+        self._listeners.append(callback)
+
+    def add_service(self, service):
+        """
+        Ties an object with start() and stop() methods (e.g. a GPU backend) to the sampler's
+        lifecycle: it is started before the collectors and stopped after them.
+        """
+        self._services.append(service)
+
+    def sources(self):
+        return list(self._collectors)
+
+    def start(self):
+        """Starts every registered service and collector. Safe to call more than once."""
+        with self._condition:
+            if self._started:
+                return
+            self._started = True
+        for service in self._services:
+            service.start()
+        for collector in self._collectors.values():
+            collector.start()
+
+    def stop(self, timeout=None):
+        """Stops the collectors, waiting up to `timeout` seconds for running collections, then the services."""
+        for collector in self._collectors.values():
+            collector.stop()
+        if timeout:
+            deadline = time.monotonic() + timeout
+            for collector in self._collectors.values():
+                collector.join(max(0.0, deadline - time.monotonic()))
+        for service in reversed(self._services):
+            try:
+                service.stop()
+            except Exception as e:
+                print(f"Stopping {service} failed: {e}")
+        with self._condition:
+            self._started = False
+
+    def next_interval(self, name):
+        """Seconds between the end of one collection of `name` and the start of the next."""
+        if self.scheduler is not None and self.scheduler.tracks(name):
+            return self.scheduler.next_interval(name)
+        return self._collectors[name].interval
+
+    def note_demand(self, name):
+        """Tells the scheduler a client wants current data of `name`, waking its collector if it was idle."""
+        if self.scheduler is not None and self.scheduler.note_demand(name):
+            self._collectors[name].wake()
+
+    def missing_sources(self):
+        """Sources that have not produced their first snapshot yet."""
+        with self._condition:
+            return [name for name in self._collectors if name not in self._snapshots]
+
+    def ready(self):
+        """True once every source has been sampled at least once."""
+        return not self.missing_sources()
+
+    def _publish(self, name, data, duration):
+        with self._condition:
+            previous = self._snapshots.get(name)
+            version = previous.version + 1 if previous else 1
+            snapshot = Snapshot(name, data, time.time(), duration, version)
+            self._snapshots[name] = snapshot
+            self._condition.notify_all()
+        if self.scheduler is not None:
+            self.scheduler.observe(name, data, duration)
+        for listener in self._listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                print(f"Snapshot listener {listener} failed for {name}: {e}")
+
+    def get(self, name, wait=None):
+        """
+        Returns the latest Snapshot for `name`, or None if there is none yet.
+        If `wait` is given, blocks up to that many seconds for the first sample to arrive
+        (useful right after startup, when the first collection is still running).
+        """
+        if name not in self._collectors:
+            raise KeyError(name)
+        with self._condition:
+            snapshot = self._snapshots.get(name)
+            if snapshot is None and wait:
+                self._condition.wait_for(lambda: name in self._snapshots, timeout=wait)
+                snapshot = self._snapshots.get(name)
+            return snapshot
+
+    def status(self):
+        """
+        Metadata (age, interval, collection time) for every source, for diagnostics. Adaptive
+        sources also report their current interval and why it was chosen under "schedule".
+        """
+        result = {}
+        with self._condition:
+            snapshots = dict(self._snapshots)
+        schedule = self.scheduler.status() if self.scheduler is not None else {}
+        for name, collector in self._collectors.items():
+            snapshot = snapshots.get(name)
+            entry = snapshot.meta() if snapshot else {"source": name, "timestamp": None, "age_seconds": None}
+            entry["interval_seconds"] = collector.interval
+            if name in schedule:
+                entry["schedule"] = schedule[name]
+            result[name] = entry
+        return result
@@ -0,0 +1,190 @@
+import os
+import threading
+import time
+
+from utils.alerts import ALERT_EXTRACTORS
+from utils.instrumentation import perf
+
+# Seconds a request for a source (or a snapshot delivered to a stream subscriber) counts as demand
+DEMAND_WINDOW = 30.0
+# Longest interval of a source nobody watches whose values are flat
+DEFAULT_HEARTBEAT = 15.0
+# Share of one core a collector may spend: its interval is at least runtime / budget
+DEFAULT_CPU_BUDGET = 0.1
+# Watched and changing sources are sampled this much faster than their base interval ...
+FAST_FACTOR = 0.5
+# ... but never more often than this
+MIN_INTERVAL = 0.5
+# Every flat, unwatched sample multiplies the interval by this, up to the heartbeat
+BACKOFF_FACTOR = 1.5
+# A value moving by this share of its magnitude between two samples counts as changing;
+# magnitudes below CHANGE_FLOOR count as CHANGE_FLOOR (so 1% -> 2% GPU utilization is not a ramp)
+CHANGE_THRESHOLD = 0.05
+CHANGE_FLOOR = 25.0
+# Seconds a source stays "changing" after its last significant change
+CHANGE_HOLD = 30.0
+# Weight of the newest runtime in the moving average used for the CPU budget
+RUNTIME_SMOOTHING = 0.3
+
+class _SourceState:
+    __slots__ = ("base_interval", "fast_interval", "heartbeat", "cpu_budget", "signals", "values",
+                 "last_demand", "changing_until", "idle_samples", "runtime", "interval", "reason")
+
+    def __init__(self, base_interval, heartbeat, cpu_budget, signals):
+        self.base_interval = base_interval
+        self.fast_interval = max(MIN_INTERVAL, min(base_interval, base_interval * FAST_FACTOR))
+        self.heartbeat = max(heartbeat, base_interval)
+        self.cpu_budget = cpu_budget
+        self.signals = signals
+        self.values = {}
+        self.last_demand = None
+        self.changing_until = None
+        self.idle_samples = 0     # Consecutive samples taken while unwatched and flat
+        self.runtime = None       # Moving average of the collection time, seconds
+        self.interval = base_interval
+        self.reason = "base"
+
+class AdaptiveScheduler:
+    """
+    Chooses the interval of every adaptive source from two signals and a budget:
+
+    * demand: a source requested within the last DEMAND_WINDOW seconds (note_demand()) is
+      sampled at its base interval, or FAST_FACTOR times that while its values are changing;
+    * rate of change: a source whose values moved by more than CHANGE_THRESHOLD is sampled at
+      least at its base interval for CHANGE_HOLD seconds, even if nobody is watching;
+    * otherwise the interval grows by BACKOFF_FACTOR per sample up to the heartbeat;
+    * the CPU budget: the interval is never shorter than the collector's average runtime
+      divided by its budget, so a slow `lxc` never takes more than its share of a core.
+
+    All decisions depend only on the observations and the injected `clock`, so the schedule
+    can be replayed under a fake clock.
+    """
+
+    def __init__(self, heartbeat=DEFAULT_HEARTBEAT, cpu_budget=DEFAULT_CPU_BUDGET,
+                 demand_window=DEMAND_WINDOW, clock=time.monotonic):
+        self.heartbeat = heartbeat
+        self.cpu_budget = cpu_budget
+        self.demand_window = demand_window
+        self._clock = clock
+        self._sources = {}
+        self._lock = threading.Lock()
+
+    def track(self, source, base_interval, signals=None, heartbeat=None, cpu_budget=None):
+        """
+        Schedules `source` adaptively around `base_interval`. `signals(data)` yields
+        (metric, device, value) tuples whose changes drive the rate of change signal
+        (default: the alert extractors of the source, if any).
+        """
+        state = _SourceState(base_interval,
+                             self.heartbeat if heartbeat is None else heartbeat,
+                             self.cpu_budget if cpu_budget is None else cpu_budget,
+                             signals if signals is not None else ALERT_EXTRACTORS.get(source))
+        with self._lock:
+            self._sources[source] = state
+
+    def tracks(self, source):
+        return source in self._sources
+
+    def _watched(self, state, now):
+        return state.last_demand is not None and now - state.last_demand < self.demand_window
+
+    def note_demand(self, source):
+        """
+        Records that someone wants current data of `source`. Returns True if the source was
+        not watched before, i.e. its collector should be woken up to use the shorter interval.
+        """
+        state = self._sources.get(source)
+        if state is None:
+            return False
+        now = self._clock()
+        with self._lock:
+            was_watched = self._watched(state, now)
+            state.last_demand = now
+        return not was_watched
+
+    def observe(self, source, data, duration):
+        """Feeds one finished collection of `source`: its data (for the change signal) and how long it took."""
+        state = self._sources.get(source)
+        if state is None:
+            return
+        values = {}
+        if state.signals is not None:
+            try:
+                for metric, device, value in state.signals(data):
+                    values[(metric, device)] = value
+            except Exception as e:
+                print(f"Change signals of {source} failed: {e}")
+        now = self._clock()
+        with self._lock:
+            if state.runtime is None:
+                state.runtime = duration
+            else:
+                state.runtime += RUNTIME_SMOOTHING * (duration - state.runtime)
+            change = 0.0
+            for key, value in values.items():
+                previous = state.values.get(key)
+                if previous is not None:
+                    scale = max(abs(previous), abs(value), CHANGE_FLOOR)
+                    change = max(change, abs(value - previous) / scale)
+            state.values = values
+            if change >= CHANGE_THRESHOLD:
+                state.changing_until = now + CHANGE_HOLD
+            changing = state.changing_until is not None and now < state.changing_until
+            if changing or self._watched(state, now):
+                state.idle_samples = 0
+            else:
+                state.idle_samples += 1
+
+    def next_interval(self, source):
+        """Seconds to wait after the last collection of `source` before the next one."""
+        state = self._sources[source]
+        now = self._clock()
+        with self._lock:
+            watched = self._watched(state, now)
+            changing = state.changing_until is not None and now < state.changing_until
+            if watched and changing:
+                interval, reason = state.fast_interval, "watched, changing"
+            elif watched:
+                interval, reason = state.base_interval, "watched"
+            elif changing:
+                interval, reason = state.base_interval, "changing"
+            else:
+                interval = min(state.base_interval * BACKOFF_FACTOR ** state.idle_samples, state.heartbeat)
+                reason = "heartbeat" if interval >= state.heartbeat else "backing off"
+            if state.runtime is not None and state.cpu_budget > 0 and interval < state.runtime / state.cpu_budget:
+                interval, reason = state.runtime / state.cpu_budget, "cpu budget"
+                perf.count("scheduler_budget_limited", source)
+            state.interval, state.reason = interval, reason
+        return interval
+
+    def status(self):
+        """The current interval of every adaptive source, why it was chosen, and its CPU share."""
+        now = self._clock()
+        result = {}
+        with self._lock:
+            for source, state in self._sources.items():
+                result[source] = {
+                    "interval_seconds": round(state.interval, 3),
+                    "reason": state.reason,
+                    "base_interval_seconds": state.base_interval,
+                    "watched": self._watched(state, now),
+                    "changing": state.changing_until is not None and now < state.changing_until,
+                    "runtime_seconds": round(state.runtime, 6) if state.runtime is not None else None,
+                    "cpu_share": round(state.runtime / state.interval, 4) if state.runtime is not None else None,
+                    "cpu_budget": state.cpu_budget,
+                }
+        return result
+
+def scheduler_from_env():
+    """
+    The AdaptiveScheduler configured by the environment, or None with DASHBOARD_ADAPTIVE=0
+    (every source then keeps its fixed interval).
+      DASHBOARD_HEARTBEAT        longest interval of an unwatched, flat source (default 15 s)
+      DASHBOARD_CPU_BUDGET       share of one core each collector may use (default 0.1)
+      DASHBOARD_DEMAND_WINDOW    seconds a request keeps a source watched (default 30)
+    """
+    if os.environ.get("DASHBOARD_ADAPTIVE", "1") == "0":
+        return None
+    return AdaptiveScheduler(heartbeat=float(os.environ.get("DASHBOARD_HEARTBEAT", DEFAULT_HEARTBEAT)),
+                             cpu_budget=float(os.environ.get("DASHBOARD_CPU_BUDGET", DEFAULT_CPU_BUDGET)),
+                             demand_window=float(os.environ.get("DASHBOARD_DEMAND_WINDOW", DEMAND_WINDOW)))
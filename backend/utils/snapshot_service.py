@@ -0,0 +1,406 @@
+import json
+import os
+import queue
+import socket
+import stat
+import threading
+import time
+import uuid
+
+from utils.instrumentation import perf
+from utils.platform_registry import platform_status
+from utils.sampler import Snapshot
+
+# Messages queued per connected worker before it is considered stuck and disconnected
+CLIENT_QUEUE_SIZE = 256
+RECONNECT_DELAY = 0.5
+MAX_RECONNECT_DELAY = 5.0
+# Seconds between demand notifications a worker forwards for the same source (well below the
+# scheduler's demand window, so a watched source stays watched)
+DEMAND_FORWARD_INTERVAL = 5.0
+# Demand notifications waiting for the forwarding thread; more are dropped while it is stuck
+DEMAND_QUEUE_SIZE = 64
+
+def _encode(message):
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode()
+
+class _Client:
+    """One connected worker: a bounded queue of encoded messages written by its own thread."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.queue = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+
+class SnapshotServer:
+    """
+    Serves the snapshots of a local Sampler to other processes over a unix socket, so that
+    several web server workers share one set of collectors.
+
+    The protocol is newline-delimited JSON. A client sends one request line:
+      {"op": "subscribe"} -> a "hello" message (instance id and source intervals), the current
+                             snapshot of every source, then every new snapshot as it is published
+      {"op": "perf"}      -> the collector process's own instrumentation (perf.snapshot()), its
+                             platform_status() and its sampler status (with the adaptive schedule)
+      {"op": "demand", "sources": [...]}
+                          -> passes client demand for the sources on to the sampler's scheduler
+    Each snapshot is serialized once and the same bytes are queued for every subscriber.
+    A subscriber that falls CLIENT_QUEUE_SIZE messages behind is disconnected; it reconnects
+    and starts over from the current snapshots.
+    """
+
+    def __init__(self, sampler, socket_path):
+        self.sampler = sampler
+        self.socket_path = socket_path
+        self.instance = uuid.uuid4().hex  # Lets clients detect a restarted collector process
+        self._clients = set()
+        self._lock = threading.Lock()
+        self._listener = None
+        self._stopping = threading.Event()
+        sampler.add_listener(self.on_snapshot)
+
+    @staticmethod
+    def _snapshot_message(snapshot):
+        return {"type": "snapshot", "source": snapshot.source, "data": snapshot.data,
+                "timestamp": snapshot.timestamp, "duration": snapshot.duration, "version": snapshot.version}
+
+    def on_snapshot(self, snapshot):
+        with self._lock:
+            clients = list(self._clients)
+        if not clients:
+            return
+        message = _encode(self._snapshot_message(snapshot))
+        for client in clients:
+            try:
+                client.queue.put_nowait(message)
+            except queue.Full:
+                print("Snapshot subscriber is not keeping up, disconnecting it")
+                self._drop(client)
+
+    def _drop(self, client):
+        with self._lock:
+            self._clients.discard(client)
+        try:
+            client.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _serve_subscriber(self, client):
+        hello = {"type": "hello", "instance": self.instance,
+                 "sources": {name: info["interval_seconds"] for name, info in self.sampler.status().items()}}
+        initial = [_encode(hello)]
+        # Register before reading the current snapshots so that nothing published in between is lost
+        with self._lock:
+            self._clients.add(client)
+        for name in self.sampler.sources():
+            snapshot = self.sampler.get(name)
+            if snapshot is not None:
+                initial.append(_encode(self._snapshot_message(snapshot)))
+        client.connection.sendall(b"".join(initial))
+        while not self._stopping.is_set():
+            try:
+                message = client.queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if message is None:
+                break
+            client.connection.sendall(message)
+
+    def _handle(self, connection):
+        client = _Client(connection)
+        try:
+            line = connection.makefile("rb").readline()
+            if not line:
+                return  # Connection check (wait_for_socket), nothing requested
+            op = json.loads(line).get("op")
+            if op == "subscribe":
+                self._serve_subscriber(client)
+            elif op == "perf":
+                connection.sendall(_encode(dict(perf.snapshot(), platform=platform_status(),
+                                                sources=self.sampler.status())))
+            elif op == "demand":
+                known = set(self.sampler.sources())
+                for source in json.loads(line).get("sources") or []:
+                    if source in known:
+                        self.sampler.note_demand(source)
+                connection.sendall(_encode({"ok": True}))
+            else:
+                connection.sendall(_encode({"error": f"Unknown op: {op}"}))
+        except (OSError, ValueError) as e:
+            if not self._stopping.is_set():
+                print(f"Snapshot client disconnected: {e}")
+        finally:
+            with self._lock:
+                self._clients.discard(client)
+            connection.close()
+
+    def _accept_loop(self):
+        while not self._stopping.is_set():
+            try:
+                connection, _ = self._listener.accept()
+            except OSError:
+                break  # Listener closed by stop()
+            threading.Thread(target=self._handle, args=(connection,), name="snapshot-client", daemon=True).start()
+
+    def _remove_stale_socket(self):
+        """
+        Removes a socket left over by a process that did not shut down cleanly. Raises OSError
+        rather than removing anything else: a file that is not a socket, or a socket that a
+        running server still accepts connections on.
+        """
+        try:
+            mode = os.lstat(self.socket_path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise OSError(f"{self.socket_path} exists and is not a socket")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                os.unlink(self.socket_path)
+                return
+        raise OSError(f"Another collector is already serving on {self.socket_path}")
+
+    def start(self):
+        self._remove_stale_socket()
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        self._listener.listen(64)
+        threading.Thread(target=self._accept_loop, name="snapshot-server", daemon=True).start()
+
+    def stop(self):
+        """Stops accepting, ends every subscription and removes the socket file."""
+        self._stopping.set()
+        if self._listener is not None:
+            self._listener.close()
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                client.queue.put_nowait(None)
+            except queue.Full:
+                self._drop(client)
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+def request_collector(socket_path, op, timeout=5.0, **fields):
+    """Sends a one-shot request (e.g. "perf") to a SnapshotServer and returns the decoded reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(timeout)
+        connection.connect(socket_path)
+        connection.sendall(_encode(dict(fields, op=op)))
+        return json.loads(connection.makefile("rb").readline())
+
+class RemoteSampler:
+    """
+    A read-only stand-in for Sampler in processes that do not collect anything themselves:
+    it subscribes to a SnapshotServer and keeps the latest snapshot of every source locally,
+    so request handlers read from memory exactly as with a local Sampler, and listeners
+    (history, stream broadcaster, instrumentation) receive every snapshot as it arrives.
+
+    If the connection drops, the last snapshots keep being served (their age grows) while it
+    reconnects with back-off. Versions are assigned locally and only ever increase, also across
+    a restart of the collector process.
+    """
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self._intervals = {}
+        self._snapshots = {}
+        self._versions = {}    # source -> local version counter
+        self._listeners = []
+        self._condition = threading.Condition()
+        self._connected = False
+        self._hello = threading.Event()
+        self._instance = None
+        self._started = False
+        self._stop_event = threading.Event()
+        self._connection = None
+        self._demand_forwarded = {}  # source -> monotonic time demand was last forwarded
+        self._demand = queue.Queue(maxsize=DEMAND_QUEUE_SIZE)  # Sources to forward, see _forward_demand
+
+    # --- Sampler interface ---
+
+    def register(self, name, func, interval):
+        raise RuntimeError("Collectors run in the collector process; RemoteSampler is read-only")
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def add_service(self, service):
+        raise RuntimeError("Services run in the collector process; RemoteSampler is read-only")
+
+    def sources(self):
+        with self._condition:
+            return list(self._intervals)
+
+    def start(self, wait=10.0):
+        """Connects in a background thread and waits up to `wait` seconds for the source list. Safe to call more than once."""
+        with self._condition:
+            if self._started:
+                return
+            self._started = True
+        self._stop_event.clear()
+        threading.Thread(target=self._run, name="remote-sampler", daemon=True).start()
+        threading.Thread(target=self._forward_demand, name="remote-demand", daemon=True).start()
+        self._hello.wait(wait)
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        connection = self._connection
+        if connection is not None:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        with self._condition:
+            self._started = False
+
+    def get(self, name, wait=None):
+        """
+        As Sampler.get. Until the collector's hello has announced its sources every source is
+        pending, so None is returned (after waiting up to `wait` seconds for the hello and the
+        first sample) instead of raising KeyError for a source that is not known yet.
+        """
+        with self._condition:
+            if name not in self._snapshots and wait:
+                self._condition.wait_for(
+                    lambda: name in self._snapshots or (self._announced() and name not in self._intervals),
+                    timeout=wait)
+            if not self._announced():
+                return None
+            if name not in self._intervals:
+                raise KeyError(name)
+            return self._snapshots.get(name)
+
+    def _announced(self):
+        """True once a hello has listed the sources (also while reconnecting). Called with the condition held."""
+        return self._instance is not None
+
+    def status(self):
+        result = {}
+        with self._condition:
+            snapshots = dict(self._snapshots)
+            intervals = dict(self._intervals)
+        for name, interval in intervals.items():
+            snapshot = snapshots.get(name)
+            entry = snapshot.meta() if snapshot else {"source": name, "timestamp": None, "age_seconds": None}
+            entry["interval_seconds"] = interval
+            result[name] = entry
+        return result
+
+    def note_demand(self, name):
+        """
+        Forwards client demand for `name` to the collector process, at most every DEMAND_FORWARD_INTERVAL.
+        Called on request threads, so the round trip to the collector is left to _forward_demand.
+        """
+        now = time.monotonic()
+        with self._condition:
+            if not self._connected or now - self._demand_forwarded.get(name, -DEMAND_FORWARD_INTERVAL) < DEMAND_FORWARD_INTERVAL:
+                return
+            self._demand_forwarded[name] = now
+        try:
+            self._demand.put_nowait(name)
+        except queue.Full:
+            with self._condition:
+                self._demand_forwarded.pop(name, None)  # Retried by the next request
+
+    def missing_sources(self):
+        with self._condition:
+            if not self._connected:
+                return list(self._intervals) or ["collector connection"]
+            return [name for name in self._intervals if name not in self._snapshots]
+
+    def ready(self):
+        return not self.missing_sources()
+
+    def connected(self):
+        return self._connected
+
+    def collector_perf(self):
+        """The instrumentation of the collector process (subprocess spawns, timeouts, ...)."""
+        return request_collector(self.socket_path, "perf")
+
+    def _forward_demand(self):
+        """Sends the queued demand to the collector process, all sources queued meanwhile in one request."""
+        while not self._stop_event.is_set():
+            try:
+                sources = [self._demand.get(timeout=1.0)]
+            except queue.Empty:
+                continue
+            while True:
+                try:
+                    sources.append(self._demand.get_nowait())
+                except queue.Empty:
+                    break
+            sources = list(dict.fromkeys(sources))
+            try:
+                request_collector(self.socket_path, "demand", timeout=0.5, sources=sources)
+            except (OSError, ValueError) as e:
+                print(f"Forwarding demand for {', '.join(sources)} failed: {e}")
+
+    # --- Subscription ---
+
+    def _apply(self, message):
+        if message.get("type") == "hello":
+            with self._condition:
+                if self._instance is not None and self._instance != message.get("instance"):
+                    print("Collector process was restarted, resynchronizing snapshots")
+                self._instance = message.get("instance")
+                self._intervals = message.get("sources") or {}
+                self._connected = True
+                self._condition.notify_all()
+            self._hello.set()
+            return
+        if message.get("type") != "snapshot":
+            return
+        name = message["source"]
+        with self._condition:
+            version = self._versions.get(name, 0) + 1
+            self._versions[name] = version
+            snapshot = Snapshot(name, message["data"], message["timestamp"], message["duration"], version)
+            self._snapshots[name] = snapshot
+            self._condition.notify_all()
+        for listener in self._listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                print(f"Snapshot listener {listener} failed for {name}: {e}")
+
+    def _run(self):
+        delay = RECONNECT_DELAY
+        while not self._stop_event.is_set():
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                    connection.connect(self.socket_path)
+                    self._connection = connection
+                    connection.sendall(_encode({"op": "subscribe"}))
+                    delay = RECONNECT_DELAY
+                    for line in connection.makefile("rb"):
+                        self._apply(json.loads(line))
+            except (OSError, ValueError) as e:
+                if not self._stop_event.is_set():
+                    print(f"Collector connection at {self.socket_path} failed: {e}")
+            finally:
+                self._connection = None
+                with self._condition:
+                    self._connected = False
+            if not self._stop_event.is_set():
+                perf.count("collector_reconnects", self.socket_path)
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+def wait_for_socket(socket_path, timeout=30.0):
+    """Blocks until a SnapshotServer accepts connections at `socket_path`; returns False on timeout."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                connection.connect(socket_path)
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
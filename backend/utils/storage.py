@@ -0,0 +1,451 @@
+import fnmatch
+import json
+import math
+import mmap
+import os
+import shutil
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+from utils.history import EXTRACTORS
+from utils.instrumentation import perf
+
+# Each record is two float64 in the machine's byte order: timestamp (epoch seconds) and value
+RECORD_SIZE = 16
+
+DEFAULT_SEGMENT_SECONDS = 3600
+DEFAULT_RETENTION_SECONDS = 7 * 24 * 3600
+DEFAULT_FLUSH_INTERVAL = 5.0
+# How often retention is enforced by the flush thread
+RETENTION_CHECK_INTERVAL = 60.0
+# Every series is also stored as averages over this many seconds, for long ranges and startup
+ROLLUP_SECONDS = 60
+RAW_SUFFIX, ROLLUP_SUFFIX = "", f".{ROLLUP_SECONDS}s"
+
+SERIES_FILE = "series.json"
+
+class _Timestamps:
+    """The timestamps of a memory-mapped series file as a sequence, for bisect."""
+
+    def __init__(self, doubles):
+        self.doubles = doubles
+
+    def __len__(self):
+        return len(self.doubles) // 2
+
+    def __getitem__(self, index):
+        return self.doubles[2 * index]
+
+def _latest_per_timestamp(data):
+    """
+    Interleaved (timestamp, value) records in time order, keeping only the last record of each
+    timestamp: a rollup written at shutdown is superseded by the one completing the bucket later.
+    """
+    if len(data) < 4 or all(data[index] != data[index + 2] for index in range(0, len(data) - 2, 2)):
+        return data
+    result = array("d")
+    for index in range(0, len(data), 2):
+        if index + 2 < len(data) and data[index] == data[index + 2]:
+            continue
+        result.extend(data[index:index + 2])
+    return result
+
+def downsample(timestamps, values, resolution):
+    """Averages points into buckets of `resolution` seconds, stamped with the bucket start."""
+    out_timestamps, out_values = array("d"), array("d")
+    bucket, total, count = None, 0.0, 0
+    for timestamp, value in zip(timestamps, values):
+        current = math.floor(timestamp / resolution)
+        if current != bucket:
+            if count:
+                out_timestamps.append(bucket * resolution)
+                out_values.append(total / count)
+            bucket, total, count = current, 0.0, 0
+        total += value
+        count += 1
+    if count:
+        out_timestamps.append(bucket * resolution)
+        out_values.append(total / count)
+    return out_timestamps, out_values
+
+class SegmentStore:
+    """
+    Durable metric storage in append-only, fixed-width segment files.
+
+    Time is partitioned into segments of `segment_seconds`, one directory each (named after
+    the segment's start time), holding one file per series with 16-byte (timestamp, value)
+    records. A series' records are in time order, so reading a range is a binary search on
+    the memory-mapped file and one slice, with nothing to parse. Series are numbered;
+    series.json maps the numbers to (metric, device). Next to the raw points, every series
+    keeps a file of ROLLUP_SECONDS averages, so long ranges (and the history loaded at
+    startup) are read without touching the raw points.
+
+    Appends are buffered and written by a background thread every `flush_interval` seconds,
+    one write per series, so persisting 1 s samples costs a few small appends per interval.
+    On shutdown the rollups still being filled are written too; if the next process samples
+    the same bucket, it resumes the bucket from the raw points and its rollup supersedes the
+    partial one when read.
+    Segments whose end is older than `retention_seconds` are deleted, as are the oldest
+    segments while the store is larger than `max_bytes`. A torn record left by a crash is
+    dropped when the segment is next written.
+
+    Several processes may read the same directory; only one (the one collecting) should append.
+    """
+
+    def __init__(self, directory, segment_seconds=DEFAULT_SEGMENT_SECONDS, retention_seconds=DEFAULT_RETENTION_SECONDS,
+                 max_bytes=None, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.retention_seconds = retention_seconds
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        os.makedirs(directory, exist_ok=True)
+        self._series = {}       # (metric, device) -> id
+        self._series_keys = {}  # id -> (metric, device)
+        self._series_mtime = None
+        self._unsaved_series = False
+        self._buffers = {}      # (id, file suffix) -> array('d') of interleaved timestamps and values
+        self._rollups = {}      # id -> [bucket, sum, count] of the rollup being accumulated
+        self._checked_files = set()  # Files whose length was checked for a torn record
+        self._last_retention = 0.0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._load_series()
+
+    # --- Series registry ---
+
+    def _series_path(self):
+        return os.path.join(self.directory, SERIES_FILE)
+
+    def _load_series(self):
+        """(Re)reads series.json if another process changed it."""
+        try:
+            mtime = os.stat(self._series_path()).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._series_mtime:
+            return
+        with open(self._series_path()) as series_file:
+            saved = json.load(series_file)
+        with self._lock:
+            for series_id, (metric, device) in saved["series"].items():
+                self._series.setdefault((metric, device), int(series_id))
+                self._series_keys.setdefault(int(series_id), (metric, device))
+            self._series_mtime = mtime
+
+    def _save_series(self):
+        with self._lock:
+            if not self._unsaved_series:
+                return
+            saved = {"series": {str(series_id): list(key) for series_id, key in self._series_keys.items()}}
+            self._unsaved_series = False
+        temporary = self._series_path() + ".tmp"
+        with open(temporary, "w") as series_file:
+            json.dump(saved, series_file)
+        os.replace(temporary, self._series_path())
+        self._series_mtime = os.stat(self._series_path()).st_mtime_ns
+
+    # --- Writing ---
+
+    def append(self, metric, device, timestamp, value):
+        """Buffers one point; it is written by the next flush()."""
+        key = (metric, device)
+        with self._lock:
+            series_id = self._series.get(key)
+            if series_id is None:
+                series_id = len(self._series_keys)
+                while series_id in self._series_keys:
+                    series_id += 1
+                self._series[key] = series_id
+                self._series_keys[series_id] = key
+                self._unsaved_series = True
+            self._buffer(series_id, RAW_SUFFIX).extend((timestamp, value))
+            bucket = timestamp // ROLLUP_SECONDS
+            rollup = self._rollups.get(series_id)
+            if rollup is None:
+                self._rollups[series_id] = self._resume_rollup(series_id, bucket, timestamp, value)
+            elif rollup[0] == bucket:
+                rollup[1] += value
+                rollup[2] += 1
+            else:
+                self._buffer(series_id, ROLLUP_SUFFIX).extend((rollup[0] * ROLLUP_SECONDS, rollup[1] / rollup[2]))
+                self._rollups[series_id] = [bucket, value, 1]
+
+    def _resume_rollup(self, series_id, bucket, timestamp, value):
+        """
+        The rollup state for the first point of a series in this process: the bucket also
+        counts the points an earlier process recorded in it (all of them flushed, see stop()).
+        """
+        start = bucket * ROLLUP_SECONDS
+        earlier = array("d")
+        for segment_start in range(self._segment_start(start), self._segment_start(timestamp) + 1, self.segment_seconds):
+            earlier.extend(self._read_file(os.path.join(self._segment_dir(segment_start), f"{series_id}{RAW_SUFFIX}.f8"),
+                                           start, timestamp))
+        values = earlier[1::2]
+        return [bucket, value + sum(values), 1 + len(values)]
+
+    def _buffer(self, series_id, suffix):
+        buffer = self._buffers.get((series_id, suffix))
+        if buffer is None:
+            buffer = self._buffers[(series_id, suffix)] = array("d")
+        return buffer
+
+    def record_snapshot(self, snapshot):
+        """Sampler listener: buffers the metrics of the GPU, CPU and RAM/disk snapshots (see history.EXTRACTORS)."""
+        extractor = EXTRACTORS.get(snapshot.source)
+        if extractor is None:
+            return
+        for metric, device, value in extractor(snapshot.data):
+            self.append(metric, device, snapshot.timestamp, float(value))
+
+    def _segment_start(self, timestamp):
+        return int(timestamp // self.segment_seconds * self.segment_seconds)
+
+    def _segment_dir(self, segment_start):
+        return os.path.join(self.directory, f"{segment_start:012d}")
+
+    def _write(self, segment_start, series_id, suffix, data):
+        directory = self._segment_dir(segment_start)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{series_id}{suffix}.f8")
+        with open(path, "ab") as segment_file:
+            if path not in self._checked_files:
+                # A crash in the middle of a write may have left a partial record at the end
+                size = segment_file.tell()
+                if size % RECORD_SIZE:
+                    segment_file.truncate(size - size % RECORD_SIZE)
+                self._checked_files.add(path)
+            segment_file.write(data.tobytes())
+
+    def flush(self, partial_rollups=False):
+        """
+        Writes the buffered points: one append per series and segment. `partial_rollups` also
+        writes the averages of the rollup buckets still being filled (on shutdown).
+        """
+        with self._flush_lock:
+            self._save_series()
+            with self._lock:
+                if partial_rollups:
+                    for series_id, (bucket, total, count) in self._rollups.items():
+                        self._buffer(series_id, ROLLUP_SUFFIX).extend((bucket * ROLLUP_SECONDS, total / count))
+                    self._rollups = {}
+                buffers, self._buffers = self._buffers, {}
+            points = 0
+            for (series_id, suffix), buffer in buffers.items():
+                if suffix == RAW_SUFFIX:
+                    points += len(buffer) // 2
+                first, last = self._segment_start(buffer[0]), self._segment_start(buffer[-2])
+                if first == last:
+                    self._write(first, series_id, suffix, buffer)
+                    continue
+                # The buffer spans a segment boundary: split it by segment
+                start = 0
+                for index in range(0, len(buffer), 2):
+                    if self._segment_start(buffer[index]) != self._segment_start(buffer[start]):
+                        self._write(self._segment_start(buffer[start]), series_id, suffix, buffer[start:index])
+                        start = index
+                self._write(self._segment_start(buffer[start]), series_id, suffix, buffer[start:])
+            if points:
+                perf.count("storage_points_written", "segments", points)
+        return points
+
+    # --- Segments and retention ---
+
+    def segments(self):
+        """Start times of the stored segments, oldest first."""
+        starts = []
+        for entry in os.scandir(self.directory):
+            if entry.is_dir() and entry.name.isdigit():
+                starts.append(int(entry.name))
+        return sorted(starts)
+
+    def _segment_bytes(self, segment_start):
+        try:
+            return sum(entry.stat().st_size for entry in os.scandir(self._segment_dir(segment_start)))
+        except FileNotFoundError:
+            return 0
+
+    def enforce_retention(self, now=None):
+        """Deletes expired segments, then the oldest ones while over max_bytes. Returns the deleted start times."""
+        now = now if now is not None else time.time()
+        current = self._segment_start(now)
+        deleted = []
+        segments = self.segments()
+        sizes = {start: self._segment_bytes(start) for start in segments} if self.max_bytes else {}
+        total = sum(sizes.values())
+        for start in segments:
+            if start >= current:
+                break
+            expired = start + self.segment_seconds < now - self.retention_seconds
+            if not expired and not (self.max_bytes and total > self.max_bytes):
+                break
+            shutil.rmtree(self._segment_dir(start), ignore_errors=True)
+            total -= sizes.get(start, 0)
+            deleted.append(start)
+        if deleted:
+            self._checked_files = {path for path in self._checked_files if os.path.exists(path)}
+        return deleted
+
+    # --- Reading ---
+
+    def keys(self, metric=None, device=None):
+        """Sorted (metric, device) pairs of the stored series matching the `metric`/`device` globs."""
+        self._load_series()
+        with self._lock:
+            keys = list(self._series)
+        return sorted(key for key in keys
+                      if (metric is None or fnmatch.fnmatchcase(key[0], metric))
+                      and (device is None or fnmatch.fnmatchcase(str(key[1]), device)))
+
+    def catalog(self):
+        """{metric: [devices]} for every stored series, like HistoryStore.catalog()."""
+        catalog = {}
+        for metric, device in self.keys():
+            catalog.setdefault(metric, []).append(device)
+        return catalog
+
+    def _read_file(self, path, start, end):
+        try:
+            with open(path, "rb") as segment_file:
+                size = os.fstat(segment_file.fileno()).st_size // RECORD_SIZE * RECORD_SIZE
+                if not size:
+                    return array("d")
+                with mmap.mmap(segment_file.fileno(), size, access=mmap.ACCESS_READ) as mapped:
+                    doubles = memoryview(mapped).cast("d")
+                    try:
+                        timestamps = _Timestamps(doubles)
+                        first, last = bisect_left(timestamps, start), bisect_right(timestamps, end)
+                    finally:
+                        doubles.release()
+                    data = array("d")
+                    data.frombytes(mapped[first * RECORD_SIZE:last * RECORD_SIZE])
+                    return data
+        except FileNotFoundError:
+            return array("d")
+
+    def read(self, metric, device, start=None, end=None, resolution=None):
+        """
+        (resolution, timestamps, values) of one series between `start` and `end` (default: all
+        of it). Points are returned as recorded (resolution 0) unless `resolution` asks for
+        averages over buckets of that many seconds; from ROLLUP_SECONDS up, these are computed
+        from the stored rollups.
+        """
+        self._load_series()
+        with self._lock:
+            series_id = self._series.get((metric, device))
+        if series_id is None:
+            raise KeyError((metric, device))
+        start = start if start is not None else 0.0
+        end = end if end is not None else math.inf
+        suffix = ROLLUP_SUFFIX if resolution and resolution >= ROLLUP_SECONDS else RAW_SUFFIX
+        data = array("d")
+        for segment_start in self.segments():
+            if segment_start + self.segment_seconds <= start or segment_start > end:
+                continue
+            data.extend(self._read_file(os.path.join(self._segment_dir(segment_start), f"{series_id}{suffix}.f8"), start, end))
+        if suffix == ROLLUP_SUFFIX:
+            data = _latest_per_timestamp(data)
+        timestamps, values = data[0::2], data[1::2]
+        if resolution == ROLLUP_SECONDS:
+            return resolution, timestamps, values
+        if resolution:
+            timestamps, values = downsample(timestamps, values, resolution)
+            return resolution, timestamps, values
+        return 0, timestamps, values
+
+    def query(self, metric, device=None, start=None, end=None, resolution=None):
+        """Same result shape as HistoryStore.query(), read from the segments."""
+        end = end if end is not None else time.time()
+        start = start if start is not None else end - 3600
+        result = {"metric": metric, "start": start, "end": end, "resolution": resolution or 0, "series": {}}
+        for series_metric, series_device in self.keys():
+            if series_metric != metric or (device is not None and series_device != device):
+                continue
+            _, timestamps, values = self.read(series_metric, series_device, start, end, resolution)
+            result["series"][series_device] = {"timestamps": timestamps.tolist(), "values": values.tolist()}
+        return result
+
+    def load_into(self, history, seconds, raw_seconds=600):
+        """
+        Records the last `seconds` of every series into a HistoryStore, e.g. at startup:
+        rollups for the older part, and the points as recorded for the last `raw_seconds`
+        (from the start of the rollup bucket that far back, so no point is loaded twice).
+        Returns the number of points loaded.
+        """
+        now = time.time()
+        raw_start = (now - min(raw_seconds, seconds)) // ROLLUP_SECONDS * ROLLUP_SECONDS
+        points = 0
+        for metric, device in self.keys():
+            # Rollups are stamped with their bucket start, a multiple of ROLLUP_SECONDS
+            _, old_timestamps, old_values = self.read(metric, device, now - seconds, raw_start - 1, ROLLUP_SECONDS)
+            _, timestamps, values = self.read(metric, device, raw_start)
+            for timestamp, value in zip(old_timestamps + timestamps, old_values + values):
+                history.record(metric, device, timestamp, value)
+            points += len(old_timestamps) + len(timestamps)
+        return points
+
+    def status(self):
+        segments = self.segments()
+        with self._lock:
+            buffered = sum(len(buffer) // 2 for buffer in self._buffers.values())  # Raw points and rollups
+            series = len(self._series)
+        return {
+            "directory": self.directory,
+            "segments": len(segments),
+            "oldest_segment": segments[0] if segments else None,
+            "newest_segment": segments[-1] if segments else None,
+            "bytes": sum(self._segment_bytes(start) for start in segments),
+            "series": series,
+            "buffered_values": buffered,
+        }
+
+    # --- Background flushing (Sampler service interface) ---
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+                if time.monotonic() - self._last_retention >= RETENTION_CHECK_INTERVAL:
+                    self._last_retention = time.monotonic()
+                    self.enforce_retention()
+            except OSError as e:
+                print(f"Writing metric segments to {self.directory} failed: {e}")
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="segment-store", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the flush thread and writes what is still buffered."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        try:
+            self.flush(partial_rollups=True)
+        except OSError as e:
+            print(f"Final flush of metric segments to {self.directory} failed: {e}")
+
+def storage_from_env():
+    """
+    The SegmentStore configured by DASHBOARD_STORAGE_DIR, or None if persistence is disabled.
+      DASHBOARD_STORAGE_RETENTION   seconds of data kept (default 7 days)
+      DASHBOARD_STORAGE_MAX_MB      size limit in MB (default: none)
+      DASHBOARD_STORAGE_SEGMENT     seconds per segment (default 3600)
+      DASHBOARD_STORAGE_FLUSH       seconds between writes (default 5)
+    """
+    directory = os.environ.get("DASHBOARD_STORAGE_DIR")
+    if not directory:
+        return None
+    max_mb = os.environ.get("DASHBOARD_STORAGE_MAX_MB")
+    return SegmentStore(directory,
+                        segment_seconds=int(os.environ.get("DASHBOARD_STORAGE_SEGMENT", DEFAULT_SEGMENT_SECONDS)),
+                        retention_seconds=float(os.environ.get("DASHBOARD_STORAGE_RETENTION", DEFAULT_RETENTION_SECONDS)),
+                        max_bytes=int(float(max_mb) * 1024 * 1024) if max_mb else None,
+                        flush_interval=float(os.environ.get("DASHBOARD_STORAGE_FLUSH", DEFAULT_FLUSH_INTERVAL)))
@@ -0,0 +1,158 @@
+import json
+import queue
+import threading
+import time
+
+# Seconds between keep-alive comments on an idle stream, so proxies don't close it
+KEEPALIVE_INTERVAL = 15
+# Events buffered per subscriber before it is considered too slow and gets resynchronized
+SUBSCRIBER_QUEUE_SIZE = 64
+
+def flatten(data, prefix="", out=None):
+    """
+    Flattens nested dicts/lists into {path: scalar}, with path segments joined by '.'.
+    List lengths are recorded under '<path>.#' so a client can truncate lists that shrank,
+    and empty containers are kept as values so they survive a round trip.
+    """
+    if out is None:
+        out = {}
+    if isinstance(data, dict) and data:
+        for key, value in data.items():
+            flatten(value, f"{prefix}.{key}" if prefix else str(key), out)
+    elif isinstance(data, list) and data:
+        out[f"{prefix}.#" if prefix else "#"] = len(data)
+        for index, value in enumerate(data):
+            flatten(value, f"{prefix}.{index}" if prefix else str(index), out)
+    else:
+        out[prefix] = data
+    return out
+
+def compute_delta(old, new):
+    """Difference between two flattened snapshots: {"set": {path: value}, "unset": [paths]}."""
+    changed = {path: value for path, value in new.items() if path not in old or old[path] != value}
+    removed = [path for path in old if path not in new]
+    return {"set": changed, "unset": removed}
+
+def format_event(event, payload):
+    """Serializes one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+class Subscription:
+    """One connected stream client: a bounded queue of preformatted events."""
+
+    def __init__(self, sources):
+        self.sources = sources  # None means all sources
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.needs_resync = False
+
+    def wants(self, source):
+        return self.sources is None or source in self.sources
+
+class Broadcaster:
+    """
+    Fans snapshot changes out to all stream subscribers.
+
+    Registered as a Sampler listener: for every new snapshot the delta against the previous
+    snapshot of the same source is computed and serialized once, and the same event string is
+    queued for every subscriber. A new subscriber first receives the full current snapshot of
+    each source ("snapshot" events) and then only "delta" events. A subscriber whose queue
+    overflows is resynchronized with full snapshots instead of blocking the sampler.
+    """
+
+    def __init__(self, sampler):
+        self.sampler = sampler
+        self._flat = {}  # source -> flattened data of the last broadcast snapshot
+        self._subscribers = set()
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def on_snapshot(self, snapshot):
+        new_flat = flatten(snapshot.data)
+        with self._lock:
+            old_flat = self._flat.get(snapshot.source)
+            self._flat[snapshot.source] = new_flat
+            subscribers = [s for s in self._subscribers if s.wants(snapshot.source)]
+        if not subscribers:
+            return
+        # Connected streams keep their sources watched, see Sampler.note_demand
+        self.sampler.note_demand(snapshot.source)
+        if old_flat is None:
+            event = self._snapshot_event(snapshot)
+        else:
+            delta = compute_delta(old_flat, new_flat)
+            if not delta["set"] and not delta["unset"]:
+                return
+            event = format_event("delta", {"source": snapshot.source, "version": snapshot.version,
+                                           "timestamp": snapshot.timestamp, **delta})
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(event)
+            except queue.Full:
+                subscription.needs_resync = True
+
+    def _snapshot_event(self, snapshot):
+        return format_event("snapshot", {"source": snapshot.source, "version": snapshot.version,
+                                         "timestamp": snapshot.timestamp, "data": snapshot.data})
+
+    def _initial_events(self, subscription):
+        events = []
+        for source in self.sampler.sources():
+            if subscription.wants(source):
+                self.sampler.note_demand(source)
+                snapshot = self.sampler.get(source)
+                if snapshot is not None:
+                    events.append(self._snapshot_event(snapshot))
+        return events
+
+    def subscribe(self, sources=None):
+        subscription = Subscription(set(sources) if sources else None)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def close(self):
+        """Ends every open stream (e.g. on server shutdown) so their requests complete promptly."""
+        with self._lock:
+            self._closed = True
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(None)
+            except queue.Full:
+                subscription.needs_resync = True  # Checked before blocking again, see events()
+
+    def events(self, subscription):
+        """Generator of SSE strings for one subscriber; unsubscribes when the client goes away."""
+        try:
+            yield "retry: 3000\n\n"
+            for event in self._initial_events(subscription):
+                yield event
+            last_sent = time.monotonic()
+            while not self._closed:
+                if subscription.needs_resync:
+                    # Drop the backlog and start over from full snapshots
+                    while not subscription.queue.empty():
+                        subscription.queue.get_nowait()
+                    subscription.needs_resync = False
+                    for event in self._initial_events(subscription):
+                        yield event
+                try:
+                    event = subscription.queue.get(timeout=KEEPALIVE_INTERVAL)
+                    if event is None:
+                        break  # Closed
+                    yield event
+                    last_sent = time.monotonic()
+                except queue.Empty:
+                    if time.monotonic() - last_sent >= KEEPALIVE_INTERVAL:
+                        yield ": keep-alive\n\n"
+                        last_sent = time.monotonic()
+        finally:
+            self.unsubscribe(subscription)
@@ -0,0 +1,223 @@
+import os
+import re
+import threading
+import time
+from array import array
+
+# /proc/diskstats counts 512-byte sectors, whatever the device's sector size
+SECTOR_BYTES = 512
+
+# Partitions are skipped (their whole disk is reported), as are loop and RAM disks
+_PARTITION_RE = re.compile(r"^(?:(?:sd|vd|xvd|hd)[a-z]+\d+|(?:nvme\d+n\d+|mmcblk\d+)p\d+)$")
+_SKIPPED_DISK_PREFIXES = ("loop", "ram")
+
+# Columns of /proc/diskstats after major, minor and name, and the ones kept per device:
+# reads completed, sectors read, ms reading, writes completed, sectors written, ms writing, ms doing I/O
+_DISK_COLUMNS = (0, 2, 3, 4, 6, 7, 9)
+_READS, _SECTORS_READ, _READ_MS, _WRITES, _SECTORS_WRITTEN, _WRITE_MS, _IO_MS = range(len(_DISK_COLUMNS))
+
+# Columns of /proc/net/dev after "name:": rx bytes, packets, errs, drop, then tx from column 8
+_NET_COLUMNS = (0, 1, 2, 3, 8, 9, 10, 11)
+_RX_BYTES, _RX_PACKETS, _RX_ERRORS, _RX_DROPPED, _TX_BYTES, _TX_PACKETS, _TX_ERRORS, _TX_DROPPED = range(len(_NET_COLUMNS))
+
+class CounterRates:
+    """
+    Rates from a table of monotonically increasing per-device counters.
+
+    The counters of the current and the previous sample live in two flat array('Q') buffers
+    (row = device, column = counter) that are swapped on every sample and only reallocated
+    when the set of devices changes, so a sample parses straight into preallocated storage
+    without building per-device dictionaries. `clock` can be replaced for testing.
+    """
+
+    def __init__(self, columns, clock=time.monotonic):
+        self.columns = columns
+        self._clock = clock
+        self.names = []
+        self._index = {}
+        self._current = array("Q")
+        self._previous = array("Q")
+        self._previous_time = None
+        self._lock = threading.Lock()
+
+    def _resize(self, names):
+        self.names = list(names)
+        self._index = {name: row for row, name in enumerate(self.names)}
+        size = len(self.names) * self.columns
+        self._current = array("Q", bytes(8 * size))
+        self._previous = array("Q", bytes(8 * size))
+        self._previous_time = None  # No deltas across a change of the device set
+
+    def sample(self, rows):
+        """
+        Takes one sample from `rows`, an iterable of (name, counters) with `columns` counters
+        each. Returns (elapsed seconds or None for the first sample, previous, current): the
+        two counter buffers, indexed by row * columns + column in the order of `names`.
+        """
+        rows = list(rows)
+        now = self._clock()
+        with self._lock:
+            if len(rows) != len(self.names) or any(name != self.names[row] for row, (name, _) in enumerate(rows)):
+                self._resize(name for name, _ in rows)
+            self._current, self._previous = self._previous, self._current
+            current, width = self._current, self.columns
+            for row, (_, counters) in enumerate(rows):
+                current[row * width:(row + 1) * width] = counters
+            elapsed = now - self._previous_time if self._previous_time is not None else None
+            self._previous_time = now
+            return elapsed, self._previous, current
+
+def _rate(current, previous, elapsed):
+    """Per-second rate of a counter, or None if there is no previous sample or it went backwards."""
+    if not elapsed or current < previous:
+        return None
+    return (current - previous) / elapsed
+
+def _round(value, digits=1):
+    return round(value, digits) if value is not None else None
+
+class DiskStatsSampler:
+    """Per-disk read/write throughput, IOPS, latency and utilization from /proc/diskstats."""
+
+    def __init__(self, path="/proc/diskstats", clock=time.monotonic):
+        self.path = path
+        self._rates = CounterRates(len(_DISK_COLUMNS), clock)
+
+    def _rows(self):
+        with open(self.path, "rb") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 14:
+                    continue
+                name = fields[2].decode()
+                if name.startswith(_SKIPPED_DISK_PREFIXES) or _PARTITION_RE.match(name):
+                    continue
+                yield name, array("Q", [int(fields[3 + column]) for column in _DISK_COLUMNS])
+
+    def sample(self):
+        elapsed, previous, current = self._rates.sample(self._rows())
+        width = len(_DISK_COLUMNS)
+        devices = []
+        for row, name in enumerate(self._rates.names):
+            base = row * width
+            now = current[base:base + width]
+            before = previous[base:base + width] if elapsed else now
+            reads = _rate(now[_READS], before[_READS], elapsed)
+            writes = _rate(now[_WRITES], before[_WRITES], elapsed)
+            io_ms = _rate(now[_IO_MS], before[_IO_MS], elapsed)
+            read_ops, write_ops = now[_READS] - before[_READS], now[_WRITES] - before[_WRITES]
+            read_bytes = _rate(now[_SECTORS_READ], before[_SECTORS_READ], elapsed)
+            written_bytes = _rate(now[_SECTORS_WRITTEN], before[_SECTORS_WRITTEN], elapsed)
+            devices.append({
+                "name": name,
+                "read_bytes_per_second": _round(read_bytes * SECTOR_BYTES if read_bytes is not None else None),
+                "write_bytes_per_second": _round(written_bytes * SECTOR_BYTES if written_bytes is not None else None),
+                "read_iops": _round(reads, 2),
+                "write_iops": _round(writes, 2),
+                # Average time per completed request since the previous sample
+                "read_latency_ms": _round((now[_READ_MS] - before[_READ_MS]) / read_ops, 3) if read_ops > 0 else None,
+                "write_latency_ms": _round((now[_WRITE_MS] - before[_WRITE_MS]) / write_ops, 3) if write_ops > 0 else None,
+                # Share of the time the device had requests in flight
+                "utilization_percent": _round(min(100.0, io_ms / 10.0)) if io_ms is not None else None,
+                "read_bytes_total": now[_SECTORS_READ] * SECTOR_BYTES,
+                "write_bytes_total": now[_SECTORS_WRITTEN] * SECTOR_BYTES,
+            })
+        return {"devices": devices, "interval_seconds": _round(elapsed, 3)}
+
+class NetDevSampler:
+    """
+    Per-interface receive/transmit rates from /proc/net/dev. The link speed is read from
+    `sys_class_net`/<interface>/speed when the interfaces change, to report utilization.
+    """
+
+    def __init__(self, path="/proc/net/dev", sys_class_net="/sys/class/net", clock=time.monotonic,
+                 include_loopback=False):
+        self.path = path
+        self.sys_class_net = sys_class_net
+        self.include_loopback = include_loopback
+        self._rates = CounterRates(len(_NET_COLUMNS), clock)
+        self._speeds = {}
+        self._speed_names = None
+
+    def _rows(self):
+        with open(self.path, "rb") as f:
+            for line in f:
+                name, sep, counters = line.partition(b":")
+                if not sep:
+                    continue  # The two header lines
+                name = name.strip().decode()
+                if name == "lo" and not self.include_loopback:
+                    continue
+                fields = counters.split()
+                yield name, array("Q", [int(fields[column]) for column in _NET_COLUMNS])
+
+    def _link_speed(self, name):
+        """Link speed in bytes per second, or None (virtual interfaces, link down)."""
+        try:
+            with open(os.path.join(self.sys_class_net, name, "speed"), "rb") as f:
+                megabits = int(f.read())
+        except (OSError, ValueError):
+            return None
+        return megabits * 125000 if megabits > 0 else None
+
+    def sample(self):
+        elapsed, previous, current = self._rates.sample(self._rows())
+        if self._speed_names is not self._rates.names:
+            self._speeds = {name: self._link_speed(name) for name in self._rates.names}
+            self._speed_names = self._rates.names
+        width = len(_NET_COLUMNS)
+        interfaces = []
+        for row, name in enumerate(self._rates.names):
+            base = row * width
+            now = current[base:base + width]
+            before = previous[base:base + width] if elapsed else now
+            rx = _rate(now[_RX_BYTES], before[_RX_BYTES], elapsed)
+            tx = _rate(now[_TX_BYTES], before[_TX_BYTES], elapsed)
+            speed = self._speeds.get(name)
+            interfaces.append({
+                "name": name,
+                "rx_bytes_per_second": _round(rx),
+                "tx_bytes_per_second": _round(tx),
+                "rx_packets_per_second": _round(_rate(now[_RX_PACKETS], before[_RX_PACKETS], elapsed), 2),
+                "tx_packets_per_second": _round(_rate(now[_TX_PACKETS], before[_TX_PACKETS], elapsed), 2),
+                "rx_errors": now[_RX_ERRORS],
+                "tx_errors": now[_TX_ERRORS],
+                "rx_dropped": now[_RX_DROPPED],
+                "tx_dropped": now[_TX_DROPPED],
+                "rx_bytes_total": now[_RX_BYTES],
+                "tx_bytes_total": now[_TX_BYTES],
+                "link_speed_bytes_per_second": speed,
+                # The busier direction, as a share of the link speed
+                "utilization_percent": _round(100.0 * max(rx, tx) / speed) if speed and rx is not None and tx is not None else None,
+            })
+        return {"interfaces": interfaces, "interval_seconds": _round(elapsed, 3)}
+
+_disk_sampler = DiskStatsSampler()
+_net_sampler = NetDevSampler()
+
+def get_disk_io():
+    """
+    Per-disk throughput (bytes/s), IOPS, average latency and utilization on Linux, from the
+    difference between this and the previous /proc/diskstats. The first call has no rates.
+    """
+    try:
+        return _disk_sampler.sample()
+    except FileNotFoundError as e:
+        return {"error": f"{e.filename} not found (should be available on Linux).", "devices": []}
+    except Exception as e:
+        return {"error": f"An unexpected error occurred while reading disk statistics: {e}", "devices": []}
+
+def get_network_io():
+    """Per-interface receive/transmit rates on Linux, from the difference between two /proc/net/dev samples."""
+    try:
+        return _net_sampler.sample()
+    except FileNotFoundError as e:
+        return {"error": f"{e.filename} not found (should be available on Linux).", "interfaces": []}
+    except Exception as e:
+        return {"error": f"An unexpected error occurred while reading network statistics: {e}", "interfaces": []}
+
+if __name__ == '__main__':
+    import json
+    get_disk_io(), get_network_io()
+    time.sleep(1)
+    print(json.dumps({"disk_io": get_disk_io(), "network": get_network_io()}, indent=4))
@@ -0,0 +1,167 @@
+"""
+Windows collectors, based on `wmic`, `systeminfo` and PowerShell. Only imported on Windows,
+through utils/platform_registry.py; missing commands are detected by cached capability probes
+instead of a failed Popen on every collection.
+"""
+import re
+import subprocess
+
+from utils.instrumentation import perf
+from utils.platform_registry import capability
+from utils.ram_disk import BYTES_PER_GB, BYTES_PER_MB, combine_ram_disk
+
+def get_cpu_info():
+    """Fetches CPU information using WMIC."""
+    if not capability("wmic").available():
+        return {"error": "wmic command not found (should be available on Windows)."}
+    cpu_info_list = []
+    try:
+        command = ["wmic", "cpu", "get", "Name,Manufacturer,MaxClockSpeed,NumberOfCores,NumberOfLogicalProcessors,Description,Caption,SocketDesignation", "/FORMAT:CSV"]
+        perf.spawned("wmic cpu")
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, shell=False)
+        stdout, stderr = process.communicate(timeout=15)
+
+        if process.returncode != 0:
+            return {"error": "Failed to execute wmic cpu", "details": stderr.strip()}
+
+        lines = stdout.strip().splitlines()
+        if len(lines) > 1:
+            header = [h.strip() for h in lines[0].split(",")]
+            for line in lines[1:]:
+                if not line.strip():
+                    continue
+                values = [v.strip() for v in line.split(",")]
+                # The first column from WMIC CSV is often "Node"
+                if len(values) == len(header) +1: # Node,Name,Manufacturer...
+                     values_to_zip = values[1:] # Skip node
+                elif len(values) == len(header):
+                     values_to_zip = values
+                else:
+                    continue # malformed line
+
+                info = dict(zip(header, values_to_zip))
+                # Basic parsing for numerical values if they exist
+                for key in ['MaxClockSpeed', 'NumberOfCores', 'NumberOfLogicalProcessors']:
+                    if key in info and info[key].isdigit():
+                        info[key] = int(info[key])
+                cpu_info_list.append(info)
+        return cpu_info_list if cpu_info_list else {"error": "No CPU data parsed from wmic"}
+
+    except FileNotFoundError:
+        return {"error": "wmic command not found (should be available on Windows)."}
+    except subprocess.TimeoutExpired:
+        perf.timed_out("wmic cpu")
+        return {"error": "wmic cpu command timed out."}
+    except Exception as e:
+        return {"error": f"An unexpected error occurred while fetching CPU info on Windows: {e}"}
+
+def _get_ram_info_windows():
+    """RAM usage from `systeminfo` (Windows)."""
+    if not capability("systeminfo").available():
+        return {"error": "'systeminfo' command not found. RAM info unavailable."}
+    try:
+        perf.spawned("systeminfo")
+        ram_process = subprocess.Popen(["systeminfo"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, shell=False)
+        ram_stdout, ram_stderr = ram_process.communicate(timeout=20)
+
+        if ram_process.returncode != 0:
+            return {"error": f"systeminfo command failed with code {ram_process.returncode}: {ram_stderr.strip()}"}
+
+        total_mem_match = re.search(r"Total Physical Memory:\s*([\d,]+(?:\.\d+)?)\s*MB", ram_stdout, re.IGNORECASE)
+        avail_mem_match = re.search(r"Available Physical Memory:\s*([\d,]+(?:\.\d+)?)\s*MB", ram_stdout, re.IGNORECASE)
+        if not (total_mem_match and avail_mem_match):
+            return {"error": "Could not parse RAM info from systeminfo output."}
+
+        total_mem_mb = int(float(total_mem_match.group(1).replace(",", "")))
+        avail_mem_mb = int(float(avail_mem_match.group(1).replace(",", "")))
+        return {
+            "total_bytes": total_mem_mb * BYTES_PER_MB,
+            "available_bytes": avail_mem_mb * BYTES_PER_MB,
+            "used_bytes": (total_mem_mb - avail_mem_mb) * BYTES_PER_MB,
+            "total_mb": total_mem_mb,
+            "available_mb": avail_mem_mb,
+            "used_mb": total_mem_mb - avail_mem_mb,
+            "source": "systeminfo (Windows)"
+        }
+    except FileNotFoundError:
+        return {"error": "'systeminfo' command not found. RAM info unavailable."}
+    except subprocess.TimeoutExpired:
+        perf.timed_out("systeminfo")
+        return {"error": "'systeminfo' command timed out."}
+    except Exception as e:
+        return {"error": f"Error processing 'systeminfo': {str(e)}"}
+
+def _get_disk_info_windows():
+    """Disk usage from `wmic logicaldisk` (Windows)."""
+    if not capability("wmic").available():
+        return {"error": "'wmic' command not found. Disk info unavailable."}
+    try:
+        disk_command = ["wmic", "logicaldisk", "get", "DeviceID,FreeSpace,Size", "/FORMAT:CSV"]
+        perf.spawned("wmic logicaldisk")
+        disk_process = subprocess.Popen(disk_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, shell=False)
+        disk_stdout, disk_stderr = disk_process.communicate(timeout=15)
+
+        if disk_process.returncode != 0 or not disk_stdout.strip():
+            return {"error": f"wmic command failed with code {disk_process.returncode}: {disk_stderr.strip()}"}
+
+        disk_info = []
+        for line in disk_stdout.strip().splitlines():
+            # A typical data line: DESKTOP-XYZ,C:,123456789,987654321
+            # The "Node,DeviceID,FreeSpace,Size" header and blank lines fail the checks below
+            parts = line.strip().split(",")
+            if len(parts) == 4 and parts[1].endswith(":") and parts[2].isdigit() and parts[3].isdigit():
+                device_id = parts[1]
+                free_space_bytes = int(parts[2])
+                total_size_bytes = int(parts[3])
+                if total_size_bytes > 0:
+                    used_bytes = total_size_bytes - free_space_bytes
+                    disk_info.append({
+                        "filesystem": device_id,
+                        "total_bytes": total_size_bytes,
+                        "used_bytes": used_bytes,
+                        "available_bytes": free_space_bytes,
+                        "total_gb": round(total_size_bytes / BYTES_PER_GB, 2),
+                        "free_gb": round(free_space_bytes / BYTES_PER_GB, 2),
+                        "used_gb": round(used_bytes / BYTES_PER_GB, 2),
+                        "use_percent": round((used_bytes / total_size_bytes) * 100, 1),
+                        "source": "wmic (Windows)"
+                    })
+        return disk_info if disk_info else {"error": "WMIC executed but no disk data parsed."}
+    except FileNotFoundError:
+        return {"error": "'wmic' command not found. Disk info unavailable."}
+    except subprocess.TimeoutExpired:
+        perf.timed_out("wmic logicaldisk")
+        return {"error": "'wmic' command timed out."}
+    except Exception as e:
+        return {"error": f"Error processing 'wmic': {str(e)}"}
+
+def get_ram_disk_info():
+    """RAM usage from `systeminfo` and disk usage from `wmic logicaldisk`."""
+    return combine_ram_disk(_get_ram_info_windows(), _get_disk_info_windows())
+
+def _process_listing():
+    if not capability("powershell").available():
+        return "powershell not found. Ensure it is in your PATH."
+    try:
+        # Get-Process, sort by WorkingSet (WS), take top 30, format as table
+        # CPU is total CPU seconds, WS is in bytes
+        cmd = [
+            "powershell", "-Command",
+            "Get-Process | Sort-Object WS -Descending | Select-Object -First 30 -Property ProcessName, Id, WS, CPU, Path | Format-Table -AutoSize"
+        ]
+        perf.spawned("powershell Get-Process")
+        process = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=15)
+        return process.stdout
+    except subprocess.CalledProcessError as e:
+        return f"Command failed: {e}\nOutput: {e.stderr}"
+    except subprocess.TimeoutExpired:
+        perf.timed_out("process listing (Windows)")
+        return "Command timed out after 15 seconds."
+    except FileNotFoundError:
+        return "Command not found. Ensure it is in your PATH."
+    except Exception as e:
+        return f"An unexpected error occurred: {e}"
+
+def get_process_stats():
+    """Process statistics as text only ("processes" and "top_rss" stay empty), from Get-Process."""
+    return {"processes": [], "top_rss": [], "text": _process_listing(), "source": "command (Windows)"}
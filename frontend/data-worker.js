@@ -0,0 +1,286 @@
+// Web Worker that owns the data connection of the dashboard. It receives the live stream (or
+// fetches /api/snapshot), parses the JSON, applies deltas and turns the long lists (cores,
+// GPUs, GPU processes, containers) into formatted, sorted table rows. Only what changed is
+// posted back to the page: new summaries of the sources it renders, cell patches for tables
+// whose rows kept their order, and full row lists when rows were added, removed or reordered.
+importScripts('format.js');
+
+const percent = value => typeof value === 'number' ? value.toFixed(1) : 'N/A';
+const formatList = values => Array.isArray(values) && values.length > 0 ? values.join(', ') : 'N/A';
+
+// Device lists of a container are either lists or a "No ... devices" string
+function formatDisks(disks) {
+    if (!Array.isArray(disks)) return formatValue(disks);
+    return disks.map(disk => `${disk.name} (${disk.pool}${disk.total && disk.used ? `, ${disk.used} / ${disk.total}` : ''})`).join(', ') || 'None';
+}
+
+function formatGpuDevices(gpus) {
+    if (!Array.isArray(gpus)) return formatValue(gpus);
+    return gpus.map(gpu => gpu.pci_address || gpu.product || gpu.name || 'N/A').join(', ') || 'None';
+}
+
+function formatGpuUsage(gpus) {
+    if (!Array.isArray(gpus) || gpus.length === 0) return 'None';
+    return gpus.map(gpu => `${gpu.gpu_bus_id || 'N/A'}: ${gpu.used_memory_mb} MiB (PIDs: ${gpu.pids.join(', ')})`).join('; ');
+}
+
+// Tables built here, by name: the source they show, how to get its rows and their key, the
+// [field, label, format] columns, the text for an empty list, and the current sort column
+const TABLES = {
+    cores: {
+        source: 'cpu',
+        rows: data => data && Array.isArray(data.per_core_utilization)
+            ? data.per_core_utilization.map((utilization, core) => ({ core, utilization })) : null,
+        key: row => row.core,
+        columns: [['core', 'Core'], ['utilization', 'Util (%)', percent]],
+        empty: 'No per-core utilization available.',
+        sort: { column: 0, descending: false },
+    },
+    gpus: {
+        source: 'gpu',
+        rows: data => Array.isArray(data) ? data : null,
+        key: (row, index) => row.pci_bus_id || index,
+        columns: [
+            ['name', 'Name'], ['pci_bus_id', 'PCI Bus'], ['temperature_gpu', 'Temp (°C)'], ['utilization_gpu', 'Util (%)'],
+            ['utilization_memory', 'Mem Util (%)'], ['memory_used_mb', 'Mem Used (MiB)'], ['memory_total_mb', 'Mem Total (MiB)'],
+        ],
+        empty: 'No data available or applicable for this system.',
+        sort: { column: 1, descending: false },
+    },
+    processes: {
+        source: 'gpu_processes',
+        rows: data => data && Array.isArray(data.processes) ? data.processes : null,
+        key: row => `${row.pid}@${row.gpu_bus_id}`,
+        columns: [
+            ['pid', 'PID'], ['name', 'Process'], ['user', 'User'], ['container', 'Container'],
+            ['gpu_bus_id', 'GPU'], ['used_memory_mb', 'GPU Memory (MiB)'],
+        ],
+        empty: 'No processes are using a GPU.',
+        sort: { column: 5, descending: true },
+    },
+    containers: {
+        source: 'lxc',
+        rows: data => Array.isArray(data) ? data : null,
+        key: row => row.name,
+        columns: [
+            ['name', 'Name'], ['status', 'Status'], ['user_owner', 'Owner'], ['ipv4', 'IPv4', formatList],
+            ['ipv6', 'IPv6', formatList], ['memory_usage_mb', 'Memory (MB)'], ['cpu_percent', 'CPU (%)', percent],
+            ['pids', 'Processes'], ['io_read_bytes_per_second', 'Disk Read', formatRate],
+            ['io_write_bytes_per_second', 'Disk Write', formatRate], ['disk_devices', 'Disk Devices', formatDisks],
+            ['gpu_devices', 'GPU Devices', formatGpuDevices], ['gpus_used', 'GPU Usage', formatGpuUsage],
+        ],
+        empty: 'No LXC containers found.',
+        sort: { column: 0, descending: false },
+    },
+};
+
+// Numeric-aware, so 'c2' sorts before 'c10'
+const collator = new Intl.Collator(undefined, { numeric: true });
+
+let baseUrl = '';
+let renderedSources = [];       // Sources the page renders itself, see `renderers` in script.js
+const state = {};               // Latest data per source
+const postedSummaries = {};     // source -> JSON of the data last posted for it
+const postedTables = {};        // table -> {keys, cells} or {message} last posted
+
+// Error and message texts in the style of displayData() in script.js
+function describe(data, empty) {
+    if (data && data.error) return `Error: ${data.error}${data.details ? `\nDetails: ${data.details}` : ''}`;
+    if (data && data.message) return data.message;
+    return empty;
+}
+
+// The data of a source as the page needs it; the per-core list is only shown as a table
+function summarize(source, data) {
+    if (source === 'cpu' && data && !Array.isArray(data) && 'per_core_utilization' in data) {
+        const { per_core_utilization, ...summary } = data;
+        return summary;
+    }
+    return data;
+}
+
+// Formats and sorts the rows of a table: {keys, cells} or {message}
+function buildRows(table, data) {
+    const items = table.rows(data);
+    if (!Array.isArray(items)) return { message: describe(data, table.empty) };
+    if (items.length === 0) return { message: table.empty };
+    const { column, descending } = table.sort;
+    const field = table.columns[column][0];
+    const rows = items.map((item, index) => {
+        const cells = table.columns.map(([name, , format]) => (format || formatValue)(item[name]));
+        const value = item[field];
+        return {
+            key: String(table.key(item, index)),
+            cells,
+            value: typeof value === 'number' || typeof value === 'string' ? value : cells[column],
+            missing: value === null || value === undefined,
+        };
+    });
+    rows.sort((a, b) => {
+        if (a.missing !== b.missing) return a.missing ? 1 : -1; // Missing values last in both directions
+        const order = typeof a.value === 'number' && typeof b.value === 'number'
+            ? a.value - b.value : collator.compare(String(a.value), String(b.value));
+        return descending ? -order : order;
+    });
+    return { keys: rows.map(row => row.key), cells: rows.map(row => row.cells) };
+}
+
+function sameKeys(a, b) {
+    if (a.length !== b.length) return false;
+    for (let i = 0; i < a.length; i++) {
+        if (a[i] !== b[i]) return false;
+    }
+    return true;
+}
+
+// The change of one table since the last post: {message}, {rows, columns, sort}, {patch} or null
+function diffTable(name, full) {
+    const table = TABLES[name];
+    const result = buildRows(table, state[table.source]);
+    const previous = postedTables[name];
+    postedTables[name] = result;
+    if (result.message !== undefined) {
+        return !full && previous && previous.message === result.message ? null : { message: result.message };
+    }
+    if (!full && previous && previous.keys && sameKeys(previous.keys, result.keys)) {
+        // Same rows in the same order: only the cells whose text changed, as [row, column, text]
+        const patch = [];
+        result.cells.forEach((cells, row) => {
+            const before = previous.cells[row];
+            cells.forEach((text, column) => {
+                if (before[column] !== text) patch.push([row, column, text]);
+            });
+        });
+        return patch.length > 0 ? { patch } : null;
+    }
+    return { rows: result.cells, columns: table.columns.map(([, label]) => label), sort: table.sort };
+}
+
+// Posts what changed on the page after new data of `sources` arrived (all of it with `full`)
+function publish(sources, full = false) {
+    const update = { sources: {}, tables: {} };
+    for (const source of sources) {
+        if (!renderedSources.includes(source) || state[source] === undefined) continue;
+        const summary = summarize(source, state[source]);
+        const json = JSON.stringify(summary);
+        if (full || postedSummaries[source] !== json) {
+            postedSummaries[source] = json;
+            update.sources[source] = summary;
+        }
+    }
+    for (const [name, table] of Object.entries(TABLES)) {
+        if (!sources.includes(table.source) || state[table.source] === undefined) continue;
+        const change = diffTable(name, full);
+        if (change) update.tables[name] = change;
+    }
+    if (Object.keys(update.sources).length > 0 || Object.keys(update.tables).length > 0) {
+        self.postMessage(update);
+    }
+}
+
+function allSources() {
+    return [...new Set([...renderedSources, ...Object.values(TABLES).map(table => table.source)])];
+}
+
+// Applies a delta from /api/stream to the data of one source. Paths are '.'-joined keys and
+// list indexes; '<list>.#' carries the list length so shrinking lists are truncated.
+function applyDelta(data, delta) {
+    let root = { value: data };
+    for (const [path, value] of Object.entries(delta.set)) {
+        const keys = ['value', ...(path === '' ? [] : path.split('.'))];
+        let target = root;
+        for (let i = 0; i < keys.length - 1; i++) {
+            if (target[keys[i]] === null || typeof target[keys[i]] !== 'object') {
+                target[keys[i]] = (keys[i + 1] === '#' || /^\d+$/.test(keys[i + 1])) ? [] : {};
+            }
+            target = target[keys[i]];
+        }
+        const last = keys[keys.length - 1];
+        if (last === '#') {
+            target.length = value;
+        } else {
+            target[last] = value;
+        }
+    }
+    for (const path of delta.unset) {
+        const keys = path.split('.');
+        let target = root.value;
+        for (let i = 0; i < keys.length - 1 && target; i++) {
+            target = target[keys[i]];
+        }
+        if (target && !Array.isArray(target)) {
+            delete target[keys[keys.length - 1]];
+        }
+    }
+    return root.value;
+}
+
+function startLiveStream() {
+    const source = new EventSource(`${baseUrl}/api/stream`);
+    source.addEventListener('snapshot', event => {
+        const message = JSON.parse(event.data);
+        state[message.source] = message.data;
+        publish([message.source]);
+    });
+    source.addEventListener('delta', event => {
+        const message = JSON.parse(event.data);
+        state[message.source] = applyDelta(state[message.source], message);
+        publish([message.source]);
+    });
+    source.onerror = () => {
+        // EventSource reconnects by itself; the server resends full snapshots on reconnect
+        console.warn('Live stream interrupted, reconnecting...');
+    };
+    return source;
+}
+
+// Every source in one request; the backend reads them all from its cache
+async function loadSnapshot() {
+    let snapshot;
+    try {
+        const response = await fetch(`${baseUrl}/api/snapshot`);
+        if (!response.ok) {
+            const errorText = await response.text();
+            throw new Error(`HTTP error! status: ${response.status}, message: ${errorText}`);
+        }
+        snapshot = await response.json();
+    } catch (error) {
+        console.error('Error fetching snapshot:', error);
+        snapshot = { error: `Failed to load data from snapshot. ${error.message}` };
+    }
+    const loaded = [];
+    for (const source of allSources()) {
+        const entry = snapshot.sources && snapshot.sources[source];
+        if (entry) {
+            state[source] = entry.data;
+        } else if (snapshot.error) {
+            state[source] = { error: snapshot.error };
+        } else {
+            continue; // Not collected yet (listed in snapshot.missing) or not enabled, e.g. alerts
+        }
+        loaded.push(source);
+    }
+    publish(loaded);
+}
+
+// Messages from the page: start, load (refresh everything), sort, resync (post everything again)
+self.onmessage = event => {
+    const message = event.data;
+    if (message.type === 'start') {
+        baseUrl = message.baseUrl;
+        renderedSources = message.sources;
+        if (self.EventSource) {
+            startLiveStream(); // Full snapshots first, then only the values that changed
+        } else {
+            loadSnapshot();
+        }
+    } else if (message.type === 'load') {
+        loadSnapshot();
+    } else if (message.type === 'sort' && TABLES[message.table]) {
+        TABLES[message.table].sort = { column: message.column, descending: message.descending };
+        postedTables[message.table] = null; // The order changed: post all rows
+        publish([TABLES[message.table].source]);
+    } else if (message.type === 'resync') {
+        publish(allSources(), true);
+    }
+};
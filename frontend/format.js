@@ -0,0 +1,15 @@
+// Formatting helpers shared by the page (script.js) and the data worker (data-worker.js)
+
+// Bytes per second as a short human readable rate
+function formatRate(value) {
+    if (typeof value !== 'number') return 'N/A';
+    const units = ['B/s', 'KB/s', 'MB/s', 'GB/s'];
+    let unit = 0;
+    while (value >= 1024 && unit < units.length - 1) { value /= 1024; unit++; }
+    return `${value.toFixed(unit ? 1 : 0)} ${units[unit]}`;
+}
+
+const formatNumber = value => typeof value === 'number' ? String(value) : 'N/A';
+
+// Any cell value as text, missing values as 'N/A'
+const formatValue = value => value === null || value === undefined ? 'N/A' : String(value);
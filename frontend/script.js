@@ -7,6 +7,7 @@ document.addEventListener('DOMContentLoaded', () => {
         cpu: document.getElementById('cpu-section'),
         gpu: document.getElementById('gpu-section'),
         ramDisk: document.getElementById('ram-disk-section'),
+        io: document.getElementById('io-section'),
         lxc: document.getElementById('lxc-section'),
         liveStats: document.getElementById('live-stats-section'), // New section
     };
@@ -17,14 +18,20 @@ document.addEventListener('DOMContentLoaded', () => {
         overviewCpu: document.getElementById('overview-cpu').querySelector('pre'),
         overviewRam: document.getElementById('overview-ram').querySelector('pre'),
         overviewDisk: document.getElementById('overview-disk').querySelector('pre'),
+        overviewIo: document.getElementById('overview-io').querySelector('pre'),
         // Detailed sections
         cpuInfo: document.getElementById('cpu-info'),
+        cpuCores: document.getElementById('cpu-cores'),
         gpuInfo: document.getElementById('gpu-info'),
+        gpuProcessesInfo: document.getElementById('gpu-processes-info'),
         ramInfo: document.getElementById('ram-info'),
         diskInfo: document.getElementById('disk-info'),
-        lxcInfo: document.getElementById('lxc-info'), // This is the container for the rich HTML
+        diskIoInfo: document.getElementById('disk-io-info'),
+        networkInfo: document.getElementById('network-info'),
+        lxcInfo: document.getElementById('lxc-info'), // Container table
         liveStatsDisplay: document.getElementById('live-stats-display'), // New element for live stats <pre>
         timestamp: document.getElementById('timestamp'),
+        alertsBanner: document.getElementById('alerts-banner'),
     };
 
     // Navigation buttons
@@ -33,6 +40,7 @@ document.addEventListener('DOMContentLoaded', () => {
         cpu: document.getElementById('btn-cpu'),
         gpu: document.getElementById('btn-gpu'),
         ramDisk: document.getElementById('btn-ram-disk'),
+        io: document.getElementById('btn-io'),
         lxc: document.getElementById('btn-lxc'),
         liveStats: document.getElementById('btn-live-stats'), // New button
     };
@@ -76,61 +84,192 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    // --- Data Loading Functions ---
-    async function loadCpuInfo() {
-        const data = await fetchData('cpu-info');
-        displayData(elements.cpuInfo, data);
-        // Also update overview if it's just a summary
+    // Writes text into an element only if it differs, so unchanged cells are not touched
+    function setText(element, text) {
+        if (element.textContent !== text) {
+            element.textContent = text;
+        }
+    }
+
+    // Latest data per rendered source ('cpu', 'gpu', 'ram_disk', 'disk_io', 'network', 'live_stats', ...),
+    // as posted by the data worker
+    const state = {};
+
+    // --- Virtual Tables ---
+    // Height of a table row in pixels, must match `.virtual-table td` in style.css
+    const ROW_HEIGHT = 28;
+    // Rows visible at once; longer tables scroll inside their own viewport
+    const VIEWPORT_ROWS = 20;
+    // Rows rendered above and below the visible ones, so fast scrolling shows no blank rows
+    const OVERSCAN_ROWS = 5;
+
+    // A table that only creates DOM rows for the visible window of its rows. The rows are lists
+    // of cell texts, already formatted and sorted by the data worker; scrolling reuses a fixed pool
+    // of <tr> elements between two spacer rows, and patches write only the cells that changed.
+    class VirtualTable {
+        constructor(container, onSort) {
+            this.container = container;
+            this.rows = [];
+            this.columns = [];
+            this.sort = null;
+            this.first = 0;       // Index of the row shown in the first pooled <tr>
+            this.pool = [];
+            this.frame = null;
+
+            this.viewport = document.createElement('div');
+            this.viewport.className = 'virtual-table';
+            this.viewport.style.maxHeight = `${ROW_HEIGHT * (VIEWPORT_ROWS + 1)}px`; // Rows plus the header
+            this.viewport.addEventListener('scroll', () => this.scheduleRender(), { passive: true });
+            const table = document.createElement('table');
+            table.className = 'data-table';
+            this.headRow = table.createTHead().insertRow();
+            this.headRow.addEventListener('click', event => {
+                const header = event.target.closest('th');
+                if (header) onSort(Number(header.dataset.column));
+            });
+            this.body = table.createTBody();
+            this.topSpacer = this.body.insertRow();
+            this.bottomSpacer = this.body.insertRow();
+            [this.topSpacer, this.bottomSpacer].forEach(spacer => { spacer.className = 'spacer'; spacer.insertCell(); });
+            this.viewport.appendChild(table);
+            this.messageElement = document.createElement('pre');
+        }
+
+        // Shows `rows` (lists of cell texts) under the `columns` labels, sorted as in `sort`
+        setRows(columns, rows, sort) {
+            if (columns.join('\n') !== this.columns.join('\n') || !this.sort ||
+                    sort.column !== this.sort.column || sort.descending !== this.sort.descending) {
+                this.renderHead(columns, sort);
+            }
+            this.rows = rows;
+            if (this.container.firstChild !== this.viewport) this.container.replaceChildren(this.viewport);
+            this.render();
+        }
+
+        // Applies [row, column, text] changes; only cells of rendered rows touch the DOM
+        patch(changes) {
+            for (const [index, column, text] of changes) {
+                const row = this.rows[index];
+                if (!row) continue; // Stale patch from before a resync
+                row[column] = text;
+                const element = this.pool[index - this.first];
+                if (element) setText(element.cells[column], text);
+            }
+        }
+
+        // Shows an error or "nothing to show" text instead of the table
+        showMessage(text) {
+            this.rows = [];
+            setText(this.messageElement, text);
+            if (this.container.firstChild !== this.messageElement) this.container.replaceChildren(this.messageElement);
+        }
+
+        renderHead(columns, sort) {
+            this.columns = columns;
+            this.sort = sort;
+            this.headRow.replaceChildren(...columns.map((label, column) => {
+                const header = document.createElement('th');
+                header.dataset.column = column;
+                header.textContent = column === sort.column ? `${label} ${sort.descending ? '▼' : '▲'}` : label;
+                return header;
+            }));
+            this.topSpacer.cells[0].colSpan = this.bottomSpacer.cells[0].colSpan = columns.length;
+            // Pooled rows have one cell per column, so a new set of columns starts a new pool
+            this.pool.forEach(row => row.remove());
+            this.pool = [];
+        }
+
+        scheduleRender() {
+            if (this.frame === null) {
+                this.frame = requestAnimationFrame(() => { this.frame = null; this.render(); });
+            }
+        }
+
+        render() {
+            const total = this.rows.length;
+            const windowSize = VIEWPORT_ROWS + 2 * OVERSCAN_ROWS;
+            const first = Math.max(0, Math.min(Math.floor(this.viewport.scrollTop / ROW_HEIGHT) - OVERSCAN_ROWS, total - windowSize));
+            const count = Math.min(windowSize, total - first);
+            while (this.pool.length < count) {
+                const row = document.createElement('tr');
+                this.columns.forEach(() => row.insertCell());
+                this.body.insertBefore(row, this.bottomSpacer);
+                this.pool.push(row);
+            }
+            while (this.pool.length > count) {
+                this.pool.pop().remove();
+            }
+            this.first = first;
+            for (let i = 0; i < count; i++) {
+                const cells = this.rows[first + i];
+                const element = this.pool[i];
+                for (let column = 0; column < cells.length; column++) {
+                    setText(element.cells[column], cells[column]);
+                }
+            }
+            this.setSpacer(this.topSpacer, first);
+            this.setSpacer(this.bottomSpacer, total - first - count);
+        }
+
+        setSpacer(spacer, rows) {
+            spacer.style.display = rows > 0 ? '' : 'none';
+            spacer.style.height = `${rows * ROW_HEIGHT}px`;
+        }
+    }
+
+    // --- Rendering Functions ---
+    function renderOverviewCompute() {
+        // GPU info takes the compute slot of the overview if available, otherwise CPU info is shown
+        const gpus = state.gpu;
+        if (Array.isArray(gpus) && gpus.length > 0) {
+            const gpuSummary = gpus.map(gpu => `${gpu.name} (Memory: ${gpu.memory_total_mb} MiB, Util: ${gpu.utilization_gpu} %)`).join('\n');
+            setText(elements.overviewCpu, gpuSummary);
+            return;
+        }
+        const data = state.cpu;
         if (Array.isArray(data) && data.length > 0) {
             // Assuming the first entry is representative for the overview
             const core = data[0]; 
-            elements.overviewCpu.textContent = `${core.Name || core.model_name || 'Unknown CPU'} (${core.NumberOfCores || 'N/A'} Cores, ${core.NumberOfLogicalProcessors || 'N/A'} Threads)`;
-        } else if (data && typeof data === 'object' && !Array.isArray(data) && Object.keys(data).length > 0) { // Handle single CPU object case (already good)
+            setText(elements.overviewCpu, `${core.Name || core.model_name || 'Unknown CPU'} (${core.NumberOfCores || core.physical_cores || 'N/A'} Cores, ${core.NumberOfLogicalProcessors || core.logical_processors || 'N/A'} Threads)`);
+        } else if (data && data.error) {
+            setText(elements.overviewCpu, `Error: ${data.error}`);
+        } else if (data && typeof data === 'object' && Object.keys(data).length > 0) { // Single CPU object (Linux)
             const core = data;
-            elements.overviewCpu.textContent = `${core.Name || core.model_name || 'Unknown CPU'} (${core.NumberOfCores || 'N/A'} Cores, ${core.NumberOfLogicalProcessors || 'N/A'} Threads)`;
-        }
-         else if (data && data.error) {
-            elements.overviewCpu.textContent = `Error: ${data.error}`;
+            const load = core.utilization_percent !== undefined ? `, Load: ${core.utilization_percent} %` : '';
+            setText(elements.overviewCpu, `${core.Name || core.model_name || 'Unknown CPU'} (${core.NumberOfCores || core.physical_cores || 'N/A'} Cores, ${core.NumberOfLogicalProcessors || core.logical_processors || 'N/A'} Threads${load})`);
         } else {
-            elements.overviewCpu.textContent = "CPU data not available or in unexpected format.";
+            setText(elements.overviewCpu, "CPU data not available or in unexpected format.");
         }
     }
 
-    async function loadGpuInfo() {
-        const data = await fetchData('gpu-info');
-        displayData(elements.gpuInfo, data);
-        // Update overview with GPU info if available, otherwise default to CPU info already set
-        if (Array.isArray(data) && data.length > 0) {
-            const gpuSummary = data.map(gpu => `${gpu.name} (Memory: ${gpu.memory_total} MiB, Util: ${gpu.utilization_gpu} %)`).join('\\n');
-            // If there's GPU info, prepend it or replace CPU, depending on desired layout.
-            // For now, let's assume if GPU exists, it's the primary interest for this slot in overview.
-            elements.overviewCpu.textContent = gpuSummary; // Potentially rename overviewCpu to overviewSystemCompute or similar
-        } else if (data && data.error) {
-            // elements.overviewCpu.textContent += `\\nGPU Error: ${data.error}`; // Append GPU error or handle differently
-        }
-        // If no GPU data, the CPU info (set by loadCpuInfo) will remain.
+    function renderCpu(data) {
+        displayData(elements.cpuInfo, data);
+        renderOverviewCompute();
     }
 
-    async function loadRamDiskInfo() {
-        const data = await fetchData('ram-disk');
+    function renderGpu() {
+        renderOverviewCompute(); // The GPU table itself is filled by the data worker
+    }
+
+    function renderRamDisk(data) {
         if (data && !data.error) {
             displayData(elements.ramInfo, data.ram);
             displayData(elements.diskInfo, data.disk);
             // Overview update
             if (data.ram && !data.ram.error) {
-                elements.overviewRam.textContent = `Total: ${data.ram.total_mb || 'N/A'} MB, Used: ${data.ram.used_mb || 'N/A'} MB, Available: ${data.ram.available_mb || 'N/A'} MB`;
+                setText(elements.overviewRam, `Total: ${data.ram.total_mb || 'N/A'} MB, Used: ${data.ram.used_mb || 'N/A'} MB, Available: ${data.ram.available_mb || 'N/A'} MB`);
             } else {
-                elements.overviewRam.textContent = (data.ram && data.ram.error) || "RAM data not available.";
+                setText(elements.overviewRam, (data.ram && data.ram.error) || "RAM data not available.");
             }
             if (data.disk && Array.isArray(data.disk)) {
                 const diskSummary = data.disk.map(d => 
-                    `${d.filesystem || d.mounted_on || d.caption || 'N/A'}: ${d.used_gb || d.used_str || 'N/A'} GB used of ${d.total_gb || d.total_str || 'N/A'} GB (${d.use_percent || d.use_percent_str || 'N/A'})`
-                ).join('\n'); // Changed from '\\n' to '\n'
-                elements.overviewDisk.textContent = diskSummary || "Disk data not available.";
+                    `${d.filesystem || d.mounted_on || d.caption || 'N/A'}: ${d.used_gb ?? d.used_str ?? 'N/A'} GB used of ${d.total_gb ?? d.total_str ?? 'N/A'} GB (${d.use_percent ?? d.use_percent_str ?? 'N/A'}%)`
+                ).join('\n');
+                setText(elements.overviewDisk, diskSummary || "Disk data not available.");
             } else if (data.disk && data.disk.error) {
-                elements.overviewDisk.textContent = data.disk.error;
+                setText(elements.overviewDisk, data.disk.error);
             } else {
-                elements.overviewDisk.textContent = "Disk data not available or in unexpected format.";
+                setText(elements.overviewDisk, "Disk data not available or in unexpected format.");
             }
         } else {
             const errorMsg = (data && data.error) || "Failed to load RAM/Disk data.";
@@ -141,35 +280,162 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    async function loadLxcInfo() { // Renamed from the previous simple version
-        await fetchLxcData(); // fetchLxcData updates its own specific section ('lxc-data')
+    // Renders `rows` as a table of [field, label, format] columns, or the data's message/error
+    function renderRateTable(container, data, rows, columns) {
+        if (!data || data.error || data.message || !Array.isArray(rows)) {
+            container.innerHTML = '<pre></pre>';
+            container.firstChild.textContent = (data && (data.error || data.message)) || 'No data available.';
+            return;
+        }
+        let html = '<table class="data-table"><thead><tr>';
+        columns.forEach(([, label]) => { html += `<th>${label}</th>`; });
+        html += '</tr></thead><tbody>';
+        rows.forEach(row => {
+            html += '<tr>';
+            columns.forEach(([field, , format]) => { html += `<td>${(format || formatNumber)(row[field])}</td>`; });
+            html += '</tr>';
+        });
+        container.innerHTML = html + '</tbody></table>';
     }
 
+    const DISK_IO_COLUMNS = [
+        ['name', 'Device', String], ['read_bytes_per_second', 'Read', formatRate], ['write_bytes_per_second', 'Write', formatRate],
+        ['read_iops', 'Read IOPS'], ['write_iops', 'Write IOPS'], ['read_latency_ms', 'Read Latency (ms)'],
+        ['write_latency_ms', 'Write Latency (ms)'], ['utilization_percent', 'Util (%)'],
+    ];
+
+    const NETWORK_COLUMNS = [
+        ['name', 'Interface', String], ['rx_bytes_per_second', 'Receive', formatRate], ['tx_bytes_per_second', 'Transmit', formatRate],
+        ['rx_packets_per_second', 'RX Packets/s'], ['tx_packets_per_second', 'TX Packets/s'],
+        ['link_speed_bytes_per_second', 'Link Speed', formatRate], ['utilization_percent', 'Util (%)'],
+        ['rx_dropped', 'RX Dropped'], ['tx_errors', 'TX Errors'],
+    ];
+
+    // Sum of one rate field over devices, or null if none reports it yet
+    function totalRate(rows, field) {
+        const values = (rows || []).map(row => row[field]).filter(value => typeof value === 'number');
+        return values.length ? values.reduce((sum, value) => sum + value, 0) : null;
+    }
+
+    function renderOverviewIo() {
+        const disks = state.disk_io && state.disk_io.devices;
+        // Bridges and container veths repeat the traffic of the physical interfaces
+        const interfaces = ((state.network && state.network.interfaces) || [])
+            .filter(iface => !/^(veth|lxdbr|br|docker|virbr)/.test(iface.name));
+        setText(elements.overviewIo,
+            `Disk: read ${formatRate(totalRate(disks, 'read_bytes_per_second'))}, write ${formatRate(totalRate(disks, 'write_bytes_per_second'))}\n` +
+            `Network: receive ${formatRate(totalRate(interfaces, 'rx_bytes_per_second'))}, transmit ${formatRate(totalRate(interfaces, 'tx_bytes_per_second'))}`);
+    }
+
+    function renderDiskIo(data) {
+        renderRateTable(elements.diskIoInfo, data, data && data.devices, DISK_IO_COLUMNS);
+        renderOverviewIo();
+    }
+
+    function renderNetwork(data) {
+        renderRateTable(elements.networkInfo, data, data && data.interfaces, NETWORK_COLUMNS);
+        renderOverviewIo();
+    }
+
+    // Firing alerts from the backend's rules engine, shown above every section
+    function renderAlerts(data) {
+        const firing = (data && Array.isArray(data.firing)) ? data.firing : [];
+        elements.alertsBanner.classList.toggle('hidden', firing.length === 0);
+        const lines = firing.map(alert => {
+            const value = typeof alert.value === 'number' ? alert.value.toFixed(1) : alert.value;
+            return `[${alert.severity}] ${alert.rule} on ${alert.device}: ${alert.metric} = ${value} (threshold ${alert.threshold})`;
+        });
+        setText(elements.alertsBanner, lines.join('\n'));
+    }
+
+    function renderLiveStats(data) {
+        setText(elements.liveStatsDisplay, typeof data === 'string' ? data : (data && (data.text || data.error)) || '');
+    }
+
+    // Renderers per source, called with the data posted by the data worker. The long lists (cores,
+    // GPUs, GPU processes, LXC containers) are rendered as virtual tables instead, see `tables`.
+    const renderers = {
+        cpu: renderCpu,
+        gpu: renderGpu,
+        ram_disk: renderRamDisk,
+        live_stats: renderLiveStats,
+        disk_io: renderDiskIo,
+        network: renderNetwork,
+        alerts: renderAlerts,
+    };
+
+    // --- Data Worker ---
+    // The worker owns the live stream (or the snapshot requests): it parses, applies deltas,
+    // sorts and diffs, and posts {sources: {source: data}, tables: {table: change}} updates.
+    const worker = new Worker('data-worker.js');
+
+    // Queued updates beyond this (e.g. while the tab is in the background and no animation
+    // frames run) are dropped and the worker is asked to post everything again
+    const MAX_PENDING_UPDATES = 100;
+
+    const tables = {};
+    [['cores', elements.cpuCores], ['gpus', elements.gpuInfo], ['processes', elements.gpuProcessesInfo],
+     ['containers', elements.lxcInfo]].forEach(([name, container]) => {
+        tables[name] = new VirtualTable(container, column => {
+            // Clicking the sort column again reverses the order
+            const sort = tables[name].sort;
+            const descending = sort && sort.column === column ? !sort.descending : false;
+            worker.postMessage({ type: 'sort', table: name, column, descending });
+        });
+    });
+
+    let pendingUpdates = [];
+
+    // Updates are applied once per animation frame, so a burst of stream events costs one layout
+    function applyUpdates() {
+        const updates = pendingUpdates;
+        pendingUpdates = [];
+        for (const update of updates) {
+            for (const [source, data] of Object.entries(update.sources)) {
+                state[source] = data;
+                renderers[source](data);
+            }
+            for (const [name, change] of Object.entries(update.tables)) {
+                if (change.message !== undefined) {
+                    tables[name].showMessage(change.message);
+                } else if (change.rows) {
+                    tables[name].setRows(change.columns, change.rows, change.sort);
+                } else {
+                    tables[name].patch(change.patch);
+                }
+            }
+        }
+        if (updates.length > 0) updateTimestamp();
+    }
+
+    worker.onmessage = event => {
+        if (pendingUpdates.length >= MAX_PENDING_UPDATES) {
+            pendingUpdates = [];
+            worker.postMessage({ type: 'resync' });
+            return;
+        }
+        if (pendingUpdates.length === 0) requestAnimationFrame(applyUpdates);
+        pendingUpdates.push(event.data);
+    };
+
+    // --- Data Loading Functions ---
     async function loadLiveStats() {
-        elements.liveStatsDisplay.textContent = "Loading live stats...";
         const data = await fetchData('live-stats', false); // false because we expect plain text
-        elements.liveStatsDisplay.textContent = data;
+        renderLiveStats(data);
     }
 
     function updateTimestamp() {
         elements.timestamp.textContent = new Date().toLocaleString();
     }
 
-    async function loadAllData() {
+    function loadAllData() {
         // Show a loading indicator if you have one
         // Clear previous overview data to avoid confusion during refresh
         elements.overviewCpu.textContent = "Loading...";
         elements.overviewRam.textContent = "Loading...";
         elements.overviewDisk.textContent = "Loading...";
 
-        await loadCpuInfo(); // Load CPU info first
-        await loadGpuInfo(); // Then load GPU info, which might overwrite the CPU field in overview
-        await loadRamDiskInfo();
-        await loadLxcInfo(); 
-        await loadLiveStats(); // Load live stats
-        
-        updateTimestamp();
-        // Hide loading indicator
+        worker.postMessage({ type: 'load' }); // Every source in one request, see loadSnapshot() in data-worker.js
     }
 
     // --- Navigation --- 
@@ -193,103 +459,17 @@ document.addEventListener('DOMContentLoaded', () => {
     navButtons.cpu.addEventListener('click', () => showSection('cpu'));
     navButtons.gpu.addEventListener('click', () => showSection('gpu'));
     navButtons.ramDisk.addEventListener('click', () => showSection('ramDisk'));
+    navButtons.io.addEventListener('click', () => showSection('io'));
     navButtons.lxc.addEventListener('click', () => showSection('lxc'));
     navButtons.liveStats.addEventListener('click', () => {
         showSection('liveStats');
-        loadLiveStats(); // Load live stats when section is shown
+        if (!window.EventSource) loadLiveStats(); // Without the live stream, load live stats when section is shown
     });
 
     refreshAllButton.addEventListener('click', loadAllData);
 
     // Initial load
     showSection('overview'); // Show overview by default
-    loadAllData(); // This will call the individual loaders including fetchLxcData indirectly or directly based on your setup.
-    // fetchLxcData(); // This line might be redundant if loadAllData -> loadLxcInfo -> fetchLxcData path is correctly set up.
-                       // Or if loadLxcInfo directly calls the /api/lxc and updates elements.lxcInfo
-                       // For clarity, ensure loadLxcInfo is the one that calls displayData(elements.lxcInfo, data);
-                       // and fetchLxcData is the one that builds the complex HTML for the LXC section.
-                       // Let's adjust: loadLxcInfo will call fetchLxcData.
-
-    // --- LXC Data Fetching ---
-    async function fetchLxcData() {
-        try {
-            const response = await fetch('/api/lxc');
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
-            }
-            const data = await response.json();
-            const lxcSection = document.getElementById('lxc-data');
-            if (data.error) {
-                lxcSection.innerHTML = `<p>Error fetching LXC data: ${data.error}</p><p>${data.message || ''}</p>`;
-                return;
-            }
-            if (data.message) { // Handle cases like "LXC commands not available on this OS"
-                lxcSection.innerHTML = `<p>${data.message}</p>`;
-                return;
-            }
-
-            let html = '<h2>LXC Container Information</h2>';
-            if (data.length === 0) {
-                html += '<p>No LXC containers found.</p>';
-            } else {
-                data.forEach(container => {
-                    html += `
-                        <div class="container-card">
-                            <h3>${container.name} (Status: ${container.status})</h3>
-                            <p><strong>Owner:</strong> ${container.user_owner || 'N/A'}</p>
-                            <p><strong>IPv4:</strong> ${container.ipv4 && container.ipv4.length > 0 ? container.ipv4.join(', ') : 'N/A'}</p>
-                            <p><strong>IPv6:</strong> ${container.ipv6 && container.ipv6.length > 0 ? container.ipv6.join(', ') : 'N/A'}</p>
-                            <p><strong>Memory Usage:</strong> ${container.memory_usage_mb} MB</p>
-                            <h4>Disk Devices:</h4>
-                    `;
-                    if (Array.isArray(container.disk_devices)) {
-                        if (container.disk_devices.length > 0) {
-                            html += '<ul>';
-                            container.disk_devices.forEach(disk => {
-                                html += `<li>
-                                    <strong>${disk.name}</strong> (Path: ${disk.path}, Pool: ${disk.pool})
-                                    ${disk.total && disk.used ? `- Usage: ${disk.used} / ${disk.total}` : ' (Usage N/A)'}
-                                </li>`;
-                            });
-                            html += '</ul>';
-                        } else {
-                            html += '<p>No disk devices found or usage not reported.</p>';
-                        }
-                    } else {
-                         html += `<p>${container.disk_devices}</p>`; // Handles the "No disk devices..." string directly
-                    }
-
-                    html += '<h4>GPU Devices:</h4>';
-                    if (Array.isArray(container.gpu_devices)) {
-                        if (container.gpu_devices.length > 0) {
-                            html += '<ul>';
-                            container.gpu_devices.forEach(gpu => {
-                                html += `<li>
-                                    <strong>${gpu.name || 'N/A'}</strong>
-                                    ${gpu.vendor ? `(Vendor: ${gpu.vendor}` : ''}
-                                    ${gpu.product ? `, Product: ${gpu.product}` : ''}
-                                    ${gpu.pci_address ? `, PCI: ${gpu.pci_address}` : ''})
-                                </li>`;
-                            });
-                            html += '</ul>';
-                        } else {
-                            html += '<p>No GPU devices configured for this container.</p>';
-                        }
-                    } else {
-                        html += `<p>${container.gpu_devices}</p>`; // Handles the "No GPU devices..." string directly
-                    }
-                    html += '</div>';
-                });
-            }
-            lxcSection.innerHTML = html;
-        } catch (error) {
-            document.getElementById('lxc-data').innerHTML = `<p>Failed to load LXC data: ${error.message}</p>`;
-            console.error('Error fetching LXC data:', error);
-        }
-    }
-
-    // Adjusting loadLxcInfo to use the detailed fetchLxcData for the LXC section
-    async function loadLxcInfo() { // Renamed from the previous simple version
-        await fetchLxcData(); // fetchLxcData updates its own specific section ('lxc-data')
-    }
+    // The worker starts the live stream, or loads one snapshot where EventSource is not available
+    worker.postMessage({ type: 'start', baseUrl: API_BASE_URL, sources: Object.keys(renderers) });
 });
@@ -1,3 +1,7 @@
 #!/bin/bash
 cd backend
+if [ "$1" = "production" ]; then
+    # gunicorn workers sharing one collector process, see backend/gunicorn.conf.py
+    exec gunicorn -c gunicorn.conf.py
+fi
 python3 app.py